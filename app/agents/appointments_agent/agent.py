@@ -26,7 +26,7 @@ def crear_cita(
         event["id"],
         {"paciente": paciente, "telefono": telefono, "inicio": inicio_iso, "fin": fin_iso},
     )
-    scheduler_tool.schedule_reminders(event["id"], inicio_iso)
+    scheduler_tool.schedule_reminders(event["id"], inicio_iso, telefono, paciente)
     messaging_tool.send_whatsapp(
         telefono, f"Tu cita ha sido programada para {inicio_iso}."
     )
@@ -51,6 +51,7 @@ def actualizar_cita(evento_id: str, inicio_iso: str, fin_iso: str) -> str:
 def cancelar_cita(evento_id: str, telefono: str) -> str:
     """Cancel an appointment."""
     google_calendar_tool.eliminar_evento(evento_id)
+    scheduler_tool.cancel_reminders(evento_id)
     state_store.delete_state(evento_id)
     messaging_tool.send_whatsapp(telefono, "Tu cita ha sido cancelada.")
     notify_owner_tool.notify_owner(f"Cita cancelada {evento_id}")
@@ -0,0 +1,174 @@
+"""
+Índice precompilado del catálogo de servicios.
+
+El YAML se carga una vez por contenedor y se recompila solo si cambia (mtime
+en disco o ETag en S3). Las rutas relativas se resuelven contra el paquete
+`app/` (el que se sube a Lambda, con `content/` adentro), no contra el cwd; si
+el catálogo por defecto no existe, el módulo falla al importarse. Cada servicio queda como documento de un índice
+invertido con tokens sin tildes; las búsquedas puntúan con BM25 solo los
+documentos que comparten algún token con la pregunta. Las líneas de cada
+servicio y el pie de contacto se renderizan al compilar.
+"""
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+from .textnorm import tokens
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Raíz del paquete desplegado (app/): base de las rutas relativas
+APP_ROOT = Path(__file__).resolve().parents[1]
+# Cada cuánto (s) se revisa si el origen cambió; 0 = en cada llamada
+RECHECK_S = float(os.environ.get("CATALOG_RECHECK_S", "5"))
+FALLBACK_N = 3
+MAX_HITS = int(os.environ.get("CATALOG_MAX_HITS", "5"))
+NAME_BOOST = 2  # los tokens del nombre cuentan doble
+K1, B = 1.2, 0.75
+
+
+class CatalogIndex:
+    """Catálogo compilado: índice invertido BM25 + textos prerenderizados."""
+
+    def __init__(self, data: dict, version: str = ""):
+        self.version = version
+        self.data = data
+        self.services = data.get("servicios", []) or []
+        contacto = data.get("contacto", {}) or {}
+        self.contacto = contacto
+        self.lines = [
+            f"- {s['nombre']} ({s['duracion']}): {s['descripcion']}" for s in self.services
+        ]
+        self.footer = (
+            f"\n\nDirección: {contacto.get('direccion', '')}"
+            f"\nWhatsApp: {contacto.get('whatsapp', '')}"
+            f"\nHorario: {contacto.get('horario', '')}"
+        )
+        self.fallback = (
+            "Servicios recomendados:\n" + "\n".join(self.lines[:FALLBACK_N]) + self.footer
+        )
+
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        self.doc_len: list[int] = []
+        for doc_id, s in enumerate(self.services):
+            terms = tokens(s["nombre"]) * NAME_BOOST + tokens(s["descripcion"])
+            self.doc_len.append(len(terms))
+            tf: dict[str, int] = {}
+            for t in terms:
+                tf[t] = tf.get(t, 0) + 1
+            for t, n in tf.items():
+                self.postings.setdefault(t, []).append((doc_id, n))
+        n_docs = len(self.services)
+        self.avgdl = (sum(self.doc_len) / n_docs) if n_docs else 0.0
+        # Normalización por longitud de BM25, precalculada por documento
+        self.doc_norm = [K1 * (1 - B + B * n / self.avgdl) for n in self.doc_len]
+        self.idf = {
+            t: math.log(1 + (n_docs - len(p) + 0.5) / (len(p) + 0.5))
+            for t, p in self.postings.items()
+        }
+
+    def search(self, question: str, limit: int | None = None) -> list[int]:
+        """Ids de servicios relevantes, de mayor a menor puntuación BM25."""
+        scores: dict[int, float] = {}
+        for t in set(tokens(question)):
+            posting = self.postings.get(t)
+            if not posting:
+                continue
+            idf = self.idf[t]
+            for doc_id, tf in posting:
+                score = idf * tf * (K1 + 1) / (tf + self.doc_norm[doc_id])
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+        if limit:
+            return heapq.nsmallest(limit, scores, key=lambda d: (-scores[d], d))
+        return sorted(scores, key=lambda d: (-scores[d], d))
+
+    def answer(self, question: str, limit: int | None = MAX_HITS) -> str:
+        hits = self.search(question, limit)
+        if not hits:
+            return self.fallback
+        return "Servicios recomendados:\n" + "\n".join(self.lines[d] for d in hits) + self.footer
+
+
+def _parse_yaml(text: str) -> dict:
+    import yaml
+
+    return yaml.safe_load(text) or {}
+
+
+class _Source:
+    """Origen del catálogo: ruta local (versión = mtime) o `s3://bucket/key` (versión = ETag)."""
+
+    def __init__(self, location: str):
+        self.location = str(location)
+        self.is_s3 = self.location.startswith("s3://")
+        if self.is_s3:
+            self.bucket, _, self.key = self.location[5:].partition("/")
+
+    def version(self) -> str:
+        if self.is_s3:
+            from tools import aws_clients
+
+            head = aws_clients.client("s3").head_object(Bucket=self.bucket, Key=self.key)
+            return head["ETag"]
+        st = Path(self.location).stat()
+        return f"{st.st_mtime_ns}:{st.st_size}"
+
+    def read(self) -> str:
+        if self.is_s3:
+            from tools import aws_clients
+
+            obj = aws_clients.client("s3").get_object(Bucket=self.bucket, Key=self.key)
+            return obj["Body"].read().decode("utf-8")
+        return Path(self.location).read_text(encoding="utf-8")
+
+
+def resolve_location(location) -> str:
+    """s3://... y rutas absolutas tal cual; las relativas, dentro de APP_ROOT."""
+    location = str(location)
+    if location.startswith("s3://") or Path(location).is_absolute():
+        return location
+    return str(APP_ROOT / location)
+
+
+# Ruta local o s3://bucket/key del catálogo
+DEFAULT_LOCATION = resolve_location(os.getenv("PT_CONTENT_PATH") or "content/pelvis/service.yml")
+if not DEFAULT_LOCATION.startswith("s3://") and not Path(DEFAULT_LOCATION).is_file():
+    raise FileNotFoundError(f"Service catalog not found: {DEFAULT_LOCATION} (PT_CONTENT_PATH)")
+
+_cache: dict[str, tuple[CatalogIndex, float]] = {}
+_lock = threading.Lock()
+
+
+def get_index(location, clock=time.monotonic) -> CatalogIndex:
+    """
+    Índice compilado para `location`. Revisa la versión del origen como mucho
+    cada RECHECK_S segundos y solo recompila si cambió.
+    """
+    key = resolve_location(location)
+    cached = _cache.get(key)
+    now = clock()
+    if cached and now - cached[1] < RECHECK_S:
+        return cached[0]
+    with _lock:
+        cached = _cache.get(key)
+        if cached and now - cached[1] < RECHECK_S:
+            return cached[0]
+        src = _Source(key)
+        version = src.version()
+        if cached and cached[0].version == version:
+            _cache[key] = (cached[0], now)
+            return cached[0]
+        index = CatalogIndex(_parse_yaml(src.read()), version)
+        logger.info("Catalog %s compiled (%d services, v=%s)", key, len(index.services), version)
+        _cache[key] = (index, now)
+        return index
+
+
+def clear_cache() -> None:
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,130 @@
+"""
+Respuestas deterministas para intenciones frecuentes (saludo, horario,
+dirección, contacto, servicios) antes de recurrir al LLM.
+
+Las reglas son regex precompiladas sobre texto sin tildes. Cada regla tiene un
+peso; la confianza baja cuando el mensaje es largo (probablemente pregunta algo
+más), y solo se responde si supera FAST_PATH_THRESHOLD. Las respuestas se
+renderizan una vez por versión del catálogo.
+"""
+import logging
+import os
+import re
+import threading
+
+from .catalog_index import DEFAULT_LOCATION, get_index
+from .textnorm import fold, tokens
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+THRESHOLD = float(os.environ.get("FAST_PATH_THRESHOLD", "0.6"))
+# Tokens que cubre una intención sin penalizar la confianza
+TOKEN_BUDGET = 6
+
+
+class Rule:
+    __slots__ = ("intent", "pattern", "weight")
+
+    def __init__(self, intent: str, pattern: str, weight: float):
+        self.intent = intent
+        self.pattern = re.compile(pattern)
+        self.weight = weight
+
+
+RULES = [
+    Rule(
+        "servicios",
+        r"\b(que servicios|servicios (tienen|ofrecen|hay|brindan)|catalogo"
+        r"|que (tratamientos|terapias) (tienen|ofrecen|hacen)|^servicios?\W*$)",
+        0.9,
+    ),
+    Rule(
+        "horario",
+        r"\b(horarios?|horas? de atencion|a que hora|atienden|abren|cierran)\b",
+        0.9,
+    ),
+    Rule(
+        "direccion",
+        r"\b(direccion|donde (estan|queda|quedan|se encuentran|atienden)|ubicad[oa]s?"
+        r"|ubicacion|como llego)\b",
+        0.9,
+    ),
+    Rule("contacto", r"\b(telefono|celular|numero de contacto|contacto)\b", 0.8),
+    Rule("saludo", r"^\W*(hola|buen[oa]s?( dias| tardes| noches)?|saludos|hey)\b", 0.9),
+]
+
+
+def _render(index) -> dict[str, str]:
+    c = index.contacto
+    centro = index.data.get("centro", "Pelvis Therapy")
+    return {
+        "saludo": (
+            f"¡Hola! Soy el asistente de {centro}. Puedo contarte sobre nuestros servicios, "
+            "horario y ubicación, o ayudarte con tu cita."
+        ),
+        "horario": f"Nuestro horario de atención es {c.get('horario', '')}.",
+        "direccion": (
+            f"Estamos en {c.get('direccion', '')}. Horario: {c.get('horario', '')}."
+        ),
+        "contacto": f"Puedes escribirnos al WhatsApp {c.get('whatsapp', '')}.",
+        "servicios": (
+            "Estos son nuestros servicios:\n"
+            + "\n".join(index.lines)
+            + "\n\n¿Sobre cuál te gustaría saber más?"
+        ),
+    }
+
+
+class FastPath:
+    def __init__(self, location=DEFAULT_LOCATION, threshold: float = THRESHOLD):
+        self.location = location
+        self.threshold = threshold
+        self._responses: tuple[str, dict[str, str]] | None = None
+        self._lock = threading.Lock()
+        self.counters = {"total": 0, "fast": 0}
+
+    def _templates(self) -> dict[str, str]:
+        index = get_index(self.location)
+        cached = self._responses
+        if cached is None or cached[0] != index.version:
+            cached = (index.version, _render(index))
+            self._responses = cached
+        return cached[1]
+
+    def classify(self, text: str) -> tuple[list[str], float]:
+        """Intenciones detectadas (en orden de reglas) y confianza combinada."""
+        folded = fold(text or "").strip()
+        intents = [r for r in RULES if r.pattern.search(folded)]
+        if not intents:
+            return [], 0.0
+        # el saludo solo cuenta si no hay otra intención
+        if len(intents) > 1:
+            intents = [r for r in intents if r.intent != "saludo"]
+        n_tokens = len(tokens(folded, drop_stopwords=False)) or 1
+        budget = TOKEN_BUDGET * len(intents)
+        confidence = min(r.weight for r in intents) * min(1.0, budget / n_tokens)
+        return [r.intent for r in intents], confidence
+
+    def answer(self, text: str) -> str | None:
+        """Respuesta precomputada o None si el mensaje debe ir al LLM."""
+        intents, confidence = self.classify(text)
+        hit = bool(intents) and confidence >= self.threshold
+        with self._lock:
+            self.counters["total"] += 1
+            self.counters["fast"] += hit
+        if not hit:
+            return None
+        try:
+            templates = self._templates()
+        except OSError as e:
+            logger.warning("Fast path disabled, catalog unavailable: %s", e)
+            return None
+        return "\n\n".join(templates[i] for i in intents)
+
+    def stats(self) -> dict:
+        with self._lock:
+            c = dict(self.counters)
+        c["llm"] = c["total"] - c["fast"]
+        c["fast_ratio"] = round(c["fast"] / c["total"], 4) if c["total"] else 0.0
+        return c
@@ -1,13 +1,12 @@
-import os
-import yaml
 import logging
-from pathlib import Path
 from strands import Agent, tool
 
+from .catalog_index import DEFAULT_LOCATION, get_index, resolve_location
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-DATA = Path(os.getenv("PT_CONTENT_PATH", "content/pelvis/services.yml"))
+DATA = DEFAULT_LOCATION
 
 
 @tool
@@ -15,27 +14,37 @@ def buscar_servicio(pregunta: str) -> str:
     """
     Devuelve texto breve con el/los servicios relevantes y datos de contacto.
     """
-    data = yaml.safe_load(DATA.read_text(encoding="utf-8"))
-    svc = data.get("servicios", [])
-    hits = []
-    q = pregunta.lower()
-    for s in svc:
-        if any(k in q for k in (s["nombre"].lower().split())) or any(
-            w in s["descripcion"].lower() for w in q.split()
-        ):
-            hits.append(f"- {s['nombre']} ({s['duracion']}): {s['descripcion']}")
-    if not hits:
-        # fallback: muestra catálogo
-        hits = [f"- {s['nombre']} ({s['duracion']}): {s['descripcion']}" for s in svc[:3]]
-    footer = f"\n\nDirección: {data['contacto']['direccion']}\nWhatsApp: {data['contacto']['whatsapp']}\nHorario: {data['contacto']['horario']}"
-    return "Servicios recomendados:\n" + "\n".join(hits) + footer
-
-
-info_agent = Agent(
-    system_prompt=(
-        "Eres el asistente de Pelvis Therapy. Responde claro y corto. "
-        "Si preguntan por servicios, usa la herramienta buscar_servicio. "
-        "No inventes precios."
-    ),
-    tools=[buscar_servicio],
-)
+    return get_index(DATA).answer(pregunta)
+
+
+_agents: dict[str, Agent] = {}
+
+
+def _search_tool(location):
+    """buscar_servicio sobre el catálogo de otro tenant."""
+
+    @tool
+    def buscar_servicio(pregunta: str) -> str:
+        """
+        Devuelve texto breve con el/los servicios relevantes y datos de contacto.
+        """
+        return get_index(location).answer(pregunta)
+
+    return buscar_servicio
+
+
+def get_info_agent(location=DATA) -> Agent:
+    """Construye el Agent del catálogo en el primer uso (no al importar el módulo)."""
+    location = resolve_location(location)
+    agent = _agents.get(location)
+    if agent is None:
+        centro = get_index(location).data.get("centro", "Pelvis Therapy")
+        agent = _agents[location] = Agent(
+            system_prompt=(
+                f"Eres el asistente de {centro}. Responde claro y corto. "
+                "Si preguntan por servicios, usa la herramienta buscar_servicio. "
+                "No inventes precios."
+            ),
+            tools=[buscar_servicio if location == DATA else _search_tool(location)],
+        )
+    return agent
@@ -0,0 +1,182 @@
+"""
+Caché de respuestas del info_agent con claves normalizadas.
+
+"¿Dónde están ubicados?" y "ubicados donde estan" comparten clave: minúsculas,
+sin tildes, sin stopwords, tokens ordenados. Negaciones e interrogativos se
+conservan (KEY_STOPWORDS): "¿Dónde...?" y "¿Cuándo...?" no comparten respuesta.
+La ubicación y la versión del catálogo forman parte de la clave: cada tenant
+tiene sus entradas y, al cambiar el catálogo, las viejas dejan de usarse (y en
+DynamoDB expiran por `ttl`). Los backends se consultan en orden y un acierto en
+uno inferior rellena los superiores.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .catalog_index import DEFAULT_LOCATION, get_index, resolve_location
+from .textnorm import KEY_STOPWORDS, tokens
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# "lru" o "lru,dynamodb"
+BACKENDS = os.environ.get("RESPONSE_CACHE_BACKENDS", "lru")
+LRU_MAX = int(os.environ.get("RESPONSE_CACHE_LRU_MAX", "1024"))
+TTL_S = int(os.environ.get("RESPONSE_CACHE_TTL_S", str(24 * 3600)))
+
+
+def cache_key(text: str) -> str:
+    """Clave semántica: tokens normalizados, únicos y ordenados."""
+    return " ".join(sorted(set(tokens(text or "", stopwords=KEY_STOPWORDS))))
+
+
+class LruBackend:
+    name = "lru"
+
+    def __init__(self, maxsize: int = LRU_MAX, ttl: float = TTL_S, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            if hit[1] <= self._clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return hit[0]
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            self._data[key] = (value, self._clock() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class DynamoBackend:
+    """Entradas `RESPCACHE#<sha1>` en la tabla única, expiradas con `ttl`."""
+
+    name = "dynamodb"
+
+    def __init__(self, table, ttl: int = TTL_S):
+        self.table = table
+        self.ttl = ttl
+
+    @staticmethod
+    def _item_key(key: str) -> dict:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return {"pk": f"RESPCACHE#{digest}", "sk": "RESPCACHE"}
+
+    def get(self, key: str) -> str | None:
+        item = self.table.get_item(
+            Key=self._item_key(key),
+            ProjectionExpression="answer, #t",
+            ExpressionAttributeNames={"#t": "ttl"},
+        ).get("Item")
+        if not item or int(item.get("ttl", 0)) <= time.time():
+            return None
+        return item["answer"]
+
+    def put(self, key: str, value: str) -> None:
+        self.table.put_item(
+            Item={**self._item_key(key), "answer": value, "ttl": int(time.time()) + self.ttl}
+        )
+
+    def clear(self) -> None:
+        """No aplica: la versión del catálogo en la clave invalida y `ttl` limpia."""
+
+
+class ResponseCache:
+    def __init__(self, backends: list, location=DEFAULT_LOCATION):
+        self.backends = backends
+        self.location = resolve_location(location)
+        self._version = None
+        self._lock = threading.Lock()
+        self.counters = {"misses": 0, "errors": 0, **{f"{b.name}_hits": 0 for b in backends}}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def _full_key(self, text: str) -> str | None:
+        norm = cache_key(text)
+        if not norm:
+            return None
+        try:
+            version = get_index(self.location).version
+        except OSError as e:
+            logger.warning("Catalog unavailable, caching unversioned: %s", e)
+            version = "unversioned"
+        if version != self._version:
+            # catálogo nuevo: vacía tiers locales (los remotos quedan huérfanos por clave)
+            for b in self.backends:
+                b.clear()
+            self._version = version
+        return f"{self.location}|{version}|{norm}"
+
+    def get(self, text: str) -> str | None:
+        key = self._full_key(text)
+        if key is None:
+            return None
+        for i, backend in enumerate(self.backends):
+            try:
+                value = backend.get(key)
+            except Exception as e:  # noqa: BLE001 - un tier caído no debe cortar la respuesta
+                logger.warning("Response cache %s get failed: %s", backend.name, e)
+                self._count("errors")
+                continue
+            if value is not None:
+                self._count(f"{backend.name}_hits")
+                for upper in self.backends[:i]:
+                    upper.put(key, value)
+                return value
+        self._count("misses")
+        return None
+
+    def put(self, text: str, answer: str) -> None:
+        key = self._full_key(text)
+        if key is None or not answer:
+            return
+        for backend in self.backends:
+            try:
+                backend.put(key, answer)
+            except Exception as e:  # noqa: BLE001
+                logger.warning("Response cache %s put failed: %s", backend.name, e)
+                self._count("errors")
+
+    def stats(self) -> dict:
+        with self._lock:
+            c = dict(self.counters)
+        hits = sum(v for k, v in c.items() if k.endswith("_hits"))
+        total = hits + c["misses"]
+        c["hit_rate"] = round(hits / total, 4) if total else 0.0
+        return c
+
+
+def build_cache(spec: str = BACKENDS, location=DEFAULT_LOCATION) -> ResponseCache:
+    """Construye la caché según RESPONSE_CACHE_BACKENDS (p. ej. "lru,dynamodb")."""
+    backends = []
+    for name in (s.strip() for s in spec.split(",")):
+        if name == "lru":
+            backends.append(LruBackend())
+        elif name == "dynamodb":
+            from tools.aws_clients import lazy_table
+
+            table_name = os.environ.get("RESPONSE_CACHE_TABLE") or os.environ["DDB_TABLE"]
+            backends.append(DynamoBackend(lazy_table(table_name)))
+        elif name:
+            raise ValueError(f"Unknown response cache backend: {name}")
+    return ResponseCache(backends, location)
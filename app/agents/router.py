@@ -1,10 +1,26 @@
+import logging
 import re
-from .info_agent import info_agent
+import threading
+
+from .catalog_index import DEFAULT_LOCATION, resolve_location
+from .fast_path import FastPath
+from .response_cache import build_cache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 INTENT_RE = {
     "citas": re.compile(r"\b(cita|agendar|reservar|reprogram|cancelar)\b", re.I),
 }
 
+# Respuestas deterministas para intenciones frecuentes (sin LLM)
+FAST_PATH = FastPath()
+# Respuestas previas del LLM por pregunta normalizada
+RESPONSE_CACHE = build_cache()
+# Fast path y caché de los demás tenants, por ubicación de su catálogo
+_TENANT_PATHS: dict[str, tuple] = {}
+_lock = threading.Lock()
+
 
 def route_intent(text: str) -> str:
     if INTENT_RE["citas"].search(text or ""):
@@ -12,11 +28,43 @@ def route_intent(text: str) -> str:
     return "info"
 
 
-def handle_message(text: str) -> str:
+def _paths(location) -> tuple:
+    """(FastPath, ResponseCache) del catálogo en `location`."""
+    location = resolve_location(location)
+    if location == DEFAULT_LOCATION:
+        return FAST_PATH, RESPONSE_CACHE
+    paths = _TENANT_PATHS.get(location)
+    if paths is None:
+        with _lock:
+            paths = _TENANT_PATHS.get(location)
+            if paths is None:
+                paths = _TENANT_PATHS[location] = (
+                    FastPath(location),
+                    build_cache(location=location),
+                )
+    return paths
+
+
+def handle_message(text: str, location=DEFAULT_LOCATION) -> str:
+    """Responde con el catálogo en `location` (el del tenant del mensaje)."""
     intent = route_intent(text)
     if intent == "info":
-        res = info_agent(text)
-        return str(res.message).strip()
+        fast_path, cache = _paths(location)
+        fast = fast_path.answer(text)
+        logger.info("Fast path %s; stats=%s", "hit" if fast else "miss", fast_path.stats())
+        if fast is not None:
+            return fast
+        cached = cache.get(text)
+        logger.info("Response cache stats=%s", cache.stats())
+        if cached is not None:
+            return cached
+        # Import diferido: strands/Bedrock solo se cargan si hace falta el LLM
+        from .info_agent import get_info_agent
+
+        res = get_info_agent(location)(text)
+        answer = str(res.message).strip()
+        cache.put(text, answer)
+        return answer
     # placeholder para el siguiente paso (citas)
     return (
         "Puedo ayudarte a *agendar/actualizar/cancelar* tu cita. "
@@ -0,0 +1,43 @@
+"""Normalización de texto en español: minúsculas, sin tildes, tokens y stopwords."""
+import re
+import unicodedata
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    """
+    a al algo algun alguna como con cual cuales cuando de del donde el ella en es esta
+    este esto hay la las le les lo los me mi mis muy no o para pero por que quien quiero
+    necesito se sobre son su sus tiene tienen tu tus un una uno unos unas usted ustedes
+    y ya hola buenas buenos dias tardes noches gracias porfa favor info informacion
+    """.split()
+)
+
+# Para claves de caché: la negación y el interrogativo cambian la pregunta
+# ("¿Dónde es...?" ≠ "¿Cuándo es...?", "¿Atienden...?" ≠ "¿No atienden...?")
+KEY_STOPWORDS = STOPWORDS - {"no", "como", "cual", "cuales", "cuando", "donde", "quien"}
+
+
+def fold(text: str) -> str:
+    """Minúsculas y sin diacríticos ("Pélvica" → "pelvica")."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def stem(token: str) -> str:
+    """Stemming mínimo de plurales ("dolores" → "dolor", "ejercicios" → "ejercicio")."""
+    if len(token) > 5 and token.endswith("es"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def tokens(text: str, drop_stopwords: bool = True, stopwords=STOPWORDS) -> list[str]:
+    """Tokens normalizados (fold + stem), opcionalmente sin `stopwords`."""
+    out = []
+    for tok in _TOKEN_RE.findall(fold(text)):
+        if drop_stopwords and tok in stopwords:
+            continue
+        out.append(stem(tok))
+    return out
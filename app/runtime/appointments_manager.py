@@ -1,16 +1,39 @@
 import os
 import json
 import logging
-import boto3
+from concurrent.futures import ThreadPoolExecutor
+
+import botocore.exceptions as bex
 from tools import gcal_client as gcal
-from tools.whatsapp_owner import send_owner_template
+from tools import tenants
+from tools.appointments_repo import AppointmentsRepo, ConditionFailed
+from tools.aws_clients import lazy_client, lazy_table
+from tools.secrets_cache import prefetch_from_env
+from tools.owner_digest import DynamoDigestBuffer, OwnerNotifier, owner_notice
+from tools.reminder_policy import default_policy
+from tools.schedule_lifecycle import delete_schedules, group_name
+from tools.webhook_payload import log_event
+from tools.whatsapp_owner import send_many
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 REMINDER_SCHEDULER_NAME = os.environ.get("REMINDER_SCHEDULER_NAME", "pt-dev-reminder-scheduler")
+STAGE = os.environ.get("STAGE", "dev")
+SCHEDULE_GROUP = os.environ.get("SCHEDULE_GROUP") or group_name(STAGE)
+# Misma política que reminder_scheduler: los nombres de schedule salen del appointment_id
+POLICY = default_policy(STAGE)
+# Filas APPT# marcadas como canceladas en paralelo
+ROW_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+DDB_TABLE = os.environ.get("DDB_TABLE", "")
 
-lambda_client = boto3.client("lambda")
+lambda_client = lazy_client("lambda")
+scheduler = lazy_client("scheduler")
+prefetch_from_env()
+# Buffer del resumen de avisos (solo se usa con OWNER_NOTIFY_MODE=digest)
+TABLE = lazy_table(DDB_TABLE)
+REPO = AppointmentsRepo(TABLE, DDB_TABLE)
+OWNER = OwnerNotifier(DynamoDigestBuffer(TABLE), send=lambda payloads: send_many(payloads))
 
 
 def _invoke_scheduler(appt_id, patient_phone_e164, patient_name, appt_time_iso):
@@ -27,11 +50,229 @@ def _invoke_scheduler(appt_id, patient_phone_e164, patient_name, appt_time_iso):
     )
 
 
+def _cancel_schedules(appt_ids: list[str]) -> dict:
+    """Borra en paralelo todos los recordatorios pendientes de las citas."""
+    names = [n for appt_id in appt_ids if appt_id for n in POLICY.schedule_names(appt_id)]
+    res = delete_schedules(scheduler, names, group=SCHEDULE_GROUP)
+    if res["errors"]:
+        logger.warning("Schedules not deleted: %s", res["errors"])
+    return res
+
+
+def _mark_cancelled(appt_ids: list[str]) -> dict[str, str]:
+    """
+    Marca en paralelo las filas APPT# como canceladas (fuera de gsi1: una "SI"
+    ya no las confirma) y borra sus ítems REM# del motor sweeper, como
+    calendar_sync. Devuelve {appointment_id: error}.
+    """
+    appt_ids = [a for a in dict.fromkeys(appt_ids) if a]
+    if not appt_ids:
+        return {}
+
+    def _cancel(appt_id: str) -> None:
+        try:
+            REPO.cancel(appt_id)
+        except ConditionFailed:
+            logger.info("No APPT# row for cancelled appointment %s", appt_id)
+        REPO.delete_reminders(appt_id)
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=min(ROW_CONCURRENCY, len(appt_ids))) as pool:
+        futures = {a: pool.submit(_cancel, a) for a in appt_ids}
+        for appt_id, fut in futures.items():
+            try:
+                fut.result()
+            except (bex.ClientError, bex.BotoCoreError) as e:
+                logger.error("Row cancel failed for %s: %s", appt_id, e)
+                errors[appt_id] = str(e)
+    return errors
+
+
+def _require(event: dict, *keys: str) -> None:
+    missing = [k for k in keys if not event.get(k)]
+    if missing:
+        raise KeyError(", ".join(missing))
+
+
+def _update_fields(event: dict) -> dict:
+    """Campos del PATCH de Calendar (solo los que cambian)."""
+    fields = {}
+    if "start_iso" in event and "end_iso" in event:
+        fields["start"] = {
+            "dateTime": event["start_iso"],
+            "timeZone": os.environ.get("TZ", "America/Guayaquil"),
+        }
+        fields["end"] = {
+            "dateTime": event["end_iso"],
+            "timeZone": os.environ.get("TZ", "America/Guayaquil"),
+        }
+    if "notes" in event:
+        fields["description"] = event["notes"]
+    return fields
+
+
+def _notify_owner_many(kind: str, items: list[dict], estado_fmt: str) -> None:
+    """Un aviso por cita a la propietaria (en paralelo, o al resumen)."""
+    tenants.current().owner(OWNER).notify(
+        [
+            owner_notice(
+                kind,
+                paciente=it.get("patient_phone_e164", ""),
+                fecha_hora=it.get("start_iso", ""),
+                estado=estado_fmt.format(**it),
+            )
+            for it in items
+        ]
+    )
+
+
+def _invoke_scheduler_many(appointments: list[dict]) -> None:
+    if appointments:
+        lambda_client.invoke(
+            FunctionName=REMINDER_SCHEDULER_NAME,
+            InvocationType="Event",
+            Payload=json.dumps({"appointments": appointments}).encode("utf-8"),
+        )
+
+
+def _create_many(items: list[dict]) -> dict:
+    """
+    Importación de agenda: una consulta freebusy para todo el rango, inserts en
+    lotes HTTP de Calendar, avisos en paralelo y una sola invocación del
+    scheduler. Dos citas del mismo lote que se solapan: la segunda es conflicto.
+    """
+    results: list[dict] = [{} for _ in items]
+    spans: dict[int, tuple[str, str]] = {}
+    for i, it in enumerate(items):
+        try:
+            # lo que falte debe fallar aquí, no después de insertar en Calendar
+            _require(it, "appointment_id", "patient_phone_e164")
+            spans[i] = (gcal.event_utc(it["start_iso"]), gcal.event_utc(it["end_iso"]))
+        except (KeyError, ValueError) as e:
+            results[i] = {"ok": False, "error": f"invalid: {e}"}
+
+    to_create: list[int] = []
+    if spans:
+        busy = gcal.busy_between(
+            min(a for a, _ in spans.values()), max(b for _, b in spans.values())
+        )
+        for i, (start, end) in spans.items():
+            a, b = gcal.to_epoch(start), gcal.to_epoch(end)
+            if busy.overlaps(a, b):
+                results[i] = {"ok": False, "conflict": True}
+            else:
+                busy.add(a, b)
+                to_create.append(i)
+
+    created = gcal.create_many(
+        [
+            {
+                "summary": f"Pelvis Therapy - {items[i].get('patient_name', 'Paciente')}",
+                "start_iso": items[i]["start_iso"],
+                "end_iso": items[i]["end_iso"],
+                "description": items[i].get("notes", ""),
+                "appointment_id": items[i]["appointment_id"],
+            }
+            for i in to_create
+        ]
+    )
+    ok_items = []
+    for i, res in zip(to_create, created):
+        if res["ok"]:
+            results[i] = {"ok": True, "event_id": res["id"]}
+            ok_items.append({**items[i], "event_id": res["id"]})
+        else:
+            results[i] = res
+
+    _notify_owner_many("created", ok_items, "Agendado (eventId={event_id})")
+    _invoke_scheduler_many(
+        [
+            {
+                "appointment_id": it["appointment_id"],
+                "event_id": it["event_id"],
+                "patient_phone_e164": it["patient_phone_e164"],
+                "patient_name": it.get("patient_name", "Paciente"),
+                "appt_time_iso": gcal.event_utc(it["start_iso"]),
+            }
+            for it in ok_items
+        ]
+    )
+    return {
+        "ok": len(ok_items) == len(items),
+        "created": len(ok_items),
+        "results": [
+            {"appointment_id": it.get("appointment_id"), **r} for it, r in zip(items, results)
+        ],
+    }
+
+
+def _cancel_many(items: list[dict]) -> dict:
+    """
+    Borra varios eventos en lotes HTTP, marca sus filas canceladas y avisa a la
+    propietaria en paralelo. Un ítem sin event_id falla solo, no el lote.
+    """
+    results: list[dict] = [{} for _ in items]
+    valid: list[int] = []
+    for i, it in enumerate(items):
+        try:
+            _require(it, "event_id", "appointment_id")
+            valid.append(i)
+        except KeyError as e:
+            results[i] = {"ok": False, "error": f"invalid: {e}"}
+
+    deleted = gcal.delete_many([items[i]["event_id"] for i in valid])
+    for i, res in zip(valid, deleted):
+        results[i] = res
+    cancelled = [it for it, r in zip(items, results) if r.get("ok")]
+    _notify_owner_many("cancelled", cancelled, "Cancelado (eventId={event_id})")
+    _cancel_schedules([it["appointment_id"] for it in cancelled])
+    errors = _mark_cancelled([it["appointment_id"] for it in cancelled])
+    for i in valid:
+        if items[i]["appointment_id"] in errors:
+            # el evento ya no existe; la fila quedó sin marcar
+            results[i] = {**results[i], "ok": False, "error": errors[items[i]["appointment_id"]]}
+    return {
+        "ok": all(r["ok"] for r in results),
+        "results": [
+            {"appointment_id": it.get("appointment_id"), **r} for it, r in zip(items, results)
+        ],
+    }
+
+
+def _update_many(updates: list[dict]) -> dict:
+    """
+    Reprograma varias citas: PATCH en lotes HTTP de Calendar, un aviso por cita
+    a la propietaria (en paralelo) y una sola invocación del scheduler con
+    {"appointments": [...]} para las que cambiaron de hora.
+    """
+    results = gcal.update_many([(u["event_id"], _update_fields(u)) for u in updates])
+    ok = [(u, r) for u, r in zip(updates, results) if r["ok"]]
+    _notify_owner_many("updated", [u for u, _ in ok], "Actualizado (eventId={event_id})")
+    moved = [
+        {
+            "appointment_id": u["appointment_id"],
+            "event_id": u["event_id"],
+            "patient_phone_e164": u.get("patient_phone_e164", ""),
+            "patient_name": u.get("patient_name", "Paciente"),
+            "appt_time_iso": gcal.event_utc(u["start_iso"]),
+        }
+        for u, _ in ok
+        if "start_iso" in u
+    ]
+    _invoke_scheduler_many(moved)
+    return {
+        "ok": len(ok) == len(updates),
+        "results": [
+            {"appointment_id": u.get("appointment_id"), **r} for u, r in zip(updates, results)
+        ],
+    }
+
+
 def handler(event, context):
     """
     event example:
     {
-      "action": "create|update|cancel",
+      "action": "create|update|cancel|create_many|update_many|cancel_many",
       "appointment_id": "appt-001",
       "patient_phone_e164": "+5939...",
       "patient_name": "Carlos",
@@ -39,15 +280,41 @@ def handler(event, context):
       "end_iso":   "2025-08-12T16:00:00",
       "notes": "Evaluación inicial"
     }
+
+    Acciones masivas (resultado por ítem, en orden):
+      {"action": "create_many", "appointments": [<evento de create>, ...]}
+      {"action": "update_many", "updates": [<evento de update>, ...]}
+      {"action": "cancel_many", "appointments": [<evento de cancel>, ...]}
     """
-    logger.info("appointments_manager event: %s", json.dumps(event))
+    log_event(logger, "appointments_manager event", event)
+    # Clínica del evento: su calendario y su propietaria (sin datos, la del entorno)
+    ctx = tenants.context(event.get("phone_number_id", ""), event.get("tenant_id", ""))
+    if not ctx.is_default:
+        # Las filas APPT# y los recordatorios aún no llevan tenant_id: confirmaciones
+        # y recordatorios saldrían con la configuración de la clínica default
+        logger.warning("Appointments for tenant %s are not supported", ctx.tenant.tenant_id)
+        return {"ok": False, "error": "tenant_not_supported"}
+    with ctx.activate():
+        return _handle(event)
+
+
+def _handle(event: dict) -> dict:
     action = event["action"]
+    if action == "create_many":
+        return _create_many(event.get("appointments") or [])
+    if action == "update_many":
+        return _update_many(event.get("updates") or [])
+    if action == "cancel_many":
+        return _cancel_many(event.get("appointments") or [])
     appt_id = event["appointment_id"]
 
     if action == "create":
+        _require(event, "patient_phone_e164")
         start_iso = event["start_iso"]
         end_iso = event["end_iso"]
-        if not gcal.is_free(gcal.iso_utc(start_iso), gcal.iso_utc(end_iso)):
+        # Horas naive = hora local TZ, como las interpreta Calendar (igual que create_many);
+        # freebusy en vivo: el índice cacheado solo sirve para sugerir slots
+        if not gcal.is_free(gcal.event_utc(start_iso), gcal.event_utc(end_iso), live=True):
             return {"ok": False, "conflict": True}
 
         created = gcal.create_event(
@@ -56,61 +323,48 @@ def handler(event, context):
             end_iso=end_iso,
             description=event.get("notes", ""),
             attendee_email=None,
+            appointment_id=appt_id,
         )
         # Notifica propietaria
-        send_owner_template(
-            paciente=event["patient_phone_e164"],
-            fecha_hora=start_iso,
-            estado=f"Agendado (eventId={created['id']})",
+        _notify_owner_many(
+            "created", [{**event, "event_id": created["id"]}], "Agendado (eventId={event_id})"
         )
         # Programa recordatorios
         _invoke_scheduler(
             appt_id,
             event["patient_phone_e164"],
             event.get("patient_name", "Paciente"),
-            gcal.iso_utc(start_iso),
+            gcal.event_utc(start_iso),
         )
         return {"ok": True, "event_id": created["id"]}
 
     if action == "update":
         event_id = event["event_id"]
-        fields = {}
-        if "start_iso" in event and "end_iso" in event:
-            fields["start"] = {
-                "dateTime": event["start_iso"],
-                "timeZone": os.environ.get("TZ", "America/Guayaquil"),
-            }
-            fields["end"] = {
-                "dateTime": event["end_iso"],
-                "timeZone": os.environ.get("TZ", "America/Guayaquil"),
-            }
-        if "notes" in event:
-            fields["description"] = event["notes"]
-        gcal.update_event(event_id, **fields)
-        send_owner_template(
-            paciente=event.get("patient_phone_e164", ""),
-            fecha_hora=event.get("start_iso", ""),
-            estado=f"Actualizado (eventId={event_id})",
-        )
+        try:
+            gcal.update_event(event_id, **_update_fields(event))
+        except gcal.EventChanged:
+            # alguien lo movió en Calendar desde que lo vimos: no lo pisamos
+            return {"ok": False, "conflict": "event_changed"}
+        _notify_owner_many("updated", [event], "Actualizado (eventId={event_id})")
         # Reprograma recordatorios (mismo appointment_id)
         if "start_iso" in event:
             _invoke_scheduler(
                 appt_id,
                 event.get("patient_phone_e164", ""),
                 event.get("patient_name", "Paciente"),
-                gcal.iso_utc(event["start_iso"]),
+                gcal.event_utc(event["start_iso"]),
             )
         return {"ok": True}
 
     if action == "cancel":
         event_id = event["event_id"]
         gcal.delete_event(event_id)
-        send_owner_template(
-            paciente=event.get("patient_phone_e164", ""),
-            fecha_hora=event.get("start_iso", ""),
-            estado=f"Cancelado (eventId={event_id})",
-        )
-        # Opcional: cancelar schedules (puedes borrar r1/r2/esc por nombre si quieres)
-        return {"ok": True}
+        _notify_owner_many("cancelled", [event], "Cancelado (eventId={event_id})")
+        # Recordatorios pendientes (r1/r2/esc) de la cita y su fila APPT#
+        res = _cancel_schedules([appt_id])
+        errors = _mark_cancelled([appt_id])
+        if errors:
+            return {"ok": False, "error": errors[appt_id], "schedules_deleted": res["deleted"]}
+        return {"ok": True, "schedules_deleted": res["deleted"]}
 
     return {"ok": False, "error": "unknown_action"}
@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import time
+
+from tools import gcal_client as gcal
+from tools.appointments_repo import (
+    P_SYNC,
+    Appointment,
+    AppointmentsRepo,
+    ConditionFailed,
+    sync_key,
+)
+from tools.aws_clients import lazy_client, lazy_table
+from tools.schedule_lifecycle import delete_schedules, group_name
+from tools.secrets_cache import prefetch_from_env
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# ===== Entorno =====
+DDB_TABLE = os.environ["DDB_TABLE"]
+REMINDER_SCHEDULER_NAME = os.environ.get("REMINDER_SCHEDULER_NAME", "pt-dev-reminder-scheduler")
+STAGE = os.environ.get("STAGE", "dev")
+SCHEDULE_GROUP = os.environ.get("SCHEDULE_GROUP") or group_name(STAGE)
+# Eventos nuestros sin fila APPT# todavía (carrera con la creación): se
+# reintentan en las corridas siguientes durante este tiempo
+MISSING_RETRY_S = int(os.environ.get("SYNC_MISSING_RETRY_S", "3600"))
+MISSING_MAX = 200
+
+TABLE = lazy_table(DDB_TABLE)
+REPO = AppointmentsRepo(TABLE, DDB_TABLE)
+scheduler = lazy_client("scheduler")
+lambda_client = lazy_client("lambda")
+prefetch_from_env()
+
+
+def _token_key() -> dict:
+    return sync_key(gcal.CALENDAR_ID)
+
+
+def _load_state() -> tuple[str | None, list[dict]]:
+    """(syncToken, eventos pendientes) de la corrida anterior."""
+    item = TABLE.get_item(Key=_token_key(), ConsistentRead=True).get("Item") or {}
+    return item.get("sync_token"), json.loads(item.get("pending") or "[]")
+
+
+def _save_state(token: str | None, pending: list[dict]) -> None:
+    if not token and not pending:
+        TABLE.delete_item(Key=_token_key())
+        return
+    item = {**_token_key()}
+    if token:
+        item["sync_token"] = token
+    if pending:
+        item["pending"] = json.dumps(pending, ensure_ascii=False)
+    TABLE.put_item(Item=item)
+
+
+def _invoke_scheduler(appt: Appointment, appt_time_iso: str) -> None:
+    payload = {
+        "appointment_id": appt.appointment_id,
+        "patient_phone_e164": appt.patient_phone_e164 or "",
+        "patient_name": appt.patient_name or "Paciente",
+        "appt_time_iso": appt_time_iso,
+    }
+    lambda_client.invoke(
+        FunctionName=REMINDER_SCHEDULER_NAME,
+        InvocationType="Event",
+        Payload=json.dumps(payload).encode("utf-8"),
+    )
+
+
+def _cancel_reminders(appt: Appointment) -> None:
+    """Borra los schedules r1/r2/esc o los ítems REM# del motor sweeper."""
+    res = delete_schedules(scheduler, appt.schedule_names(), group=SCHEDULE_GROUP)
+    if res["errors"]:
+        logger.warning("Schedules not deleted: %s", res["errors"])
+    if appt.reminder_engine == "sweeper":
+        REPO.delete_reminders(appt.appointment_id)
+
+
+def _apply(ev: dict) -> str:
+    """Aplica un evento cambiado a su fila APPT#. Devuelve el resultado."""
+    appt_id = gcal.appointment_id_of(ev)
+    if not appt_id:
+        return "ignored"  # evento que no creamos nosotros
+    appt = REPO.get(appt_id, P_SYNC, consistent=True)
+    if appt is None:
+        return "missing"
+    etag = ev.get("etag", "")
+    if etag and appt.gcal_etag == etag:
+        return "unchanged"
+
+    try:
+        if ev.get("status") == "cancelled":
+            if appt.cancelled:
+                return "unchanged"
+            REPO.cancel(appt_id, set_={"gcal_etag": etag})
+            _cancel_reminders(appt)
+            return "cancelled"
+
+        start = (ev.get("start") or {}).get("dateTime")
+        if not start:
+            return "ignored"  # evento de día completo
+        # misma normalización con la que se creó la cita (naive = hora de la clínica)
+        appt_time_iso = gcal.event_utc(start)
+        if appt.appt_time_iso and appt_time_iso == gcal.event_utc(appt.appt_time_iso):
+            REPO.update(appt_id, set_={"gcal_etag": etag}, condition="attribute_exists(pk)")
+            return "unchanged"
+
+        # movida a mano en el calendario: nueva hora, requiere volver a confirmar
+        REPO.update(
+            appt_id,
+            set_={"appt_time_iso": appt_time_iso, "gsi1sk": appt_time_iso, "gcal_etag": etag},
+            remove=("confirmed_at",),
+            condition="attribute_exists(pk)",
+        )
+    except ConditionFailed:
+        return "missing"  # la fila se borró entre la lectura y la escritura
+    _invoke_scheduler(appt, appt_time_iso)
+    return "rescheduled"
+
+
+def sync(
+    token: str | None, pending: list[dict] = (), now: float | None = None
+) -> tuple[dict, str | None, list[dict]]:
+    """
+    Reaplica los eventos `pending` y consume los deltas desde `token`; ante 410
+    rehace la sincronización completa. Devuelve (conteos, próximo token,
+    pendientes): los eventos cuya fila aún no existe no se pierden aunque el
+    token avance, se guardan para la próxima corrida hasta MISSING_RETRY_S.
+    """
+    now = time.time() if now is None else now
+    counts: dict[str, int] = {}
+    retry: dict[str, dict] = {}
+
+    def _run(ev: dict, first_seen: float) -> None:
+        outcome = _apply(ev)
+        counts[outcome] = counts.get(outcome, 0) + 1
+        if outcome != "missing":
+            retry.pop(ev.get("id"), None)
+        elif now - first_seen < MISSING_RETRY_S:
+            retry[ev.get("id")] = {"event": ev, "first_seen": first_seen}
+        else:
+            logger.warning("Event %s has no APPT# row, giving up", ev.get("id"))
+            retry.pop(ev.get("id"), None)
+
+    def _consume(changes) -> None:
+        for ev in changes:
+            seen = retry.get(ev.get("id"))
+            _run(ev, seen["first_seen"] if seen else now)
+
+    for p in pending:
+        _run(p["event"], p["first_seen"])
+    changes = gcal.EventChanges(token)
+    try:
+        _consume(changes)
+    except gcal.SyncTokenExpired:
+        logger.warning("Sync token expired, running full sync")
+        counts["full_resync"] = 1
+        changes = gcal.EventChanges(None)
+        _consume(changes)
+    counts["pages"] = changes.pages
+    pending_out = list(retry.values())
+    if len(pending_out) > MISSING_MAX:
+        logger.warning("Dropping %d pending events", len(pending_out) - MISSING_MAX)
+        pending_out = pending_out[-MISSING_MAX:]
+    return counts, changes.next_sync_token, pending_out
+
+
+def handler(event, context):
+    """Invocado periódicamente por EventBridge Scheduler."""
+    counts, token, pending = sync(*_load_state())
+    _save_state(token, pending)
+    logger.info("Calendar sync: %s (pending=%d)", counts, len(pending))
+    return {"ok": True, **counts}
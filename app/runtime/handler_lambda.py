@@ -1,3 +1,8 @@
 # placeholder: handler Lambda - enruta a agentes
+from tools.conversation_state import flush_after
+
+
+# el estado de conversación que escriban los agentes se vuelca una vez al final
+@flush_after
 def handler(event, context):
     return {"statusCode": 200, "body": "ok"}
@@ -1,15 +1,31 @@
-import base64
 import datetime as dt
-import json
 import logging
 import os
+from zoneinfo import ZoneInfo
 
-import boto3
 import botocore.exceptions as bex
-from boto3.dynamodb.conditions import Key
-import urllib.error
-from tools.whatsapp_owner import send_owner_template, send_text
-from agents.router import handle_message
+from tools import tenants
+from tools.appointments_repo import AppointmentsRepo
+from tools.aws_clients import lazy_client, lazy_table
+from tools.confirmations import ConfirmationEngine
+from tools.dedup import MessageDeduper
+from tools.delivery_status import DeliveryTracker, DynamoDeliveryStore
+from tools.inbound_queue import get_queue
+from tools.owner_digest import DynamoDigestBuffer, OwnerNotifier, owner_notice
+from tools.schedule_lifecycle import delete_schedules, group_name
+from tools.secrets_cache import prefetch_from_env
+from tools.webhook_payload import (
+    InboundMessage,
+    PayloadError,
+    StatusUpdate,
+    from_queue_record,
+    iter_events,
+    log_raw,
+    parse,
+    raw_body,
+    status_summary,
+)
+from tools.whatsapp_owner import send_many, text_payload
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -17,17 +33,45 @@ logger.setLevel(logging.INFO)
 # Env
 VERIFY_TOKEN = os.environ.get("VERIFY_TOKEN", "PT_VERIFY_DEV")
 DDB_TABLE = os.environ["DDB_TABLE"]
+# "sync": procesa en la misma invocación; "async": encola y responde 200 de inmediato
+WEBHOOK_MODE = os.environ.get("WEBHOOK_MODE", "sync")
+STAGE = os.environ.get("STAGE", "dev")
+# Zona en la que se muestran las horas al paciente (TZ está reservada en Lambda)
+CLINIC_TZ = os.environ.get("CLINIC_TZ", "America/Guayaquil")
+SCHEDULE_GROUP = os.environ.get("SCHEDULE_GROUP") or group_name(STAGE)
 
-# AWS clients
-dynamodb = boto3.resource("dynamodb")
-TABLE = dynamodb.Table(DDB_TABLE)
-scheduler = boto3.client("scheduler")
+# AWS clients (perezosos: se construyen en el primer uso, no al importar)
+TABLE = lazy_table(DDB_TABLE)
+REPO = AppointmentsRepo(TABLE, DDB_TABLE)
+scheduler = lazy_client("scheduler")
+# Secretos de SECRETS_PREFETCH en paralelo durante el init (sin bloquear)
+prefetch_from_env()
+
+# Confirmaciones "SI": update condicional + caché por paciente
+CONFIRMER = ConfirmationEngine(
+    REPO, lambda names: delete_schedules(scheduler, names, group=SCHEDULE_GROUP)
+)
+
+# Estados de entrega (sent/delivered/read/failed) de los recordatorios enviados
+DELIVERY = DeliveryTracker(DynamoDeliveryStore(REPO))
+
+# Dedup de reintentos de Meta por msg["id"] (LRU del contenedor + put condicional)
+DEDUP = MessageDeduper(TABLE)
+
+# Avisos a la propietaria: inmediatos o agrupados en resúmenes (OWNER_NOTIFY_MODE)
+OWNER = OwnerNotifier(DynamoDigestBuffer(TABLE))
+
+CONFIRM_WORDS = {"si", "sí", "si.", "sí.", "ok", "listo", "confirmo", "confirmar"}
 
 
 def _ok(body="ok", content_type="text/plain"):
     return {"statusCode": 200, "headers": {"Content-Type": content_type}, "body": body}
 
 
+def _error():
+    return {"statusCode": 500, "headers": {"Content-Type": "text/plain"}, "body": "error"}
+
+
 def _forbidden():
     return {"statusCode": 403, "headers": {"Content-Type": "text/plain"}, "body": "forbidden"}
 
@@ -43,53 +87,44 @@ def _now_iso() -> str:
     return dt.datetime.now(dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
 
-def _mark_confirmed_and_cancel(phone_e164: str):
-    """
-    Busca la próxima cita futura del paciente por GSI1 (gsi1pk/gsi1sk),
-    marca confirmación y cancela schedules r2/esc si existen.
-    """
-    now_iso = _now_iso()
+def _local_time(iso: str | None) -> str:
+    """'2030-01-10T15:00:00Z' → '10/01/2030 10:00' en la zona de la clínica."""
+    if not iso:
+        return ""
     try:
-        resp = TABLE.query(
-            IndexName="gsi1",
-            KeyConditionExpression=Key("gsi1pk").eq(f"PATIENT#{phone_e164}")
-            & Key("gsi1sk").gt(now_iso),
-            Limit=1,
-            ScanIndexForward=True,  # más cercana primero
-        )
-        items = resp.get("Items", [])
-    except bex.ClientError as e:
-        logger.exception("DDB query failed for patient %s: %s", phone_e164, e.response)
-        return False, None
+        when = dt.datetime.fromisoformat(iso.replace("Z", "+00:00"))
+    except ValueError:
+        return iso
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=dt.timezone.utc)
+    return when.astimezone(ZoneInfo(CLINIC_TZ)).strftime("%d/%m/%Y %H:%M")
 
-    if not items:
-        return False, None
 
-    appt = items[0]
+def _agent_reply(text: str, tenant) -> str:
+    """
+    Respuesta del router (fast path, caché o LLM) con el catálogo del tenant,
+    importado solo al usarse.
+    """
     try:
-        TABLE.update_item(
-            Key={"pk": appt["pk"], "sk": appt["sk"]},
-            UpdateExpression="SET confirmed_at=:c, #st=:s",
-            ExpressionAttributeNames={"#st": "status"},
-            ExpressionAttributeValues={":c": now_iso, ":s": "confirmed"},
-        )
-    except bex.ClientError as e:
-        logger.exception(
-            "DDB update failed to mark confirmed for %s: %s", appt.get("pk"), e.response
+        from agents.router import handle_message
+
+        return handle_message(text, tenant.catalog_location)
+    except Exception as e:  # noqa: BLE001 - el paciente igual recibe respuesta
+        logger.exception("Router failed: %s", e)
+        return (
+            f"¡Hola! Soy el asistente de {tenant.name}. "
+            "Puedo ayudarte a agendar/confirmar tu cita. Escribe 'SI' para confirmar."
         )
-        # seguimos intentando cancelar schedules igualmente
 
-    # Cancela R2/ESC si estaban programados
-    for k in ("r2_schedule_name", "esc_schedule_name"):
-        name = appt.get(k)
-        if name:
-            try:
-                scheduler.delete_schedule(Name=name)
-                logger.info("Deleted schedule %s", name)
-            except bex.ClientError as e:
-                logger.warning("delete_schedule %s failed: %s", name, e.response)
 
-    return True, appt
+def _mark_confirmed_and_cancel(phone_e164: str):
+    """
+    Confirma la próxima cita futura del paciente (update condicional; solo el
+    primer "SI" cancela r2/esc). Devuelve (hay cita, cita).
+    """
+    outcome, appt = CONFIRMER.confirm(phone_e164, _now_iso())
+    logger.info("Confirmation for %s: %s", phone_e164, outcome)
+    return appt is not None, appt
 
 
 def handler(event, context):
@@ -110,82 +145,196 @@ def handler(event, context):
         return _forbidden()
 
     # ---- 2) Recepción de mensajes (POST) ----
-    raw_body = event.get("body") or "{}"
-    if event.get("isBase64Encoded") is True or event.get("isBase64Encoded") == "true":
-        raw_body = base64.b64decode(raw_body).decode("utf-8")
-
+    raw = raw_body(event)
+    log_raw(logger, "Incoming Meta payload", raw)
     try:
-        body = json.loads(raw_body)
-    except json.JSONDecodeError as e:
+        body = parse(raw)
+    except PayloadError as e:
         logger.exception("JSON parse error: %s", e)
         return _ok("ignored")
 
-    logger.info("Incoming Meta payload: %s", json.dumps(body)[:2000])
-
-    entries = body.get("entry") or []
-    for entry in entries:
-        changes = entry.get("changes") or []
-        for change in changes:
-            value = change.get("value", {})
-            # Log de estados (opcional)
-            statuses = value.get("statuses") or []
-            if statuses:
-                logger.info("Statuses: %s", json.dumps(statuses)[:1000])
-
-            messages = value.get("messages") or []
-            for msg in messages:
-                # Solo texto para MVP
-                msg_type = msg.get("type")
-                if msg_type != "text":
-                    continue
-
-                from_id = msg.get("from", "")  # "5939..." sin '+'
-                user_e164 = _normalize_e164(from_id)  # "+5939..."
-                text = (msg.get("text") or {}).get("body") or ""
-                normalized = text.strip().lower()
-
-                # 2.1 Notifica a propietaria (siempre que llega un entrante)
-                try:
-                    send_owner_template(
-                        paciente=user_e164 or "desconocido",
-                        fecha_hora="N/A",
-                        estado=f"mensaje entrante: {text[:80]}",
-                    )
-                except urllib.error.URLError as e:
-                    logger.exception("Owner notification failed: %s", e)
-
-                # 2.2 Confirmación por palabras clave
-                if normalized in {"si", "sí", "si.", "sí.", "ok", "listo", "confirmo", "confirmar"}:
-                    ok, appt = _mark_confirmed_and_cancel(user_e164)
-                    if ok:
-                        reply = handle_message(text)
-                        try:
-                            send_text(user_e164, reply)
-                            # Aviso opcional a propietaria
-                            send_owner_template(
-                                paciente=user_e164,
-                                fecha_hora=appt.get("appt_time_iso", "N/A"),
-                                estado="Paciente confirmó",
-                            )
-                        except urllib.error.URLError as e:
-                            logger.exception("Post-confirmation messages failed: %s", e)
-                    else:
-                        try:
-                            send_text(
-                                user_e164,
-                                "Gracias. No encontré una cita pendiente. Si deseas agendar, cuéntame tu disponibilidad.",
-                            )
-                        except urllib.error.URLError as e:
-                            logger.exception("No-appointment reply failed: %s", e)
-                else:
-                    # 2.3 Auto-respuesta básica (MVP)
-                    try:
-                        send_text(
-                            user_e164,
-                            "¡Hola! Soy el asistente de Pelvis Therapy. "
-                            "Puedo ayudarte a agendar/confirmar tu cita. Escribe 'SI' para confirmar.",
-                        )
-                    except urllib.error.URLError as e:
-                        logger.exception("Auto-reply failed: %s", e)
+    if WEBHOOK_MODE == "async":
+        return _enqueue(body)
 
+    pending, statuses, claimed = {}, [], []
+    try:
+        for ev in iter_events(body):
+            if isinstance(ev, StatusUpdate):
+                statuses.append(ev)
+                continue
+            if _is_duplicate(ev):
+                continue
+            if ev.type == "text":
+                claimed.append(ev.id)
+            _collect(pending, ev)
+        if statuses:
+            try:
+                _ingest_statuses(statuses)
+            except Exception as e:  # noqa: BLE001 - los estados no bloquean la respuesta al paciente
+                logger.exception("Status ingestion failed: %s", e)
+
+        for ctx, outbound, notices in pending.values():
+            _send_outbound(outbound, notices, ctx)
+    except Exception:
+        # el reintento de Meta no debe descartarse como duplicado
+        for msg_id in claimed:
+            DEDUP.release(msg_id)
+        raise
+    logger.info("Dedup stats: %s", DEDUP.stats())
     return _ok()
+
+
+def _ingest_statuses(statuses: list[StatusUpdate]) -> None:
+    """Escribe por lotes las transiciones de entrega de `statuses`."""
+    counts = DELIVERY.ingest(statuses)
+    logger.info("Statuses: %s → %s", status_summary(statuses), counts)
+
+
+def _is_duplicate(msg: InboundMessage) -> bool:
+    """True si el mensaje de texto ya fue recibido (reintento de Meta)."""
+    if msg.type != "text":
+        return False
+    if DEDUP.claim(msg.id):
+        return False
+    logger.info("Duplicate inbound message skipped: %s", msg.id)
+    return True
+
+
+def _enqueue(body: dict):
+    """Modo async: valida, encola registros compactos y responde sin esperar al agente."""
+    records = []
+    for ev in iter_events(body):
+        # Estados: el consumidor los escribe agrupados con los del resto del lote
+        if isinstance(ev, StatusUpdate):
+            records.append(ev.to_record())
+        # Solo texto para MVP
+        elif ev.type == "text" and not _is_duplicate(ev):
+            records.append(ev.to_record())
+
+    if records:
+        try:
+            get_queue().send_batch(records)
+        except (bex.ClientError, RuntimeError) as e:
+            # 500 → Meta reintenta el webhook; no perdemos mensajes
+            logger.exception("Enqueue of %d inbound messages failed: %s", len(records), e)
+            for rec in records:
+                if "status" not in rec:
+                    DEDUP.release(rec["id"])
+            return _error()
+        logger.info("Enqueued %d inbound records", len(records))
+    logger.info("Dedup stats: %s", DEDUP.stats())
+    return _ok()
+
+
+def consumer_handler(event, context):
+    """
+    Consumidor por lotes (SQS → Lambda). Procesa cada registro encolado por el
+    modo async y reporta fallos parciales con `batchItemFailures`.
+    """
+    failures = []
+    pending = {}
+    statuses, status_ids = [], []
+    for record in event.get("Records", []):
+        try:
+            ev = from_queue_record(parse(record["body"]))
+            if isinstance(ev, StatusUpdate):
+                statuses.append(ev)
+                status_ids.append(record.get("messageId"))
+                continue
+            _collect(pending, ev)
+        except Exception as e:  # noqa: BLE001 - el registro vuelve a la cola
+            logger.exception("Inbound record %s failed: %s", record.get("messageId"), e)
+            failures.append({"itemIdentifier": record.get("messageId")})
+
+    if statuses:
+        try:
+            _ingest_statuses(statuses)
+        except Exception as e:  # noqa: BLE001 - los estados del lote vuelven a la cola
+            logger.exception("Status ingestion failed: %s", e)
+            failures.extend({"itemIdentifier": mid} for mid in status_ids)
+
+    for ctx, outbound, notices in pending.values():
+        _send_outbound(outbound, notices, ctx)
+    return {"batchItemFailures": failures}
+
+
+def _collect(pending: dict, msg: InboundMessage) -> None:
+    """Procesa `msg` y acumula sus envíos en el lote de su tenant (phone_number_id)."""
+    ctx = tenants.context(msg.phone_number_id)
+    out, owner = _process_message(msg, ctx)
+    _, outbound, notices = pending.setdefault(ctx.tenant.tenant_id, (ctx, [], []))
+    outbound.extend(out)
+    notices.extend(owner)
+
+
+def _send_outbound(outbound: list[dict], notices: list[dict] = (), ctx=None) -> None:
+    """
+    Envíos salientes en paralelo (orden preservado por destinatario) con el
+    número del tenant. Los avisos a la propietaria que no son inmediatos quedan
+    en el buffer del resumen.
+    """
+    ctx = ctx or tenants.context()
+    outbound = ctx.owner(OWNER).submit(list(notices)) + outbound
+    if not outbound:
+        return
+    results = (send_many if ctx.is_default else ctx.send_many)(outbound)
+    for payload, res in zip(outbound, results):
+        if not res.get("ok"):
+            logger.error("Outbound send to %s failed: %s", payload.get("to"), res)
+
+
+def _process_message(msg: InboundMessage, ctx=None) -> tuple[list[dict], list[dict]]:
+    """
+    Procesa un mensaje entrante. Devuelve (payloads salientes al paciente,
+    avisos para la propietaria).
+    """
+    ctx = ctx or tenants.context(msg.phone_number_id)
+    # Solo texto para MVP
+    if msg.type != "text":
+        return [], []
+
+    user_e164 = _normalize_e164(msg.sender)  # "5939..." sin '+' → "+5939..."
+    text = msg.text
+    normalized = text.strip().lower()
+
+    # 2.1 Notifica a propietaria (siempre que llega un entrante)
+    out = []
+    notices = [
+        owner_notice(
+            "inbound",
+            paciente=user_e164 or "desconocido",
+            fecha_hora="N/A",
+            estado=f"mensaje entrante: {text[:80]}",
+        )
+    ]
+
+    # 2.2 Confirmación por palabras clave
+    if normalized in CONFIRM_WORDS:
+        # Las filas APPT# aún no llevan tenant: solo el default tiene citas
+        ok, appt = _mark_confirmed_and_cancel(user_e164) if ctx.is_default else (False, None)
+        if ok:
+            # Respuesta fija: confirmar no necesita cargar el stack del LLM
+            when = _local_time(appt.appt_time_iso)
+            out.append(
+                text_payload(user_e164, f"¡Gracias! Tu cita del {when} quedó confirmada.")
+            )
+            # Aviso opcional a propietaria
+            notices.append(
+                owner_notice(
+                    "confirmed",
+                    paciente=user_e164,
+                    fecha_hora=when or "N/A",
+                    estado="Paciente confirmó",
+                )
+            )
+        else:
+            out.append(
+                text_payload(
+                    user_e164,
+                    "Gracias. No encontré una cita pendiente. Si deseas agendar, cuéntame tu disponibilidad.",
+                )
+            )
+    else:
+        # 2.3 Resto de mensajes: router (reglas, caché de respuestas y agentes)
+        out.append(text_payload(user_e164, _agent_reply(text, ctx.tenant)))
+    return out, notices
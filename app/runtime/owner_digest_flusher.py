@@ -0,0 +1,22 @@
+import logging
+import os
+
+from tools.aws_clients import lazy_table
+from tools.owner_digest import DynamoDigestBuffer, OwnerNotifier
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# ===== Entorno =====
+DDB_TABLE = os.environ["DDB_TABLE"]
+
+TABLE = lazy_table(DDB_TABLE)
+NOTIFIER = OwnerNotifier(DynamoDigestBuffer(TABLE), mode="digest")
+
+
+def handler(event, context):
+    """
+    Invocado por EventBridge Scheduler cada OWNER_DIGEST_WINDOW_MIN minutos:
+    envía un resumen con los avisos acumulados en la ventana.
+    """
+    return NOTIFIER.flush()
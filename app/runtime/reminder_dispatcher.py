@@ -1,57 +1,258 @@
-import json
 import logging
 import os
 
-import boto3
-from tools.whatsapp_owner import send_owner_template, send_patient_reminder
+from tools.appointments_repo import P_REMINDER, Appointment, AppointmentsRepo
+from tools.aws_clients import lazy_client, lazy_resource, lazy_table
+from tools.delivery_status import DeliveryTracker, DynamoDeliveryStore
+from tools.secrets_cache import prefetch_from_env
+from tools.webhook_payload import loads
+from tools.whatsapp_owner import owner_template_payload, patient_reminder_payload, send_many
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-dynamodb = boto3.resource("dynamodb")
-TABLE = dynamodb.Table(os.environ["DDB_TABLE"])
-scheduler = boto3.client("scheduler")
+DDB_TABLE = os.environ["DDB_TABLE"]
+TABLE = lazy_table(DDB_TABLE)
+DDB = lazy_resource("dynamodb")
+REPO = AppointmentsRepo(TABLE, DDB_TABLE, DDB)
+# Estados de entrega por wamid (ingeridos por el webhook de Meta)
+DELIVERY = DeliveryTracker(DynamoDeliveryStore(REPO))
+scheduler = lazy_client("scheduler")
+prefetch_from_env()
 
 
-def handler(event, context):
-    logger.info("Reminder event: %s", json.dumps(event))
-    appt_id = event["appointment_id"]
-    phone = event["patient_phone_e164"]
-    pname = event.get("patient_name", "Paciente")
-    appt_iso = event["appt_time_iso"]
+# Acción cuyo estado de entrega consulta cada regla
+DELIVERY_OF = {"first": "first", "second": "second", "escalation": "second"}
+# Canal de cada acción para eventos sin "channel" (schedules creados antes)
+DEFAULT_CHANNEL = {"first": "patient", "second": "patient", "escalation": "owner"}
+
+
+def _delivery_ref(event: dict) -> tuple[str, str, str] | None:
+    action = DELIVERY_OF.get(event.get("action"))
+    if action is None:
+        return None
+    return (event["appointment_id"], event["appt_time_iso"], action)
+
+
+def _delivery_states(events: list[dict]) -> dict:
+    """Estado de entrega por recordatorio; si la lectura falla se decide sin él."""
+    refs = [r for r in (_delivery_ref(ev) for ev in events) if r]
+    try:
+        return DELIVERY.states(refs)
+    except Exception as e:  # noqa: BLE001 - sin estados se envía como antes
+        logger.warning("Delivery state lookup failed: %s", e)
+        return {}
+
+
+def _record_sent(sent: list[tuple[dict, dict]]) -> None:
+    """
+    Mapea el wamid de cada envío aceptado a su cita/recordatorio. Se llama por
+    envío, apenas Meta responde: los estados llegan al webhook en segundos y un
+    wamid sin mapeo se descarta.
+    """
+    refs = []
+    for ev, res in sent:
+        messages = (res.get("resp") or {}).get("messages") or []
+        if res.get("ok") and messages and messages[0].get("id"):
+            refs.append(
+                (ev["appointment_id"], ev["appt_time_iso"], ev.get("action"), messages[0]["id"])
+            )
+    try:
+        DELIVERY.record_sent(refs)
+    except Exception as e:  # noqa: BLE001 - el envío ya salió; no se reintenta por esto
+        logger.warning("Recording %d sent wamids failed: %s", len(refs), e)
+
+
+def _payload(event: dict, channel: str, note: str, estado: str) -> dict:
+    """Mensaje del recordatorio al paciente o aviso a la propietaria, según el canal."""
+    if channel == "owner":
+        return owner_template_payload(
+            paciente=event["patient_phone_e164"], fecha_hora=event["appt_time_iso"], estado=estado
+        )
+    return patient_reminder_payload(
+        event["patient_phone_e164"],
+        event.get("patient_name", "Paciente"),
+        event["appt_time_iso"],
+        note,
+        template_name=event.get("template"),
+    )
+
+
+def _decide(
+    event: dict, appt: Appointment | None, delivery: str | None = None
+) -> tuple[dict, dict | None]:
+    """
+    Reglas first/second/escalation en memoria: (resultado, payload a enviar o None).
+    `delivery` es el estado de entrega del recordatorio (de R2 para escalation).
+    El canal (paciente o propietaria) es el de la regla de la política.
+    """
     action = event.get("action")
+    channel = event.get("channel") or DEFAULT_CHANNEL.get(action, "patient")
 
-    # lee cita
-    item = TABLE.get_item(Key={"pk": f"APPT#{appt_id}", "sk": f"APPT#{appt_id}"}).get("Item")
-    if not item:
-        logger.warning("Appointment not found: %s", appt_id)
-        return {"skipped": "not_found"}
+    if appt is None:
+        return {"skipped": "not_found"}, None
+    if appt.cancelled:
+        return {"skipped": "cancelled"}, None
 
-    confirmed = bool(item.get("confirmed_at"))
+    confirmed = appt.confirmed
+    # Condición declarada por la política de recordatorios (ver reminder_policy)
+    if event.get("condition") == "unconfirmed" and confirmed:
+        return {"skipped": "already_confirmed"}, None
+    # Un R1/R2 que Meta ya aceptó no se repite (reentregas de SQS/sweeper);
+    # si falló la entrega se vuelve a intentar
+    retry = {"retry": True} if delivery == "failed" else {}
+    if action in ("first", "second") and delivery in ("sent", "delivered", "read"):
+        return {"skipped": f"already_{delivery}"}, None
 
     if action == "first":
         # R1 siempre se envía
-        send_patient_reminder(phone, pname, appt_iso, "Responde SI para confirmar")
-        return {"sent": "r1"}
+        return {"sent": "r1", **retry}, _payload(
+            event, channel, "Responde SI para confirmar", "Recordatorio de cita enviado"
+        )
 
     if action == "second":
         # Sólo si aún no confirma
         if confirmed:
-            return {"skipped": "already_confirmed"}
-        send_patient_reminder(
-            phone, pname, appt_iso, "Responde SI para confirmar (2do recordatorio)"
+            return {"skipped": "already_confirmed"}, None
+        return {"sent": "r2", **retry}, _payload(
+            event,
+            channel,
+            "Responde SI para confirmar (2do recordatorio)",
+            "Paciente aún NO confirma tras el 1er recordatorio",
         )
-        return {"sent": "r2"}
 
     if action == "escalation":
         # Si tras R2 sigue sin confirmar → avisa a propietaria
         if confirmed:
-            return {"skipped": "already_confirmed"}
-        send_owner_template(
-            paciente=phone,
-            fecha_hora=appt_iso,
-            estado="Paciente aún NO confirma tras 2 recordatorios",
+            return {"skipped": "already_confirmed"}, None
+        estado = "Paciente aún NO confirma tras 2 recordatorios"
+        if delivery == "failed":
+            estado = "No se pudo entregar el 2do recordatorio por WhatsApp: contactar"
+        return {"sent": "owner_alert", "r2": delivery}, _payload(
+            event, channel, "Responde SI para confirmar tu cita", estado
         )
-        return {"sent": "owner_alert"}
 
-    return {"skipped": "unknown_action"}
+    return {"skipped": "unknown_action"}, None
+
+
+def dispatch_batch(reminders: list[dict]) -> list[dict]:
+    """
+    Procesa N eventos de recordatorio: una lectura BatchGetItem, reglas en
+    memoria y envíos concurrentes. Devuelve un resultado por evento (mismo
+    orden); los fallidos llevan "error" para que el origen los reintente.
+    """
+    results: list[dict] = [{} for _ in reminders]
+    valid = []
+    for i, ev in enumerate(reminders):
+        if not all(k in ev for k in ("appointment_id", "patient_phone_e164", "appt_time_iso")):
+            results[i] = {"error": "invalid_event"}
+        else:
+            valid.append(i)
+
+    try:
+        appts, unresolved = REPO.batch_get(
+            [reminders[i]["appointment_id"] for i in valid], P_REMINDER
+        )
+    except Exception as e:  # noqa: BLE001 - todo el lote queda para reintento
+        logger.exception("BatchGetItem failed: %s", e)
+        for i in valid:
+            results[i] = {"error": f"ddb: {e}"}
+        return results
+
+    delivery = _delivery_states(
+        [reminders[i] for i in valid if reminders[i]["appointment_id"] in appts]
+    )
+    to_send: list[tuple[int, dict]] = []
+    seen: set[tuple[str, str]] = set()
+    for i in valid:
+        ev = reminders[i]
+        appt_id = ev["appointment_id"]
+        key = (appt_id, ev.get("action"))
+        if appt_id in unresolved:
+            results[i] = {"error": "ddb: unprocessed"}
+            continue
+        if key in seen:
+            # el mismo recordatorio repetido en el lote (reentrega de SQS/sweeper)
+            results[i] = {"skipped": "duplicate_in_batch"}
+            continue
+        seen.add(key)
+        outcome, payload = _decide(ev, appts.get(appt_id), delivery.get(_delivery_ref(ev)))
+        results[i] = outcome
+        if payload is not None:
+            to_send.append((i, payload))
+
+    if to_send:
+        sends = send_many(
+            [p for _, p in to_send],
+            on_result=lambda j, res: _record_sent([(reminders[to_send[j][0]], res)]),
+        )
+        for (i, _), res in zip(to_send, sends):
+            if not res.get("ok"):
+                results[i] = {**results[i], "error": str(res.get("error"))[:300]}
+
+    for i, ev in enumerate(reminders):
+        results[i] = {
+            "appointment_id": ev.get("appointment_id"),
+            "action": ev.get("action"),
+            **results[i],
+        }
+    return results
+
+
+def batch_handler(event, context):
+    """
+    event = {"Records": [<mensajes SQS con el evento en body>]}
+          | {"reminders": [<evento>, ...]}
+
+    Con SQS devuelve batchItemFailures para que solo se reintenten los fallidos.
+    """
+    if "Records" in event:
+        ids, reminders = [], []
+        bad: list[str] = []
+        for rec in event["Records"]:
+            try:
+                reminders.append(loads(rec["body"]))
+                ids.append(rec["messageId"])
+            except (KeyError, ValueError):
+                bad.append(rec.get("messageId"))
+    else:
+        reminders = event.get("reminders") or []
+        ids, bad = list(range(len(reminders))), []
+
+    results = dispatch_batch(reminders)
+    failures = bad + [ids[i] for i, r in enumerate(results) if r.get("error")]
+    sent = sum(1 for r in results if "sent" in r and not r.get("error"))
+    logger.info(
+        "Reminder batch: %d events, %d sent, %d failed",
+        len(results) + len(bad),
+        sent,
+        len(failures),
+    )
+    return {
+        "results": results,
+        "sent": sent,
+        "failed": len(failures),
+        "batchItemFailures": [{"itemIdentifier": str(f)} for f in failures],
+    }
+
+
+def handler(event, context):
+    if "Records" in event or "reminders" in event:
+        return batch_handler(event, context)
+
+    appt_id = event["appointment_id"]
+    logger.info("Reminder event: %s %s", appt_id, event.get("action"))
+
+    # lee cita (solo lo que deciden las reglas)
+    appt = REPO.get(appt_id, P_REMINDER)
+    if appt is None:
+        logger.warning("Appointment not found: %s", appt_id)
+
+    states = _delivery_states([event]) if appt is not None else {}
+    outcome, payload = _decide(event, appt, states.get(_delivery_ref(event)))
+    if payload is not None:
+        res = send_many([payload])[0]
+        if not res.get("ok"):
+            logger.error("Reminder send failed for %s: %s", appt_id, res.get("error"))
+        _record_sent([(event, res)])
+    return outcome
@@ -1,10 +1,21 @@
-import datetime as dt
-import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-import boto3
 import botocore.exceptions as bex
+from tools.appointments_repo import SCHEDULE_FIELDS, AppointmentsRepo, patient_pk
+from tools.aws_clients import LazyProxy, client, lazy_client, lazy_table
+from tools.reminder_buckets import DynamoBucketStore, reminder_item
+from tools.reminder_policy import (
+    default_policy,
+    ensure_future,
+    isoz,
+    parse_iso,
+    upsert_all,
+    utc_now,
+)
+from tools.schedule_lifecycle import group_name
+from tools.webhook_payload import log_event
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -15,73 +26,109 @@ SCHEDULER_ROLE_ARN = os.environ["SCHEDULER_ROLE_ARN"]
 REMINDER_DISPATCHER_ARN = os.environ["REMINDER_DISPATCHER_ARN"]
 STAGE = os.environ.get("STAGE", "dev")
 FAST_MODE = os.environ.get("FAST_MODE", "0") == "1"
-
-# ===== AWS clients =====
-dynamodb = boto3.resource("dynamodb")
-TABLE = dynamodb.Table(DDB_TABLE)
-scheduler = boto3.client("scheduler")
+# Upserts de schedules simultáneos en batch_handler
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+# "schedules": un schedule de EventBridge por recordatorio
+# "sweeper": ítems REM# en buckets por minuto que barre runtime/reminder_sweeper
+REMINDER_ENGINE = os.environ.get("REMINDER_ENGINE", "schedules")
+# Grupo de schedules de recordatorio (uno por stage)
+SCHEDULE_GROUP = os.environ.get("SCHEDULE_GROUP") or group_name(STAGE)
+
+# ===== AWS clients (perezosos) =====
+TABLE = lazy_table(DDB_TABLE)
+REPO = AppointmentsRepo(TABLE, DDB_TABLE)
+scheduler = lazy_client("scheduler")
+BUCKET_STORE = DynamoBucketStore(TABLE)
+
+# Recordatorios declarativos (r1/r2/esc) y destino de los schedules
+POLICY = default_policy(STAGE)
+TARGET = {"Arn": REMINDER_DISPATCHER_ARN, "RoleArn": SCHEDULER_ROLE_ARN}
+
+_batch_config = None
+
+
+def _batch_scheduler():
+    """Cliente de Scheduler con reintentos adaptativos (rate limiting del lado cliente)."""
+    global _batch_config
+    if _batch_config is None:
+        from botocore.config import Config
+
+        _batch_config = Config(
+            retries={"mode": "adaptive", "max_attempts": 10},
+            max_pool_connections=max(10, BATCH_CONCURRENCY),
+        )
+    return client("scheduler", config=_batch_config)
 
 
-def _fmt_noz(d: dt.datetime) -> str:
-    """EventBridge Scheduler espera at(YYYY-MM-DDThh:mm:ss) sin 'Z'."""
-    return d.strftime("%Y-%m-%dT%H:%M:%S")
+batch_scheduler = LazyProxy(_batch_scheduler)
 
 
-def _isoz(d: dt.datetime) -> str:
-    """ISO con sufijo Z (para devolver en la respuesta/logs)."""
-    return d.astimezone(dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+def _bucket_items(plan: dict) -> list[dict]:
+    """Ítems REM# del motor sweeper (vencidos → próximo minuto, como los schedules)."""
+    now = utc_now()
+    return [
+        reminder_item(plan["appointment_id"], f.rule.action, ensure_future(f.when, now), f.payload)
+        for f in plan["fires"]
+    ]
 
 
-def _ensure_future(d: dt.datetime, seconds_ahead: int = 60) -> dt.datetime:
+def _plan(event: dict) -> dict:
     """
-    Si la hora quedó en el pasado (o muy cerca), muévela un poco al futuro
-    para evitar ValidationException.
+    Horas, nombres y payloads de los recordatorios de la política para una cita.
+    Lanza ValueError si appt_time_iso no es ISO válido.
     """
-    now = dt.datetime.now(dt.timezone.utc)
-    if d <= now:
-        return now + dt.timedelta(seconds=seconds_ahead)
-    return d
+    fires = POLICY.plan(event, utc_now(), fast=FAST_MODE)
+    return {
+        "appointment_id": event["appointment_id"],
+        "phone": event["patient_phone_e164"],
+        "appt_dt": parse_iso(event["appt_time_iso"]),
+        "fires": fires,
+    }
 
 
-def _upsert_schedule(name: str, when_utc: dt.datetime, action: str, payload: dict):
-    """
-    Crea/actualiza un schedule 'at(...)' en UTC que invoca REMINDER_DISPATCHER_ARN.
-    """
-    when_utc = _ensure_future(when_utc)
-    when_str = _fmt_noz(when_utc)
+def _result(plan: dict) -> dict:
+    return {
+        "ok": True,
+        **{f.rule.name: isoz(f.when) for f in plan["fires"]},
+        "fast_mode": FAST_MODE,
+    }
 
-    target = {
-        "Arn": REMINDER_DISPATCHER_ARN,
-        "RoleArn": SCHEDULER_ROLE_ARN,
-        "Input": json.dumps(payload),
+
+def _row_values(plan: dict) -> dict:
+    """Atributos de la fila APPT# (sin pk/sk)."""
+    row = {
+        "patient_phone_e164": plan["phone"],
+        "appt_time_iso": isoz(plan["appt_dt"]),
+        "status": "scheduled",
+        "gsi1pk": patient_pk(plan["phone"]),
+        "gsi1sk": isoz(plan["appt_dt"]),
+        "reminder_engine": REMINDER_ENGINE,
     }
+    if REMINDER_ENGINE != "sweeper":
+        row.update({f.rule.field: f.schedule_name for f in plan["fires"] if f.rule.field})
+    return row
 
-    try:
-        scheduler.create_schedule(
-            Name=name,
-            FlexibleTimeWindow={"Mode": "OFF"},
-            ScheduleExpression=f"at({when_str})",  # sin 'Z'
-            ScheduleExpressionTimezone="UTC",  # explícito
-            Target=target,
-        )
-        logger.info("Created schedule %s at %s UTC (%s)", name, when_str, action)
-    except bex.ClientError as e:
-        # Si ya existe, lo actualizamos
-        if e.response.get("Error", {}).get("Code") in {
-            "ConflictException",
-            "ResourceAlreadyExistsException",
-        } or "already exists" in str(e):
-            scheduler.update_schedule(
-                Name=name,
-                FlexibleTimeWindow={"Mode": "OFF"},
-                ScheduleExpression=f"at({when_str})",
-                ScheduleExpressionTimezone="UTC",
-                Target=target,
-            )
-            logger.info("Updated schedule %s at %s UTC (%s)", name, when_str, action)
-        else:
-            logger.error("create_schedule failed for %s: %s", name, e)
-            raise
+
+def _update_rows(appointments: list[dict], plans, remove=()) -> dict[int, str]:
+    """UpdateItem de la fila APPT# de cada (índice, plan) en paralelo; devuelve errores."""
+    if not plans:
+        return {}
+
+    def _update(i: int, plan: dict) -> None:
+        extra = {k: v for k, v in appointments[i].items() if k in ("event_id", "patient_name")}
+        REPO.update(plan["appointment_id"], set_={**extra, **_row_values(plan)}, remove=remove)
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=min(BATCH_CONCURRENCY, len(plans))) as pool:
+        futures = {i: pool.submit(_update, i, plan) for i, plan in plans}
+        for i, fut in futures.items():
+            try:
+                fut.result()
+            except (bex.ClientError, bex.BotoCoreError) as e:
+                appt_id = appointments[i].get("appointment_id")
+                logger.error("Row update failed for %s: %s", appt_id, e)
+                errors[i] = str(e)
+    return errors
 
 
 def handler(event, context):
@@ -93,74 +140,113 @@ def handler(event, context):
       "appt_time_iso": "2025-08-11T15:00:00Z"   # siempre en UTC con 'Z'
     }
     """
-    logger.info("Schedule request: %s", json.dumps(event))
+    log_event(logger, "Schedule request", event)
 
-    appt_id = event["appointment_id"]
-    phone = event["patient_phone_e164"]
-    pname = event.get("patient_name", "Paciente")
-    appt_iso = event["appt_time_iso"]
+    if "appointments" in event:
+        return batch_handler(event, context)
 
-    # Parseo ISO → UTC
     try:
-        appt_dt = dt.datetime.fromisoformat(appt_iso.replace("Z", "+00:00")).astimezone(
-            dt.timezone.utc
-        )
+        plan = _plan(event)
     except ValueError as e:
-        logger.exception("Invalid appt_time_iso %s: %s", appt_iso, e)
+        logger.exception("Invalid appt_time_iso %s: %s", event.get("appt_time_iso"), e)
         raise
 
-    # Tiempos (modo normal vs. modo rápido de pruebas)
-    if FAST_MODE:
-        now = dt.datetime.now(dt.timezone.utc)
-        r1_dt = now + dt.timedelta(minutes=1)
-        r2_dt = now + dt.timedelta(minutes=5)
-        esc_dt = now + dt.timedelta(minutes=9)
-    else:
-        r1_dt = appt_dt - dt.timedelta(hours=24)  # primer recordatorio
-        r2_dt = appt_dt - dt.timedelta(hours=20)  # segundo recordatorio (+4h)
-        esc_dt = appt_dt - dt.timedelta(hours=19)  # escalación (1h luego del 2do)
-
-    base = f"pt-{STAGE}-{appt_id}"
-    r1_name, r2_name, esc_name = f"{base}-r1", f"{base}-r2", f"{base}-esc"
-
-    # Payload común que recibirá el dispatcher
-    base_payload = {
-        "appointment_id": appt_id,
-        "patient_phone_e164": phone,
-        "patient_name": pname,
-        "appt_time_iso": appt_iso,
-    }
+    appt_id = plan["appointment_id"]
+    row = _row_values(plan)
+    if REMINDER_ENGINE == "sweeper":
+        # Sin schedules: recordatorios en buckets y la fila sin nombres de schedule
+        BUCKET_STORE.put_reminders(_bucket_items(plan))
+        REPO.update(appt_id, set_=row, remove=SCHEDULE_FIELDS)
+        return _result(plan)
 
-    # Upsert de los 3 schedules
-    _upsert_schedule(r1_name, r1_dt, "first", {**base_payload, "action": "first"})
-    _upsert_schedule(r2_name, r2_dt, "second", {**base_payload, "action": "second"})
-    _upsert_schedule(esc_name, esc_dt, "escalation", {**base_payload, "action": "escalation"})
+    # Upsert de los schedules de la política, en paralelo
+    errors = upsert_all(scheduler, plan["fires"], TARGET, clock=utc_now, group=SCHEDULE_GROUP)
+    if errors:
+        raise next(iter(errors.values()))
 
     # Persistimos/actualizamos la cita en DDB
-    TABLE.update_item(
-        Key={"pk": f"APPT#{appt_id}", "sk": f"APPT#{appt_id}"},
-        UpdateExpression=(
-            "SET patient_phone_e164=:p, appt_time_iso=:t, #st=:s, "
-            "gsi1pk=:g1, gsi1sk=:g2, "
-            "r1_schedule_name=:r1, r2_schedule_name=:r2, esc_schedule_name=:esc"
-        ),
-        ExpressionAttributeNames={"#st": "status"},
-        ExpressionAttributeValues={
-            ":p": phone,
-            ":t": _isoz(appt_dt),
-            ":s": "scheduled",
-            ":g1": f"PATIENT#{phone}",
-            ":g2": _isoz(appt_dt),
-            ":r1": r1_name,
-            ":r2": r2_name,
-            ":esc": esc_name,
-        },
+    REPO.update(appt_id, set_=row)
+
+    return _result(plan)
+
+
+def batch_handler(event, context):
+    """
+    Programa recordatorios de N citas en una invocación.
+
+    event = {"appointments": [<evento de handler>, ...]}
+
+    Los upserts de los recordatorios de todas las citas corren en paralelo (máximo
+    BATCH_CONCURRENCY) con reintentos adaptativos ante throttling. Las filas de
+    las citas programadas se actualizan con un UpdateItem por cita (también en
+    paralelo), como en `handler`: reprogramar no borra confirmed_at, gcal_etag
+    ni el resto de atributos de la fila. Con REMINDER_ENGINE=sweeper no hay
+    schedules: los ítems REM# van en un batch_writer. Devuelve un resultado por
+    cita, en el mismo orden.
+    """
+    appointments = event.get("appointments") or []
+    results: list[dict] = [{} for _ in appointments]
+    plans: list[dict | None] = [None] * len(appointments)
+    for i, appt in enumerate(appointments):
+        try:
+            plans[i] = _plan(appt)
+        except (KeyError, ValueError) as e:
+            results[i] = {
+                "ok": False,
+                "appointment_id": appt.get("appointment_id"),
+                "error": str(e),
+            }
+
+    sweeper = REMINDER_ENGINE == "sweeper"
+    owner = {}
+    fires = []
+    for i, plan in enumerate(plans):
+        if plan is not None and not sweeper:
+            for fire in plan["fires"]:
+                owner[fire.schedule_name] = i
+                fires.append(fire)
+
+    errors: dict[int, str] = {}
+    failed_fires = upsert_all(
+        batch_scheduler,
+        fires,
+        TARGET,
+        clock=utc_now,
+        group=SCHEDULE_GROUP,
+        concurrency=BATCH_CONCURRENCY,
     )
+    for fire in fires:  # primer error de cada cita, en orden de la política
+        if fire.schedule_name in failed_fires:
+            errors.setdefault(owner[fire.schedule_name], str(failed_fires[fire.schedule_name]))
+
+    ok_plans = [(i, p) for i, p in enumerate(plans) if p is not None and i not in errors]
+    if sweeper and ok_plans:
+        try:
+            BUCKET_STORE.put_reminders([item for _, p in ok_plans for item in _bucket_items(p)])
+        except (bex.ClientError, bex.BotoCoreError) as e:
+            # el lote no dice qué ítems quedaron: fallan todas (reintentar sobrescribe)
+            logger.error("Bucket write failed for %d appointments: %s", len(ok_plans), e)
+            errors.update((i, str(e)) for i, _ in ok_plans)
+            ok_plans = []
+    errors.update(_update_rows(appointments, ok_plans, remove=SCHEDULE_FIELDS if sweeper else ()))
+
+    for i, plan in enumerate(plans):
+        if plan is None:
+            continue
+        if i in errors:
+            results[i] = {
+                "ok": False,
+                "appointment_id": plan["appointment_id"],
+                "error": errors[i],
+            }
+        else:
+            results[i] = {"appointment_id": plan["appointment_id"], **_result(plan)}
 
+    failed = sum(1 for r in results if not r.get("ok"))
+    logger.info("Batch scheduled %d/%d appointments", len(results) - failed, len(results))
     return {
-        "ok": True,
-        "r1": _isoz(r1_dt),
-        "r2": _isoz(r2_dt),
-        "esc": _isoz(esc_dt),
-        "fast_mode": FAST_MODE,
+        "ok": failed == 0,
+        "scheduled": len(results) - failed,
+        "failed": failed,
+        "results": results,
     }
@@ -0,0 +1,34 @@
+import logging
+import os
+
+from runtime import reminder_dispatcher
+from tools.aws_clients import lazy_table
+from tools.reminder_buckets import DynamoBucketStore, ReminderSweeper
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# ===== Entorno =====
+DDB_TABLE = os.environ["DDB_TABLE"]
+# Recordatorios por lote (100 = máximo de BatchGetItem)
+SWEEP_BATCH_SIZE = int(os.environ.get("SWEEP_BATCH_SIZE", "100"))
+# Buckets (minutos) máximos por invocación al ponerse al día tras una pausa
+SWEEP_MAX_BUCKETS = int(os.environ.get("SWEEP_MAX_BUCKETS", "120"))
+
+TABLE = lazy_table(DDB_TABLE)
+STORE = DynamoBucketStore(TABLE)
+
+
+def handler(event, context):
+    """
+    Invocado cada minuto por EventBridge Scheduler (rate(1 minute)). Cada lote
+    del bucket pasa por reminder_dispatcher.dispatch_batch (una lectura
+    BatchGetItem y envíos concurrentes).
+    """
+    sweeper = ReminderSweeper(
+        STORE,
+        reminder_dispatcher.dispatch_batch,
+        batch_size=SWEEP_BATCH_SIZE,
+        max_buckets=SWEEP_MAX_BUCKETS,
+    )
+    return sweeper.sweep()
@@ -0,0 +1,43 @@
+import logging
+import os
+
+from tools.appointments_repo import AppointmentsRepo
+from tools.aws_clients import lazy_client, lazy_table
+from tools.reminder_policy import default_policy
+from tools.schedule_lifecycle import DELETE_CONCURRENCY, ScheduleGC, group_name
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# ===== Entorno =====
+DDB_TABLE = os.environ["DDB_TABLE"]
+STAGE = os.environ.get("STAGE", "dev")
+# Grupos a recorrer: el del stage y "default" (schedules creados antes del grupo)
+GC_GROUPS = [
+    g.strip()
+    for g in os.environ.get("SCHEDULE_GC_GROUPS", f"{group_name(STAGE)},default").split(",")
+    if g.strip()
+]
+# Páginas de ListSchedules por grupo e invocación (0 = sin límite)
+GC_MAX_PAGES = int(os.environ.get("SCHEDULE_GC_MAX_PAGES", "0"))
+
+TABLE = lazy_table(DDB_TABLE)
+REPO = AppointmentsRepo(TABLE, DDB_TABLE)
+scheduler = lazy_client("scheduler")
+POLICY = default_policy(STAGE)
+
+
+def handler(event, context):
+    """
+    Invocado a diario por EventBridge Scheduler. Borra los schedules de
+    recordatorio cuya cita ya no existe, está cancelada o ya pasó.
+    event opcional: {"groups": [...], "max_pages": N}
+    """
+    groups = (event or {}).get("groups") or GC_GROUPS
+    max_pages = (event or {}).get("max_pages") or GC_MAX_PAGES or None
+    results = {}
+    for group in groups:
+        gc = ScheduleGC(scheduler, REPO, POLICY, group=group, concurrency=DELETE_CONCURRENCY)
+        res = gc.run(max_pages=max_pages)
+        results[group] = {**res, "errors": len(res["errors"])}
+    return {"ok": all(r["errors"] == 0 for r in results.values()), "groups": results}
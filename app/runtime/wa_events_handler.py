@@ -1,23 +1,32 @@
-import json
 import logging
+import os
 
-from tools.whatsapp_owner import send_owner_template  # <-- antes: from app.tools...
+from tools.aws_clients import lazy_table
+from tools.owner_digest import DynamoDigestBuffer, OwnerNotifier, owner_notice
+from tools.webhook_payload import PayloadError, log_event, parse
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Buffer del resumen de avisos (solo se usa con OWNER_NOTIFY_MODE=digest)
+OWNER = OwnerNotifier(DynamoDigestBuffer(lazy_table(os.environ.get("DDB_TABLE", ""))))
+
 
 def handler(event, context):
-    logger.info("Incoming SNS event: %s", json.dumps(event))
+    log_event(logger, "Incoming SNS event", event)
+    notices = []
     for record in event.get("Records", []):
         msg = record.get("Sns", {}).get("Message", "{}")
         try:
-            payload = json.loads(msg)
-        except json.JSONDecodeError:
+            payload = parse(msg)
+        except PayloadError:
             payload = {"raw": msg}
 
         # text = payload.get("text") or payload.get("message") or str(payload)
         from_ = payload.get("from") or "desconocido"
 
-        send_owner_template(paciente=from_, fecha_hora="N/A", estado="mensaje entrante")
+        notices.append(
+            owner_notice("inbound", paciente=from_, fecha_hora="N/A", estado="mensaje entrante")
+        )
+    OWNER.notify(notices)
     return {"statusCode": 200, "body": "ok"}
@@ -0,0 +1,393 @@
+"""
+Acceso a las citas en la tabla única (pk/sk + gsi1).
+
+Centraliza las claves (`APPT#<id>`, `PATIENT#<tel>`, `REM#<acción>`,
+`DLV#<hora>#<acción>#<estado>`, `WAMID#<id>`), lee solo los atributos que cada caso
+de uso necesita (ProjectionExpression) y arma las UpdateExpression a partir de
+diccionarios. Las lecturas devuelven
+`Appointment`, un registro con __slots__ en lugar del ítem crudo.
+
+Hook de capacidad: con `add_capacity_hook(fn)` (o DDB_LOG_CAPACITY=1) cada
+llamada pide ReturnConsumedCapacity=TOTAL y se invoca `fn(operación,
+consumed_capacity)`. Sin hooks no se pide nada (sin costo extra).
+"""
+import logging
+import os
+import time
+
+import botocore.exceptions as bex
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+APPT_PREFIX = "APPT#"
+PATIENT_PREFIX = "PATIENT#"
+GSI_PATIENT = "gsi1"
+# Límite de BatchGetItem y reintentos de UnprocessedKeys
+BATCH_GET_MAX = 100
+BATCH_GET_RETRIES = 5
+# Filas por página al buscar la próxima cita (saltando canceladas)
+NEXT_PAGE_SIZE = 5
+
+# Palabras reservadas de DynamoDB que usa esta tabla (van como #nombre)
+RESERVED = frozenset({"status", "ttl", "action", "name", "data", "date", "time"})
+
+# Proyecciones por caso de uso
+P_REMINDER = ("pk", "confirmed_at", "status")
+P_CONFIRM = (
+    "pk",
+    "appt_time_iso",
+    "confirmed_at",
+    "status",
+    "r2_schedule_name",
+    "esc_schedule_name",
+)
+P_SYNC = (
+    "pk",
+    "appt_time_iso",
+    "status",
+    "gcal_etag",
+    "patient_phone_e164",
+    "patient_name",
+    "reminder_engine",
+    "r1_schedule_name",
+    "r2_schedule_name",
+    "esc_schedule_name",
+)
+
+REMINDER_ACTIONS = ("first", "second", "escalation")
+SCHEDULE_FIELDS = ("r1_schedule_name", "r2_schedule_name", "esc_schedule_name")
+
+
+# ===== Claves =====
+def appt_key(appt_id: str) -> dict:
+    return {"pk": f"{APPT_PREFIX}{appt_id}", "sk": f"{APPT_PREFIX}{appt_id}"}
+
+
+def reminder_key(appt_id: str, action: str) -> dict:
+    return {"pk": f"{APPT_PREFIX}{appt_id}", "sk": f"REM#{action}"}
+
+
+def delivery_key(appt_id: str, appt_time_iso: str, action: str, status: str) -> dict:
+    """
+    Transición de entrega (sent/delivered/read/failed) de un recordatorio. La
+    hora de la cita es parte de la clave: reprogramar empieza de cero.
+    """
+    return {"pk": f"{APPT_PREFIX}{appt_id}", "sk": f"DLV#{appt_time_iso}#{action}#{status}"}
+
+
+def wamid_key(wamid: str) -> dict:
+    """wamid de Meta → cita/recordatorio que lo envió."""
+    return {"pk": f"WAMID#{wamid}", "sk": f"WAMID#{wamid}"}
+
+
+def patient_pk(phone_e164: str) -> str:
+    return f"{PATIENT_PREFIX}{phone_e164}"
+
+
+def appt_id_of(pk: str) -> str:
+    return pk[len(APPT_PREFIX) :] if pk.startswith(APPT_PREFIX) else pk
+
+
+def sync_key(calendar_id: str) -> dict:
+    """Estado de la sincronización incremental de Calendar."""
+    return {"pk": "SYNC#gcal", "sk": f"CAL#{calendar_id}"}
+
+
+# ===== Consumo de capacidad =====
+_capacity_hooks: list = []
+
+
+def add_capacity_hook(fn) -> None:
+    """`fn(operación, consumed_capacity)` tras cada llamada del repositorio."""
+    _capacity_hooks.append(fn)
+
+
+def remove_capacity_hook(fn) -> None:
+    if fn in _capacity_hooks:
+        _capacity_hooks.remove(fn)
+
+
+def _log_capacity(op: str, consumed) -> None:
+    logger.info("DDB %s consumed: %s", op, consumed)
+
+
+if os.environ.get("DDB_LOG_CAPACITY") == "1":
+    add_capacity_hook(_log_capacity)
+
+
+def _capacity_kwargs() -> dict:
+    return {"ReturnConsumedCapacity": "TOTAL"} if _capacity_hooks else {}
+
+
+def _report(op: str, resp: dict) -> None:
+    consumed = resp.get("ConsumedCapacity")
+    if consumed is None:
+        return
+    for fn in list(_capacity_hooks):
+        try:
+            fn(op, consumed)
+        except Exception as e:  # noqa: BLE001 - la instrumentación no rompe el hot path
+            logger.warning("Capacity hook failed: %s", e)
+
+
+# ===== Expresiones =====
+def _name(attr: str, names: dict) -> str:
+    if attr in RESERVED:
+        names[f"#{attr}"] = attr
+        return f"#{attr}"
+    return attr
+
+
+def projection(fields) -> tuple[str, dict]:
+    """(ProjectionExpression, ExpressionAttributeNames) para `fields`."""
+    names: dict[str, str] = {}
+    return ", ".join(_name(f, names) for f in fields), names
+
+
+def update_expression(set_: dict | None = None, remove=()) -> tuple[str, dict, dict]:
+    """SET a=:a, ... REMOVE b, ... → (expresión, nombres, valores)."""
+    names: dict[str, str] = {}
+    values: dict[str, object] = {}
+    parts = []
+    if set_:
+        sets = []
+        for attr, value in set_.items():
+            values[f":{attr}"] = value
+            sets.append(f"{_name(attr, names)}=:{attr}")
+        parts.append("SET " + ", ".join(sets))
+    if remove:
+        parts.append("REMOVE " + ", ".join(_name(a, names) for a in remove))
+    return " ".join(parts), names, values
+
+
+class ConditionFailed(Exception):
+    """La condición de una escritura condicional no se cumplió."""
+
+
+def _is_condition_failed(e: bex.ClientError) -> bool:
+    return e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException"
+
+
+# ===== Registro =====
+class Appointment:
+    """Fila APPT#; los atributos no proyectados quedan en None."""
+
+    __slots__ = (
+        "appointment_id",
+        "patient_phone_e164",
+        "patient_name",
+        "appt_time_iso",
+        "status",
+        "confirmed_at",
+        "event_id",
+        "gcal_etag",
+        "reminder_engine",
+        "r1_schedule_name",
+        "r2_schedule_name",
+        "esc_schedule_name",
+    )
+
+    def __init__(self, appointment_id: str, **attrs):
+        self.appointment_id = appointment_id
+        for slot in self.__slots__[1:]:
+            setattr(self, slot, attrs.get(slot))
+
+    @classmethod
+    def from_item(cls, item: dict) -> "Appointment":
+        return cls(appt_id_of(item.get("pk", "")), **item)
+
+    @property
+    def confirmed(self) -> bool:
+        return bool(self.confirmed_at)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.status == "cancelled"
+
+    def schedule_names(self, fields=SCHEDULE_FIELDS) -> list[str]:
+        return [n for n in (getattr(self, f) for f in fields) if n]
+
+    def to_item(self) -> dict:
+        item = appt_key(self.appointment_id)
+        for slot in self.__slots__[1:]:
+            value = getattr(self, slot)
+            if value is not None:
+                item[slot] = value
+        return item
+
+    def __repr__(self) -> str:
+        return f"Appointment({self.appointment_id!r}, status={self.status!r})"
+
+
+# ===== Repositorio =====
+class AppointmentsRepo:
+    """
+    `table` es la Table de boto3 (o un LazyProxy); `ddb` el recurso de DynamoDB
+    para BatchGetItem (por defecto el compartido de aws_clients).
+    """
+
+    def __init__(self, table, table_name: str | None = None, ddb=None, retry_base_s=0.05):
+        self.table = table
+        self._table_name = table_name
+        self._ddb = ddb
+        self.retry_base_s = retry_base_s
+
+    @property
+    def table_name(self) -> str:
+        return self._table_name or self.table.name
+
+    @property
+    def ddb(self):
+        if self._ddb is None:
+            from . import aws_clients
+
+            return aws_clients.resource("dynamodb")
+        return self._ddb
+
+    def get(self, appt_id: str, fields=P_REMINDER, consistent: bool = False):
+        expr, names = projection(fields)
+        kwargs = {"ExpressionAttributeNames": names} if names else {}
+        resp = self.table.get_item(
+            Key=appt_key(appt_id),
+            ProjectionExpression=expr,
+            ConsistentRead=consistent,
+            **kwargs,
+            **_capacity_kwargs(),
+        )
+        _report("GetItem", resp)
+        item = resp.get("Item")
+        return Appointment.from_item(item) if item else None
+
+    def next_for_patient(self, phone_e164: str, after_iso: str, fields=P_CONFIRM):
+        """
+        Próxima cita no cancelada del paciente posterior a `after_iso` (gsi1), o
+        None. Las canceladas salen del índice (ver `cancel`), pero las filas
+        anteriores a eso pueden seguir ahí: se saltan página a página.
+        """
+        from boto3.dynamodb.conditions import Key
+
+        if "status" not in fields:
+            fields = (*fields, "status")
+        expr, names = projection(fields)
+        kwargs = {"ExpressionAttributeNames": names} if names else {}
+        while True:
+            resp = self.table.query(
+                IndexName=GSI_PATIENT,
+                KeyConditionExpression=Key("gsi1pk").eq(patient_pk(phone_e164))
+                & Key("gsi1sk").gt(after_iso),
+                ProjectionExpression=expr,
+                Limit=NEXT_PAGE_SIZE,
+                ScanIndexForward=True,  # más cercana primero
+                **kwargs,
+                **_capacity_kwargs(),
+            )
+            _report("Query", resp)
+            for item in resp.get("Items", []):
+                appt = Appointment.from_item(item)
+                if not appt.cancelled:
+                    return appt
+            if not resp.get("LastEvaluatedKey"):
+                return None
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    def batch_get(self, appt_ids, fields=P_REMINDER) -> tuple[dict[str, Appointment], set[str]]:
+        """
+        BatchGetItem en bloques de 100 con reintento de UnprocessedKeys.
+        Devuelve (citas por id, ids que siguieron sin procesar).
+        """
+        ids = list(dict.fromkeys(appt_ids))
+        items, unprocessed = self.batch_get_keys(
+            [appt_key(i) for i in ids], fields if "pk" in fields else ("pk", *fields)
+        )
+        found: dict[str, Appointment] = {}
+        for item in items:
+            appt = Appointment.from_item(item)
+            found[appt.appointment_id] = appt
+        return found, {appt_id_of(key["pk"]) for key in unprocessed}
+
+    def batch_get_keys(self, keys: list[dict], fields=None) -> tuple[list[dict], list[dict]]:
+        """
+        BatchGetItem de claves pk/sk arbitrarias (bloques de 100, reintento de
+        UnprocessedKeys). Devuelve (ítems encontrados, claves sin procesar).
+        """
+        items: list[dict] = []
+        unprocessed: list[dict] = []
+        name = self.table_name
+        expr, names = projection(fields) if fields else (None, {})
+        for start in range(0, len(keys), BATCH_GET_MAX):
+            req: dict = {"Keys": keys[start : start + BATCH_GET_MAX]}
+            if expr:
+                req["ProjectionExpression"] = expr
+            if names:
+                req["ExpressionAttributeNames"] = names
+            request = {name: req}
+            for attempt in range(BATCH_GET_RETRIES):
+                resp = self.ddb.batch_get_item(RequestItems=request, **_capacity_kwargs())
+                _report("BatchGetItem", resp)
+                items.extend(resp.get("Responses", {}).get(name, []))
+                request = resp.get("UnprocessedKeys") or {}
+                if not request:
+                    break
+                time.sleep(self.retry_base_s * 2**attempt)
+            unprocessed.extend((request.get(name) or {}).get("Keys", []))
+        return items, unprocessed
+
+    def update(
+        self,
+        appt_id: str,
+        set_: dict | None = None,
+        remove=(),
+        condition: str | None = None,
+        condition_values: dict | None = None,
+        return_values: str | None = None,
+    ) -> dict:
+        """
+        UpdateItem sobre APPT#<id>. Con `condition` (p. ej. "attribute_exists(pk)")
+        lanza ConditionFailed si no se cumple. Devuelve los Attributes pedidos.
+        """
+        expr, names, values = update_expression(set_, remove)
+        kwargs: dict = {"Key": appt_key(appt_id), "UpdateExpression": expr}
+        if condition:
+            kwargs["ConditionExpression"] = condition
+            values.update(condition_values or {})
+        if names:
+            kwargs["ExpressionAttributeNames"] = names
+        if values:
+            kwargs["ExpressionAttributeValues"] = values
+        if return_values:
+            kwargs["ReturnValues"] = return_values
+        try:
+            resp = self.table.update_item(**kwargs, **_capacity_kwargs()) or {}
+        except bex.ClientError as e:
+            if condition and _is_condition_failed(e):
+                raise ConditionFailed(appt_id) from e
+            raise
+        _report("UpdateItem", resp)
+        return resp.get("Attributes") or {}
+
+    def cancel(self, appt_id: str, set_: dict | None = None) -> None:
+        """
+        Marca la cita como cancelada y la saca de gsi1 (índice disperso), así
+        `next_for_patient` ya no la encuentra. ConditionFailed si la fila no existe.
+        """
+        self.update(
+            appt_id,
+            set_={"status": "cancelled", **(set_ or {})},
+            remove=("gsi1pk", "gsi1sk"),
+            condition="attribute_exists(pk)",
+        )
+
+    def put_many(self, items: list[dict]) -> None:
+        """
+        Escritura por lotes (BatchWriteItem de a 25, reintentos de boto3). Una
+        clave repetida en el lote rechazaría el BatchWriteItem: gana la última.
+        """
+        with self.table.batch_writer(overwrite_by_pkeys=["pk", "sk"]) as bw:
+            for item in items:
+                bw.put_item(Item=item)
+
+    def delete_reminders(self, appt_id: str, actions=REMINDER_ACTIONS) -> None:
+        with self.table.batch_writer() as bw:
+            for action in actions:
+                bw.delete_item(Key=reminder_key(appt_id, action))
@@ -0,0 +1,103 @@
+"""
+Registro perezoso de clientes AWS: una sesión boto3 por contenedor y cada
+cliente/recurso se crea en su primer uso (boto3 ni siquiera se importa antes).
+"""
+import threading
+
+_lock = threading.RLock()
+_session = None
+_clients: dict = {}
+_resources: dict = {}
+_tables: dict = {}
+
+
+def session():
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                import boto3
+
+                _session = boto3.session.Session()
+    return _session
+
+
+def client(service: str, config=None):
+    """Cliente cacheado por (servicio, config). `config` debe ser un objeto de módulo."""
+    key = (service, id(config) if config is not None else None)
+    c = _clients.get(key)
+    if c is None:
+        with _lock:
+            c = _clients.get(key)
+            if c is None:
+                c = session().client(service, config=config)
+                _clients[key] = c
+    return c
+
+
+def resource(service: str):
+    """Recurso boto3 cacheado por servicio (p. ej. batch_get_item de DynamoDB)."""
+    r = _resources.get(service)
+    if r is None:
+        with _lock:
+            r = _resources.get(service)
+            if r is None:
+                r = session().resource(service)
+                _resources[service] = r
+    return r
+
+
+def table(name: str):
+    """Tabla DynamoDB (recurso) cacheada por nombre."""
+    t = _tables.get(name)
+    if t is None:
+        with _lock:
+            t = _tables.get(name)
+            if t is None:
+                t = resource("dynamodb").Table(name)
+                _tables[name] = t
+    return t
+
+
+class LazyProxy:
+    """
+    Objeto que delega cualquier atributo en el cliente real, construido al primer
+    acceso. Permite mantener `TABLE`/`scheduler` como atributos de módulo sin
+    pagar su construcción al importar.
+    """
+
+    def __init__(self, factory):
+        self.__dict__["_factory"] = factory
+        self.__dict__["_target"] = None
+
+    def _resolve(self):
+        target = self.__dict__["_target"]
+        if target is None:
+            target = self.__dict__["_factory"]()
+            self.__dict__["_target"] = target
+        return target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+
+def lazy_client(service: str, config=None) -> LazyProxy:
+    return LazyProxy(lambda: client(service, config))
+
+
+def lazy_resource(service: str) -> LazyProxy:
+    return LazyProxy(lambda: resource(service))
+
+
+def lazy_table(name: str) -> LazyProxy:
+    return LazyProxy(lambda: table(name))
+
+
+def reset() -> None:
+    """Descarta sesión y clientes cacheados (tests)."""
+    global _session
+    with _lock:
+        _session = None
+        _clients.clear()
+        _resources.clear()
+        _tables.clear()
@@ -0,0 +1,176 @@
+"""
+Confirmación de citas por parte del paciente ("SI").
+
+La próxima cita no cancelada se busca por gsi1 y se marca con un único
+UpdateItem condicional (`attribute_not_exists(confirmed_at)` y status distinto
+de cancelled, ReturnValues=ALL_NEW): si llegan dos "SI" casi a la vez, solo uno
+gana la condición y solo el ganador borra los schedules r2/esc (en paralelo).
+El perdedor responde igual que si hubiera confirmado, sin tocar nada; si la
+condición falló porque la cita se canceló entretanto, no hay nada que confirmar.
+
+El resultado se cachea por paciente (LRU con TTL, nunca más allá de la hora de
+la cita). Un "SI" repetido solo relee la fila cacheada con un GetItem: si la
+cita se reprogramó o canceló desde otra Lambda (calendar_sync,
+appointments_manager), la entrada se descarta y se confirma de nuevo.
+"""
+import datetime as dt
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import botocore.exceptions as bex
+
+from .appointments_repo import P_CONFIRM, Appointment, ConditionFailed
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CACHE_TTL_S = int(os.environ.get("CONFIRM_CACHE_TTL_S", "300"))
+CACHE_MAX = int(os.environ.get("CONFIRM_CACHE_MAX", "2048"))
+CANCEL_FIELDS = ("r2_schedule_name", "esc_schedule_name")
+CONFIRM_CONDITION = (
+    "attribute_exists(pk) AND attribute_not_exists(confirmed_at) AND #status <> :cancelled"
+)
+
+
+def _epoch(iso: str | None) -> float:
+    if not iso:
+        return 0.0
+    return dt.datetime.fromisoformat(iso.replace("Z", "+00:00")).timestamp()
+
+
+class ConfirmationEngine:
+    """
+    `confirm(phone, now_iso)` → (resultado, cita | None), con resultado en
+    confirmed | already_confirmed | cached | not_found | error.
+    `delete_schedules(names)` borra schedules de EventBridge en su grupo y
+    devuelve el resumen de `schedule_lifecycle.delete_schedules`.
+    """
+
+    def __init__(
+        self,
+        repo,
+        delete_schedules,
+        cache_ttl: float = CACHE_TTL_S,
+        cache_max: int = CACHE_MAX,
+        clock=time.time,
+    ):
+        self.repo = repo
+        self.delete_schedules = delete_schedules
+        self.cache_ttl = cache_ttl
+        self.cache_max = cache_max
+        self._clock = clock
+        self._cache: OrderedDict[str, tuple[Appointment, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"confirmed": 0, "already_confirmed": 0, "cached": 0, "not_found": 0}
+
+    def _cached(self, phone: str) -> Appointment | None:
+        with self._lock:
+            hit = self._cache.get(phone)
+            if hit is None:
+                return None
+            if hit[1] <= self._clock():
+                del self._cache[phone]
+                return None
+            self._cache.move_to_end(phone)
+            return hit[0]
+
+    def _remember(self, phone: str, appt: Appointment) -> None:
+        # pasada la cita, un "SI" corresponde a la siguiente: no se cachea más allá
+        expires = min(self._clock() + self.cache_ttl, _epoch(appt.appt_time_iso))
+        with self._lock:
+            self._cache[phone] = (appt, expires)
+            self._cache.move_to_end(phone)
+            while len(self._cache) > self.cache_max:
+                self._cache.popitem(last=False)
+
+    def forget(self, phone: str) -> None:
+        """Descarta la confirmación cacheada (p. ej. cita reprogramada)."""
+        with self._lock:
+            self._cache.pop(phone, None)
+
+    def _still_confirmed(self, cached: Appointment) -> bool:
+        """La fila sigue confirmada para la misma hora (no se reprogramó ni canceló)."""
+        try:
+            row = self.repo.get(cached.appointment_id, P_CONFIRM)
+        except bex.ClientError as e:
+            logger.warning("DDB get failed for %s: %s", cached.appointment_id, e.response)
+            return False
+        return (
+            row is not None
+            and row.confirmed
+            and not row.cancelled
+            and row.appt_time_iso == cached.appt_time_iso
+        )
+
+    def _cancelled_meanwhile(self, appt: Appointment) -> bool:
+        """Tras perder la condición: ¿se canceló (o borró) la cita en lugar de confirmarse?"""
+        try:
+            row = self.repo.get(appt.appointment_id, P_CONFIRM, consistent=True)
+        except bex.ClientError as e:
+            logger.warning("DDB get failed for %s: %s", appt.appointment_id, e.response)
+            return False
+        return row is None or row.cancelled
+
+    def _cancel_schedules(self, appt: Appointment) -> None:
+        names = appt.schedule_names(CANCEL_FIELDS)
+        if not names:
+            return
+        res = self.delete_schedules(names)
+        logger.info("Deleted schedules %s: %s", names, res)
+        if res.get("errors"):
+            logger.warning("Schedules not deleted: %s", res["errors"])
+
+    def confirm(self, phone: str, now_iso: str) -> tuple[str, Appointment | None]:
+        appt = self._cached(phone)
+        if appt is not None:
+            if self._still_confirmed(appt):
+                self.counters["cached"] += 1
+                return "cached", appt
+            self.forget(phone)
+
+        try:
+            appt = self.repo.next_for_patient(phone, now_iso, P_CONFIRM)
+        except bex.ClientError as e:
+            logger.exception("DDB query failed for patient %s: %s", phone, e.response)
+            return "error", None
+        if appt is None:
+            self.counters["not_found"] += 1
+            return "not_found", None
+        if appt.confirmed:
+            self.counters["already_confirmed"] += 1
+            self._remember(phone, appt)
+            return "already_confirmed", appt
+
+        try:
+            attrs = self.repo.update(
+                appt.appointment_id,
+                set_={"confirmed_at": now_iso, "status": "confirmed"},
+                condition=CONFIRM_CONDITION,
+                condition_values={":cancelled": "cancelled"},
+                return_values="ALL_NEW",
+            )
+        except ConditionFailed:
+            if self._cancelled_meanwhile(appt):
+                self.counters["not_found"] += 1
+                return "not_found", None
+            # otro "SI" ganó la condición: él cancela los schedules
+            self.counters["already_confirmed"] += 1
+            self._remember(phone, appt)
+            return "already_confirmed", appt
+        except bex.ClientError as e:
+            logger.exception(
+                "DDB update failed to mark confirmed for %s: %s", appt.appointment_id, e.response
+            )
+            # seguimos intentando cancelar schedules igualmente
+            self._cancel_schedules(appt)
+            return "confirmed", appt
+
+        if attrs:
+            appt = Appointment.from_item(attrs)
+        self._cancel_schedules(appt)
+        self.counters["confirmed"] += 1
+        self._remember(phone, appt)
+        return "confirmed", appt
@@ -0,0 +1,276 @@
+"""
+Estado de conversación por paciente con caché en el contenedor y escritura diferida.
+
+Las lecturas salen de un LRU con TTL; las escrituras son parciales (solo los
+campos tocados, vía UpdateExpression) y se acumulan en memoria: varias
+llamadas de herramientas en el mismo turno terminan en un único UpdateItem por
+clave cuando el handler llama a `flush_all()` (o usa `@flush_after`). Fuera de
+un `@flush_after` nadie vaciaría el buffer: las herramientas lo consultan con
+`in_flush_scope()` y escriben de inmediato.
+
+Versionado optimista: cada ítem lleva `version`. Si leímos el ítem, la
+escritura exige que la versión no haya cambiado; si otro contenedor escribió
+en el medio, se relee, se vuelven a aplicar nuestros campos encima y se
+reintenta. Los campos que no tocamos nunca se pisan.
+"""
+import functools
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import botocore.exceptions as bex
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CACHE_MAX = int(os.environ.get("STATE_CACHE_MAX", "512"))
+CACHE_TTL_S = int(os.environ.get("STATE_CACHE_TTL_S", "300"))
+MAX_RETRIES = 3
+VERSION = "version"
+
+_instances: "weakref.WeakSet[ConversationState]" = weakref.WeakSet()
+# Invocaciones en curso dentro de @flush_after (global: los tools pueden correr
+# en otros hilos y Lambda atiende una invocación por contenedor)
+_scopes = 0
+_scopes_lock = threading.Lock()
+
+
+def _is_condition_failed(e: bex.ClientError) -> bool:
+    return e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException"
+
+
+class _Pending:
+    __slots__ = ("set", "remove", "delete", "calls")
+
+    def __init__(self):
+        self.set: dict = {}
+        self.remove: set = set()
+        self.delete = False
+        self.calls = 0
+
+    def apply(self, data: dict) -> dict:
+        data = {k: v for k, v in data.items() if k not in self.remove}
+        data.update(self.set)
+        return data
+
+
+class ConversationState:
+    """
+    `table` es un callable que devuelve la Table de boto3 (se resuelve en cada
+    uso). `key_attr` es el nombre de la clave de partición.
+    """
+
+    def __init__(
+        self,
+        table,
+        key_attr: str = "id",
+        maxsize: int = CACHE_MAX,
+        ttl: float = CACHE_TTL_S,
+        clock=time.monotonic,
+    ):
+        self._table = table
+        self.key_attr = key_attr
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        # clave → (datos sin version, version o None si no existe, leído en)
+        self._cache: OrderedDict[str, tuple[dict | None, int | None, float]] = OrderedDict()
+        self._pending: dict[str, _Pending] = {}
+        self._lock = threading.RLock()
+        self.counters = {"hits": 0, "misses": 0, "writes": 0, "coalesced": 0, "conflicts": 0}
+        _instances.add(self)
+
+    # ===== caché =====
+    def _cached(self, key: str):
+        entry = self._cache.get(key)
+        if entry is None or self._clock() - entry[2] >= self.ttl:
+            return None
+        self._cache.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, item: dict | None) -> None:
+        if item is None:
+            entry = (None, None, self._clock())
+        else:
+            data = {k: v for k, v in item.items() if k != VERSION}
+            version = item.get(VERSION)
+            entry = (data, int(version) if version is not None else None, self._clock())
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            oldest = next(iter(self._cache))
+            if oldest in self._pending:
+                self._cache.move_to_end(oldest)  # no desalojar lo que falta escribir
+                if all(k in self._pending for k in self._cache):
+                    break
+                continue
+            self._cache.popitem(last=False)
+
+    def _load(self, key: str) -> tuple[dict | None, int | None]:
+        resp = self._table().get_item(Key={self.key_attr: key}, ConsistentRead=True)
+        item = resp.get("Item")
+        self._store(key, item)
+        entry = self._cache[key]
+        return entry[0], entry[1]
+
+    # ===== API =====
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None and pending.delete:
+                # borrado: solo existe lo que se escribió después
+                return pending.apply({self.key_attr: key}) if pending.set else None
+            entry = self._cached(key)
+            if entry is not None:
+                self.counters["hits"] += 1
+                data = entry[0]
+            else:
+                self.counters["misses"] += 1
+                data, _ = self._load(key)
+            if pending is not None:
+                data = pending.apply(data or {self.key_attr: key})
+            return dict(data) if data is not None else None
+
+    def update(self, key: str, fields: dict) -> None:
+        """
+        Merge parcial de `fields` (se escribe en el próximo flush). Tras un
+        `delete` pendiente, los campos reemplazan al registro en lugar de
+        mezclarse con el guardado.
+        """
+        fields = {k: v for k, v in fields.items() if k not in (self.key_attr, VERSION)}
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = _Pending()
+            else:
+                self.counters["coalesced"] += 1
+            pending.calls += 1
+            pending.set.update(fields)
+            pending.remove.difference_update(fields)
+
+    def remove_fields(self, key: str, names) -> None:
+        with self._lock:
+            pending = self._pending.setdefault(key, _Pending())
+            for name in names:
+                pending.set.pop(name, None)
+                pending.remove.add(name)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            pending = self._pending[key] = _Pending()
+            pending.delete = True
+            self._cache.pop(key, None)
+
+    def dirty(self) -> int:
+        return len(self._pending)
+
+    # ===== escritura diferida =====
+    def _write(self, key: str, pending: _Pending) -> None:
+        names = {"#v": VERSION}
+        values: dict = {":one": 1, ":zero": 0}
+        sets = []
+        for i, (attr, value) in enumerate(pending.set.items()):
+            names[f"#f{i}"] = attr
+            values[f":f{i}"] = value
+            sets.append(f"#f{i}=:f{i}")
+        sets.append("#v=if_not_exists(#v, :zero) + :one")
+        expr = "SET " + ", ".join(sets)
+        if pending.remove:
+            removes = []
+            for i, attr in enumerate(sorted(pending.remove)):
+                names[f"#r{i}"] = attr
+                removes.append(f"#r{i}")
+            expr += " REMOVE " + ", ".join(removes)
+
+        for attempt in range(MAX_RETRIES + 1):
+            entry = self._cached(key)
+            kwargs = {}
+            if entry is not None:
+                # leímos el ítem: la escritura exige que nadie haya escrito después
+                if entry[1] is None:
+                    kwargs["ConditionExpression"] = "attribute_not_exists(#v)"
+                else:
+                    kwargs["ConditionExpression"] = "#v = :expected"
+                    values[":expected"] = entry[1]
+            else:
+                values.pop(":expected", None)
+            try:
+                resp = self._table().update_item(
+                    Key={self.key_attr: key},
+                    UpdateExpression=expr,
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues=values,
+                    ReturnValues="ALL_NEW",
+                    **kwargs,
+                )
+            except bex.ClientError as e:
+                if not _is_condition_failed(e) or attempt == MAX_RETRIES:
+                    raise
+                self.counters["conflicts"] += 1
+                logger.info("State %s changed concurrently, merging (attempt %d)", key, attempt)
+                self._load(key)  # versión nueva; nuestros campos se reaplican encima
+                continue
+            self.counters["writes"] += 1
+            attrs = (resp or {}).get("Attributes")
+            if attrs:
+                self._store(key, attrs)
+            else:
+                self._cache.pop(key, None)
+            return
+
+    def flush(self) -> dict:
+        """Escribe lo pendiente: un UpdateItem/DeleteItem por clave."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            failed: dict[str, _Pending] = {}
+            for key, op in pending.items():
+                try:
+                    if op.delete:
+                        self._table().delete_item(Key={self.key_attr: key})
+                        self._cache.pop(key, None)
+                        self.counters["writes"] += 1
+                        if op.set:
+                            # escrito después del borrado: registro nuevo, no un merge
+                            self._store(key, None)
+                            self._write(key, op)
+                    else:
+                        self._write(key, op)
+                except bex.ClientError as e:
+                    logger.exception("State flush failed for %s: %s", key, e.response)
+                    failed[key] = op
+            # lo que falló queda para el próximo flush
+            for key, op in failed.items():
+                self._pending.setdefault(key, op)
+        return {"keys": len(pending), "failed": len(failed), **self.counters}
+
+
+def flush_all() -> None:
+    for state in list(_instances):
+        if state.dirty():
+            logger.info("State flush: %s", state.flush())
+
+
+def in_flush_scope() -> bool:
+    """True si hay un handler con @flush_after en curso (alguien vaciará el buffer)."""
+    return _scopes > 0
+
+
+def flush_after(handler):
+    """Decorador de handlers Lambda: vacía el estado diferido al terminar la invocación."""
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        global _scopes
+        with _scopes_lock:
+            _scopes += 1
+        try:
+            return handler(event, context)
+        finally:
+            with _scopes_lock:
+                _scopes -= 1
+            flush_all()
+
+    return wrapper
@@ -0,0 +1,121 @@
+"""Deduplicación de mensajes entrantes por id de WhatsApp (LRU local + DynamoDB)."""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import botocore.exceptions as bex
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+LOCAL_MAX = int(os.environ.get("DEDUP_LOCAL_MAX", "4096"))
+LOCAL_TTL_S = int(os.environ.get("DEDUP_LOCAL_TTL_S", "900"))
+# Meta reintenta webhooks hasta ~7 días
+REMOTE_TTL_S = int(os.environ.get("DEDUP_REMOTE_TTL_S", str(7 * 24 * 3600)))
+
+
+class LruTtl:
+    """Conjunto LRU acotado cuyas entradas expiran tras `ttl` segundos."""
+
+    def __init__(self, maxsize: int = LOCAL_MAX, ttl: float = LOCAL_TTL_S, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            exp = self._data.get(key)
+            if exp is None:
+                return False
+            if exp <= self._clock():
+                del self._data[key]
+                return False
+            self._data.move_to_end(key)
+            return True
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            self._data[key] = self._clock() + self.ttl
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class MessageDeduper:
+    """
+    `claim(msg_id)` devuelve True la primera vez que se ve un id y False para
+    duplicados. Primero consulta el LRU del contenedor; si no está, hace un
+    put condicional en DynamoDB (`attribute_not_exists(pk)`) con `ttl`.
+    Si DynamoDB falla se deja pasar el mensaje (fail-open).
+    """
+
+    def __init__(self, table=None, local: LruTtl | None = None, remote_ttl: int = REMOTE_TTL_S):
+        self.table = table
+        self.local = local or LruTtl()
+        self.remote_ttl = remote_ttl
+        self._lock = threading.Lock()
+        self.counters = {"local_hits": 0, "remote_hits": 0, "misses": 0, "remote_errors": 0}
+
+    @staticmethod
+    def _key(msg_id: str) -> dict:
+        return {"pk": f"INBOUND#{msg_id}", "sk": "INBOUND"}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def claim(self, msg_id: str) -> bool:
+        if not msg_id:
+            return True
+        if msg_id in self.local:
+            self._count("local_hits")
+            return False
+        if self.table is not None:
+            try:
+                self.table.put_item(
+                    Item={**self._key(msg_id), "ttl": int(time.time()) + self.remote_ttl},
+                    ConditionExpression="attribute_not_exists(pk)",
+                )
+            except bex.ClientError as e:
+                if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                    self.local.add(msg_id)
+                    self._count("remote_hits")
+                    return False
+                logger.warning("Dedup put failed for %s: %s", msg_id, e.response)
+                self._count("remote_errors")
+            except bex.BotoCoreError as e:
+                logger.warning("Dedup put failed for %s: %s", msg_id, e)
+                self._count("remote_errors")
+        self.local.add(msg_id)
+        self._count("misses")
+        return True
+
+    def release(self, msg_id: str) -> None:
+        """Olvida un id reclamado (p. ej. si no se pudo encolar) para aceptar el reintento."""
+        if not msg_id:
+            return
+        self.local.discard(msg_id)
+        if self.table is not None:
+            try:
+                self.table.delete_item(Key=self._key(msg_id))
+            except (bex.ClientError, bex.BotoCoreError) as e:
+                logger.warning("Dedup release failed for %s: %s", msg_id, e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            c = dict(self.counters)
+        hits = c["local_hits"] + c["remote_hits"]
+        total = hits + c["misses"]
+        c["hit_rate"] = round(hits / total, 4) if total else 0.0
+        return c
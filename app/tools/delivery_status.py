@@ -0,0 +1,180 @@
+"""
+Estados de entrega de WhatsApp (sent/delivered/read/failed) de los recordatorios.
+
+Al enviar, el dispatcher registra `WAMID#<wamid>` → (cita, hora, acción) y
+la transición `sent`. Los webhooks de estado se agrupan: se descartan repetidos
+por (wamid, estado), se resuelven los wamid con un BatchGetItem y las
+transiciones se escriben con BatchWriteItem (25 por llamada), así que una
+ráfaga de estados no cuesta una escritura por estado.
+
+Cada transición es su propio ítem `APPT#<id>` / `DLV#<hora>#<acción>#<estado>`: las
+escrituras son idempotentes y no dependen del orden en que Meta entrega los
+estados. El estado vigente de un recordatorio se deriva de las transiciones
+presentes (read > delivered > failed > sent); un "failed" de un wamid anterior
+al del "sent" vigente no cuenta: el recordatorio se reenvió después de fallar.
+"""
+import datetime as dt
+import logging
+import os
+import threading
+import time
+
+from .appointments_repo import appt_id_of, delivery_key, wamid_key
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Días que se conservan mapeos y transiciones antes de expirar por ttl
+KEEP_DAYS = int(os.environ.get("DELIVERY_KEEP_DAYS", "30"))
+STATUSES = ("sent", "delivered", "read", "failed")
+# Precedencia para el estado vigente: un "failed" posterior a "delivered" no lo anula
+PRECEDENCE = ("read", "delivered", "failed", "sent")
+
+
+def _iso(epoch: float) -> str:
+    return dt.datetime.fromtimestamp(epoch, dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def current_state(statuses, wamids: dict | None = None) -> str | None:
+    """
+    Estado vigente a partir del conjunto de transiciones registradas.
+    `wamids` ({estado: wamid}) descarta el "failed" de un envío anterior.
+    """
+    present = set(statuses)
+    sent_wamid = (wamids or {}).get("sent")
+    if "failed" in present and sent_wamid and wamids.get("failed") != sent_wamid:
+        present.discard("failed")
+    return next((s for s in PRECEDENCE if s in present), None)
+
+
+class DynamoDeliveryStore:
+    """Ítems en la tabla única a través de AppointmentsRepo (BatchGet/BatchWrite)."""
+
+    def __init__(self, repo):
+        self.repo = repo
+
+    def put_items(self, items: list[dict]) -> None:
+        self.repo.put_many(items)
+
+    def get_items(self, keys: list[dict]) -> list[dict]:
+        items, unprocessed = self.repo.batch_get_keys(keys)
+        if unprocessed:
+            logger.warning("Delivery lookup left %d keys unprocessed", len(unprocessed))
+        return items
+
+
+class MemoryDeliveryStore:
+    """Implementación en memoria (simulaciones y pruebas)."""
+
+    def __init__(self):
+        self.items: dict[tuple[str, str], dict] = {}
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def put_items(self, items: list[dict]) -> None:
+        with self._lock:
+            self.writes += 1
+            for item in items:
+                self.items[(item["pk"], item["sk"])] = dict(item)
+
+    def get_items(self, keys: list[dict]) -> list[dict]:
+        with self._lock:
+            hits = (self.items.get((k["pk"], k["sk"])) for k in keys)
+            return [dict(i) for i in hits if i]
+
+
+class DeliveryTracker:
+    def __init__(self, store, clock=time.time):
+        self.store = store
+        self._clock = clock
+
+    def _ttl(self) -> int:
+        return int(self._clock()) + KEEP_DAYS * 86400
+
+    def record_sent(self, sends: list[tuple[str, str, str, str]]) -> None:
+        """
+        `sends` = [(appointment_id, appt_time_iso, acción, wamid)] de los envíos
+        aceptados por Meta.
+        """
+        if not sends:
+            return
+        now, ttl = _iso(self._clock()), self._ttl()
+        items = []
+        for appt_id, appt_iso, action, wamid in sends:
+            items.append(
+                {
+                    **wamid_key(wamid),
+                    "wamid": wamid,
+                    "appointment_id": appt_id,
+                    "appt_time_iso": appt_iso,
+                    "action": action,
+                    "ttl": ttl,
+                }
+            )
+            items.append(
+                {
+                    **delivery_key(appt_id, appt_iso, action, "sent"),
+                    "wamid": wamid,
+                    "at": now,
+                    "ttl": ttl,
+                }
+            )
+        self.store.put_items(items)
+
+    def ingest(self, statuses) -> dict:
+        """
+        Escribe las transiciones de `statuses` (StatusUpdate) de mensajes
+        enviados por el dispatcher. Los wamid sin mapeo (respuestas libres,
+        avisos) se ignoran.
+        """
+        latest: dict[tuple[str, str], object] = {}
+        for st in statuses:
+            if st.id and st.status in STATUSES:
+                latest[(st.id, st.status)] = st
+        counts = {"received": len(statuses), "written": 0, "unmapped": 0}
+        if not latest:
+            return counts
+
+        wamids = list(dict.fromkeys(w for w, _ in latest))
+        mapping = {i["wamid"]: i for i in self.store.get_items([wamid_key(w) for w in wamids])}
+        ttl = self._ttl()
+        items = []
+        for (wamid, status), st in latest.items():
+            target = mapping.get(wamid)
+            if target is None:
+                counts["unmapped"] += 1
+                continue
+            item = {
+                **delivery_key(
+                    target["appointment_id"], target["appt_time_iso"], target["action"], status
+                ),
+                "wamid": wamid,
+                "at": _iso(int(st.timestamp))
+                if str(st.timestamp).isdigit()
+                else _iso(self._clock()),
+                "ttl": ttl,
+            }
+            if st.errors:
+                err = st.errors[0]
+                item["error"] = f"{err.get('code', '')} {err.get('title', '')}".strip()[:200]
+            items.append(item)
+        if items:
+            self.store.put_items(items)
+        counts["written"] = len(items)
+        return counts
+
+    def states(self, refs) -> dict[tuple[str, str, str], str | None]:
+        """
+        Estado vigente por (appointment_id, appt_time_iso, acción) con un solo
+        BatchGetItem por cada 25 recordatorios; None si nunca se envió.
+        """
+        refs = list(dict.fromkeys(refs))
+        if not refs:
+            return {}
+        keys = [delivery_key(*ref, s) for ref in refs for s in STATUSES]
+        found: dict[tuple[str, str, str], dict[str, str]] = {ref: {} for ref in refs}
+        for item in self.store.get_items(keys):
+            _, appt_iso, action, status = item["sk"].split("#")
+            ref = (appt_id_of(item["pk"]), appt_iso, action)
+            found.setdefault(ref, {})[status] = item.get("wamid")
+        return {ref: current_state(found[ref], found[ref]) for ref in refs}
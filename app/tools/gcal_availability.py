@@ -0,0 +1,174 @@
+"""
+Índice de disponibilidad del calendario.
+
+Los intervalos ocupados de una ventana móvil (ahora → +AVAIL_WINDOW_DAYS) se
+traen con una sola consulta freebusy y se guardan fusionados y ordenados, así
+que `is_free` es una búsqueda binaria. El índice se recarga al vencer el TTL o
+al quedar marcado como obsoleto: un evento creado por nosotros se agrega en
+local, pero mover o borrar uno lo marca obsoleto (freebusy devuelve bloques
+fusionados y no se puede restar con seguridad).
+"""
+import bisect
+import datetime as dt
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+WINDOW_DAYS = int(os.environ.get("AVAIL_WINDOW_DAYS", "30"))
+TTL_S = int(os.environ.get("AVAIL_TTL_S", "300"))
+SLOT_STEP_MIN = int(os.environ.get("AVAIL_SLOT_STEP_MIN", "30"))
+
+
+def to_epoch(value) -> float:
+    """ISO (con zona) o datetime → segundos epoch."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt.timezone.utc)
+    return value.timestamp()
+
+
+def to_iso(epoch: float) -> str:
+    return dt.datetime.fromtimestamp(epoch, dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class BusyIndex:
+    """Intervalos [start, end) disjuntos y ordenados (epoch)."""
+
+    def __init__(self, intervals=()):
+        self.starts: list[float] = []
+        self.ends: list[float] = []
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            elif end > start:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def overlaps(self, start: float, end: float) -> bool:
+        # primer intervalo que termina después de `start`
+        i = bisect.bisect_right(self.ends, start)
+        return i < len(self.starts) and self.starts[i] < end
+
+    def add(self, start: float, end: float) -> None:
+        lo = bisect.bisect_left(self.ends, start)
+        hi = bisect.bisect_right(self.starts, end)
+        if lo < hi:
+            start = min(start, self.starts[lo])
+            end = max(end, self.ends[hi - 1])
+        self.starts[lo:hi] = [start]
+        self.ends[lo:hi] = [end]
+
+    def gaps(self, start: float, end: float):
+        """Huecos libres dentro de [start, end)."""
+        cursor = start
+        i = bisect.bisect_right(self.ends, start)
+        while i < len(self.starts) and self.starts[i] < end:
+            if self.starts[i] > cursor:
+                yield cursor, self.starts[i]
+            cursor = max(cursor, self.ends[i])
+            i += 1
+        if cursor < end:
+            yield cursor, end
+
+
+class Availability:
+    """
+    `fetch(time_min_iso, time_max_iso) -> [(start_iso, end_iso), ...]` consulta
+    freebusy; consultas fuera de la ventana cacheada van directo a `fetch`.
+    """
+
+    def __init__(self, fetch, window_days: int = WINDOW_DAYS, ttl: float = TTL_S, clock=time.time):
+        self.fetch = fetch
+        self.window_s = window_days * 86400
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._index: BusyIndex | None = None
+        self._window = (0.0, 0.0)
+        self._loaded_at = 0.0
+        self._stale = True
+        self.counters = {"refreshes": 0, "hits": 0, "direct": 0}
+
+    def _load(self, start: float, end: float) -> BusyIndex:
+        busy = self.fetch(to_iso(start), to_iso(end))
+        return BusyIndex((to_epoch(s), to_epoch(e)) for s, e in busy)
+
+    def _current(self) -> BusyIndex:
+        now = self._clock()
+        with self._lock:
+            fresh = not self._stale and now - self._loaded_at < self.ttl
+            if fresh and self._index is not None:
+                return self._index
+        index = self._load(now, now + self.window_s)
+        with self._lock:
+            self._index, self._window = index, (now, now + self.window_s)
+            self._loaded_at, self._stale = now, False
+            self.counters["refreshes"] += 1
+        logger.info("Availability refreshed: %d busy blocks", len(index))
+        return index
+
+    def _lookup(self, start: float, end: float) -> BusyIndex | None:
+        """Índice cacheado si cubre [start, end); None si hay que ir directo."""
+        now = self._clock()
+        if start < now or end > now + self.window_s:
+            return None
+        index = self._current()
+        lo, hi = self._window
+        return index if lo <= start and end <= hi else None
+
+    def is_free(self, start_iso: str, end_iso: str) -> bool:
+        start, end = to_epoch(start_iso), to_epoch(end_iso)
+        index = self._lookup(start, end)
+        if index is None:
+            self.counters["direct"] += 1
+            index = self._load(start, end)
+        else:
+            self.counters["hits"] += 1
+        return not index.overlaps(start, end)
+
+    def find_free_slots(
+        self,
+        duration: dt.timedelta,
+        window: tuple[str, str],
+        step: dt.timedelta | None = None,
+        limit: int | None = None,
+    ) -> list[tuple[str, str]]:
+        """Slots libres de `duration` dentro de `window`, alineados a `step`."""
+        dur = duration.total_seconds()
+        step_s = (step or dt.timedelta(minutes=SLOT_STEP_MIN)).total_seconds()
+        w_start, w_end = to_epoch(window[0]), to_epoch(window[1])
+        index = self._lookup(w_start, w_end)
+        if index is None:
+            self.counters["direct"] += 1
+            index = self._load(w_start, w_end)
+        slots: list[tuple[str, str]] = []
+        for g_start, g_end in index.gaps(w_start, w_end):
+            # alinea al múltiplo de step desde el inicio de la ventana
+            t = w_start + -(-(g_start - w_start) // step_s) * step_s
+            while t + dur <= g_end:
+                slots.append((to_iso(t), to_iso(t + dur)))
+                if limit and len(slots) >= limit:
+                    return slots
+                t += step_s
+        return slots
+
+    def note_busy(self, start_iso: str, end_iso: str) -> None:
+        """Evento creado por nosotros: se agrega sin recargar."""
+        with self._lock:
+            if self._index is not None:
+                self._index.add(to_epoch(start_iso), to_epoch(end_iso))
+
+    def invalidate(self) -> None:
+        """Evento movido/borrado (o cambio externo): recarga en la próxima consulta."""
+        with self._lock:
+            self._stale = True
@@ -1,12 +1,14 @@
 import os
-import json
+import contextlib
+import contextvars
 import logging
-import boto3
+import threading
+from collections import OrderedDict
 from datetime import timezone
 from dateutil import parser as dtparser
 
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from .gcal_availability import Availability, BusyIndex, to_epoch
+from .secrets_cache import SECRETS
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -16,26 +18,88 @@ SECRET_NAME = os.environ.get("GCAL_SECRET_NAME", "pelvis/gcal/sa")
 CALENDAR_ID = os.environ.get("GCAL_CALENDAR_ID", "")
 TZ = os.environ.get("TZ", "America/Guayaquil")
 
-_sa_cache = None
-_svc_cache = None
+# Por nombre de secreto: (secreto del que salieron, credenciales/servicio);
+# se reconstruyen si el secreto rota
+_sa_cache: dict[str, tuple] = {}
+_svc_cache: dict[str, tuple] = {}
+# (calendar_id, secreto) del tenant en curso; None = los del entorno
+_active: contextvars.ContextVar = contextvars.ContextVar("gcal_active", default=None)
+
+# ETag conocido por evento (insert/patch): permite PATCH condicional sin GET previo
+ETAG_CACHE_MAX = int(os.environ.get("GCAL_ETAG_CACHE_MAX", "1024"))
+# Máximo de llamadas por lote HTTP de Calendar
+BATCH_MAX = 50
+_etags: OrderedDict[str, str] = OrderedDict()
+_etags_lock = threading.Lock()
+
+
+class EventChanged(Exception):
+    """El evento cambió en Calendar desde que lo vimos (If-Match → 412)."""
+
+    def __init__(self, event_id: str):
+        super().__init__(f"event {event_id} changed since last seen")
+        self.event_id = event_id
+
+
+def _remember_etag(event_id: str, etag: str | None) -> None:
+    with _etags_lock:
+        if not etag:
+            _etags.pop(event_id, None)
+            return
+        _etags[event_id] = etag
+        _etags.move_to_end(event_id)
+        while len(_etags) > ETAG_CACHE_MAX:
+            _etags.popitem(last=False)
+
+
+def _http_status(exc) -> int | None:
+    return getattr(getattr(exc, "resp", None), "status", None)
+
+
+def calendar_id() -> str:
+    active = _active.get()
+    return active[0] if active else CALENDAR_ID
+
+
+def _secret_name() -> str:
+    active = _active.get()
+    return active[1] if active else SECRET_NAME
+
+
+@contextlib.contextmanager
+def using_calendar(calendar: str | None = None, secret_name: str | None = None):
+    """Dentro del bloque, las llamadas usan el calendario/secreto dados (multi-tenant)."""
+    token = _active.set((calendar or CALENDAR_ID, secret_name or SECRET_NAME))
+    try:
+        yield
+    finally:
+        _active.reset(token)
 
 
 def _get_sa():
-    global _sa_cache
-    if _sa_cache:
-        return _sa_cache
-    sm = boto3.client("secretsmanager")
-    data = json.loads(sm.get_secret_value(SecretId=SECRET_NAME)["SecretString"])
-    _sa_cache = service_account.Credentials.from_service_account_info(data, scopes=SCOPES)
-    return _sa_cache
+    name = _secret_name()
+    data = SECRETS.get(name)
+    cached = _sa_cache.get(name)
+    if cached and cached[0] is data:
+        return cached[1]
+    from google.oauth2 import service_account
+
+    creds = service_account.Credentials.from_service_account_info(data, scopes=SCOPES)
+    _sa_cache[name] = (data, creds)
+    return creds
 
 
 def _svc():
-    global _svc_cache
-    if _svc_cache:
-        return _svc_cache
-    _svc_cache = build("calendar", "v3", credentials=_get_sa(), cache_discovery=False)
-    return _svc_cache
+    name = _secret_name()
+    creds = _get_sa()
+    cached = _svc_cache.get(name)
+    if cached and cached[0] is creds:
+        return cached[1]
+    from googleapiclient.discovery import build
+
+    svc = build("calendar", "v3", credentials=creds, cache_discovery=False)
+    _svc_cache[name] = (creds, svc)
+    return svc
 
 
 def iso_utc(s: str) -> str:
@@ -47,20 +111,75 @@ def iso_utc(s: str) -> str:
     return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
 
 
-def is_free(start_iso_utc: str, end_iso_utc: str) -> bool:
+def event_utc(s: str) -> str:
+    """Hora de evento (naive = zona TZ, como la interpreta Calendar) → ISO UTC."""
+    d = dtparser.isoparse(s)
+    if d.tzinfo is None:
+        from zoneinfo import ZoneInfo
+
+        d = d.replace(tzinfo=ZoneInfo(TZ))
+    return d.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _freebusy(time_min: str, time_max: str) -> list[tuple[str, str]]:
     body = {
-        "timeMin": start_iso_utc,
-        "timeMax": end_iso_utc,
+        "timeMin": time_min,
+        "timeMax": time_max,
         "timeZone": TZ,
-        "items": [{"id": CALENDAR_ID}],
+        "items": [{"id": calendar_id()}],
     }
     resp = _svc().freebusy().query(body=body).execute()
-    busy = resp["calendars"][CALENDAR_ID].get("busy", [])
-    return len(busy) == 0
+    return [(b["start"], b["end"]) for b in resp["calendars"][calendar_id()].get("busy", [])]
 
 
-def create_event(
-    summary: str, start_iso: str, end_iso: str, description: str, attendee_email: str | None = None
+# Intervalos ocupados de la ventana móvil (una consulta freebusy por TTL)
+AVAILABILITY = Availability(_freebusy)
+# Índices de ocupados de los calendarios de otros tenants (ver using_calendar)
+_tenant_availability: dict[str, Availability] = {}
+
+
+def _availability() -> Availability:
+    active = _active.get()
+    if not active or active[0] == CALENDAR_ID:
+        return AVAILABILITY
+    av = _tenant_availability.get(active[0])
+    if av is None:
+        av = _tenant_availability.setdefault(active[0], Availability(_freebusy))
+    return av
+
+
+def busy_between(time_min: str, time_max: str) -> BusyIndex:
+    """Índice de ocupados de [time_min, time_max) con una sola consulta freebusy."""
+    return BusyIndex((to_epoch(a), to_epoch(b)) for a, b in _freebusy(time_min, time_max))
+
+
+def is_free(start_iso_utc: str, end_iso_utc: str, live: bool = False) -> bool:
+    """
+    Con el índice cacheado (hasta su TTL) para búsquedas de slots. Con `live`
+    consulta freebusy en el momento: antes de crear un evento, porque el índice
+    no ve lo que se agendó por fuera (a mano o desde otro contenedor).
+    """
+    if not live:
+        return _availability().is_free(start_iso_utc, end_iso_utc)
+    start, end = to_epoch(start_iso_utc), to_epoch(end_iso_utc)
+    if busy_between(start_iso_utc, end_iso_utc).overlaps(start, end):
+        _availability().invalidate()  # el índice estaba desactualizado
+        return False
+    return True
+
+
+def find_free_slots(duration, window: tuple[str, str], step=None, limit: int | None = None):
+    """Slots libres (start, end) ISO UTC de `duration` (timedelta) dentro de `window`."""
+    return _availability().find_free_slots(duration, window, step=step, limit=limit)
+
+
+def _event_body(
+    summary: str,
+    start_iso: str,
+    end_iso: str,
+    description: str,
+    attendee_email: str | None = None,
+    appointment_id: str | None = None,
 ) -> dict:
     event = {
         "summary": summary,
@@ -70,23 +189,197 @@ def create_event(
     }
     if attendee_email:
         event["attendees"] = [{"email": attendee_email}]
+    if appointment_id:
+        # vínculo evento → fila APPT# para la sincronización incremental
+        event["extendedProperties"] = {"private": {"appointment_id": appointment_id}}
+    return event
+
+
+def create_event(
+    summary: str,
+    start_iso: str,
+    end_iso: str,
+    description: str,
+    attendee_email: str | None = None,
+    appointment_id: str | None = None,
+) -> dict:
+    event = _event_body(summary, start_iso, end_iso, description, attendee_email, appointment_id)
     created = (
-        _svc().events().insert(calendarId=CALENDAR_ID, body=event, sendUpdates="all").execute()
+        _svc().events().insert(calendarId=calendar_id(), body=event, sendUpdates="all").execute()
     )
+    _remember_etag(created["id"], created.get("etag"))
+    _availability().note_busy(event_utc(start_iso), event_utc(end_iso))
     return {"id": created["id"], "htmlLink": created.get("htmlLink")}
 
 
-def update_event(event_id: str, **fields) -> dict:
-    ev = _svc().events().get(calendarId=CALENDAR_ID, eventId=event_id).execute()
-    ev.update(fields)
-    updated = (
+def _execute_batched(requests: list) -> list[tuple[dict | None, Exception | None]]:
+    """Ejecuta requests en lotes HTTP de Calendar; (respuesta, excepción) por request."""
+    out: list[tuple[dict | None, Exception | None]] = [(None, None)] * len(requests)
+
+    def _callback(request_id, response, exception):
+        out[int(request_id)] = (response, exception)
+
+    for start in range(0, len(requests), BATCH_MAX):
+        batch = _svc().new_batch_http_request(callback=_callback)
+        for i in range(start, min(start + BATCH_MAX, len(requests))):
+            batch.add(requests[i], request_id=str(i))
+        batch.execute()
+    return out
+
+
+def create_many(events: list[dict]) -> list[dict]:
+    """
+    Inserta varios eventos (kwargs de create_event) en lotes HTTP. Devuelve
+    {"id", "htmlLink", "ok": True} o {"ok": False, "status", "error"} por evento.
+    """
+    reqs = [
+        _svc().events().insert(calendarId=calendar_id(), body=_event_body(**ev), sendUpdates="all")
+        for ev in events
+    ]
+    results = []
+    for ev, (created, exc) in zip(events, _execute_batched(reqs)):
+        if exc is not None:
+            results.append({"ok": False, "status": _http_status(exc), "error": str(exc)})
+            continue
+        _remember_etag(created["id"], created.get("etag"))
+        _availability().note_busy(event_utc(ev["start_iso"]), event_utc(ev["end_iso"]))
+        results.append({"id": created["id"], "htmlLink": created.get("htmlLink"), "ok": True})
+    return results
+
+
+def _patch_request(event_id: str, fields: dict):
+    """PATCH solo con los campos cambiados; If-Match si conocemos el ETag."""
+    req = (
         _svc()
         .events()
-        .update(calendarId=CALENDAR_ID, eventId=event_id, body=ev, sendUpdates="all")
-        .execute()
+        .patch(
+            calendarId=calendar_id(),
+            eventId=event_id,
+            body=fields,
+            sendUpdates="all",
+            fields="id,etag",
+        )
     )
+    etag = _etags.get(event_id)
+    if etag:
+        req.headers["If-Match"] = etag
+    return req
+
+
+def update_event(event_id: str, **fields) -> dict:
+    """Lanza EventChanged si el evento se modificó desde el último ETag visto."""
+    from googleapiclient.errors import HttpError
+
+    try:
+        updated = _patch_request(event_id, fields).execute()
+    except HttpError as e:
+        if _http_status(e) == 412:
+            _remember_etag(event_id, None)
+            raise EventChanged(event_id) from e
+        raise
+    _remember_etag(updated["id"], updated.get("etag"))
+    if "start" in fields or "end" in fields:
+        _availability().invalidate()
     return {"id": updated["id"]}
 
 
+def update_many(updates: list[tuple[str, dict]]) -> list[dict]:
+    """
+    Varios PATCH en lotes HTTP de Calendar (hasta BATCH_MAX por lote). Devuelve
+    un resultado por actualización, en orden: {"id", "ok"} o {"id", "ok": False,
+    "error", "status"} ("event_changed" ante 412).
+    """
+    reqs = [_patch_request(event_id, fields) for event_id, fields in updates]
+    results = []
+    for (event_id, _), (response, exc) in zip(updates, _execute_batched(reqs)):
+        if exc is None:
+            _remember_etag(event_id, response.get("etag"))
+            results.append({"id": event_id, "ok": True})
+            continue
+        status = _http_status(exc)
+        if status == 412:
+            _remember_etag(event_id, None)
+        results.append(
+            {
+                "id": event_id,
+                "ok": False,
+                "status": status,
+                "error": "event_changed" if status == 412 else str(exc),
+            }
+        )
+
+    if any("start" in f or "end" in f for _, f in updates):
+        _availability().invalidate()
+    return results
+
+
 def delete_event(event_id: str) -> None:
-    _svc().events().delete(calendarId=CALENDAR_ID, eventId=event_id, sendUpdates="all").execute()
+    _svc().events().delete(calendarId=calendar_id(), eventId=event_id, sendUpdates="all").execute()
+    _remember_etag(event_id, None)
+    _availability().invalidate()
+
+
+def delete_many(event_ids: list[str]) -> list[dict]:
+    """Borra varios eventos en lotes HTTP; uno ya borrado (404/410) cuenta como ok."""
+    reqs = [
+        _svc().events().delete(calendarId=calendar_id(), eventId=eid, sendUpdates="all")
+        for eid in event_ids
+    ]
+    results = []
+    for eid, (_, exc) in zip(event_ids, _execute_batched(reqs)):
+        status = _http_status(exc) if exc is not None else None
+        if exc is None or status in (404, 410):
+            _remember_etag(eid, None)
+            results.append({"id": eid, "ok": True})
+        else:
+            results.append({"id": eid, "ok": False, "status": status, "error": str(exc)})
+    if event_ids:
+        _availability().invalidate()
+    return results
+
+
+# ===== Sincronización incremental (events.list + syncToken) =====
+SYNC_PAGE_SIZE = int(os.environ.get("GCAL_SYNC_PAGE_SIZE", "250"))
+
+
+class SyncTokenExpired(Exception):
+    """Calendar respondió 410: el syncToken ya no sirve y hay que sincronizar completo."""
+
+
+class EventChanges:
+    """
+    Eventos cambiados desde `sync_token` (todos los vigentes si es None),
+    recorriendo las páginas de events.list a medida que se consumen. Al agotar
+    el iterador, `next_sync_token` tiene el token de la próxima corrida.
+    """
+
+    def __init__(self, sync_token: str | None = None, page_size: int = SYNC_PAGE_SIZE):
+        self.sync_token = sync_token
+        self.page_size = page_size
+        self.next_sync_token: str | None = None
+        self.pages = 0
+
+    def __iter__(self):
+        from googleapiclient.errors import HttpError
+
+        params = {"calendarId": calendar_id(), "maxResults": self.page_size}
+        if self.sync_token:
+            params["syncToken"] = self.sync_token
+        page_token = None
+        while True:
+            try:
+                resp = _svc().events().list(pageToken=page_token, **params).execute()
+            except HttpError as e:
+                if getattr(e.resp, "status", None) == 410:
+                    raise SyncTokenExpired() from e
+                raise
+            self.pages += 1
+            yield from resp.get("items", [])
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                self.next_sync_token = resp.get("nextSyncToken")
+                return
+
+
+def appointment_id_of(event: dict) -> str | None:
+    return ((event.get("extendedProperties") or {}).get("private") or {}).get("appointment_id")
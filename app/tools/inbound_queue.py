@@ -0,0 +1,114 @@
+"""Cola de mensajes entrantes del webhook (SQS o stand-in local para pruebas offline)."""
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import deque
+from pathlib import Path
+
+from . import aws_clients
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+QUEUE_URL = os.environ.get("INBOUND_QUEUE_URL", "")
+LOCAL_PATH = os.environ.get("INBOUND_QUEUE_LOCAL_PATH", "")
+
+SQS_BATCH_MAX = 10
+
+
+def to_sqs_event(bodies: list[tuple[str, str]]) -> dict:
+    """Arma un evento con la forma de SQS → Lambda a partir de (messageId, body)."""
+    return {
+        "Records": [
+            {"messageId": mid, "body": body, "eventSource": "aws:sqs"} for mid, body in bodies
+        ]
+    }
+
+
+class SqsQueue:
+    def __init__(self, url: str, client=None):
+        self.url = url
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = aws_clients.client("sqs")
+        return self._client
+
+    def send_batch(self, records: list[dict]) -> int:
+        """Encola `records` en lotes de 10. Lanza si alguna entrada falla."""
+        for start in range(0, len(records), SQS_BATCH_MAX):
+            chunk = records[start : start + SQS_BATCH_MAX]
+            entries = [
+                {"Id": str(i), "MessageBody": json.dumps(rec, ensure_ascii=False)}
+                for i, rec in enumerate(chunk)
+            ]
+            resp = self.client.send_message_batch(QueueUrl=self.url, Entries=entries)
+            failed = resp.get("Failed") or []
+            if failed:
+                raise RuntimeError(f"SQS send_message_batch failed: {failed}")
+        return len(records)
+
+
+class LocalQueue:
+    """
+    Cola en memoria; si se pasa `path`, persiste en un archivo JSONL para poder
+    encolar desde un proceso y consumir desde otro.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = Path(path) if path else None
+        self._items: deque[tuple[str, str]] = deque()
+        self._lock = threading.Lock()
+
+    def send_batch(self, records: list[dict]) -> int:
+        lines = [(uuid.uuid4().hex, json.dumps(rec, ensure_ascii=False)) for rec in records]
+        with self._lock:
+            if self.path:
+                with self.path.open("a", encoding="utf-8") as f:
+                    for mid, body in lines:
+                        f.write(json.dumps({"messageId": mid, "body": body}) + "\n")
+            else:
+                self._items.extend(lines)
+        return len(records)
+
+    def receive(self, max_messages: int = SQS_BATCH_MAX) -> dict:
+        """Saca hasta `max_messages` y los devuelve como evento SQS."""
+        with self._lock:
+            if self.path:
+                if not self.path.exists():
+                    return to_sqs_event([])
+                rows = [
+                    json.loads(line)
+                    for line in self.path.read_text(encoding="utf-8").splitlines()
+                    if line
+                ]
+                taken, rest = rows[:max_messages], rows[max_messages:]
+                self.path.write_text(
+                    "".join(json.dumps(r) + "\n" for r in rest), encoding="utf-8"
+                )
+                return to_sqs_event([(r["messageId"], r["body"]) for r in taken])
+            taken = [self._items.popleft() for _ in range(min(max_messages, len(self._items)))]
+            return to_sqs_event(taken)
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self.path:
+                if not self.path.exists():
+                    return 0
+                return sum(1 for line in self.path.read_text(encoding="utf-8").splitlines() if line)
+            return len(self._items)
+
+
+_queue = None
+
+
+def get_queue():
+    """SQS si hay INBOUND_QUEUE_URL; si no, cola local (archivo o memoria)."""
+    global _queue
+    if _queue is None:
+        _queue = SqsQueue(QUEUE_URL) if QUEUE_URL else LocalQueue(LOCAL_PATH or None)
+    return _queue
@@ -0,0 +1,247 @@
+"""
+Cola de envíos salientes a la Graph API con límite de ritmo, reintentos y dead-letter.
+
+Cada phone_number_id tiene un token bucket (WA_RATE_PER_S mensajes/s con
+ráfagas de hasta WA_BURST): una tanda de recordatorios a la hora en punto se
+reparte en el tiempo en lugar de chocar con el límite de Meta. Los 429, 5xx,
+fallos al conectar y los códigos de throttling de Meta se reintentan con
+backoff exponencial con jitter, sin pasar de WA_RETRY_BUDGET_S por envío (por
+debajo del timeout de la Lambda). Un error de red después de escribir la
+petición no se reintenta: el POST no es idempotente y Meta pudo haberlo
+entregado. Lo que agota los intentos, o falla de forma definitiva (400 por
+número inválido, plantilla inexistente...), va al dead-letter store con el
+payload para reenviarlo o revisarlo después.
+
+El orden por destinatario y el paralelismo entre destinatarios los mantiene
+`wa_sender.send_many`.
+"""
+import datetime as dt
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+
+from . import wa_sender
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Meta admite ~80 mensajes/s por número en el tier estándar
+RATE_PER_S = float(os.environ.get("WA_RATE_PER_S", "40"))
+BURST = int(os.environ.get("WA_BURST", "20"))
+SEND_ATTEMPTS = int(os.environ.get("WA_SEND_ATTEMPTS", "4"))
+RETRY_MAX_S = float(os.environ.get("WA_RETRY_MAX_S", "8"))
+# Tiempo total de reintentos por envío (el timeout de las Lambdas es 10 s)
+RETRY_BUDGET_S = float(os.environ.get("WA_RETRY_BUDGET_S", "5"))
+# Días que se conservan los envíos fallidos en el dead-letter store
+DLQ_KEEP_DAYS = 14
+
+# Errores de Meta que indican throttling o falla temporal (aunque vengan con 400)
+RETRYABLE_META_CODES = {4, 80007, 130429, 131000, 131016, 131056, 133004}
+
+
+def _meta_code(res: dict) -> int | None:
+    try:
+        return int(json.loads(res.get("error") or "{}")["error"]["code"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def is_retryable(res: dict) -> bool:
+    """Resultado de `post` que vale la pena reintentar."""
+    if res.get("ok"):
+        return False
+    status = res.get("status")
+    if status is None:  # red: solo si la petición no llegó a escribirse
+        return bool(res.get("connect_error"))
+    return status == 429 or status >= 500 or _meta_code(res) in RETRYABLE_META_CODES
+
+
+class TokenBucket:
+    """
+    `acquire()` reserva un token y duerme lo necesario. El saldo puede quedar
+    negativo: cada hilo espera su turno sin sostener el lock mientras duerme.
+    """
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(burst)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+# ===== Dead-letter =====
+class DynamoDeadLetters:
+    """Ítems `OUTBOUND#DLQ` / `<iso>#<uuid>` en la tabla única (expiran por ttl)."""
+
+    PK = "OUTBOUND#DLQ"
+
+    def __init__(self, table, clock=time.time):
+        self.table = table
+        self._clock = clock
+
+    def put(self, payload: dict, result: dict, attempts: int, phone_number_id: str) -> None:
+        now = self._clock()
+        iso = dt.datetime.fromtimestamp(now, dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        self.table.put_item(
+            Item={
+                "pk": self.PK,
+                "sk": f"{iso}#{uuid.uuid4().hex}",
+                "payload": json.dumps(payload, ensure_ascii=False),
+                "status": result.get("status") or 0,
+                "error": str(result.get("error"))[:1000],
+                "attempts": attempts,
+                "phone_number_id": phone_number_id,
+                "ttl": int(now) + DLQ_KEEP_DAYS * 86400,
+            }
+        )
+
+    def pending(self, limit: int = 100) -> list[dict]:
+        from boto3.dynamodb.conditions import Key
+
+        resp = self.table.query(KeyConditionExpression=Key("pk").eq(self.PK), Limit=limit)
+        return resp.get("Items", [])
+
+
+class MemoryDeadLetters:
+    """Implementación en memoria (simulaciones y pruebas)."""
+
+    def __init__(self):
+        self.items: list[dict] = []
+        self._lock = threading.Lock()
+
+    def put(self, payload: dict, result: dict, attempts: int, phone_number_id: str) -> None:
+        with self._lock:
+            self.items.append(
+                {
+                    "payload": payload,
+                    "status": result.get("status"),
+                    "error": result.get("error"),
+                    "attempts": attempts,
+                    "phone_number_id": phone_number_id,
+                }
+            )
+
+    def pending(self, limit: int = 100) -> list[dict]:
+        return self.items[:limit]
+
+
+def default_dead_letters():
+    """Dead-letter en la tabla única si hay DDB_TABLE; si no, solo en memoria."""
+    table_name = os.environ.get("OUTBOUND_DLQ_TABLE") or os.environ.get("DDB_TABLE", "")
+    if not table_name:
+        return MemoryDeadLetters()
+    from .aws_clients import lazy_table
+
+    return DynamoDeadLetters(lazy_table(table_name))
+
+
+# ===== Cola =====
+class OutboundQueue:
+    """
+    `post(payload) -> dict` es el envío crudo ({"ok", "status", "error", ...});
+    la cola le agrega ritmo por número, reintentos y dead-letter.
+    """
+
+    def __init__(
+        self,
+        post,
+        dead_letters=None,
+        rate: float = RATE_PER_S,
+        burst: int = BURST,
+        attempts: int = SEND_ATTEMPTS,
+        retry_max_s: float = RETRY_MAX_S,
+        retry_budget_s: float = RETRY_BUDGET_S,
+        sleep=time.sleep,
+        clock=time.monotonic,
+    ):
+        self.post = post
+        self.dead_letters = dead_letters if dead_letters is not None else MemoryDeadLetters()
+        self.rate = rate
+        self.burst = burst
+        self.attempts = attempts
+        self.retry_max_s = retry_max_s
+        self.retry_budget_s = retry_budget_s
+        self._sleep = sleep
+        self._clock = clock
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self.counters = {"sent": 0, "retries": 0, "throttled": 0, "dead_lettered": 0}
+
+    def bucket(self, phone_number_id: str) -> TokenBucket:
+        with self._lock:
+            b = self._buckets.get(phone_number_id)
+            if b is None:
+                b = self._buckets[phone_number_id] = TokenBucket(
+                    self.rate, self.burst, sleep=self._sleep
+                )
+            return b
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.counters[key] += 1
+
+    def _attempt(self, payload: dict, bucket: TokenBucket) -> dict:
+        bucket.acquire()
+        try:
+            res = self.post(payload)
+        except Exception as e:  # noqa: BLE001 - un envío que explota va igual al dead-letter
+            logger.exception("WA send to %s failed: %s", payload.get("to"), e)
+            return {"ok": False, "error": str(e)}
+        if res.get("status") == 429:
+            self._count("throttled")
+        return res
+
+    def send(self, payload: dict, phone_number_id: str) -> dict:
+        bucket = self.bucket(phone_number_id)
+        deadline = self._clock() + self.retry_budget_s
+        attempts = 1
+        res = self._attempt(payload, bucket)
+        while attempts < self.attempts and is_retryable(res):
+            wait = random.uniform(0, min(self.retry_max_s, 0.25 * 2**attempts))
+            if self._clock() + wait > deadline:
+                logger.warning("WA send to %s: retry budget exhausted", payload.get("to"))
+                break
+            self._count("retries")
+            logger.warning(
+                "WA send to %s retry %d after status %s",
+                payload.get("to"),
+                attempts,
+                res.get("status"),
+            )
+            self._sleep(wait)
+            attempts += 1
+            res = self._attempt(payload, bucket)
+        if res.get("ok"):
+            self._count("sent")
+            return res
+
+        self._count("dead_lettered")
+        try:
+            self.dead_letters.put(payload, res, attempts, phone_number_id)
+        except Exception as e:  # noqa: BLE001 - el resultado igual vuelve al llamador
+            logger.exception("Dead-letter write failed for %s: %s", payload.get("to"), e)
+        return {**res, "dead_lettered": True, "attempts": attempts}
+
+    def send_many(self, payloads: list[dict], phone_number_id: str, on_result=None) -> list[dict]:
+        """Como `wa_sender.send_many`, pasando cada envío por `send`."""
+        return wa_sender.send_many(
+            payloads, lambda p: self.send(p, phone_number_id), on_result=on_result
+        )
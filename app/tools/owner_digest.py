@@ -0,0 +1,255 @@
+"""
+Avisos a la propietaria agrupados en resúmenes por ventana de tiempo.
+
+Cada aviso (`owner_notice`) lleva un tipo: los tipos prioritarios (por defecto
+solo "escalation") salen de inmediato como plantilla individual; el resto se
+guarda en un buffer (`OWNER#DIGEST` / `N#<iso>#<id>` en la tabla única) y un
+flusher programado cada OWNER_DIGEST_WINDOW_MIN minutos envía una sola
+plantilla con el resumen de la ventana. Con OWNER_NOTIFY_MODE=immediate todo
+sale de inmediato, como antes.
+
+Si el buffer no se puede escribir, los avisos salen de inmediato (mejor un
+aviso de más que uno perdido). Si el envío del resumen falla, los avisos se
+quedan en el buffer para la próxima ventana.
+"""
+import datetime as dt
+import logging
+import os
+import threading
+import time
+import uuid
+
+import botocore.exceptions as bex
+
+from .whatsapp_owner import owner_template_payload, send_many
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# "digest": agrupa los avisos no prioritarios; "immediate": uno por aviso
+MODE = os.environ.get("OWNER_NOTIFY_MODE", "immediate")
+WINDOW_MIN = int(os.environ.get("OWNER_DIGEST_WINDOW_MIN", "15"))
+IMMEDIATE_KINDS = frozenset(
+    k.strip() for k in os.environ.get("OWNER_IMMEDIATE_KINDS", "escalation").split(",") if k.strip()
+)
+# Parámetro de plantilla: WhatsApp rechaza textos largos y saltos de línea
+DIGEST_MAX_CHARS = int(os.environ.get("OWNER_DIGEST_MAX_CHARS", "900"))
+
+BUFFER_PK = "OWNER#DIGEST"
+STATS_KEY = {"pk": BUFFER_PK, "sk": "STATS"}
+# Un aviso sin enviar se descarta a los 3 días
+KEEP_DAYS = 3
+
+KIND_LABELS = {
+    "inbound": "mensajes",
+    "confirmed": "confirmadas",
+    "created": "agendadas",
+    "updated": "actualizadas",
+    "cancelled": "canceladas",
+    "escalation": "sin confirmar",
+}
+
+
+def owner_notice(kind: str, paciente: str, fecha_hora: str, estado: str) -> dict:
+    return {"kind": kind, "paciente": paciente, "fecha_hora": fecha_hora, "estado": estado}
+
+
+def _payload(notice: dict, build=owner_template_payload) -> dict:
+    return build(notice["paciente"], notice["fecha_hora"], notice["estado"])
+
+
+def _iso(epoch: float) -> str:
+    return dt.datetime.fromtimestamp(epoch, dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def digest_payload(notices: list[dict], build=owner_template_payload) -> dict:
+    """Una plantilla owner_alert que resume `notices` (en orden de llegada)."""
+    counts: dict[str, int] = {}
+    for n in notices:
+        counts[n["kind"]] = counts.get(n["kind"], 0) + 1
+    summary = ", ".join(f"{c} {KIND_LABELS.get(k, k)}" for k, c in counts.items())
+    estado = summary
+    for shown, n in enumerate(notices):
+        line = f"{n['paciente']}: {n['estado']}".replace("\n", " ")
+        rest = len(notices) - shown - 1
+        tail = f" · (+{rest})" if rest else ""
+        sep = " | " if shown == 0 else " · "
+        if len(estado) + len(sep) + len(line) + len(tail) > DIGEST_MAX_CHARS:
+            estado += f" · (+{rest + 1})"
+            break
+        estado += sep + line
+    times = [n["at"] for n in notices if n.get("at")]
+    window = f"{min(times)} – {max(times)}" if times else "N/A"
+    return build(f"Resumen: {len(notices)} avisos", window, estado)
+
+
+class DynamoDigestBuffer:
+    """Buffer sobre la tabla única; una partición (el volumen es de avisos a una persona)."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def put_many(self, notices: list[dict], now: float) -> None:
+        at = _iso(now)
+        with self.table.batch_writer() as bw:
+            for n in notices:
+                bw.put_item(
+                    Item={
+                        "pk": BUFFER_PK,
+                        "sk": f"N#{at}#{uuid.uuid4().hex[:12]}",
+                        "at": at,
+                        "ttl": int(now) + KEEP_DAYS * 86400,
+                        **n,
+                    }
+                )
+
+    def pending(self, until_iso: str) -> list[dict]:
+        from boto3.dynamodb.conditions import Key
+
+        items, kwargs = [], {}
+        while True:
+            resp = self.table.query(
+                KeyConditionExpression=Key("pk").eq(BUFFER_PK)
+                & Key("sk").between("N#", f"N#{until_iso}~"),
+                ConsistentRead=True,
+                **kwargs,
+            )
+            items.extend(resp.get("Items", []))
+            if "LastEvaluatedKey" not in resp:
+                return items
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    def delete(self, items: list[dict]) -> None:
+        with self.table.batch_writer() as bw:
+            for item in items:
+                bw.delete_item(Key={"pk": item["pk"], "sk": item["sk"]})
+
+    def add_counters(self, counts: dict[str, int]) -> None:
+        counts = {k: v for k, v in counts.items() if v}
+        if not counts:
+            return
+        names = {f"#c{i}": k for i, k in enumerate(counts)}
+        self.table.update_item(
+            Key=STATS_KEY,
+            UpdateExpression="ADD " + ", ".join(f"#c{i} :c{i}" for i in range(len(counts))),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues={f":c{i}": v for i, v in enumerate(counts.values())},
+        )
+
+
+class MemoryDigestBuffer:
+    """Implementación en memoria (pruebas)."""
+
+    def __init__(self):
+        self.items: list[dict] = []
+        self.stats: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def put_many(self, notices: list[dict], now: float) -> None:
+        at = _iso(now)
+        with self._lock:
+            for n in notices:
+                self._seq += 1
+                self.items.append(
+                    {"pk": BUFFER_PK, "sk": f"N#{at}#{self._seq:012d}", "at": at, **n}
+                )
+
+    def pending(self, until_iso: str) -> list[dict]:
+        with self._lock:
+            return sorted(
+                (dict(i) for i in self.items if i["sk"] <= f"N#{until_iso}~"),
+                key=lambda i: i["sk"],
+            )
+
+    def delete(self, items: list[dict]) -> None:
+        gone = {i["sk"] for i in items}
+        with self._lock:
+            self.items = [i for i in self.items if i["sk"] not in gone]
+
+    def add_counters(self, counts: dict[str, int]) -> None:
+        with self._lock:
+            for k, v in counts.items():
+                self.stats[k] = self.stats.get(k, 0) + v
+
+
+class OwnerNotifier:
+    """
+    `submit(notices)` decide qué sale ya (devuelve los payloads, para que el
+    llamador los mande junto con sus otros envíos) y qué va al buffer;
+    `notify(notices)` además los envía. `flush()` lo llama el flusher.
+    `build(paciente, fecha_hora, estado)` arma la plantilla (propietaria del tenant).
+    """
+
+    def __init__(
+        self,
+        buffer,
+        send=None,
+        mode: str = MODE,
+        immediate_kinds=IMMEDIATE_KINDS,
+        clock=time.time,
+        build=owner_template_payload,
+    ):
+        self.buffer = buffer
+        self.send = send or send_many
+        self.build = build
+        self.mode = mode
+        self.immediate_kinds = frozenset(immediate_kinds)
+        self._clock = clock
+        self.counters = {"immediate": 0, "buffered": 0, "fallback": 0}
+
+    def is_immediate(self, notice: dict) -> bool:
+        return self.mode != "digest" or notice["kind"] in self.immediate_kinds
+
+    def submit(self, notices: list[dict]) -> list[dict]:
+        now_list = [n for n in notices if self.is_immediate(n)]
+        later = [n for n in notices if not self.is_immediate(n)]
+        if later:
+            try:
+                self.buffer.put_many(later, self._clock())
+                self.counters["buffered"] += len(later)
+            except bex.ClientError as e:
+                logger.warning("Owner digest buffer write failed, sending now: %s", e.response)
+                self.counters["fallback"] += len(later)
+                now_list.extend(later)
+        self.counters["immediate"] += len(now_list)
+        if now_list and self.mode == "digest":
+            try:
+                self.buffer.add_counters({"immediate": len(now_list)})
+            except bex.ClientError as e:
+                logger.warning("Owner digest counters update failed: %s", e.response)
+        return [_payload(n, self.build) for n in now_list]
+
+    def notify(self, notices: list[dict]) -> list[dict]:
+        payloads = self.submit(notices)
+        results = self.send(payloads) if payloads else []
+        for res in results:
+            if not res.get("ok"):
+                logger.error("Owner notice failed: %s", res)
+        return results
+
+    def flush(self) -> dict:
+        """Envía un resumen con todo lo acumulado hasta ahora y vacía el buffer."""
+        t0 = time.perf_counter()
+        items = self.buffer.pending(_iso(self._clock()))
+        if not items:
+            return {"ok": True, "coalesced": 0, "digests": 0}
+        # Un único aviso sale tal cual: no hay nada que resumir
+        if len(items) == 1:
+            payload = _payload(items[0], self.build)
+        else:
+            payload = digest_payload(items, self.build)
+        res = self.send([payload])[0]
+        if not res.get("ok"):
+            logger.error("Owner digest send failed (%d kept): %s", len(items), res)
+            return {"ok": False, "coalesced": 0, "digests": 0, "pending": len(items)}
+        self.buffer.delete(items)
+        self.buffer.add_counters({"coalesced": len(items), "digests": 1})
+        stats = {
+            "ok": True,
+            "coalesced": len(items),
+            "digests": 1,
+            "seconds": round(time.perf_counter() - t0, 3),
+        }
+        logger.info("Owner digest sent: %s", stats)
+        return stats
@@ -0,0 +1,212 @@
+"""
+Motor de recordatorios por buckets de tiempo (alternativa a un schedule por recordatorio).
+
+Cada recordatorio es un ítem `APPT#<id>` / `REM#<action>` con `gsi2pk =
+REMBUCKET#<YYYYmmddHHMM>` (minuto en que vence). El índice es disperso: al
+despachar se eliminan gsi2pk/gsi2sk, así que un bucket solo contiene
+pendientes. Un único sweeper recurrente recorre los buckets desde su marca de
+agua hasta el último minuto completo y despacha en lotes, así que nada sale
+antes de su hora (a lo sumo ~1 min después).
+
+Entrega al menos una vez: un recordatorio solo sale del índice después de
+despacharse con éxito; si falla, se mueve al bucket siguiente; si el sweeper
+muere antes de avanzar la marca de agua, el próximo barrido repite los buckets.
+"""
+import datetime as dt
+import logging
+import threading
+import time
+
+import botocore.exceptions as bex
+
+from .appointments_repo import reminder_key
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BUCKET_FMT = "%Y%m%d%H%M"
+GSI = "gsi2"
+STATE_KEY = {"pk": "SWEEPER#STATE", "sk": "SWEEPER#STATE"}
+# Días que se conservan los ítems REM# ya enviados antes de expirar por ttl
+KEEP_DAYS = 7
+
+
+def bucket_of(when: dt.datetime) -> str:
+    return when.astimezone(dt.timezone.utc).strftime(BUCKET_FMT)
+
+
+def parse_bucket(bucket: str) -> dt.datetime:
+    return dt.datetime.strptime(bucket, BUCKET_FMT).replace(tzinfo=dt.timezone.utc)
+
+
+def next_bucket(bucket: str) -> str:
+    return bucket_of(parse_bucket(bucket) + dt.timedelta(minutes=1))
+
+
+def reminder_item(appt_id: str, action: str, due: dt.datetime, payload: dict) -> dict:
+    """Ítem REM# pendiente para `payload` (evento del dispatcher) que vence en `due`."""
+    due_iso = due.astimezone(dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return {
+        **reminder_key(appt_id, action),
+        "gsi2pk": f"REMBUCKET#{bucket_of(due)}",
+        "gsi2sk": f"{due_iso}#{appt_id}#{action}",
+        "due_iso": due_iso,
+        "status": "pending",
+        "attempts": 0,
+        "payload": payload,
+        "ttl": int(due.timestamp()) + KEEP_DAYS * 86400,
+    }
+
+
+class DynamoBucketStore:
+    """Buckets sobre la tabla única (GSI disperso `gsi2`)."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def put_reminders(self, items: list[dict]) -> None:
+        with self.table.batch_writer(overwrite_by_pkeys=["pk", "sk"]) as bw:
+            for item in items:
+                bw.put_item(Item=item)
+
+    def due(self, bucket: str) -> list[dict]:
+        from boto3.dynamodb.conditions import Key
+
+        items, kwargs = [], {}
+        while True:
+            resp = self.table.query(
+                IndexName=GSI,
+                KeyConditionExpression=Key("gsi2pk").eq(f"REMBUCKET#{bucket}"),
+                **kwargs,
+            )
+            items.extend(resp.get("Items", []))
+            if "LastEvaluatedKey" not in resp:
+                return items
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    def mark_sent(self, item: dict, now_iso: str) -> None:
+        try:
+            self.table.update_item(
+                Key={"pk": item["pk"], "sk": item["sk"]},
+                UpdateExpression="SET #st=:s, sent_at=:t REMOVE gsi2pk, gsi2sk",
+                ConditionExpression="attribute_exists(gsi2pk)",
+                ExpressionAttributeNames={"#st": "status"},
+                ExpressionAttributeValues={":s": "sent", ":t": now_iso},
+            )
+        except bex.ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
+
+    def retry_later(self, item: dict, bucket: str) -> None:
+        self.table.update_item(
+            Key={"pk": item["pk"], "sk": item["sk"]},
+            UpdateExpression="SET gsi2pk=:b, attempts=if_not_exists(attempts, :z) + :one",
+            ExpressionAttributeValues={":b": f"REMBUCKET#{bucket}", ":z": 0, ":one": 1},
+        )
+
+    def get_watermark(self) -> str | None:
+        item = self.table.get_item(Key=STATE_KEY, ConsistentRead=True).get("Item")
+        return item.get("last_bucket") if item else None
+
+    def set_watermark(self, bucket: str) -> None:
+        self.table.put_item(Item={**STATE_KEY, "last_bucket": bucket})
+
+
+class MemoryBucketStore:
+    """Implementación en memoria (simulaciones y pruebas)."""
+
+    def __init__(self):
+        self.items: dict[tuple[str, str], dict] = {}
+        self.watermark: str | None = None
+        self._lock = threading.Lock()
+
+    def put_reminders(self, items: list[dict]) -> None:
+        with self._lock:
+            for item in items:
+                self.items[(item["pk"], item["sk"])] = dict(item)
+
+    def due(self, bucket: str) -> list[dict]:
+        pk = f"REMBUCKET#{bucket}"
+        with self._lock:
+            hits = [dict(i) for i in self.items.values() if i.get("gsi2pk") == pk]
+        return sorted(hits, key=lambda i: i["gsi2sk"])
+
+    def mark_sent(self, item: dict, now_iso: str) -> None:
+        with self._lock:
+            stored = self.items.get((item["pk"], item["sk"]))
+            if stored and "gsi2pk" in stored:
+                stored.pop("gsi2pk")
+                stored.pop("gsi2sk", None)
+                stored.update(status="sent", sent_at=now_iso)
+
+    def retry_later(self, item: dict, bucket: str) -> None:
+        with self._lock:
+            stored = self.items[(item["pk"], item["sk"])]
+            stored["gsi2pk"] = f"REMBUCKET#{bucket}"
+            stored["attempts"] = stored.get("attempts", 0) + 1
+
+    def get_watermark(self) -> str | None:
+        return self.watermark
+
+    def set_watermark(self, bucket: str) -> None:
+        self.watermark = bucket
+
+    def pending(self) -> list[dict]:
+        with self._lock:
+            return [i for i in self.items.values() if "gsi2pk" in i]
+
+
+class ReminderSweeper:
+    """
+    Recorre los buckets vencidos y despacha sus recordatorios.
+
+    `dispatch(payloads) -> list[dict]` recibe un lote de eventos del dispatcher y
+    devuelve un resultado por evento; un resultado con `"error"` (o una
+    excepción del lote completo) deja el recordatorio para el siguiente bucket.
+    """
+
+    def __init__(self, store, dispatch, clock=None, batch_size: int = 25, max_buckets: int = 120):
+        self.store = store
+        self.dispatch = dispatch
+        self.clock = clock or (lambda: dt.datetime.now(dt.timezone.utc))
+        self.batch_size = batch_size
+        self.max_buckets = max_buckets
+
+    def _buckets(self, now: dt.datetime) -> list[str]:
+        current = bucket_of(now - dt.timedelta(minutes=1))
+        last = self.store.get_watermark()
+        if last is None:
+            return [current]
+        buckets, b = [], next_bucket(last)
+        while b <= current and len(buckets) < self.max_buckets:
+            buckets.append(b)
+            b = next_bucket(b)
+        return buckets
+
+    def sweep(self) -> dict:
+        now = self.clock()
+        now_iso = now.astimezone(dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        retry_bucket = bucket_of(now)
+        stats = {"buckets": 0, "dispatched": 0, "failed": 0, "seconds": 0.0}
+        t0 = time.perf_counter()
+        for bucket in self._buckets(now):
+            items = self.store.due(bucket)
+            for start in range(0, len(items), self.batch_size):
+                batch = items[start : start + self.batch_size]
+                try:
+                    results = self.dispatch([i["payload"] for i in batch])
+                except Exception as e:  # noqa: BLE001 - el lote se reintenta completo
+                    logger.exception("Reminder batch dispatch failed: %s", e)
+                    results = [{"error": str(e)}] * len(batch)
+                for item, res in zip(batch, results):
+                    if res.get("error"):
+                        self.store.retry_later(item, retry_bucket)
+                        stats["failed"] += 1
+                    else:
+                        self.store.mark_sent(item, now_iso)
+                        stats["dispatched"] += 1
+            self.store.set_watermark(bucket)
+            stats["buckets"] += 1
+        stats["seconds"] = round(time.perf_counter() - t0, 4)
+        logger.info("Sweep done: %s", stats)
+        return stats
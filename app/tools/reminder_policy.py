@@ -0,0 +1,309 @@
+"""
+Políticas de recordatorio declarativas y su motor de programación.
+
+Una política es una lista de reglas (`ReminderRule`): desfase respecto de la
+cita, acción del dispatcher, condición ("always" | "unconfirmed", evaluada al
+disparar), canal (paciente o propietaria) y plantilla. `plan()` calcula una
+sola vez todas las horas de disparo de una cita; `upsert_all()` crea o
+actualiza los schedules de EventBridge en paralelo en una sola pasada
+(create → update si ya existe).
+
+El tiempo viene de `clock` (inyectable en pruebas): agregar una regla agrega un
+schedule, sin llamadas extra para calcular horas ni para leer la cita.
+"""
+import datetime as dt
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import botocore.exceptions as bex
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CONDITIONS = ("always", "unconfirmed")
+CHANNELS = ("patient", "owner")
+# Margen mínimo hacia el futuro: Scheduler rechaza at(...) en el pasado
+MIN_LEAD_S = 60
+
+
+def utc_now() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc)
+
+
+def parse_iso(iso: str) -> dt.datetime:
+    """ISO (con 'Z' u offset) → datetime en UTC. Sin zona se asume UTC."""
+    d = dt.datetime.fromisoformat(iso.replace("Z", "+00:00"))
+    if d.tzinfo is None:
+        d = d.replace(tzinfo=dt.timezone.utc)
+    return d.astimezone(dt.timezone.utc)
+
+
+def isoz(d: dt.datetime) -> str:
+    return d.astimezone(dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class ReminderRule:
+    """
+    `name` es el sufijo del schedule; `offset` es relativo a la cita (negativo
+    = antes); `fast_offset`, relativo a ahora, se usa en modo rápido de pruebas.
+    `field` es el atributo de la fila APPT# donde se guarda el nombre del schedule.
+    """
+
+    __slots__ = (
+        "name",
+        "action",
+        "offset",
+        "fast_offset",
+        "condition",
+        "channel",
+        "template",
+        "field",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        action: str,
+        offset: dt.timedelta,
+        condition: str = "always",
+        channel: str = "patient",
+        template: str | None = None,
+        field: str | None = None,
+        fast_offset: dt.timedelta | None = None,
+    ):
+        if condition not in CONDITIONS:
+            raise ValueError(f"unknown condition {condition!r}")
+        if channel not in CHANNELS:
+            raise ValueError(f"unknown channel {channel!r}")
+        self.name = name
+        self.action = action
+        self.offset = offset
+        self.fast_offset = fast_offset
+        self.condition = condition
+        self.channel = channel
+        self.template = template
+        self.field = field
+
+    def __repr__(self) -> str:
+        return f"ReminderRule({self.name!r}, {self.action!r}, {self.offset})"
+
+
+class Fire:
+    """Un disparo calculado: schedule, regla, hora UTC y evento para el dispatcher."""
+
+    __slots__ = ("schedule_name", "rule", "when", "payload")
+
+    def __init__(self, schedule_name: str, rule: ReminderRule, when: dt.datetime, payload: dict):
+        self.schedule_name = schedule_name
+        self.rule = rule
+        self.when = when
+        self.payload = payload
+
+    def __repr__(self) -> str:
+        return f"Fire({self.schedule_name!r}, {isoz(self.when)})"
+
+
+class ReminderPolicy:
+    """
+    `name_format` arma el nombre del schedule con {appt_id} y {rule} (y los
+    `name_vars` fijos, p. ej. {stage}).
+    """
+
+    def __init__(self, name: str, rules, name_format: str, **name_vars):
+        self.name = name
+        self.rules = tuple(rules)
+        self.name_format = name_format
+        self.name_vars = name_vars
+
+    def schedule_name(self, appt_id: str, rule: ReminderRule) -> str:
+        return self.name_format.format(appt_id=appt_id, rule=rule.name, **self.name_vars)
+
+    def schedule_names(self, appt_id: str) -> list[str]:
+        return [self.schedule_name(appt_id, r) for r in self.rules]
+
+    def name_prefix(self) -> str:
+        """Parte fija del nombre, antes de {appt_id} (para listar schedules)."""
+        return self.name_format.split("{appt_id}", 1)[0].format(**self.name_vars)
+
+    def appointment_id_of(self, schedule_name: str) -> str | None:
+        """Inverso de `schedule_name`; None si el nombre no es de esta política."""
+        prefix = self.name_prefix()
+        tail = self.name_format.split("{appt_id}", 1)[1]
+        if not schedule_name.startswith(prefix):
+            return None
+        for rule in self.rules:
+            suffix = tail.format(rule=rule.name, **self.name_vars)
+            if schedule_name.endswith(suffix) and len(schedule_name) > len(prefix) + len(suffix):
+                return schedule_name[len(prefix) : len(schedule_name) - len(suffix)]
+        return None
+
+    def fields(self) -> tuple[str, ...]:
+        return tuple(r.field for r in self.rules if r.field)
+
+    def plan(self, appointment: dict, now: dt.datetime, fast: bool = False) -> list[Fire]:
+        """
+        Todas las horas de disparo de `appointment` (evento con appointment_id,
+        appt_time_iso y opcionalmente patient_phone_e164/patient_name). Lanza
+        ValueError si la hora no es ISO válida.
+        """
+        appt_id = appointment["appointment_id"]
+        appt_dt = parse_iso(appointment["appt_time_iso"])
+        base = {
+            "appointment_id": appt_id,
+            "appt_time_iso": appointment["appt_time_iso"],
+        }
+        for key in ("patient_phone_e164", "patient_name"):
+            if appointment.get(key):
+                base[key] = appointment[key]
+
+        fires = []
+        for rule in self.rules:
+            if fast and rule.fast_offset is not None:
+                when = now + rule.fast_offset
+            else:
+                when = appt_dt + rule.offset
+            payload = {**base, "action": rule.action}
+            if rule.condition != "always":
+                payload["condition"] = rule.condition
+            if rule.channel != "patient":
+                payload["channel"] = rule.channel
+            if rule.template:
+                payload["template"] = rule.template
+            fires.append(Fire(self.schedule_name(appt_id, rule), rule, when, payload))
+        return fires
+
+
+# ===== Políticas =====
+def default_policy(stage: str) -> ReminderPolicy:
+    """R1 24h antes, R2 4h después si no confirmó, y aviso a la propietaria 1h más tarde."""
+    return ReminderPolicy(
+        "default",
+        [
+            ReminderRule(
+                "r1",
+                "first",
+                -dt.timedelta(hours=24),
+                template="patient_reminder",
+                field="r1_schedule_name",
+                fast_offset=dt.timedelta(minutes=1),
+            ),
+            ReminderRule(
+                "r2",
+                "second",
+                -dt.timedelta(hours=20),
+                condition="unconfirmed",
+                template="patient_reminder",
+                field="r2_schedule_name",
+                fast_offset=dt.timedelta(minutes=5),
+            ),
+            ReminderRule(
+                "esc",
+                "escalation",
+                -dt.timedelta(hours=19),
+                condition="unconfirmed",
+                channel="owner",
+                field="esc_schedule_name",
+                fast_offset=dt.timedelta(minutes=9),
+            ),
+        ],
+        "pt-{stage}-{appt_id}-{rule}",
+        stage=stage,
+    )
+
+
+def agent_policy() -> ReminderPolicy:
+    """Recordatorios del agente conversacional: 24h y 4h antes de la cita."""
+    return ReminderPolicy(
+        "agent",
+        [
+            ReminderRule("24h", "first", -dt.timedelta(hours=24), template="patient_reminder"),
+            ReminderRule(
+                "4h",
+                "second",
+                -dt.timedelta(hours=4),
+                condition="unconfirmed",
+                template="patient_reminder",
+            ),
+        ],
+        "{appt_id}-{rule}",
+    )
+
+
+# ===== Programación =====
+def ensure_future(when: dt.datetime, now: dt.datetime, lead_s: int = MIN_LEAD_S) -> dt.datetime:
+    """Una hora vencida (o demasiado cercana) se corre a now + lead_s."""
+    return when if when > now else now + dt.timedelta(seconds=lead_s)
+
+
+def _is_conflict(e: bex.ClientError) -> bool:
+    return e.response.get("Error", {}).get("Code") in {
+        "ConflictException",
+        "ResourceAlreadyExistsException",
+    } or "already exists" in str(e)
+
+
+def upsert(client, fire: Fire, target: dict, now: dt.datetime, group: str | None = None) -> str:
+    """
+    Crea (o actualiza si ya existe) el schedule at(...) en UTC de `fire`.
+    `target` = {"Arn", "RoleArn"}; el Input es el payload del disparo.
+    Devuelve "created" | "updated".
+    """
+    when_str = ensure_future(fire.when, now).strftime("%Y-%m-%dT%H:%M:%S")  # sin 'Z'
+    kwargs = {
+        "Name": fire.schedule_name,
+        "FlexibleTimeWindow": {"Mode": "OFF"},
+        "ScheduleExpression": f"at({when_str})",
+        "ScheduleExpressionTimezone": "UTC",
+        "Target": {**target, "Input": json.dumps(fire.payload)},
+        # Un schedule at(...) ya disparado no sirve: Scheduler lo borra solo
+        "ActionAfterCompletion": "DELETE",
+    }
+    if group:
+        kwargs["GroupName"] = group
+    try:
+        client.create_schedule(**kwargs)
+        logger.info(
+            "Created schedule %s at %s UTC (%s)", fire.schedule_name, when_str, fire.rule.action
+        )
+        return "created"
+    except bex.ClientError as e:
+        if not _is_conflict(e):
+            logger.error("create_schedule failed for %s: %s", fire.schedule_name, e)
+            raise
+    client.update_schedule(**kwargs)
+    logger.info(
+        "Updated schedule %s at %s UTC (%s)", fire.schedule_name, when_str, fire.rule.action
+    )
+    return "updated"
+
+
+def upsert_all(
+    client,
+    fires: list[Fire],
+    target: dict,
+    clock=utc_now,
+    group: str | None = None,
+    concurrency: int = 8,
+) -> dict[str, Exception]:
+    """
+    Upsert en paralelo de todos los disparos (de una o varias citas) con una
+    sola lectura del reloj. Devuelve {schedule_name: excepción} de los que fallaron.
+    """
+    if not fires:
+        return {}
+    now = clock()
+    errors: dict[str, Exception] = {}
+
+    def _run(fire: Fire) -> None:
+        try:
+            upsert(client, fire, target, now, group)
+        except (bex.ClientError, bex.BotoCoreError) as e:
+            errors[fire.schedule_name] = e
+
+    if len(fires) == 1:
+        _run(fires[0])
+        return errors
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(fires))) as pool:
+        list(pool.map(_run, fires))
+    return errors
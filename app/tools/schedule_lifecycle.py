@@ -0,0 +1,174 @@
+"""
+Ciclo de vida de los schedules de recordatorio en EventBridge Scheduler.
+
+Los schedules viven en un grupo por stage (`pt-<stage>-reminders`) y se crean
+con ActionAfterCompletion=DELETE (ver reminder_policy.upsert), así que los que
+ya dispararon desaparecen solos. Quedan dos casos:
+
+- Cancelación: `delete_schedules` borra todos los schedules de una o varias
+  citas en paralelo (los nombres salen de la política, sin leer la fila).
+- Huérfanos: `ScheduleGC` recorre el grupo página a página, resuelve las citas
+  de cada página con un solo BatchGetItem y borra en paralelo los schedules
+  cuya cita ya no existe, está cancelada o ya pasó. El borrado de una página
+  corre mientras se lista la siguiente.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import botocore.exceptions as bex
+
+from .reminder_policy import isoz, utc_now
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Borrados simultáneos (DeleteSchedule admite ~50 TPS por cuenta)
+DELETE_CONCURRENCY = int(os.environ.get("SCHEDULE_DELETE_CONCURRENCY", "16"))
+# Máximo de ListSchedules por página
+LIST_PAGE_SIZE = 100
+
+
+def group_name(stage: str) -> str:
+    return f"pt-{stage}-reminders"
+
+
+def _delete_one(client, name: str, group: str | None) -> str:
+    """Devuelve "deleted" | "missing"; otros errores se propagan."""
+    kwargs = {"Name": name}
+    if group:
+        kwargs["GroupName"] = group
+    try:
+        client.delete_schedule(**kwargs)
+        return "deleted"
+    except bex.ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ResourceNotFoundException":
+            return "missing"
+        raise
+
+
+class _Deleter:
+    """Borrados en un pool compartido; `result()` espera y resume."""
+
+    def __init__(self, client, group: str | None, pool: ThreadPoolExecutor):
+        self.client = client
+        self.group = group
+        self.pool = pool
+        self.futures = {}
+
+    def submit(self, names) -> None:
+        for name in names:
+            self.futures[name] = self.pool.submit(_delete_one, self.client, name, self.group)
+
+    def result(self) -> dict:
+        out = {"deleted": 0, "missing": 0, "errors": {}}
+        for name, fut in self.futures.items():
+            try:
+                out[fut.result()] += 1
+            except (bex.ClientError, bex.BotoCoreError) as e:
+                logger.error("delete_schedule failed for %s: %s", name, e)
+                out["errors"][name] = str(e)
+        return out
+
+
+def delete_schedules(
+    client, names, group: str | None = None, concurrency: int = DELETE_CONCURRENCY
+) -> dict:
+    """
+    Borra `names` en paralelo. Los que ya no existen (ya dispararon o nunca se
+    crearon) cuentan como "missing", no como error.
+    Devuelve {"deleted", "missing", "errors": {nombre: mensaje}}.
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {"deleted": 0, "missing": 0, "errors": {}}
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(names))) as pool:
+        deleter = _Deleter(client, group, pool)
+        deleter.submit(names)
+        return deleter.result()
+
+
+def iter_schedule_pages(
+    client, group: str | None = None, prefix: str = "", page_size=LIST_PAGE_SIZE
+):
+    """Nombres de los schedules de `group` (con `prefix`), una lista por página."""
+    kwargs = {"MaxResults": page_size}
+    if group:
+        kwargs["GroupName"] = group
+    if prefix:
+        kwargs["NamePrefix"] = prefix
+    token = None
+    while True:
+        resp = client.list_schedules(**kwargs, **({"NextToken": token} if token else {}))
+        yield [s["Name"] for s in resp.get("Schedules", [])]
+        token = resp.get("NextToken")
+        if not token:
+            return
+
+
+class ScheduleGC:
+    """
+    Recolector de schedules huérfanos de una política en un grupo. `repo` es un
+    AppointmentsRepo (solo usa batch_get).
+    """
+
+    def __init__(
+        self,
+        client,
+        repo,
+        policy,
+        group: str | None = None,
+        concurrency: int = DELETE_CONCURRENCY,
+        page_size: int = LIST_PAGE_SIZE,
+        clock=utc_now,
+    ):
+        self.client = client
+        self.repo = repo
+        self.policy = policy
+        self.group = group
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self._clock = clock
+
+    def _orphans(self, names: list[str], now_iso: str) -> list[str]:
+        ids = {n: self.policy.appointment_id_of(n) for n in names}
+        ids = {n: a for n, a in ids.items() if a}
+        found, unprocessed = self.repo.batch_get(
+            set(ids.values()), fields=("pk", "status", "appt_time_iso")
+        )
+        orphans = []
+        for name, appt_id in ids.items():
+            if appt_id in unprocessed:
+                continue  # sin respuesta de DynamoDB: la próxima corrida
+            appt = found.get(appt_id)
+            if appt is None or appt.cancelled or (appt.appt_time_iso or "") < now_iso:
+                orphans.append(name)
+        return orphans
+
+    def run(self, max_pages: int | None = None) -> dict:
+        now_iso = isoz(self._clock())
+        stats = {"pages": 0, "scanned": 0, "orphaned": 0}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            deleter = _Deleter(self.client, self.group, pool)
+            pages = iter_schedule_pages(
+                self.client, self.group, self.policy.name_prefix(), self.page_size
+            )
+            for names in pages:
+                stats["pages"] += 1
+                stats["scanned"] += len(names)
+                orphans = self._orphans(names, now_iso)
+                stats["orphaned"] += len(orphans)
+                deleter.submit(orphans)
+                if max_pages and stats["pages"] >= max_pages:
+                    break
+            result = deleter.result()
+        stats.update(result)
+        logger.info(
+            "Schedule GC group=%s scanned=%d orphaned=%d deleted=%d errors=%d",
+            self.group,
+            stats["scanned"],
+            stats["orphaned"],
+            stats["deleted"],
+            len(stats["errors"]),
+        )
+        return stats
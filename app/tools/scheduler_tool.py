@@ -1,36 +1,86 @@
-"""Create one-time reminder schedules in EventBridge Scheduler."""
-import json
+"""
+Create one-time reminder schedules in EventBridge Scheduler.
+
+The agent's appointments are keyed by their Calendar event id: before
+scheduling, the APPT#<evento_id> row the dispatcher reads is written (or
+updated on a reschedule), so reminders find their appointment.
+"""
 import os
-from datetime import timedelta
 
 import boto3
-from dateutil import parser as dtparser
 from strands import tool
 
+from . import gcal_client as gcal
+from .appointments_repo import AppointmentsRepo, ConditionFailed, patient_pk
+from .aws_clients import lazy_table
+from .reminder_policy import agent_policy, isoz, upsert_all, utc_now
+from .schedule_lifecycle import delete_schedules
+
 TARGET_ARN = os.environ.get("REMINDER_TARGET_ARN", "")
 ROLE_ARN = os.environ.get("REMINDER_ROLE_ARN", "")
 GROUP_NAME = os.environ.get("REMINDER_GROUP", "default")
+DDB_TABLE = os.environ.get("DDB_TABLE", "")
+
+REPO = AppointmentsRepo(lazy_table(DDB_TABLE), DDB_TABLE)
+# Misma política/payload que el runtime: el destino recibe eventos del dispatcher
+POLICY = agent_policy()
+
+
+def _save_row(evento_id: str, appt_time_iso: str, telefono: str, paciente: str) -> dict:
+    """
+    Upsert of the APPT# row; a new time needs a new confirmation. Returns the
+    row's phone/name (the stored ones when not given, e.g. on a reschedule).
+    """
+    row = {
+        "event_id": evento_id,
+        "appt_time_iso": appt_time_iso,
+        "status": "scheduled",
+        "gsi1sk": appt_time_iso,
+    }
+    if telefono:
+        row.update(patient_phone_e164=telefono, gsi1pk=patient_pk(telefono))
+    if paciente:
+        row["patient_name"] = paciente
+    attrs = REPO.update(evento_id, set_=row, remove=("confirmed_at",), return_values="ALL_NEW")
+    return {
+        "patient_phone_e164": attrs.get("patient_phone_e164", telefono),
+        "patient_name": attrs.get("patient_name", paciente),
+    }
 
 
 @tool
-def schedule_reminders(evento_id: str, inicio_iso: str) -> dict:
-    """Create schedules 24h and 4h before the appointment."""
+def schedule_reminders(
+    evento_id: str, inicio_iso: str, telefono: str = "", paciente: str = ""
+) -> dict:
+    """Create (or update) the reminder schedules 24h and 4h before the appointment."""
+    # naive = hora de la clínica, como la interpreta Calendar
+    appt_time_iso = gcal.event_utc(inicio_iso)
+    appointment = {
+        "appointment_id": evento_id,
+        "appt_time_iso": appt_time_iso,
+        **_save_row(evento_id, appt_time_iso, telefono, paciente),
+    }
     client = boto3.client("scheduler")
-    start = dtparser.isoparse(inicio_iso)
-    results = {}
-    for hours in (24, 4):
-        run = start - timedelta(hours=hours)
-        name = f"{evento_id}-{hours}h"
-        resp = client.create_schedule(
-            Name=name,
-            GroupName=GROUP_NAME,
-            ScheduleExpression=f"at({run.strftime('%Y-%m-%dT%H:%M:%S')})",
-            FlexibleTimeWindow={"Mode": "OFF"},
-            Target={
-                "Arn": TARGET_ARN,
-                "RoleArn": ROLE_ARN,
-                "Input": json.dumps({"event_id": evento_id, "offset_hours": hours}),
-            },
-        )
-        results[name] = resp
-    return results
+    fires = POLICY.plan(appointment, now=utc_now())
+    errors = upsert_all(
+        client, fires, {"Arn": TARGET_ARN, "RoleArn": ROLE_ARN}, clock=utc_now, group=GROUP_NAME
+    )
+    return {
+        f.schedule_name: {"at": isoz(f.when), "action": f.rule.action}
+        if f.schedule_name not in errors
+        else {"error": str(errors[f.schedule_name])}
+        for f in fires
+    }
+
+
+@tool
+def cancel_reminders(evento_id: str) -> dict:
+    """Delete the appointment's reminder schedules and mark its row cancelled."""
+    res = delete_schedules(
+        boto3.client("scheduler"), POLICY.schedule_names(evento_id), group=GROUP_NAME
+    )
+    try:
+        REPO.cancel(evento_id)
+    except ConditionFailed:
+        pass  # sin fila: nada que cancelar
+    return res
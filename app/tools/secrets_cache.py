@@ -0,0 +1,192 @@
+"""
+Caché compartida de secretos (Secrets Manager) para todo el contenedor.
+
+Cada secreto se guarda ya parseado (JSON) durante SECRETS_TTL_S. Pasado
+TTL - SECRETS_REFRESH_AHEAD_S, una lectura devuelve el valor cacheado y dispara
+un refresco en segundo plano, así que un token rotado se recoge sin que ninguna
+petición pague la latencia. Las lecturas fallidas se reintentan con backoff
+exponencial y jitter; si el refresco falla al vencer, se sirve el valor
+anterior mientras se pueda (stale-if-error).
+
+`prefetch(names)` trae varios secretos en paralelo (p. ej. durante el init de
+la Lambda, con SECRETS_PREFETCH). Para pruebas y desarrollo local,
+SECRETS_LOCAL_FILE (JSON {nombre: secreto}) o SECRET_JSON_<NOMBRE> (nombre en
+mayúsculas, lo no alfanumérico como "_") reemplazan a Secrets Manager.
+"""
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from . import aws_clients
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+TTL_S = int(os.environ.get("SECRETS_TTL_S", "3600"))
+REFRESH_AHEAD_S = int(os.environ.get("SECRETS_REFRESH_AHEAD_S", "300"))
+FETCH_ATTEMPTS = int(os.environ.get("SECRETS_FETCH_ATTEMPTS", "4"))
+LOCAL_FILE = os.environ.get("SECRETS_LOCAL_FILE", "")
+# Backoff entre intentos: aleatorio en [0, min(MAX, BASE * 2**intento)]
+RETRY_BASE_S = 0.1
+RETRY_MAX_S = 2.0
+
+RETRYABLE_CODES = {
+    "ThrottlingException",
+    "InternalServiceError",
+    "InternalServiceErrorException",
+    "ServiceUnavailable",
+    "RequestTimeout",
+}
+
+
+def _retryable(exc: BaseException) -> bool:
+    import botocore.exceptions as bex
+
+    if isinstance(exc, bex.ClientError):
+        return exc.response.get("Error", {}).get("Code") in RETRYABLE_CODES
+    return isinstance(exc, (bex.EndpointConnectionError, bex.ConnectionClosedError, OSError))
+
+
+def _env_name(name: str) -> str:
+    return "SECRET_JSON_" + re.sub(r"[^A-Za-z0-9]", "_", name).upper()
+
+
+def local_secret(name: str) -> str | None:
+    """Secreto de SECRET_JSON_<NOMBRE> o de SECRETS_LOCAL_FILE; None si no hay."""
+    raw = os.environ.get(_env_name(name))
+    if raw is not None:
+        return raw
+    if LOCAL_FILE:
+        with open(LOCAL_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+        if name in data:
+            value = data[name]
+            return value if isinstance(value, str) else json.dumps(value)
+    return None
+
+
+def fetch_secret(name: str) -> str:
+    """SecretString del secreto `name` (stand-in local si existe)."""
+    raw = local_secret(name)
+    if raw is not None:
+        return raw
+    sm = aws_clients.client("secretsmanager")
+    return sm.get_secret_value(SecretId=name)["SecretString"]
+
+
+class SecretsCache:
+    """`get(name)` devuelve el secreto parseado; ver docstring del módulo."""
+
+    def __init__(
+        self,
+        fetch=fetch_secret,
+        ttl: float = TTL_S,
+        refresh_ahead: float = REFRESH_AHEAD_S,
+        attempts: int = FETCH_ATTEMPTS,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl / 2)
+        self.attempts = attempts
+        self._clock = clock
+        self._sleep = sleep
+        self._entries: dict[str, tuple[dict, float]] = {}  # name → (valor, vence)
+        self._locks: dict[str, threading.Lock] = {}
+        self._refreshing: set[str] = set()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "fetches": 0, "refreshes": 0, "errors": 0, "stale": 0}
+
+    def _name_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def _fetch(self, name: str) -> str:
+        """`fetch` con reintentos (sin dependencias: este módulo carga en todas las Lambdas)."""
+        for attempt in range(1, self.attempts + 1):
+            try:
+                return self.fetch(name)
+            except Exception as e:
+                if attempt >= self.attempts or not _retryable(e):
+                    raise
+                self._sleep(random.uniform(0, min(RETRY_MAX_S, RETRY_BASE_S * 2**attempt)))
+        raise RuntimeError("unreachable")
+
+    def _load(self, name: str) -> dict:
+        value = json.loads(self._fetch(name))
+        with self._lock:
+            self._entries[name] = (value, self._clock() + self.ttl)
+            self.counters["fetches"] += 1
+        return value
+
+    def get(self, name: str) -> dict:
+        entry = self._entries.get(name)
+        if entry and self._clock() < entry[1]:
+            if self._clock() >= entry[1] - self.refresh_ahead:
+                self._refresh_async(name)
+            self.counters["hits"] += 1
+            return entry[0]
+        with self._name_lock(name):
+            # otro hilo (prefetch/refresco) pudo traerlo mientras esperábamos
+            entry = self._entries.get(name)
+            if entry and self._clock() < entry[1]:
+                self.counters["hits"] += 1
+                return entry[0]
+            try:
+                return self._load(name)
+            except Exception:
+                self.counters["errors"] += 1
+                if entry is None:
+                    raise
+                logger.warning("Secret %s refresh failed, serving stale value", name)
+                self.counters["stale"] += 1
+                return entry[0]
+
+    def _refresh(self, name: str) -> None:
+        try:
+            with self._name_lock(name):
+                self._load(name)
+            self.counters["refreshes"] += 1
+        except Exception as e:  # noqa: BLE001 - se reintenta en la próxima lectura
+            self.counters["errors"] += 1
+            logger.warning("Background refresh of secret %s failed: %s", name, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(name)
+
+    def _refresh_async(self, name: str) -> threading.Thread | None:
+        with self._lock:
+            if name in self._refreshing:
+                return None
+            self._refreshing.add(name)
+        t = threading.Thread(target=self._refresh, args=(name,), daemon=True)
+        t.start()
+        return t
+
+    def prefetch(self, names, wait: bool = False) -> None:
+        """Trae en paralelo los secretos aún no cacheados (sin bloquear salvo `wait`)."""
+        threads = [self._refresh_async(n) for n in names if n and n not in self._entries]
+        if wait:
+            for t in threads:
+                if t is not None:
+                    t.join()
+
+    def invalidate(self, name: str) -> None:
+        """Olvida el secreto (p. ej. tras un 401): la próxima lectura lo vuelve a traer."""
+        with self._lock:
+            self._entries.pop(name, None)
+
+
+SECRETS = SecretsCache()
+
+
+def prefetch_from_env() -> None:
+    """Prefetch de SECRETS_PREFETCH (nombres separados por coma) durante el init."""
+    names = [n.strip() for n in os.environ.get("SECRETS_PREFETCH", "").split(",") if n.strip()]
+    if names:
+        SECRETS.prefetch(names)
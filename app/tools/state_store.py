@@ -1,8 +1,17 @@
-"""Simple DynamoDB based state storage."""
+"""
+DynamoDB based conversation state.
+
+Reads go through an in-container LRU and writes are partial merges buffered
+until the handler flushes (see tools.conversation_state): several tool calls
+in one invocation become a single UpdateItem per key. Called outside a
+`flush_after` handler, the tools write through immediately.
+"""
 import os
 import boto3
 from strands import tool
 
+from .conversation_state import ConversationState, in_flush_scope
+
 TABLE_NAME = os.environ.get("STATE_TABLE", "appointments_state")
 _table_cache = None
 
@@ -14,22 +23,36 @@ def _table():
     return _table_cache
 
 
+# `_table` se resuelve en cada uso (los tests lo reemplazan)
+STATE = ConversationState(lambda: _table(), key_attr="id")
+
+
+def _write_through() -> None:
+    """Sin un handler @flush_after que vacíe el buffer, se escribe ya."""
+    if not in_flush_scope():
+        STATE.flush()
+
+
 @tool
 def save_state(clave: str, datos: dict) -> None:
-    """Persist conversation state in DynamoDB."""
-    item = {"id": clave}
-    item.update(datos)
-    _table().put_item(Item=item)
+    """Merge `datos` into the conversation state (fields not given are kept)."""
+    STATE.update(clave, datos)
+    _write_through()
 
 
 @tool
 def get_state(clave: str) -> dict | None:
     """Retrieve conversation state."""
-    resp = _table().get_item(Key={"id": clave})
-    return resp.get("Item")
+    return STATE.get(clave)
 
 
 @tool
 def delete_state(clave: str) -> None:
     """Delete conversation state."""
-    _table().delete_item(Key={"id": clave})
+    STATE.delete(clave)
+    _write_through()
+
+
+def flush_state() -> dict:
+    """Write buffered state changes now (normally done by `flush_after`)."""
+    return STATE.flush()
@@ -0,0 +1,276 @@
+"""
+Registro de clínicas (tenants) atendidas desde un mismo despliegue.
+
+Cada tenant se identifica por el `phone_number_id` de su número de WhatsApp
+(metadata del webhook) y trae su propia configuración: secreto de Meta,
+propietaria y plantillas, calendario y secreto de Google, y catálogo de
+servicios. El registro se lee una vez por contenedor desde TENANTS_CONFIG
+(ruta local o s3://bucket/key con JSON) o TENANTS_JSON. Sin configuración hay
+un único tenant, "default", armado con las variables de entorno de siempre; lo
+que un tenant no define también se toma de ahí.
+
+`context(phone_number_id)` devuelve un `TenantContext` cacheado en el
+contenedor: cola de envíos, avisos a la propietaria y catálogo se construyen en
+el primer uso, así que el costo por petición es un lookup en un dict sin
+importar cuántas clínicas haya.
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+
+from . import whatsapp_owner
+from .outbound_queue import OutboundQueue
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Ruta local o s3://bucket/key del JSON {"tenants": [...]}
+CONFIG_LOCATION = os.environ.get("TENANTS_CONFIG", "")
+DEFAULT_ID = "default"
+
+# Tenant de la petición en curso (ver TenantContext.activate)
+_current: contextvars.ContextVar = contextvars.ContextVar("tenant", default=None)
+
+
+class Tenant:
+    """Configuración de una clínica; los campos vacíos se completan con los del entorno."""
+
+    __slots__ = (
+        "tenant_id",
+        "phone_number_id",
+        "name",
+        "wa_secret_name",
+        "owner_wa_e164",
+        "owner_template",
+        "lang_code",
+        "calendar_id",
+        "gcal_secret_name",
+        "catalog_location",
+    )
+
+    def __init__(self, tenant_id: str, **attrs):
+        self.tenant_id = tenant_id
+        for slot in self.__slots__[1:]:
+            setattr(self, slot, attrs.get(slot) or "")
+
+    @classmethod
+    def from_env(cls) -> "Tenant":
+        return cls(
+            DEFAULT_ID,
+            phone_number_id=os.environ.get("META_PHONE_NUMBER_ID", ""),
+            name=os.environ.get("CLINIC_NAME", "Pelvis Therapy"),
+            wa_secret_name=whatsapp_owner.SECRETS_NAME,
+            owner_wa_e164=whatsapp_owner.OWNER_WA_E164,
+            owner_template=whatsapp_owner.TEMPLATE_NAME,
+            lang_code=whatsapp_owner.LANG_CODE,
+            calendar_id=os.environ.get("GCAL_CALENDAR_ID", ""),
+            gcal_secret_name=os.environ.get("GCAL_SECRET_NAME", "pelvis/gcal/sa"),
+            catalog_location=os.getenv("PT_CONTENT_PATH", "content/pelvis/service.yml"),
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict, defaults: "Tenant") -> "Tenant":
+        if not data.get("tenant_id"):
+            raise ValueError(f"tenant without tenant_id: {data!r}")
+        attrs = {s: data.get(s) or getattr(defaults, s) for s in cls.__slots__[1:]}
+        attrs["phone_number_id"] = str(data.get("phone_number_id") or "")
+        return cls(data["tenant_id"], **attrs)
+
+    def __repr__(self) -> str:
+        return f"Tenant({self.tenant_id!r}, phone_number_id={self.phone_number_id!r})"
+
+
+class TenantRegistry:
+    """Tenants por phone_number_id y por tenant_id; lo desconocido cae en `default`."""
+
+    def __init__(self, tenants=(), default: Tenant | None = None):
+        self.default = default or Tenant.from_env()
+        self.by_id: dict[str, Tenant] = {self.default.tenant_id: self.default}
+        self.by_phone: dict[str, Tenant] = {}
+        if self.default.phone_number_id:
+            self.by_phone[self.default.phone_number_id] = self.default
+        for t in tenants:
+            if t.tenant_id in self.by_id and t is not self.by_id[t.tenant_id]:
+                raise ValueError(f"duplicate tenant_id {t.tenant_id!r}")
+            self.by_id[t.tenant_id] = t
+            if t.phone_number_id:
+                self.by_phone[t.phone_number_id] = t
+
+    @classmethod
+    def from_config(cls, data: dict, default: Tenant | None = None) -> "TenantRegistry":
+        default = default or Tenant.from_env()
+        return cls([Tenant.from_dict(d, default) for d in data.get("tenants") or []], default)
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def get(self, phone_number_id: str = "", tenant_id: str = "") -> Tenant:
+        if tenant_id:
+            tenant = self.by_id.get(tenant_id)
+            if tenant is not None:
+                return tenant
+            logger.warning("Unknown tenant_id %s, using default", tenant_id)
+        tenant = self.by_phone.get(phone_number_id) if phone_number_id else None
+        if tenant is None:
+            if phone_number_id and len(self.by_phone) > 1:
+                logger.warning("Unknown phone_number_id %s, using default", phone_number_id)
+            return self.default
+        return tenant
+
+
+def _read_config(location: str) -> dict:
+    if location.startswith("s3://"):
+        from . import aws_clients
+
+        bucket, _, key = location[5:].partition("/")
+        obj = aws_clients.client("s3").get_object(Bucket=bucket, Key=key)
+        return json.loads(obj["Body"].read())
+    with open(location, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_registry() -> TenantRegistry:
+    """Registro de TENANTS_JSON o TENANTS_CONFIG; sin ninguno, solo el tenant del entorno."""
+    raw = os.environ.get("TENANTS_JSON")
+    if raw:
+        return TenantRegistry.from_config(json.loads(raw))
+    if CONFIG_LOCATION:
+        return TenantRegistry.from_config(_read_config(CONFIG_LOCATION))
+    return TenantRegistry()
+
+
+class TenantContext:
+    """Recursos de un tenant en el contenedor, construidos en el primer uso."""
+
+    def __init__(self, tenant: Tenant, dead_letters=None):
+        self.tenant = tenant
+        self._dead_letters = dead_letters
+        self._outbound = None
+        self._owner = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_default(self) -> bool:
+        return self.tenant.tenant_id == DEFAULT_ID
+
+    @property
+    def outbound(self) -> OutboundQueue:
+        """Cola de envíos con el secreto de Meta del tenant (la del módulo para el default)."""
+        if self.is_default:
+            return whatsapp_owner.OUTBOUND
+        if self._outbound is None:
+            with self._lock:
+                if self._outbound is None:
+                    secret = self.tenant.wa_secret_name
+                    self._outbound = OutboundQueue(
+                        lambda p: whatsapp_owner._post_messages(p, secret),
+                        self._dead_letters or whatsapp_owner.OUTBOUND.dead_letters,
+                    )
+        return self._outbound
+
+    def phone_number_id(self) -> str:
+        if self.tenant.phone_number_id:
+            return self.tenant.phone_number_id
+        return whatsapp_owner._get_meta_creds(self.tenant.wa_secret_name)["phone_number_id"]
+
+    def send_many(self, payloads: list[dict]) -> list[dict]:
+        if not payloads:
+            return []
+        if self.is_default:
+            return whatsapp_owner.send_many(payloads)
+        return self.outbound.send_many(payloads, self.phone_number_id())
+
+    def owner_payload(self, paciente: str, fecha_hora: str, estado: str) -> dict:
+        return whatsapp_owner.owner_template_payload(
+            paciente,
+            fecha_hora,
+            estado,
+            owner_e164=self.tenant.owner_wa_e164,
+            template_name=self.tenant.owner_template,
+            lang_code=self.tenant.lang_code,
+        )
+
+    def owner(self, default=None):
+        """
+        OwnerNotifier del tenant. El default usa el del llamador (con el resumen
+        por ventana); los demás avisan de inmediato a su propietaria.
+        """
+        if self.is_default and default is not None:
+            return default
+        if self._owner is None:
+            from .owner_digest import MemoryDigestBuffer, OwnerNotifier
+
+            with self._lock:
+                if self._owner is None:
+                    self._owner = OwnerNotifier(
+                        MemoryDigestBuffer(),
+                        send=self.send_many,
+                        mode="immediate",
+                        build=self.owner_payload,
+                    )
+        return self._owner
+
+    def catalog(self):
+        """Índice compilado del catálogo del tenant (cacheado por ubicación)."""
+        from agents.catalog_index import get_index
+
+        return get_index(self.tenant.catalog_location)
+
+    def calendar(self):
+        """Context manager: dentro, gcal_client usa el calendario del tenant."""
+        from . import gcal_client
+
+        return gcal_client.using_calendar(self.tenant.calendar_id, self.tenant.gcal_secret_name)
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Hace de este el tenant en curso (`current()`) y de su calendario el activo."""
+        token = _current.set(self)
+        try:
+            with self.calendar():
+                yield self
+        finally:
+            _current.reset(token)
+
+
+_registry: TenantRegistry | None = None
+_contexts: dict[str, TenantContext] = {}
+_lock = threading.Lock()
+
+
+def registry() -> TenantRegistry:
+    global _registry
+    if _registry is None:
+        with _lock:
+            if _registry is None:
+                _registry = load_registry()
+                logger.info("Tenant registry loaded (%d tenants)", len(_registry))
+    return _registry
+
+
+def context(phone_number_id: str = "", tenant_id: str = "") -> TenantContext:
+    """TenantContext cacheado del tenant de `phone_number_id` (o `tenant_id`)."""
+    tenant = registry().get(phone_number_id, tenant_id)
+    ctx = _contexts.get(tenant.tenant_id)
+    if ctx is None or ctx.tenant is not tenant:
+        with _lock:
+            ctx = _contexts.get(tenant.tenant_id)
+            if ctx is None or ctx.tenant is not tenant:
+                ctx = _contexts[tenant.tenant_id] = TenantContext(tenant)
+    return ctx
+
+
+def current() -> TenantContext:
+    """Tenant activado en esta petición; fuera de `activate()`, el default."""
+    return _current.get() or context()
+
+
+def set_registry(reg: TenantRegistry | None) -> None:
+    """Reemplaza el registro del contenedor (None = recargar en el próximo uso)."""
+    global _registry
+    with _lock:
+        _registry = reg
+        _contexts.clear()
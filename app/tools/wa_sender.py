@@ -0,0 +1,179 @@
+"""Pooled HTTPS client and concurrent dispatcher for WhatsApp Cloud API sends."""
+import http.client
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+GRAPH_HOST = os.environ.get("META_GRAPH_HOST", "graph.facebook.com")
+# "http" solo para stubs locales (pruebas de carga); host puede llevar ":puerto"
+GRAPH_SCHEME = os.environ.get("META_GRAPH_SCHEME", "https")
+GRAPH_VERSION = os.environ.get("META_GRAPH_VERSION", "v20.0")
+POOL_SIZE = int(os.environ.get("WA_POOL_SIZE", "8"))
+SEND_CONCURRENCY = int(os.environ.get("WA_SEND_CONCURRENCY", "8"))
+TIMEOUT_S = 10
+# Conexión keep-alive ya cerrada por el servidor, detectada al escribir
+_STALE_ERRORS = (BrokenPipeError, ConnectionResetError, http.client.RemoteDisconnected)
+
+
+class ConnectError(OSError):
+    """No se pudo abrir la conexión: la petición no llegó a escribirse."""
+
+
+def _connect(conn) -> None:
+    """Abre una conexión nueva antes de escribir, para distinguir sus fallos de los del envío."""
+    if getattr(conn, "sock", True) is not None:
+        return
+    try:
+        conn.connect()
+    except OSError as e:
+        conn.close()
+        raise ConnectError(str(e)) from e
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones keep-alive a un host. Cada hilo toma una conexión libre
+    (o abre una nueva) y la devuelve al terminar; como máximo `size` quedan ociosas.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        size: int = POOL_SIZE,
+        timeout: float = TIMEOUT_S,
+        factory=None,
+        scheme: str = "https",
+    ):
+        self.host = host
+        self.size = size
+        self.timeout = timeout
+        conn_cls = http.client.HTTPConnection if scheme == "http" else http.client.HTTPSConnection
+        self._factory = factory or (lambda: conn_cls(self.host, timeout=self.timeout))
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._factory(), False
+
+    def _release(self, conn) -> None:
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method: str, path: str, body: bytes, headers: dict) -> tuple[int, bytes]:
+        """
+        Devuelve (status, cuerpo). Si la conexión reutilizada ya estaba cerrada
+        al escribir la petición (nada se envió), reintenta una vez en una nueva.
+        Un fallo al leer la respuesta no se reintenta: el mensaje pudo haber
+        salido. Levanta ConnectError si no se pudo conectar (nada se envió).
+        """
+        conn, reused = self._acquire()
+        if not reused:
+            _connect(conn)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+        except _STALE_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            # keep-alive caducado del lado del servidor: una conexión nueva
+            conn = self._factory()
+            _connect(conn)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                raise
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            raise
+        try:
+            resp = conn.getresponse()
+            data = resp.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        return resp.status, data
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pool = None
+_executor = None
+_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = ConnectionPool(GRAPH_HOST, scheme=GRAPH_SCHEME)
+    return _pool
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=SEND_CONCURRENCY, thread_name_prefix="wa-send"
+                )
+    return _executor
+
+
+def send_many(payloads: list[dict], post, on_result=None) -> list[dict]:
+    """
+    Envía `payloads` en paralelo usando `post(payload) -> dict`.
+
+    Los mensajes al mismo destinatario (`payload["to"]`) se envían en serie y en
+    el orden recibido; destinatarios distintos avanzan en paralelo. El resultado
+    i-ésimo corresponde al payload i-ésimo. `on_result(i, resultado)` se llama
+    apenas termina cada envío, sin esperar al resto.
+    """
+    results: list[dict | None] = [None] * len(payloads)
+    by_recipient: dict[str, list[int]] = {}
+    for i, payload in enumerate(payloads):
+        by_recipient.setdefault(payload.get("to", ""), []).append(i)
+
+    def _run(indexes: list[int]) -> None:
+        for i in indexes:
+            try:
+                results[i] = post(payloads[i])
+            except Exception as e:  # noqa: BLE001 - un envío no debe tumbar al resto
+                logger.exception("WA send failed: %s", e)
+                results[i] = {"ok": False, "error": str(e)}
+            if on_result is not None:
+                try:
+                    on_result(i, results[i])
+                except Exception as e:  # noqa: BLE001 - el envío ya salió
+                    logger.exception("on_result failed for send %d: %s", i, e)
+
+    groups = list(by_recipient.values())
+    if len(groups) <= 1:
+        for g in groups:
+            _run(g)
+        return results
+
+    futures = [_get_executor().submit(_run, g) for g in groups]
+    for f in futures:
+        f.result()
+    return results
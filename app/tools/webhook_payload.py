@@ -0,0 +1,175 @@
+"""
+Lectura de los payloads del webhook de WhatsApp Cloud API con orjson (o el
+`json` estándar si orjson no está instalado: no viaja en las capas de Lambda).
+
+El cuerpo se decodifica una sola vez directo desde los bytes (o el str de API
+Gateway), `iter_events` recorre entry → changes → value y entrega registros
+tipados (`InboundMessage`, `StatusUpdate`) sin copiar el resto del payload, y
+el log recorta los bytes crudos en lugar de volver a serializar el JSON.
+"""
+import base64
+import json
+import logging
+import os
+from collections import Counter
+from collections.abc import Iterator
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del empaquetado
+    orjson = None
+
+LOG_MAX_BYTES = int(os.environ.get("WEBHOOK_LOG_MAX_BYTES", "2000"))
+
+
+class PayloadError(ValueError):
+    """El cuerpo del webhook no es JSON válido."""
+
+
+def raw_body(event: dict) -> bytes | str:
+    """Cuerpo crudo del evento HTTP API v2 (bytes si venía en base64)."""
+    body = event.get("body") or "{}"
+    if event.get("isBase64Encoded") is True or event.get("isBase64Encoded") == "true":
+        return base64.b64decode(body)
+    return body
+
+
+def loads(raw: bytes | str):
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, default=str, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def parse(raw: bytes | str) -> dict:
+    try:
+        body = loads(raw)
+    except ValueError as e:  # orjson.JSONDecodeError y json.JSONDecodeError
+        raise PayloadError(str(e)) from e
+    if not isinstance(body, dict):
+        raise PayloadError(f"expected object, got {type(body).__name__}")
+    return body
+
+
+# ===== Registros =====
+class InboundMessage:
+    """Mensaje entrante (`value.messages[]`); `text` vacío si no es de texto."""
+
+    __slots__ = ("id", "sender", "type", "timestamp", "text", "phone_number_id")
+
+    def __init__(self, id, sender, type, timestamp="", text="", phone_number_id=""):
+        self.id = id
+        self.sender = sender
+        self.type = type
+        self.timestamp = timestamp
+        self.text = text
+        self.phone_number_id = phone_number_id
+
+    @classmethod
+    def from_record(cls, msg: dict, metadata: dict | None = None) -> "InboundMessage":
+        """Desde un mensaje de Meta o un registro compacto de la cola de entrada."""
+        return cls(
+            msg.get("id", ""),
+            msg.get("from", ""),
+            msg.get("type", ""),
+            msg.get("timestamp", ""),
+            (msg.get("text") or {}).get("body") or "",
+            msg.get("phone_number_id") or (metadata or {}).get("phone_number_id") or "",
+        )
+
+    def to_record(self) -> dict:
+        """Registro compacto para la cola de entrada: solo lo necesario para procesarlo."""
+        rec = {"id": self.id, "from": self.sender, "type": self.type, "timestamp": self.timestamp}
+        if self.type == "text":
+            rec["text"] = {"body": self.text}
+        if self.phone_number_id:
+            rec["phone_number_id"] = self.phone_number_id
+        return rec
+
+    def __repr__(self) -> str:
+        return f"InboundMessage({self.id!r}, type={self.type!r})"
+
+
+class StatusUpdate:
+    """Estado de entrega de un mensaje saliente (`value.statuses[]`)."""
+
+    __slots__ = ("id", "status", "recipient_id", "timestamp", "errors", "phone_number_id")
+
+    def __init__(self, id, status, recipient_id="", timestamp="", errors=(), phone_number_id=""):
+        self.id = id
+        self.status = status
+        self.recipient_id = recipient_id
+        self.timestamp = timestamp
+        self.errors = errors
+        self.phone_number_id = phone_number_id
+
+    @classmethod
+    def from_record(cls, st: dict, metadata: dict | None = None) -> "StatusUpdate":
+        return cls(
+            st.get("id", ""),
+            st.get("status", ""),
+            st.get("recipient_id", ""),
+            st.get("timestamp", ""),
+            tuple(st.get("errors") or ()),
+            st.get("phone_number_id") or (metadata or {}).get("phone_number_id") or "",
+        )
+
+    def to_record(self) -> dict:
+        """Registro compacto para la cola de entrada (lo distingue la clave `status`)."""
+        rec = {"id": self.id, "status": self.status, "timestamp": self.timestamp}
+        if self.errors:
+            rec["errors"] = list(self.errors)
+        if self.phone_number_id:
+            rec["phone_number_id"] = self.phone_number_id
+        return rec
+
+    def __repr__(self) -> str:
+        return f"StatusUpdate({self.id!r}, status={self.status!r})"
+
+
+def from_queue_record(rec: dict) -> InboundMessage | StatusUpdate:
+    """Registro de la cola de entrada (ver `to_record`) → registro tipado."""
+    if "status" in rec:
+        return StatusUpdate.from_record(rec)
+    return InboundMessage.from_record(rec)
+
+
+def iter_events(body: dict) -> Iterator[InboundMessage | StatusUpdate]:
+    """Recorre el payload en orden: por cada `value`, primero estados y luego mensajes."""
+    for entry in body.get("entry") or ():
+        for change in entry.get("changes") or ():
+            value = change.get("value") or {}
+            metadata = value.get("metadata")
+            for st in value.get("statuses") or ():
+                yield StatusUpdate.from_record(st, metadata)
+            for msg in value.get("messages") or ():
+                yield InboundMessage.from_record(msg, metadata)
+
+
+# ===== Log =====
+def _clip(raw: bytes | str, limit: int) -> str:
+    if isinstance(raw, str):
+        return raw[:limit]
+    return raw[:limit].decode("utf-8", "replace")
+
+
+def log_raw(logger: logging.Logger, label: str, raw: bytes | str, limit: int = LOG_MAX_BYTES):
+    """Loguea los primeros `limit` bytes del cuerpo tal como llegó (sin re-serializar)."""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("%s (%d bytes): %s", label, len(raw), _clip(raw, limit))
+
+
+def log_event(logger: logging.Logger, label: str, event, limit: int = LOG_MAX_BYTES):
+    """Loguea un evento ya decodificado (una sola serialización, recortada a `limit`)."""
+    if logger.isEnabledFor(logging.INFO):
+        raw = dumps(event)
+        logger.info("%s (%d bytes): %s", label, len(raw), _clip(raw, limit))
+
+
+def status_summary(statuses) -> str:
+    """'delivered=3 read=1' para loguear estados sin volcar cada uno."""
+    counts = Counter(st.status for st in statuses)
+    return " ".join(f"{k}={v}" for k, v in sorted(counts.items()))
@@ -1,10 +1,11 @@
+import http.client
 import json
 import logging
 import os
-import urllib.error
-import urllib.request
 
-import boto3
+from . import wa_sender
+from .outbound_queue import OutboundQueue, default_dead_letters
+from .secrets_cache import SECRETS
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -14,57 +15,76 @@ OWNER_WA_E164 = os.environ.get("OWNER_WA_E164", "")
 TEMPLATE_NAME = os.environ.get("OWNER_WA_TEMPLATE", "owner_alert_v2")
 LANG_CODE = os.environ.get("OWNER_WA_LANG", "es_EC")
 
-_secrets_cache = None
 
-
-def _get_meta_creds():
-    global _secrets_cache
-    if _secrets_cache:
-        return _secrets_cache
-    sm = boto3.client("secretsmanager")
-    resp = sm.get_secret_value(SecretId=SECRETS_NAME)
-    data = json.loads(resp["SecretString"])
-    _secrets_cache = {
-        "access_token": data["access_token"],
-        "phone_number_id": data["phone_number_id"],
-    }
-    return _secrets_cache
+def _get_meta_creds(secret_name: str = SECRETS_NAME):
+    data = SECRETS.get(secret_name)
+    return {"access_token": data["access_token"], "phone_number_id": data["phone_number_id"]}
 
 
-def _post_messages(payload: dict) -> dict:
-    creds = _get_meta_creds()
-    url = f"https://graph.facebook.com/v20.0/{creds['phone_number_id']}/messages"
+def _post_messages(payload: dict, secret_name: str = SECRETS_NAME) -> dict:
+    creds = _get_meta_creds(secret_name)
+    path = f"/{wa_sender.GRAPH_VERSION}/{creds['phone_number_id']}/messages"
     headers = {
         "Authorization": f"Bearer {creds['access_token']}",
         "Content-Type": "application/json",
     }
     body = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(url, data=body, headers=headers, method="POST")
     try:
-        with urllib.request.urlopen(req, timeout=10) as r:
-            txt = r.read().decode("utf-8")
-            logger.info("WA resp: %s", txt)
-            try:
-                return {"ok": True, "resp": json.loads(txt)}
-            except json.JSONDecodeError:
-                return {"ok": True, "resp_text": txt}
-    except urllib.error.HTTPError as e:
-        err = e.read().decode("utf-8") if e.fp else str(e)
-        logger.error("WA error %s: %s", e.code, err)
-        return {"ok": False, "status": e.code, "error": err}
-    except urllib.error.URLError as e:
+        status, data = wa_sender.get_pool().request("POST", path, body, headers)
+    except wa_sender.ConnectError as e:
+        logger.warning("WA connect error: %s", e)
+        return {"ok": False, "error": str(e), "connect_error": True}
+    except (http.client.HTTPException, OSError) as e:
         logger.exception("WA error: %s", e)
         return {"ok": False, "error": str(e)}
+    txt = data.decode("utf-8", errors="replace")
+    if status >= 400:
+        logger.error("WA error %s: %s", status, txt)
+        if status == 401:
+            # token rotado o revocado: la próxima llamada relee el secreto
+            SECRETS.invalidate(secret_name)
+        return {"ok": False, "status": status, "error": txt}
+    logger.info("WA resp: %s", txt)
+    try:
+        return {"ok": True, "resp": json.loads(txt)}
+    except json.JSONDecodeError:
+        return {"ok": True, "resp_text": txt}
 
 
-def send_owner_template(paciente: str, fecha_hora: str, estado: str) -> dict:
-    payload = {
+# Ritmo por número, reintentos con jitter y dead-letter para todos los envíos
+OUTBOUND = OutboundQueue(lambda payload: _post_messages(payload), default_dead_letters())
+
+
+def send_many(payloads: list[dict], on_result=None) -> list[dict]:
+    """
+    Envía varios payloads en paralelo (orden preservado por destinatario).
+    `on_result(i, resultado)` se llama al terminar cada envío.
+    """
+    if not payloads:
+        return []
+    return OUTBOUND.send_many(payloads, _get_meta_creds()["phone_number_id"], on_result)
+
+
+def _send_one(payload: dict) -> dict:
+    return send_many([payload])[0]
+
+
+def owner_template_payload(
+    paciente: str,
+    fecha_hora: str,
+    estado: str,
+    owner_e164: str = None,
+    template_name: str = None,
+    lang_code: str = None,
+) -> dict:
+    owner = owner_e164 or OWNER_WA_E164
+    return {
         "messaging_product": "whatsapp",
-        "to": OWNER_WA_E164[1:] if OWNER_WA_E164.startswith("+") else OWNER_WA_E164,
+        "to": owner[1:] if owner.startswith("+") else owner,
         "type": "template",
         "template": {
-            "name": TEMPLATE_NAME,  # "owner_alert"
-            "language": {"code": LANG_CODE},  # "es_EC"
+            "name": template_name or TEMPLATE_NAME,  # "owner_alert"
+            "language": {"code": lang_code or LANG_CODE},  # "es_EC"
             "components": [
                 {
                     "type": "body",
@@ -77,22 +97,28 @@ def send_owner_template(paciente: str, fecha_hora: str, estado: str) -> dict:
             ],
         },
     }
-    return _post_messages(payload)
 
 
-def send_text(to_e164: str, text: str) -> dict:
+def send_owner_template(paciente: str, fecha_hora: str, estado: str) -> dict:
+    return _send_one(owner_template_payload(paciente, fecha_hora, estado))
+
+
+def text_payload(to_e164: str, text: str) -> dict:
     # Cloud API acepta número internacional (normalmente sin '+', pero con '+' también funciona).
     to = to_e164[1:] if to_e164.startswith("+") else to_e164
-    payload = {
+    return {
         "messaging_product": "whatsapp",
         "to": to,
         "type": "text",
         "text": {"preview_url": False, "body": text[:4000]},
     }
-    return _post_messages(payload)
 
 
-def send_patient_reminder(
+def send_text(to_e164: str, text: str) -> dict:
+    return _send_one(text_payload(to_e164, text))
+
+
+def patient_reminder_payload(
     to_e164: str,
     paciente: str,
     fecha_hora: str,
@@ -103,7 +129,7 @@ def send_patient_reminder(
     creds_lang = lang_code or LANG_CODE
     tname = template_name or "patient_reminder"
     to = to_e164[1:] if to_e164.startswith("+") else to_e164
-    payload = {
+    return {
         "messaging_product": "whatsapp",
         "to": to,
         "type": "template",
@@ -126,4 +152,18 @@ def send_patient_reminder(
             ],
         },
     }
-    return _post_messages(payload)
+
+
+def send_patient_reminder(
+    to_e164: str,
+    paciente: str,
+    fecha_hora: str,
+    confirmar_texto: str,
+    template_name: str = None,
+    lang_code: str = None,
+) -> dict:
+    return _send_one(
+        patient_reminder_payload(
+            to_e164, paciente, fecha_hora, confirmar_texto, template_name, lang_code
+        )
+    )
@@ -84,11 +84,13 @@ module "lambda_wa" {
   source_dir     = "${path.root}/../../../../app"
   handler        = "runtime/wa_events_handler.handler" # <-- sin app/
   env_vars = {
+    DDB_TABLE           = module.ddb.table_name
     VERIFY_TOKEN        = "PT_VERIFY_DEV" # cámbialo si quieres
     OWNER_WA_E164       = var.owner_wa_e164
     META_WA_SECRET_NAME = "pelvis/wa/meta-owner"
     OWNER_WA_TEMPLATE   = "owner_alert_v2"
     OWNER_WA_LANG       = "es_EC"
+    OWNER_NOTIFY_MODE   = var.owner_notify_mode
   }
   tags = local.tags
 }
@@ -105,6 +107,7 @@ module "lambda_reminder" {
     META_WA_SECRET_NAME = "pelvis/wa/meta-owner"
     OWNER_WA_TEMPLATE   = "owner_alert"
     OWNER_WA_LANG       = "es_EC"
+    SECRETS_PREFETCH    = "pelvis/wa/meta-owner"
   }
   tags = local.tags
 }
@@ -117,17 +120,71 @@ module "lambda_meta" {
   handler        = "runtime/meta_webhook_handler.handler"
   layers         = [module.layer_agents.layer_arn]
   env_vars = {
-    DDB_TABLE           = module.ddb.table_name
-    VERIFY_TOKEN        = "PT_VERIFY_DEV" # cámbialo si quieres
-    OWNER_WA_E164       = var.owner_wa_e164
-    META_WA_SECRET_NAME = "pelvis/wa/meta-owner"
-    OWNER_WA_TEMPLATE   = "owner_alert"
-    OWNER_WA_LANG       = "es_EC"
-    PT_CONTENT_PATH     = "content/pelvis/services.yml"
+    DDB_TABLE               = module.ddb.table_name
+    VERIFY_TOKEN            = "PT_VERIFY_DEV" # cámbialo si quieres
+    OWNER_WA_E164           = var.owner_wa_e164
+    META_WA_SECRET_NAME     = "pelvis/wa/meta-owner"
+    OWNER_WA_TEMPLATE       = "owner_alert"
+    OWNER_WA_LANG           = "es_EC"
+    PT_CONTENT_PATH         = "content/pelvis/service.yml"
+    RESPONSE_CACHE_BACKENDS = "lru,dynamodb"
+    WEBHOOK_MODE            = "async" # encola y responde 200; procesa lambda_inbound
+    INBOUND_QUEUE_URL       = aws_sqs_queue.inbound.url
+    OWNER_NOTIFY_MODE       = var.owner_notify_mode
+    SECRETS_PREFETCH        = "pelvis/wa/meta-owner"
+    STAGE                   = "dev"
+  }
+  tags = local.tags
+}
+
+# Cola de mensajes entrantes (modo async del webhook)
+resource "aws_sqs_queue" "inbound_dlq" {
+  name                      = "${var.project_prefix}-inbound-dlq"
+  message_retention_seconds = 1209600
+  tags                      = local.tags
+}
+
+resource "aws_sqs_queue" "inbound" {
+  name                       = "${var.project_prefix}-inbound"
+  visibility_timeout_seconds = 60 # >= timeout de la Lambda consumidora
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.inbound_dlq.arn
+    maxReceiveCount     = 3
+  })
+  tags = local.tags
+}
+
+module "lambda_inbound" {
+  source         = "../../modules/lambda_function"
+  project_prefix = var.project_prefix
+  function_name  = "inbound-consumer"
+  source_dir     = "${path.root}/../../../../app"
+  handler        = "runtime/meta_webhook_handler.consumer_handler"
+  timeout        = 50 # < visibility_timeout_seconds de la cola inbound
+  layers         = [module.layer_agents.layer_arn]
+  env_vars = {
+    DDB_TABLE               = module.ddb.table_name
+    OWNER_WA_E164           = var.owner_wa_e164
+    META_WA_SECRET_NAME     = "pelvis/wa/meta-owner"
+    OWNER_WA_TEMPLATE       = "owner_alert"
+    OWNER_WA_LANG           = "es_EC"
+    PT_CONTENT_PATH         = "content/pelvis/service.yml"
+    RESPONSE_CACHE_BACKENDS = "lru,dynamodb"
+    OWNER_NOTIFY_MODE       = var.owner_notify_mode
+    SECRETS_PREFETCH        = "pelvis/wa/meta-owner"
+    STAGE                   = "dev"
   }
   tags = local.tags
 }
 
+resource "aws_lambda_event_source_mapping" "inbound_to_consumer" {
+  event_source_arn                   = aws_sqs_queue.inbound.arn
+  function_name                      = module.lambda_inbound.lambda_arn
+  batch_size                         = 10
+  maximum_batching_window_in_seconds = 1
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
 module "lambda_scheduler" {
   source         = "../../modules/lambda_function"
   project_prefix = var.project_prefix
@@ -146,10 +203,120 @@ module "lambda_scheduler" {
     OWNER_WA_LANG           = "es_EC"
     STAGE                   = "dev"
     FAST_MODE               = "1"
+    REMINDER_ENGINE         = var.reminder_engine
+    SCHEDULE_GROUP          = aws_scheduler_schedule_group.reminders.name
+  }
+  tags = local.tags
+}
+
+# Grupo de los schedules de recordatorio (se crean con ActionAfterCompletion=DELETE)
+resource "aws_scheduler_schedule_group" "reminders" {
+  name = "pt-dev-reminders"
+  tags = local.tags
+}
+
+# Limpieza diaria de schedules huérfanos (cita borrada, cancelada o pasada)
+module "lambda_schedule_gc" {
+  source         = "../../modules/lambda_function"
+  project_prefix = var.project_prefix
+  function_name  = "schedule-gc"
+  source_dir     = "${path.root}/../../../../app"
+  handler        = "runtime/schedule_gc.handler"
+  timeout        = 300
+  env_vars = {
+    DDB_TABLE                   = module.ddb.table_name
+    STAGE                       = "dev"
+    SCHEDULE_GC_GROUPS          = "${aws_scheduler_schedule_group.reminders.name},default"
+    SCHEDULE_DELETE_CONCURRENCY = "16"
+  }
+  tags = local.tags
+}
+
+resource "aws_scheduler_schedule" "schedule_gc" {
+  name                = "${var.project_prefix}-schedule-gc"
+  schedule_expression = "cron(0 8 * * ? *)"
+
+  flexible_time_window {
+    mode = "OFF"
+  }
+
+  target {
+    arn      = module.lambda_schedule_gc.lambda_arn
+    role_arn = aws_iam_role.scheduler_invoke_role.arn
+  }
+}
+
+# Motor de recordatorios por buckets: un barrido por minuto en lugar de un
+# schedule por recordatorio (activo con reminder_engine = "sweeper")
+module "lambda_sweeper" {
+  source         = "../../modules/lambda_function"
+  project_prefix = var.project_prefix
+  function_name  = "reminder-sweeper"
+  source_dir     = "${path.root}/../../../../app"
+  handler        = "runtime/reminder_sweeper.handler"
+  env_vars = {
+    DDB_TABLE           = module.ddb.table_name
+    OWNER_WA_E164       = var.owner_wa_e164
+    META_WA_SECRET_NAME = "pelvis/wa/meta-owner"
+    OWNER_WA_TEMPLATE   = "owner_alert"
+    OWNER_WA_LANG       = "es_EC"
+    SWEEP_BATCH_SIZE    = "100"
+  }
+  tags = local.tags
+}
+
+resource "aws_scheduler_schedule" "reminder_sweeper" {
+  name                = "${var.project_prefix}-reminder-sweeper"
+  schedule_expression = "rate(1 minute)"
+  state               = var.reminder_engine == "sweeper" ? "ENABLED" : "DISABLED"
+
+  flexible_time_window {
+    mode = "OFF"
+  }
+
+  target {
+    arn      = module.lambda_sweeper.lambda_arn
+    role_arn = aws_iam_role.scheduler_invoke_role.arn
+    retry_policy {
+      maximum_retry_attempts = 0 # el siguiente minuto reintenta desde la marca de agua
+    }
+  }
+}
+
+# Resumen de avisos a la propietaria: un envío por ventana en lugar de uno por
+# evento (activo con owner_notify_mode = "digest"; escalamientos siguen inmediatos)
+module "lambda_owner_digest" {
+  source         = "../../modules/lambda_function"
+  project_prefix = var.project_prefix
+  function_name  = "owner-digest"
+  source_dir     = "${path.root}/../../../../app"
+  handler        = "runtime/owner_digest_flusher.handler"
+  env_vars = {
+    DDB_TABLE               = module.ddb.table_name
+    OWNER_WA_E164           = var.owner_wa_e164
+    META_WA_SECRET_NAME     = "pelvis/wa/meta-owner"
+    OWNER_WA_TEMPLATE       = "owner_alert"
+    OWNER_WA_LANG           = "es_EC"
+    OWNER_DIGEST_WINDOW_MIN = tostring(var.owner_digest_window_min)
   }
   tags = local.tags
 }
 
+resource "aws_scheduler_schedule" "owner_digest" {
+  name                = "${var.project_prefix}-owner-digest"
+  schedule_expression = "rate(${var.owner_digest_window_min} minutes)"
+  state               = var.owner_notify_mode == "digest" ? "ENABLED" : "DISABLED"
+
+  flexible_time_window {
+    mode = "OFF"
+  }
+
+  target {
+    arn      = module.lambda_owner_digest.lambda_arn
+    role_arn = aws_iam_role.scheduler_invoke_role.arn
+  }
+}
+
 module "layer_google" {
   source          = "../../modules/lambda_layer"
   layer_name      = "${var.project_prefix}-google-deps"
@@ -174,6 +341,7 @@ module "lambda_appts" {
   source_dir     = "${path.root}/../../../../app"
   layers         = [module.layer_google.layer_arn]
   env_vars = {
+    DDB_TABLE               = module.ddb.table_name
     GCAL_SECRET_NAME        = "pelvis/gcal/sa"
     GCAL_CALENDAR_ID        = var.gcal_calendar_id # agrega esta var en variables.tf
     TZ                      = "America/Guayaquil"
@@ -182,6 +350,10 @@ module "lambda_appts" {
     META_WA_SECRET_NAME     = "pelvis/wa/meta-owner"
     OWNER_WA_TEMPLATE       = "owner_alert"
     OWNER_WA_LANG           = "es_EC"
+    OWNER_NOTIFY_MODE       = var.owner_notify_mode
+    SECRETS_PREFETCH        = "pelvis/gcal/sa,pelvis/wa/meta-owner"
+    STAGE                   = "dev"
+    SCHEDULE_GROUP          = aws_scheduler_schedule_group.reminders.name
   }
   tags = local.tags
 }
@@ -214,7 +386,64 @@ resource "aws_iam_role_policy" "scheduler_invoke_policy" {
     Statement = [{
       Effect : "Allow",
       Action : ["lambda:InvokeFunction"],
-      Resource : module.lambda_reminder.lambda_arn
+      Resource : [
+        module.lambda_reminder.lambda_arn,
+        module.lambda_sweeper.lambda_arn,
+        module.lambda_calendar_sync.lambda_arn,
+        module.lambda_owner_digest.lambda_arn,
+        module.lambda_schedule_gc.lambda_arn,
+      ]
+    }]
+  })
+}
+
+# Sincronización incremental de Google Calendar → filas APPT# (cambios hechos a mano)
+module "lambda_calendar_sync" {
+  source         = "../../modules/lambda_function"
+  project_prefix = var.project_prefix
+  function_name  = "calendar-sync"
+  handler        = "runtime/calendar_sync.handler"
+  source_dir     = "${path.root}/../../../../app"
+  layers         = [module.layer_google.layer_arn]
+  env_vars = {
+    DDB_TABLE               = module.ddb.table_name
+    GCAL_SECRET_NAME        = "pelvis/gcal/sa"
+    GCAL_CALENDAR_ID        = var.gcal_calendar_id
+    TZ                      = "America/Guayaquil"
+    REMINDER_SCHEDULER_NAME = "pt-dev-reminder-scheduler"
+    SECRETS_PREFETCH        = "pelvis/gcal/sa"
+    STAGE                   = "dev"
+  }
+  tags = local.tags
+}
+
+resource "aws_scheduler_schedule" "calendar_sync" {
+  name                = "${var.project_prefix}-calendar-sync"
+  schedule_expression = "rate(5 minutes)"
+
+  flexible_time_window {
+    mode = "OFF"
+  }
+
+  target {
+    arn      = module.lambda_calendar_sync.lambda_arn
+    role_arn = aws_iam_role.scheduler_invoke_role.arn
+  }
+}
+
+data "aws_iam_role" "calendar_sync_role" {
+  name = "${var.project_prefix}-calendar-sync-role"
+}
+
+resource "aws_iam_role_policy" "calendar_sync_invoke_scheduler" {
+  name = "${var.project_prefix}-calendar-sync-invoke-scheduler"
+  role = data.aws_iam_role.calendar_sync_role.name
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [{
+      Effect   = "Allow",
+      Action   = ["lambda:InvokeFunction"],
+      Resource = module.lambda_scheduler.lambda_arn
     }]
   })
 }
@@ -277,6 +506,26 @@ resource "aws_iam_role_policy" "meta_bedrock" {
   })
 }
 
+data "aws_iam_role" "inbound_role" {
+  name = "${var.project_prefix}-inbound-consumer-role"
+}
+
+resource "aws_iam_role_policy" "inbound_bedrock" {
+  name = "${var.project_prefix}-inbound-bedrock"
+  role = data.aws_iam_role.inbound_role.name
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [{
+      Effect : "Allow",
+      Action : [
+        "bedrock:InvokeModel",
+        "bedrock:InvokeModelWithResponseStream"
+      ],
+      Resource : "*"
+    }]
+  })
+}
+
 resource "aws_s3_bucket" "layers" {
   bucket        = "${var.project_prefix}-lambda-layers-${data.aws_caller_identity.current.account_id}-${var.region}"
   force_destroy = true
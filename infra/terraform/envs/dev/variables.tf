@@ -23,4 +23,21 @@ variable "owner_wa_e164" {
 variable "gcal_calendar_id" {
   type        = string
   description = "Calendar ID de Pelvis Therapy"
-}
\ No newline at end of file
+}
+variable "reminder_engine" {
+  type        = string
+  description = "Motor de recordatorios: schedules (uno por recordatorio) o sweeper (buckets por minuto)"
+  default     = "schedules"
+}
+
+variable "owner_notify_mode" {
+  type        = string
+  description = "Avisos a la propietaria: immediate (uno por evento) o digest (resumen por ventana)"
+  default     = "immediate"
+}
+
+variable "owner_digest_window_min" {
+  type        = number
+  description = "Minutos por ventana del resumen de avisos (>= 2)"
+  default     = 15
+}
@@ -40,6 +40,24 @@ resource "aws_dynamodb_table" "this" {
     projection_type = "ALL"
   }
 
+  # Recordatorios pendientes por minuto (REMINDER_ENGINE=sweeper).
+  # Índice disperso: gsi2pk se elimina al despachar.
+  attribute {
+    name = "gsi2pk"
+    type = "S"
+  }
+  attribute {
+    name = "gsi2sk"
+    type = "S"
+  }
+
+  global_secondary_index {
+    name            = "gsi2"
+    hash_key        = "gsi2pk"   # REMBUCKET#YYYYmmddHHMM
+    range_key       = "gsi2sk"   # ISO vencimiento#appt_id#action
+    projection_type = "ALL"
+  }
+
   point_in_time_recovery {
     enabled = true
   }
@@ -37,6 +37,12 @@ variable "layers" {
   default = []
 }
 
+# Segundos; los jobs por lotes (p. ej. schedule-gc) necesitan más que el default
+variable "timeout" {
+  type    = number
+  default = 10
+}
+
 data "archive_file" "zip" {
   type        = "zip"
   source_dir  = var.source_dir
@@ -71,7 +77,7 @@ data "aws_iam_policy_document" "lambda_inline" {
   statement {
     sid     = "DDBBasic"
     effect  = "Allow"
-    actions = ["dynamodb:GetItem","dynamodb:PutItem","dynamodb:UpdateItem","dynamodb:DeleteItem","dynamodb:Query"]
+    actions = ["dynamodb:GetItem","dynamodb:PutItem","dynamodb:UpdateItem","dynamodb:DeleteItem","dynamodb:Query","dynamodb:BatchWriteItem","dynamodb:BatchGetItem"]
     resources = ["*"]
   }
 
@@ -96,6 +102,18 @@ data "aws_iam_policy_document" "lambda_inline" {
     resources = ["*"]
   }
 
+  statement {
+    sid     = "SQS"
+    effect  = "Allow"
+    actions = [
+      "sqs:SendMessage",
+      "sqs:ReceiveMessage",
+      "sqs:DeleteMessage",
+      "sqs:GetQueueAttributes"
+    ]
+    resources = ["*"]
+  }
+
   statement {
     sid     = "Scheduler"
     effect  = "Allow"
@@ -104,6 +122,7 @@ data "aws_iam_policy_document" "lambda_inline" {
       "scheduler:UpdateSchedule",
       "scheduler:DeleteSchedule",
       "scheduler:GetSchedule",
+      "scheduler:ListSchedules",
       "iam:PassRole"
     ]
     resources = ["*"]
@@ -123,7 +142,7 @@ resource "aws_lambda_function" "this" {
   source_code_hash = data.archive_file.zip.output_base64sha256
   runtime          = var.runtime
   handler          = var.handler
-  timeout          = 10
+  timeout          = var.timeout
   layers           = var.layers
 
   environment {
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de buscar_servicio: escaneo lineal original (YAML + substrings
+en cada llamada) vs. índice compilado (BM25 sobre índice invertido).
+
+Uso:
+    python scripts/bench_catalog_index.py [--queries 200]
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from agents import catalog_index  # noqa: E402
+
+SIZES = [10, 100, 1000, 10000]
+WORDS = (
+    "dolor pélvico suelo postparto incontinencia urinaria biofeedback diástasis "
+    "ejercicios hipopresivos terapia manual evaluación embarazo prolapso vejiga "
+    "fortalecimiento respiración postura cicatriz cesárea masaje reeducación"
+).split()
+QUESTIONS = [
+    "¿tienen algo para la incontinencia?",
+    "dolor pelvico despues del parto",
+    "quiero terapia manual para cicatriz de cesarea",
+    "ejercicios hipopresivos",
+    "hola, cuanto cuesta?",
+]
+
+
+def _catalog(n: int, rnd: random.Random) -> dict:
+    # vocabulario que crece con el catálogo, como en uno real (términos específicos)
+    vocab = WORDS + [
+        "".join(rnd.choice("bcdfglmnprstv") + rnd.choice("aeiou") for _ in range(4))
+        for _ in range(n)
+    ]
+    return {
+        "servicios": [
+            {
+                "nombre": " ".join(rnd.sample(vocab, 3)) + f" {i}",
+                "duracion": "50 minutos",
+                "descripcion": " ".join(rnd.sample(WORDS, 2) + rnd.sample(vocab, 6)) + ".",
+            }
+            for i in range(n)
+        ],
+        "contacto": {"direccion": "Ambato", "whatsapp": "+593", "horario": "Lun-Vie"},
+    }
+
+
+def _legacy(path: Path, pregunta: str) -> str:
+    """Implementación original de buscar_servicio."""
+    data = yaml.safe_load(path.read_text(encoding="utf-8"))
+    svc = data.get("servicios", [])
+    hits = []
+    q = pregunta.lower()
+    for s in svc:
+        if any(k in q for k in (s["nombre"].lower().split())) or any(
+            w in s["descripcion"].lower() for w in q.split()
+        ):
+            hits.append(f"- {s['nombre']} ({s['duracion']}): {s['descripcion']}")
+    if not hits:
+        hits = [f"- {s['nombre']} ({s['duracion']}): {s['descripcion']}" for s in svc[:3]]
+    footer = (
+        f"\n\nDirección: {data['contacto']['direccion']}\nWhatsApp: "
+        f"{data['contacto']['whatsapp']}\nHorario: {data['contacto']['horario']}"
+    )
+    return "Servicios recomendados:\n" + "\n".join(hits) + footer
+
+
+def _per_call_us(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(QUESTIONS[i % len(QUESTIONS)])
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=200)
+    args = ap.parse_args()
+    rnd = random.Random(7)
+
+    print(f"{'services':>9} {'build ms':>9} {'legacy us/q':>12} {'index us/q':>11} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in SIZES:
+            path = Path(tmp) / f"catalog_{n}.yml"
+            path.write_text(yaml.safe_dump(_catalog(n, rnd), allow_unicode=True), encoding="utf-8")
+            catalog_index.clear_cache()
+
+            t0 = time.perf_counter()
+            catalog_index.get_index(path)
+            build_ms = (time.perf_counter() - t0) * 1000
+
+            # el original relee el YAML en cada llamada: menos iteraciones en catálogos grandes
+            legacy_n = max(3, min(args.queries, 20000 // n))
+            legacy = _per_call_us(lambda q: _legacy(path, q), legacy_n)
+            index = _per_call_us(lambda q: catalog_index.get_index(path).answer(q), args.queries)
+            print(f"{n:>9} {build_ms:9.1f} {legacy:12.1f} {index:11.1f} {legacy / index:7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
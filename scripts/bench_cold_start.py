@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Mide el cold start (import del módulo) de cada handler Lambda en un proceso
+nuevo, y qué paquetes pesados quedan cargados tras importarlo.
+
+Uso:
+    python scripts/bench_cold_start.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+
+HANDLERS = [
+    "runtime.meta_webhook_handler",
+    "runtime.reminder_scheduler",
+    "runtime.reminder_dispatcher",
+    "runtime.appointments_manager",
+    "runtime.wa_events_handler",
+]
+
+HEAVY = ["boto3", "strands", "googleapiclient", "yaml"]
+
+# Variables mínimas para que los módulos importen sin AWS real
+DUMMY_ENV = {
+    "DDB_TABLE": "bench",
+    "SCHEDULER_ROLE_ARN": "arn:aws:iam::000000000000:role/bench",
+    "REMINDER_DISPATCHER_ARN": "arn:aws:lambda:us-east-1:000000000000:function:bench",
+    "AWS_DEFAULT_REGION": "us-east-1",
+}
+
+PROBE = """
+import importlib, json, sys, time
+t0 = time.perf_counter()
+mod = importlib.import_module(sys.argv[1])
+import_ms = (time.perf_counter() - t0) * 1000
+get_ms = None
+if sys.argv[1].endswith("meta_webhook_handler"):
+    ev = {"requestContext": {"http": {"method": "GET"}},
+          "queryStringParameters": {"hub.mode": "subscribe",
+                                    "hub.verify_token": mod.VERIFY_TOKEN,
+                                    "hub.challenge": "1"}}
+    t1 = time.perf_counter()
+    mod.handler(ev, None)
+    get_ms = (time.perf_counter() - t1) * 1000
+heavy = [m for m in %r if m in sys.modules]
+print(json.dumps({"import_ms": import_ms, "get_ms": get_ms, "heavy": heavy}))
+""" % (HEAVY,)
+
+
+def _probe(module: str) -> dict:
+    env = {**os.environ, **DUMMY_ENV}
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE, module],
+        cwd=APP_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    print(f"{'handler':36} {'p50 import ms':>14} {'max ms':>8} {'GET ms':>8}  heavy modules")
+    for module in HANDLERS:
+        samples = [_probe(module) for _ in range(args.runs)]
+        imports = [s["import_ms"] for s in samples]
+        get_ms = samples[-1]["get_ms"]
+        print(
+            f"{module:36} {statistics.median(imports):14.1f} {max(imports):8.1f} "
+            f"{'' if get_ms is None else f'{get_ms:.1f}':>8}  {','.join(samples[-1]['heavy']) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Disponibilidad de calendario: freebusy en vivo por consulta (camino original)
+vs. índice de intervalos (una consulta freebusy por ventana/TTL), contra un
+servicio Calendar falso con latencia simulada.
+
+Uso:
+    python scripts/bench_gcal_availability.py [--events 400] [--checks 500] [--latency-ms 80]
+"""
+import argparse
+import datetime as dt
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("GCAL_CALENDAR_ID", "bench")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from tools import gcal_client  # noqa: E402
+from tools.gcal_availability import Availability, to_epoch, to_iso  # noqa: E402
+
+
+class FakeCalendar:
+    """Solo freebusy().query(body).execute(), con bloques fusionados como Google."""
+
+    def __init__(self, busy: list[tuple[float, float]], latency: float):
+        self.busy = sorted(busy)
+        self.latency = latency
+        self.calls = 0
+
+    def freebusy(self):
+        return self
+
+    def query(self, body):
+        self._body = body
+        return self
+
+    def execute(self):
+        time.sleep(self.latency)
+        self.calls += 1
+        lo, hi = to_epoch(self._body["timeMin"]), to_epoch(self._body["timeMax"])
+        merged: list[list[float]] = []
+        for s, e in self.busy:
+            if e <= lo or s >= hi:
+                continue
+            if merged and s <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], e)
+            else:
+                merged.append([s, e])
+        busy = [{"start": to_iso(s), "end": to_iso(e)} for s, e in merged]
+        return {"calendars": {gcal_client.CALENDAR_ID: {"busy": busy}}}
+
+
+def _live_is_free(start_iso: str, end_iso: str) -> bool:
+    """Camino original: una consulta freebusy por verificación."""
+    return not gcal_client._freebusy(start_iso, end_iso)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=400)
+    ap.add_argument("--checks", type=int, default=500)
+    ap.add_argument("--latency-ms", type=float, default=80.0)
+    args = ap.parse_args()
+
+    rng = random.Random(3)
+    now = time.time() // 900 * 900  # alineado a segundos enteros como las respuestas ISO
+    busy = []
+    for _ in range(args.events):
+        start = now + rng.randrange(30 * 24 * 4) * 900  # cuartos de hora en 30 días
+        busy.append((start, start + rng.choice((1800, 3600, 5400))))
+    cal = FakeCalendar(busy, args.latency_ms / 1000)
+    gcal_client._svc = lambda: cal
+
+    checks = []
+    for _ in range(args.checks):
+        start = now + 3600 + rng.randrange(29 * 24 * 4) * 900
+        checks.append((to_iso(start), to_iso(start + 3600)))
+
+    print(f"{'mode':14} {'checks':>7} {'seconds':>8} {'ms/check':>9} {'freebusy':>9}")
+    for mode in ("live", "index"):
+        cal.calls = 0
+        av = Availability(gcal_client._freebusy)
+        fn = _live_is_free if mode == "live" else av.is_free
+        t0 = time.perf_counter()
+        answers = [fn(s, e) for s, e in checks]
+        elapsed = time.perf_counter() - t0
+        print(
+            f"{mode:14} {len(checks):7} {elapsed:8.3f} "
+            f"{1000 * elapsed / len(checks):9.3f} {cal.calls:9}"
+        )
+        if mode == "live":
+            expected = answers
+        else:
+            assert answers == expected, "índice y freebusy en vivo no coinciden"
+
+    # Sugerir slots de 1 h para la próxima semana, de 30 en 30 min
+    w_start = now + 3600 - (now + 3600) % 1800
+    window = (to_iso(w_start), to_iso(w_start + 7 * 86400))
+    cal.calls = 0
+    t0 = time.perf_counter()
+    probes = 0
+    t = w_start
+    while t + 3600 <= w_start + 7 * 86400 and probes < 50:  # sondeo en vivo (acotado)
+        _live_is_free(to_iso(t), to_iso(t + 3600))
+        probes += 1
+        t += 1800
+    live_per_probe = (time.perf_counter() - t0) / probes
+    total_probes = int((7 * 86400 - 3600) // 1800) + 1
+    av = Availability(gcal_client._freebusy)
+    t0 = time.perf_counter()
+    slots = av.find_free_slots(dt.timedelta(hours=1), window)
+    idx_elapsed = time.perf_counter() - t0
+    print(
+        f"find_free_slots (7 días, {total_probes} candidatos): "
+        f"sondeo en vivo ≈ {live_per_probe * total_probes:.1f}s, "
+        f"índice {idx_elapsed * 1000:.1f} ms ({len(slots)} slots libres)"
+    )
+
+
+if __name__ == "__main__":
+    main()
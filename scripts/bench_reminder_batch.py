@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Throughput de programación de recordatorios: handler por cita (serie) vs.
+batch_handler (upserts en paralelo + batch_writer), contra un Scheduler local
+con latencia simulada por llamada.
+
+Uso:
+    python scripts/bench_reminder_batch.py [--appointments 200] [--latency-ms 20]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+os.environ.setdefault("DDB_TABLE", "bench")
+os.environ.setdefault("SCHEDULER_ROLE_ARN", "arn:aws:iam::000000000000:role/bench")
+os.environ.setdefault("REMINDER_DISPATCHER_ARN", "arn:aws:lambda:us-east-1:0:function:bench")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from botocore.exceptions import ClientError  # noqa: E402
+
+from runtime import reminder_scheduler as rs  # noqa: E402
+
+
+class StubScheduler:
+    """Scheduler en memoria: cada llamada cuesta `latency` segundos."""
+
+    def __init__(self, latency: float, existing: set[str]):
+        self.latency = latency
+        self.names = set(existing)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+
+    def create_schedule(self, Name, **kwargs):
+        self._call()
+        with self._lock:
+            if Name in self.names:
+                raise ClientError({"Error": {"Code": "ConflictException"}}, "CreateSchedule")
+            self.names.add(Name)
+
+    def update_schedule(self, Name, **kwargs):
+        self._call()
+
+
+class StubTable:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.writes = 0
+
+    def update_item(self, **kwargs):
+        time.sleep(self.latency)
+        self.writes += 1
+
+    def batch_writer(self):
+        table = self
+
+        class _Writer:
+            pending = 0
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                # BatchWriteItem: una llamada por cada 25 ítems
+                time.sleep(table.latency * -(-self.pending // 25))
+                return False
+
+            def put_item(self, Item):
+                self.pending += 1
+                table.writes += 1
+
+        return _Writer()
+
+
+def _appointments(n: int) -> list[dict]:
+    return [
+        {
+            "appointment_id": f"bench-{i}",
+            "patient_phone_e164": f"+5939{i:07d}",
+            "patient_name": "Paciente",
+            "appt_time_iso": f"2030-01-{1 + i % 28:02d}T{8 + i % 10:02d}:00:00Z",
+        }
+        for i in range(n)
+    ]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--appointments", type=int, default=200)
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--existing", type=float, default=0.2, help="fracción ya programada")
+    args = ap.parse_args()
+
+    rs.FAST_MODE = False
+    latency = args.latency_ms / 1000
+    appts = _appointments(args.appointments)
+    existing = {
+        f"pt-{rs.STAGE}-{a['appointment_id']}-r1"
+        for a in appts[: int(len(appts) * args.existing)]
+    }
+
+    print(f"{'mode':8} {'appts':>6} {'seconds':>8} {'appts/s':>8} {'api calls':>10}")
+    for mode in ("serial", "batch"):
+        sched, table = StubScheduler(latency, existing), StubTable(latency)
+        rs.scheduler = rs.batch_scheduler = sched
+        rs.TABLE = table
+        t0 = time.perf_counter()
+        if mode == "serial":
+            for a in appts:
+                rs.handler(a, None)
+        else:
+            res = rs.batch_handler({"appointments": appts}, None)
+            assert res["ok"], res
+        elapsed = time.perf_counter() - t0
+        print(
+            f"{mode:8} {len(appts):6} {elapsed:8.2f} {len(appts) / elapsed:8.1f} "
+            f"{sched.calls:10}"
+        )
+    print(f"(concurrencia batch = {rs.BATCH_CONCURRENCY}, latencia stub = {args.latency_ms} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Costo por recordatorio del dispatcher: handler por evento (GetItem + envío en
+serie) vs. dispatch_batch (un BatchGetItem por 100 + envíos concurrentes),
+contra DynamoDB y Graph API simulados con latencia fija por llamada.
+
+Uso:
+    python scripts/bench_reminder_dispatch.py [--reminders 300] [--latency-ms 15]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("DDB_TABLE", "bench")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from runtime import reminder_dispatcher as rd  # noqa: E402
+from tools import wa_sender  # noqa: E402
+from tools.appointments_repo import BATCH_GET_MAX, AppointmentsRepo  # noqa: E402
+
+
+class StubDDB:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def get_item(self, Key, **kwargs):
+        time.sleep(self.latency)
+        self.calls += 1
+        return {"Item": {"pk": Key["pk"]}}
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        time.sleep(self.latency)
+        self.calls += 1
+        ((table, req),) = RequestItems.items()
+        return {"Responses": {table: [{"pk": k["pk"]} for k in req["Keys"]]}}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--reminders", type=int, default=300)
+    ap.add_argument("--latency-ms", type=float, default=15.0)
+    args = ap.parse_args()
+    latency = args.latency_ms / 1000
+
+    def post(payload):
+        time.sleep(latency)
+        return {"ok": True}
+
+    rd.send_many = lambda payloads: wa_sender.send_many(payloads, post)
+    events = [
+        {
+            "appointment_id": f"bench-{i}",
+            "patient_phone_e164": f"+5939{i:07d}",
+            "appt_time_iso": "2030-01-10T15:00:00Z",
+            "action": "first",
+        }
+        for i in range(args.reminders)
+    ]
+
+    print(f"{'mode':8} {'reminders':>9} {'seconds':>8} {'ms/rem':>7} {'ddb calls':>9}")
+    for mode in ("single", "batch"):
+        ddb = StubDDB(latency)
+        rd.REPO = AppointmentsRepo(ddb, "bench", ddb)
+        t0 = time.perf_counter()
+        if mode == "single":
+            for ev in events:
+                rd.handler(ev, None)
+        else:
+            for start in range(0, len(events), BATCH_GET_MAX):
+                rd.dispatch_batch(events[start : start + BATCH_GET_MAX])
+        elapsed = time.perf_counter() - t0
+        print(
+            f"{mode:8} {len(events):9} {elapsed:8.2f} "
+            f"{1000 * elapsed / len(events):7.2f} {ddb.calls:9}"
+        )
+    print(
+        f"(WA_SEND_CONCURRENCY = {wa_sender.SEND_CONCURRENCY}, latencia stub = {args.latency_ms} ms)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Latencia p50/p99 de router.handle_message por camino: fast path (reglas) vs. LLM.
+
+Por defecto el LLM se simula con una espera (--llm-ms, con jitter) para poder
+correr sin Bedrock; con --live se usa el agente real (requiere credenciales).
+
+Uso:
+    python scripts/bench_router.py [--iterations 500] [--llm-ms 1800] [--live]
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "app"))
+
+from agents import fast_path, router  # noqa: E402
+
+TRAFFIC = [
+    "hola",
+    "Buenas tardes",
+    "¿dónde están ubicados?",
+    "direccion?",
+    "a qué hora atienden",
+    "qué servicios tienen",
+    "horario y dirección por favor",
+    "¿tienen algo para la incontinencia después del parto?",
+    "¿el tratamiento de dolor pélvico es doloroso?",
+    "¿cuántas sesiones necesito para la diástasis?",
+]
+
+
+class _SimulatedAgent:
+    def __init__(self, mean_ms: float, rnd: random.Random):
+        self.mean_ms = mean_ms
+        self.rnd = rnd
+
+    def __call__(self, text):
+        time.sleep(max(0.0, self.rnd.gauss(self.mean_ms, self.mean_ms * 0.25)) / 1000)
+        return type("Result", (), {"message": "respuesta simulada"})()
+
+
+def _pct(samples: list[float], p: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else float("nan")
+    return statistics.quantiles(samples, n=100, method="inclusive")[p - 1]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iterations", type=int, default=500)
+    ap.add_argument("--llm-ms", type=float, default=1800.0)
+    ap.add_argument("--llm-calls", type=int, default=20, help="llamadas LLM a medir")
+    ap.add_argument("--live", action="store_true")
+    args = ap.parse_args()
+
+    router.FAST_PATH = fast_path.FastPath(ROOT / "app" / "content" / "pelvis" / "service.yml")
+    if not args.live:
+        from agents import info_agent
+
+        agent = _SimulatedAgent(args.llm_ms, random.Random(3))
+        info_agent.get_info_agent = lambda: agent
+
+    fast, llm = [], []
+    for i in range(args.iterations):
+        text = TRAFFIC[i % len(TRAFFIC)]
+        is_fast = router.FAST_PATH.classify(text)[1] >= router.FAST_PATH.threshold
+        if not is_fast and len(llm) >= args.llm_calls:
+            continue
+        t0 = time.perf_counter()
+        router.handle_message(text)
+        (fast if is_fast else llm).append((time.perf_counter() - t0) * 1000)
+
+    answerable = sum(
+        router.FAST_PATH.classify(t)[1] >= router.FAST_PATH.threshold for t in TRAFFIC
+    )
+    print(f"traffic mix: fast path answers {answerable}/{len(TRAFFIC)} sample messages")
+    print(f"engine counters (measured calls only): {router.FAST_PATH.stats()}")
+    print(f"{'path':6} {'n':>5} {'p50 ms':>10} {'p99 ms':>10}")
+    for name, samples in (("fast", fast), ("llm", llm)):
+        print(f"{name:6} {len(samples):5} {_pct(samples, 50):10.3f} {_pct(samples, 99):10.3f}")
+    if not args.live:
+        print(f"(LLM simulado: media {args.llm_ms:.0f} ms; usa --live para Bedrock real)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Costo de ingerir un payload del webhook de Meta: camino anterior (json.loads +
+json.dumps(body)[:2000] para el log + json.dumps(statuses) por value + dicts
+crudos) vs. webhook_payload (orjson desde bytes, log recortando los bytes
+crudos y registros tipados), con payloads sintéticos de 1 a 1000 mensajes.
+
+Uso:
+    python scripts/bench_webhook_payload.py [--sizes 1,10,100,1000] [--repeat 200]
+"""
+import argparse
+import base64
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from tools import webhook_payload as wp  # noqa: E402
+
+
+def synthetic_payload(n: int) -> bytes:
+    """`n` mensajes de texto y `n` estados repartidos en entries de 50 changes."""
+    entries = []
+    for start in range(0, n, 50):
+        changes = []
+        for i in range(start, min(n, start + 50)):
+            changes.append(
+                {
+                    "field": "messages",
+                    "value": {
+                        "messaging_product": "whatsapp",
+                        "metadata": {"display_phone_number": "593999", "phone_number_id": "PN1"},
+                        "contacts": [
+                            {"profile": {"name": f"Paciente {i}"}, "wa_id": f"5939{i:07d}"}
+                        ],
+                        "messages": [
+                            {
+                                "from": f"5939{i:07d}",
+                                "id": f"wamid.M{i:012d}",
+                                "timestamp": "1760000000",
+                                "type": "text",
+                                "text": {"body": "Hola, quisiera confirmar mi cita del martes"},
+                            }
+                        ],
+                        "statuses": [
+                            {
+                                "id": f"wamid.S{i:012d}",
+                                "status": "delivered",
+                                "timestamp": "1760000000",
+                                "recipient_id": f"5939{i:07d}",
+                                "pricing": {"billable": True, "category": "utility"},
+                            }
+                        ],
+                    },
+                }
+            )
+        entries.append({"id": "WABA", "changes": changes})
+    return json.dumps({"object": "whatsapp_business_account", "entry": entries}).encode()
+
+
+def legacy(event: dict) -> int:
+    raw_body = event["body"]
+    if event.get("isBase64Encoded"):
+        raw_body = base64.b64decode(raw_body).decode("utf-8")
+    body = json.loads(raw_body)
+    _ = json.dumps(body)[:2000]
+    seen = 0
+    for entry in body.get("entry") or []:
+        for change in entry.get("changes") or []:
+            value = change.get("value", {})
+            statuses = value.get("statuses") or []
+            if statuses:
+                _ = json.dumps(statuses)[:1000]
+            for msg in value.get("messages") or []:
+                seen += msg.get("type") == "text"
+    return seen
+
+
+def streaming(event: dict) -> int:
+    raw = wp.raw_body(event)
+    _ = wp._clip(raw, wp.LOG_MAX_BYTES)
+    seen = 0
+    for ev in wp.iter_events(wp.parse(raw)):
+        if isinstance(ev, wp.InboundMessage):
+            seen += ev.type == "text"
+    return seen
+
+
+def measure(fn, event: dict, repeat: int) -> tuple[float, int]:
+    fn(event)  # calentamiento
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(event)
+    per_call = (time.perf_counter() - t0) / repeat
+    tracemalloc.start()
+    fn(event)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_call, peak
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1,10,100,1000")
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    print(
+        f"{'msgs':>6} {'bytes':>9} {'legacy ms':>10} {'orjson ms':>10} {'speedup':>8} "
+        f"{'legacy KiB':>11} {'orjson KiB':>11}"
+    )
+    for n in (int(x) for x in args.sizes.split(",")):
+        raw = synthetic_payload(n)
+        event = {"body": base64.b64encode(raw).decode(), "isBase64Encoded": True}
+        assert legacy(event) == streaming(event) == n
+        repeat = max(5, args.repeat // max(1, n // 10))
+        t_old, m_old = measure(legacy, event, repeat)
+        t_new, m_new = measure(streaming, event, repeat)
+        print(
+            f"{n:>6} {len(raw):>9} {t_old * 1000:>10.3f} {t_new * 1000:>10.3f} "
+            f"{t_old / t_new:>7.1f}x {m_old / 1024:>11.1f} {m_new / 1024:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
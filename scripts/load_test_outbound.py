@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de la cola de envíos salientes contra un stub HTTP local de la
+Graph API que limita el ritmo por número (429 al pasarse) e inyecta 429/5xx
+aleatorios. Compara el envío directo (sin ritmo ni reintentos) con
+OutboundQueue.
+
+Uso:
+    python scripts/load_test_outbound.py [--messages 600] [--recipients 200]
+        [--stub-rate 50] [--p429 0.05] [--p5xx 0.02] [--latency-ms 20]
+        [--rate 40] [--burst 20]
+    # contra otro stub ya levantado:
+    python scripts/load_test_outbound.py --host 127.0.0.1:9000 --scheme http
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+SECRET_NAME = "pelvis/wa/meta-owner"
+
+
+class GraphStub:
+    """Stub de POST /<versión>/<phone_number_id>/messages."""
+
+    def __init__(self, rate: float, p429: float, p5xx: float, latency: float, seed: int = 7):
+        self.rate = rate
+        self.p429 = p429
+        self.p5xx = p5xx
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window: dict[int, int] = Counter()  # segundo → aceptados
+        self.codes: Counter = Counter()
+        self.n = 0
+
+    def respond(self) -> tuple[int, dict]:
+        time.sleep(self.latency)
+        with self.lock:
+            second = int(time.monotonic())
+            roll = self.random.random()
+            if self.window[second] >= self.rate:
+                code, body = 429, {"error": {"code": 130429, "message": "Rate limit hit"}}
+            elif roll < self.p429:
+                code, body = 429, {"error": {"code": 80007, "message": "Throttled"}}
+            elif roll < self.p429 + self.p5xx:
+                code, body = 503, {"error": {"code": 131000, "message": "Unavailable"}}
+            else:
+                self.window[second] += 1
+                self.n += 1
+                code, body = 200, {"messages": [{"id": f"wamid.{self.n}"}]}
+            self.codes[code] += 1
+        return code, body
+
+    def serve(self) -> ThreadingHTTPServer:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                code, body = stub.respond()
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def run(label: str, send_many, payloads: list[dict], stub: GraphStub | None) -> None:
+    if stub:
+        stub.codes.clear()
+    t0 = time.perf_counter()
+    results = send_many(payloads)
+    elapsed = time.perf_counter() - t0
+    ok = sum(1 for r in results if r.get("ok"))
+    line = f"{label:<14} ok={ok:>4}/{len(payloads)} lost={len(payloads) - ok:>4} {elapsed:6.2f}s"
+    if stub:
+        peak = max(stub.window.values(), default=0)
+        line += f" http={dict(stub.codes)} peak_ok/s={peak}"
+        stub.window.clear()
+    print(line)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=600)
+    ap.add_argument("--recipients", type=int, default=200)
+    ap.add_argument("--host", default="", help="host[:puerto] de un stub externo")
+    ap.add_argument("--scheme", default="http")
+    ap.add_argument("--stub-rate", type=float, default=50)
+    ap.add_argument("--p429", type=float, default=0.05)
+    ap.add_argument("--p5xx", type=float, default=0.02)
+    ap.add_argument("--latency-ms", type=float, default=20)
+    ap.add_argument("--rate", type=float, default=40)
+    ap.add_argument("--burst", type=int, default=20)
+    ap.add_argument("--attempts", type=int, default=5)
+    args = ap.parse_args()
+
+    stub = None
+    host = args.host
+    if not host:
+        stub = GraphStub(args.stub_rate, args.p429, args.p5xx, args.latency_ms / 1000)
+        host = f"127.0.0.1:{stub.serve().server_address[1]}"
+
+    # configuración antes de importar: wa_sender lee host/esquema al cargar
+    os.environ["META_GRAPH_HOST"] = host
+    os.environ["META_GRAPH_SCHEME"] = args.scheme
+    os.environ["SECRET_JSON_" + re.sub(r"[^A-Za-z0-9]", "_", SECRET_NAME).upper()] = json.dumps(
+        {"access_token": "load-test", "phone_number_id": "PN-LOAD"}
+    )
+    os.environ.pop("DDB_TABLE", None)
+    logging.disable(logging.CRITICAL)
+
+    from tools import wa_sender, whatsapp_owner
+    from tools.outbound_queue import MemoryDeadLetters, OutboundQueue
+
+    payloads = [
+        whatsapp_owner.text_payload(f"+5939{i % args.recipients:08d}", f"Recordatorio {i}")
+        for i in range(args.messages)
+    ]
+    print(
+        f"{args.messages} mensajes a {args.recipients} destinatarios, "
+        f"WA_SEND_CONCURRENCY={wa_sender.SEND_CONCURRENCY}, stub={host} ({args.scheme})"
+    )
+
+    run("direct", lambda p: wa_sender.send_many(p, whatsapp_owner._post_messages), payloads, stub)
+
+    dlq = MemoryDeadLetters()
+    whatsapp_owner.OUTBOUND = OutboundQueue(
+        whatsapp_owner._post_messages,
+        dlq,
+        rate=args.rate,
+        burst=args.burst,
+        attempts=args.attempts,
+        retry_max_s=2,
+    )
+    run("outbound_queue", whatsapp_owner.send_many, payloads, stub)
+    print(f"queue counters={whatsapp_owner.OUTBOUND.counters} dead_letters={len(dlq.items)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Simulación del motor de recordatorios por buckets con reloj falso.
+
+Genera citas con r1/r2/esc en MemoryBucketStore, avanza el reloj minuto a
+minuto y ejecuta el sweeper con fallos inyectados:
+  - fallos por recordatorio (el dispatch devuelve error → bucket siguiente)
+  - fallos de lote completo (excepción en dispatch)
+  - caídas del sweeper tras despachar y antes de marcar/avanzar la marca de agua
+
+Verifica que todo recordatorio se entregó al menos una vez y nunca antes de su
+hora, y reporta duplicados, retraso máximo y throughput de despacho.
+
+Uso:
+    python scripts/sim_reminder_sweeper.py [--appointments 2000] [--hours 6]
+        [--fail-rate 0.05] [--batch-fail-rate 0.01] [--crash-rate 0.02]
+        [--latency-ms 0] [--seed 7]
+"""
+import argparse
+import datetime as dt
+import logging
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from tools.reminder_buckets import (  # noqa: E402
+    MemoryBucketStore,
+    ReminderSweeper,
+    reminder_item,
+)
+
+
+class FakeClock:
+    def __init__(self, start: dt.datetime):
+        self.now = start
+
+    def __call__(self) -> dt.datetime:
+        return self.now
+
+    def advance(self, **kwargs) -> None:
+        self.now += dt.timedelta(**kwargs)
+
+
+class Crash(Exception):
+    """La Lambda muere a mitad del barrido."""
+
+
+class CrashingStore(MemoryBucketStore):
+    def __init__(self, rng: random.Random, crash_rate: float):
+        super().__init__()
+        self.rng = rng
+        self.crash_rate = crash_rate
+
+    def mark_sent(self, item, now_iso):
+        if self.rng.random() < self.crash_rate:
+            raise Crash()
+        super().mark_sent(item, now_iso)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--appointments", type=int, default=2000)
+    ap.add_argument("--hours", type=int, default=6, help="ventana de recordatorios")
+    ap.add_argument("--fail-rate", type=float, default=0.05)
+    ap.add_argument("--batch-fail-rate", type=float, default=0.01)
+    ap.add_argument("--crash-rate", type=float, default=0.02)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="costo por lote despachado")
+    ap.add_argument("--batch-size", type=int, default=25)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    logging.disable(logging.ERROR)  # los fallos inyectados no son noticia
+    rng = random.Random(args.seed)
+    start = dt.datetime(2030, 1, 1, 8, 0, tzinfo=dt.timezone.utc)
+    clock = FakeClock(start)
+    store = CrashingStore(rng, args.crash_rate)
+
+    due: dict[tuple[str, str], dt.datetime] = {}
+    items = []
+    for i in range(args.appointments):
+        appt_id = f"sim-{i}"
+        r1 = start + dt.timedelta(seconds=rng.randrange(args.hours * 3600))
+        # mismas distancias que reminder_scheduler: r2 = r1 + 4h, esc = r1 + 5h
+        for action, hours in (("first", 0), ("second", 4), ("escalation", 5)):
+            when = r1 + dt.timedelta(hours=hours)
+            payload = {"appointment_id": appt_id, "action": action}
+            items.append(reminder_item(appt_id, action, when, payload))
+            due[(appt_id, action)] = when
+    store.put_reminders(items)
+
+    deliveries: Counter = Counter()
+    lateness: list[float] = []
+    early = 0
+
+    def dispatch(payloads):
+        nonlocal early
+        if rng.random() < args.batch_fail_rate:
+            raise RuntimeError("batch failure")
+        if args.latency_ms:
+            time.sleep(args.latency_ms / 1000)
+        results = []
+        for p in payloads:
+            if rng.random() < args.fail_rate:
+                results.append({"error": "send failed"})
+                continue
+            key = (p["appointment_id"], p["action"])
+            deliveries[key] += 1
+            delay = (clock() - due[key]).total_seconds()
+            early += delay < 0
+            lateness.append(delay)
+            results.append({"sent": p["action"]})
+        return results
+
+    sweeper = ReminderSweeper(store, dispatch, clock=clock, batch_size=args.batch_size)
+    crashes = sweeps = 0
+    busy = 0.0
+    end = max(due.values()) + dt.timedelta(minutes=30)
+    while clock() <= end:
+        t0 = time.perf_counter()
+        try:
+            sweeper.sweep()
+        except Crash:
+            crashes += 1
+        busy += time.perf_counter() - t0
+        sweeps += 1
+        clock.advance(minutes=1)
+
+    total = len(due)
+    delivered = sum(1 for k in due if deliveries[k] > 0)
+    dups = sum(c - 1 for c in deliveries.values() if c > 1)
+    sends = sum(deliveries.values())
+    print(f"reminders      {total}")
+    print(f"delivered      {delivered} ({'OK' if delivered == total else 'MISSING'})")
+    print(f"pending        {len(store.pending())}")
+    print(f"duplicates     {dups}")
+    print(f"early          {early}")
+    print(f"max lateness   {max(lateness, default=0) / 60:.1f} min")
+    print(f"sweeps         {sweeps} (crashes {crashes})")
+    print(f"throughput     {sends / busy:.0f} dispatches/s (sweeper busy {busy:.2f}s)")
+    if delivered != total or early:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,385 @@
 import sys
+import threading
+import time
 from pathlib import Path
 
+import httplib2
+import pytest
+from botocore.exceptions import ClientError
+from googleapiclient.errors import HttpError
+
 # Ensure project root on sys.path
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(autouse=True)
+def _no_agent_calls(monkeypatch):
+    """El webhook responde sin llamar al router/LLM en las pruebas."""
+    for name in ("app.runtime.meta_webhook_handler", "runtime.meta_webhook_handler"):
+        mod = sys.modules.get(name)
+        if mod is not None:
+            monkeypatch.setattr(mod, "_agent_reply", lambda text, tenant: f"{tenant.name}: {text}")
+
+
+def _condition_failed(op: str) -> ClientError:
+    return ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, op)
+
+
+# ===== DynamoDB =====
+class FakeBatchWriter:
+    """
+    batch_writer(): aplica al salir. Sin `overwrite_by_pkeys`, dos escrituras
+    de la misma clave en el lote fallan como en BatchWriteItem.
+    """
+
+    def __init__(self, table, overwrite_by_pkeys=None):
+        self.table = table
+        self.overwrite = overwrite_by_pkeys
+        self.ops = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is not None:
+            return False
+        keys = [(k["pk"], k["sk"]) for _, k in self.ops]
+        if not self.overwrite and len(set(keys)) != len(keys):
+            raise ClientError(
+                {"Error": {"Code": "ValidationException", "Message": "duplicates"}},
+                "BatchWriteItem",
+            )
+        with self.table.lock:
+            self.table.calls.append(("BatchWriteItem", {"ops": list(self.ops)}))
+            for op, item in self.ops:
+                key = (item["pk"], item["sk"])
+                if op == "put":
+                    self.table.items[key] = dict(item)
+                else:
+                    self.table.items.pop(key, None)
+        return False
+
+    def put_item(self, Item):
+        self.ops.append(("put", dict(Item)))
+
+    def delete_item(self, Key):
+        self.ops.append(("delete", dict(Key)))
+
+
+class FakeTable:
+    """
+    Tabla única en memoria (pk/sk) con lo que usan los repositorios: GetItem con
+    proyección, PutItem/UpdateItem condicionales (attribute_(not_)exists, `<>`),
+    SET/REMOVE, Query por la tabla o un gsi disperso y batch_writer. `calls`
+    guarda (operación, kwargs) de cada llamada.
+    """
+
+    name = "dummy"
+
+    def __init__(self, items=(), query_delay: float = 0.0):
+        self.items = {(i["pk"], i["sk"]): dict(i) for i in items}
+        self.calls = []
+        self.query_delay = query_delay
+        self.lock = threading.RLock()
+
+    def count(self, op: str) -> int:
+        return sum(1 for name, _ in self.calls if name == op)
+
+    def _check(self, op, condition, item, names, values) -> None:
+        for clause in filter(None, (condition or "").split(" AND ")):
+            if " <> " in clause:
+                attr, placeholder = clause.split(" <> ")
+                ok = (item or {}).get(names.get(attr, attr)) != values[placeholder]
+            else:
+                attr = clause[clause.find("(") + 1 : -1]
+                exists = item is not None and names.get(attr, attr) in item
+                ok = exists if clause.startswith("attribute_exists") else not exists
+            if not ok:
+                raise _condition_failed(op)
+
+    def get_item(self, Key, ProjectionExpression=None, **kwargs):
+        with self.lock:
+            self.calls.append(
+                ("GetItem", {"Key": Key, "ProjectionExpression": ProjectionExpression, **kwargs})
+            )
+            item = self.items.get((Key["pk"], Key["sk"]))
+        if not item:
+            return {}
+        if ProjectionExpression:
+            names = kwargs.get("ExpressionAttributeNames", {})
+            fields = [names.get(f, f) for f in ProjectionExpression.split(", ")]
+            item = {f: item[f] for f in fields if f in item}
+        resp = {"Item": dict(item)}
+        if kwargs.get("ReturnConsumedCapacity"):
+            resp["ConsumedCapacity"] = {"TableName": self.name, "CapacityUnits": 0.5}
+        return resp
+
+    def put_item(self, Item, ConditionExpression=None, **kwargs):
+        key = (Item["pk"], Item["sk"])
+        with self.lock:
+            self.calls.append(("PutItem", {"Item": Item, **kwargs}))
+            self._check("PutItem", ConditionExpression, self.items.get(key), {}, {})
+            self.items[key] = dict(Item)
+        return {}
+
+    def delete_item(self, Key, **kwargs):
+        with self.lock:
+            self.calls.append(("DeleteItem", {"Key": Key, **kwargs}))
+            self.items.pop((Key["pk"], Key["sk"]), None)
+        return {}
+
+    def update_item(self, Key, UpdateExpression, **kwargs):
+        names = kwargs.get("ExpressionAttributeNames", {})
+        values = kwargs.get("ExpressionAttributeValues", {})
+        key = (Key["pk"], Key["sk"])
+        with self.lock:
+            self.calls.append(
+                ("UpdateItem", {"Key": Key, "UpdateExpression": UpdateExpression, **kwargs})
+            )
+            current = self.items.get(key)
+            self._check("UpdateItem", kwargs.get("ConditionExpression"), current, names, values)
+            item = self.items.setdefault(key, dict(Key))
+            sets, _, removes = UpdateExpression.partition("REMOVE ")
+            for part in filter(None, sets.strip()[len("SET ") :].split(", ")):
+                attr, placeholder = (p.strip() for p in part.split("="))
+                item[names.get(attr, attr)] = values[placeholder]
+            for attr in filter(None, (a.strip() for a in removes.split(","))):
+                item.pop(names.get(attr, attr), None)
+            attrs = dict(item)
+        resp = {"Attributes": attrs} if kwargs.get("ReturnValues") else {}
+        if kwargs.get("ReturnConsumedCapacity"):
+            resp["ConsumedCapacity"] = {"TableName": self.name, "CapacityUnits": 1.0}
+        return resp
+
+    @staticmethod
+    def _match(cond, item) -> bool:
+        expr = cond.get_expression()
+        op, args = expr["operator"], expr["values"]
+        if op == "AND":
+            return all(FakeTable._match(c, item) for c in args)
+        current = item.get(args[0].name)
+        if current is None:
+            return False
+        if op == "=":
+            return current == args[1]
+        if op == ">":
+            return current > args[1]
+        if op == "BETWEEN":
+            return args[1] <= current <= args[2]
+        if op == "begins_with":
+            return current.startswith(args[1])
+        raise NotImplementedError(op)
+
+    def query(self, KeyConditionExpression, IndexName=None, Limit=None, **kwargs):
+        time.sleep(self.query_delay)
+        sort_key = f"{IndexName}sk" if IndexName else "sk"
+        start = kwargs.get("ExclusiveStartKey")
+        with self.lock:
+            self.calls.append(("Query", {"IndexName": IndexName, "Limit": Limit, **kwargs}))
+            hits = sorted(
+                (
+                    dict(i)
+                    for i in self.items.values()
+                    if self._match(KeyConditionExpression, i)
+                    and (start is None or i[sort_key] > start[sort_key])
+                ),
+                key=lambda i: i[sort_key],
+                reverse=kwargs.get("ScanIndexForward") is False,
+            )
+        if Limit is None or len(hits) <= Limit:
+            return {"Items": hits}
+        last = hits[Limit - 1]
+        return {
+            "Items": hits[:Limit],
+            "LastEvaluatedKey": {"pk": last["pk"], "sk": last["sk"], sort_key: last[sort_key]},
+        }
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return FakeBatchWriter(self, overwrite_by_pkeys)
+
+
+# ===== EventBridge Scheduler =====
+class FakeScheduler:
+    """
+    Schedules en memoria por nombre: create (ConflictException si existe,
+    ValidationException para `fail_names`), update, delete por grupo
+    (ResourceNotFoundException si no está en ese grupo) y list paginado.
+    """
+
+    def __init__(self, names=(), group=None, fail_names=()):
+        self.schedules = {n: {"GroupName": group} if group else {} for n in names}
+        self.fail_names = set(fail_names)
+        self.calls = []
+        self.deleted = []
+        self.list_calls = []
+        self.lock = threading.Lock()
+
+    def create_schedule(self, Name, **kwargs):
+        with self.lock:
+            self.calls.append(("create", Name))
+            if Name in self.fail_names:
+                raise ClientError({"Error": {"Code": "ValidationException"}}, "CreateSchedule")
+            if Name in self.schedules:
+                raise ClientError({"Error": {"Code": "ConflictException"}}, "CreateSchedule")
+            self.schedules[Name] = kwargs
+
+    def update_schedule(self, Name, **kwargs):
+        with self.lock:
+            self.calls.append(("update", Name))
+            self.schedules[Name] = kwargs
+
+    def delete_schedule(self, Name, GroupName=None):
+        with self.lock:
+            self.calls.append(("delete", Name))
+            sched = self.schedules.get(Name)
+            if sched is None or sched.get("GroupName") != GroupName:
+                raise ClientError(
+                    {"Error": {"Code": "ResourceNotFoundException"}}, "DeleteSchedule"
+                )
+            del self.schedules[Name]
+            self.deleted.append(Name)
+
+    def list_schedules(self, MaxResults, GroupName=None, NamePrefix="", NextToken=None):
+        self.list_calls.append(NextToken)
+        names = sorted(
+            n
+            for n, s in self.schedules.items()
+            if s.get("GroupName") == GroupName and n.startswith(NamePrefix)
+        )
+        # cursor por nombre: borrar durante el listado no salta schedules
+        names = [n for n in names if NextToken is None or n > NextToken]
+        resp = {"Schedules": [{"Name": n} for n in names[:MaxResults]]}
+        if len(names) > MaxResults:
+            resp["NextToken"] = names[MaxResults - 1]
+        return resp
+
+
+# ===== Google Calendar =====
+def _http_error(status: int, reason: bytes) -> HttpError:
+    return HttpError(httplib2.Response({"status": status}), reason)
+
+
+class FakeCall:
+    def __init__(self, fn):
+        self.fn = fn
+        self.headers = {}
+
+    def execute(self):
+        return self.fn(self.headers)
+
+
+class FakeBatch:
+    def __init__(self, cal, callback):
+        self.cal, self.callback, self.reqs = cal, callback, []
+
+    def add(self, req, request_id):
+        self.reqs.append((request_id, req))
+
+    def execute(self):
+        self.cal.batches.append(len(self.reqs))
+        for rid, req in self.reqs:
+            try:
+                self.callback(rid, req.execute(), None)
+            except HttpError as e:
+                self.callback(rid, None, e)
+
+
+class FakeCalendar:
+    """
+    events() en memoria por id (cada evento con su etag): patch con If-Match
+    (412 si cambió), insert (403 para summary "falla"), delete (410 si no
+    existe), batches HTTP y list() paginado con syncToken: sin token devuelve
+    los eventos no cancelados; con uno conocido, solo los cambiados desde
+    entonces; con uno desconocido responde 410.
+    """
+
+    def __init__(self, events=(), page_size=2):
+        self.store = {e["id"]: dict(e) for e in events}
+        self.page_size = page_size
+        self.changed: list[str] = []
+        self.tokens = {}
+        self.list_calls, self.requests, self.batches, self.patches = [], [], [], []
+
+    def change(self, ev):
+        self.store[ev["id"]] = ev
+        self.changed.append(ev["id"])
+
+    def events(self):
+        return self
+
+    def list(self, calendarId, maxResults, pageToken=None, syncToken=None):
+        self.list_calls.append({"pageToken": pageToken, "syncToken": syncToken})
+        return FakeCall(lambda headers: self._page(pageToken, syncToken))
+
+    def _page(self, page_token, sync_token):
+        if sync_token is None:
+            ids = [i for i, e in self.store.items() if e.get("status") != "cancelled"]
+        elif sync_token in self.tokens:
+            ids = self.changed[self.tokens[sync_token] :]
+        else:
+            raise _http_error(410, b"Gone")
+        start = int(page_token or 0)
+        resp = {"items": [self.store[i] for i in ids[start : start + self.page_size]]}
+        if start + self.page_size < len(ids):
+            resp["nextPageToken"] = str(start + self.page_size)
+        else:
+            token = f"tok{len(self.tokens)}"
+            self.tokens[token] = len(self.changed)
+            resp["nextSyncToken"] = token
+        return resp
+
+    def patch(self, calendarId, eventId, body, sendUpdates, fields):
+        self.patches.append((eventId, body))
+
+        def run(headers):
+            self.requests.append((eventId, dict(headers)))
+            event = self.store[eventId]
+            if headers.get("If-Match") not in (None, event["etag"]):
+                raise _http_error(412, b"Precondition Failed")
+            event.update(body, etag=f"{event['etag']}+")
+            return {"id": eventId, "etag": event["etag"]}
+
+        return FakeCall(run)
+
+    def insert(self, calendarId, body, sendUpdates):
+        def run(headers):
+            if body["summary"] == "falla":
+                raise _http_error(403, b"Forbidden")
+            eid = f"new{len(self.store)}"
+            self.store[eid] = {**body, "id": eid, "etag": "v1"}
+            return {"id": eid, "etag": "v1", "htmlLink": f"https://cal/{eid}"}
+
+        return FakeCall(run)
+
+    def delete(self, calendarId, eventId, sendUpdates):
+        def run(headers):
+            if self.store.pop(eventId, None) is None:
+                raise _http_error(410, b"Gone")
+
+        return FakeCall(run)
+
+    def get(self, **kw):
+        raise AssertionError("update no debe hacer GET")
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+@pytest.fixture
+def fake_table():
+    """Fábrica de FakeTable: `fake_table(items, query_delay=0)`."""
+    return FakeTable
+
+
+@pytest.fixture
+def fake_scheduler():
+    """Fábrica de FakeScheduler: `fake_scheduler(names, group, fail_names)`."""
+    return FakeScheduler
+
+
+@pytest.fixture
+def fake_calendar():
+    """Fábrica de FakeCalendar: `fake_calendar(events, page_size=2)`."""
+    return FakeCalendar
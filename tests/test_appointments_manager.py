@@ -0,0 +1,221 @@
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "app"))
+
+from app.runtime import appointments_manager as am  # noqa: E402
+
+
+def test_update_many_invokes_scheduler_once(monkeypatch):
+    invoked, sent = [], []
+
+    class Lambda:
+        def invoke(self, **kw):
+            invoked.append(json.loads(kw["Payload"]))
+
+    def fake_update_many(updates):
+        return [{"id": eid, "ok": eid != "ev2"} for eid, _ in updates]
+
+    monkeypatch.setattr(am, "lambda_client", Lambda())
+    monkeypatch.setattr(am.gcal, "update_many", fake_update_many)
+    monkeypatch.setattr(
+        am, "send_many", lambda payloads: sent.extend(payloads) or [{"ok": True}] * len(payloads)
+    )
+
+    updates = [
+        {
+            "appointment_id": f"a{i}",
+            "event_id": f"ev{i}",
+            "start_iso": "2030-01-10T10:00:00Z",
+            "end_iso": "2030-01-10T11:00:00Z",
+        }
+        for i in range(3)
+    ]
+    res = am.handler({"action": "update_many", "updates": updates}, None)
+
+    assert [r["ok"] for r in res["results"]] == [True, True, False]
+    assert len(sent) == 2
+    assert len(invoked) == 1
+    assert [a["appointment_id"] for a in invoked[0]["appointments"]] == ["a0", "a1"]
+
+
+def test_create_many_checks_conflicts_with_one_freebusy_query(monkeypatch):
+    invoked, sent, fb_calls, created = [], [], [], []
+
+    class Lambda:
+        def invoke(self, **kw):
+            invoked.append(json.loads(kw["Payload"]))
+
+    def fake_busy_between(time_min, time_max):
+        fb_calls.append((time_min, time_max))
+        busy = [
+            (am.gcal.to_epoch("2030-01-10T15:00:00Z"), am.gcal.to_epoch("2030-01-10T16:00:00Z"))
+        ]
+        return am.gcal.BusyIndex(busy)
+
+    def fake_create_many(events):
+        created.extend(events)
+        return [{"id": f"ev-{e['appointment_id']}", "ok": True} for e in events]
+
+    monkeypatch.setattr(am.gcal, "TZ", "America/Guayaquil")
+    monkeypatch.setattr(am, "lambda_client", Lambda())
+    monkeypatch.setattr(am.gcal, "busy_between", fake_busy_between)
+    monkeypatch.setattr(am.gcal, "create_many", fake_create_many)
+    monkeypatch.setattr(
+        am, "send_many", lambda payloads: sent.extend(payloads) or [{"ok": True}] * len(payloads)
+    )
+
+    def appt(i, start, end):
+        return {
+            "appointment_id": f"a{i}",
+            "patient_phone_e164": "+593900000000",
+            "start_iso": start,
+            "end_iso": end,
+        }
+
+    appointments = [
+        appt(0, "2030-01-10T10:30:00", "2030-01-10T11:30:00"),  # choca con 15:00Z ocupado
+        appt(1, "2030-01-10T12:00:00", "2030-01-10T13:00:00"),
+        appt(2, "2030-01-10T12:30:00", "2030-01-10T13:30:00"),  # choca con a1
+        appt(3, "2030-01-11T09:00:00", "2030-01-11T10:00:00"),
+    ]
+    res = am.handler({"action": "create_many", "appointments": appointments}, None)
+
+    assert fb_calls == [("2030-01-10T15:30:00Z", "2030-01-11T15:00:00Z")]
+    assert [r.get("conflict", False) for r in res["results"]] == [True, False, True, False]
+    assert res["created"] == 2 and not res["ok"]
+    assert [e["appointment_id"] for e in created] == ["a1", "a3"]
+    assert len(sent) == 2 and len(invoked) == 1
+    assert invoked[0]["appointments"][0]["appt_time_iso"] == "2030-01-10T17:00:00Z"
+    assert invoked[0]["appointments"][1]["event_id"] == "ev-a3"
+
+
+def _rows(ids):
+    rows = []
+    for a in ids:
+        key = {"pk": f"APPT#{a}", "sk": f"APPT#{a}"}
+        rows.append({**key, "status": "scheduled", "gsi1pk": "PATIENT#+5939", "gsi1sk": "t"})
+        rows.append({"pk": key["pk"], "sk": "REM#first", "gsi2pk": "REMBUCKET#x"})
+    return rows
+
+
+def test_cancel_many_marks_rows_and_validates_per_item(monkeypatch, fake_scheduler, fake_table):
+    sent = []
+    names = [f"pt-dev-a{i}-{r}" for i in range(3) for r in ("r1", "r2", "esc")]
+    sched = fake_scheduler(names, group="pt-dev-reminders")
+    table = fake_table(_rows(["a0", "a1", "a2"]))
+    monkeypatch.setattr(am, "scheduler", sched)
+    monkeypatch.setattr(am, "REPO", am.AppointmentsRepo(table, "dummy"))
+    monkeypatch.setattr(
+        am.gcal,
+        "delete_many",
+        lambda ids: [{"id": eid, "ok": eid != "ev1"} for eid in ids],
+    )
+    monkeypatch.setattr(
+        am, "send_many", lambda payloads: sent.extend(payloads) or [{"ok": True}] * len(payloads)
+    )
+
+    items = [{"appointment_id": f"a{i}", "event_id": f"ev{i}"} for i in range(3)]
+    items.append({"appointment_id": "a3"})  # sin event_id: falla solo este ítem
+    res = am.handler({"action": "cancel_many", "appointments": items}, None)
+
+    assert [r["ok"] for r in res["results"]] == [True, False, True, False]
+    assert res["results"][3]["error"].startswith("invalid")
+    assert len(sent) == 2
+    assert sorted(sched.deleted) == [
+        f"pt-dev-{a}-{r}" for a in ("a0", "a2") for r in ("esc", "r1", "r2")
+    ]
+    for a in ("a0", "a2"):
+        row = table.items[(f"APPT#{a}", f"APPT#{a}")]
+        assert row["status"] == "cancelled" and "gsi1pk" not in row
+        assert (f"APPT#{a}", "REM#first") not in table.items
+    assert table.items[("APPT#a1", "APPT#a1")]["status"] == "scheduled"
+    assert ("APPT#a1", "REM#first") in table.items
+
+
+def test_cancel_marks_the_row_cancelled(monkeypatch, fake_scheduler, fake_table):
+    table = fake_table(_rows(["a0"]))
+    monkeypatch.setattr(am, "scheduler", fake_scheduler())
+    monkeypatch.setattr(am, "REPO", am.AppointmentsRepo(table, "dummy"))
+    monkeypatch.setattr(am.gcal, "delete_event", lambda event_id: None)
+    monkeypatch.setattr(am, "send_many", lambda payloads: [{"ok": True}] * len(payloads))
+
+    res = am.handler({"action": "cancel", "appointment_id": "a0", "event_id": "ev0"}, None)
+
+    assert res == {"ok": True, "schedules_deleted": 0}
+    assert table.items[("APPT#a0", "APPT#a0")]["status"] == "cancelled"
+    assert ("APPT#a0", "REM#first") not in table.items
+
+
+def _fake_calendar(monkeypatch, invoked, created):
+    """Calendar en memoria: interpreta las horas naive en TZ, como el real."""
+    busy = []
+
+    def note(ev):
+        start, end = am.gcal.event_utc(ev["start_iso"]), am.gcal.event_utc(ev["end_iso"])
+        busy.append((am.gcal.to_epoch(start), am.gcal.to_epoch(end)))
+        created.append(ev["appointment_id"])
+
+    def is_free(start, end, live=False):
+        assert live  # antes de crear: freebusy en vivo, no el índice cacheado
+        return not am.gcal.BusyIndex(busy).overlaps(am.gcal.to_epoch(start), am.gcal.to_epoch(end))
+
+    def create_many(events):
+        for ev in events:
+            note(ev)
+        return [{"id": f"ev-{e['appointment_id']}", "ok": True} for e in events]
+
+    def create_event(**kw):
+        note(kw)
+        return {"id": f"ev-{kw['appointment_id']}"}
+
+    class Lambda:
+        def invoke(self, **kw):
+            invoked.append(json.loads(kw["Payload"]))
+
+    monkeypatch.setattr(am.gcal, "TZ", "America/Guayaquil")
+    monkeypatch.setattr(am.gcal, "is_free", is_free)
+    monkeypatch.setattr(am.gcal, "busy_between", lambda a, b: am.gcal.BusyIndex(busy))
+    monkeypatch.setattr(am.gcal, "create_many", create_many)
+    monkeypatch.setattr(am.gcal, "create_event", create_event)
+    monkeypatch.setattr(am, "lambda_client", Lambda())
+    monkeypatch.setattr(am, "send_many", lambda payloads: [{"ok": True}] * len(payloads))
+
+
+def test_single_and_bulk_create_of_same_local_slot_conflict(monkeypatch):
+    invoked, created = [], []
+    _fake_calendar(monkeypatch, invoked, created)
+    slot = {"start_iso": "2030-01-10T15:00:00", "end_iso": "2030-01-10T16:00:00"}
+
+    bulk = am.handler(
+        {
+            "action": "create_many",
+            "appointments": [
+                {"appointment_id": "a1", "patient_phone_e164": "+5931", **slot},
+                {"appointment_id": "a2", **slot},  # sin teléfono: no se inserta
+            ],
+        },
+        None,
+    )
+    single = am.handler(
+        {"action": "create", "appointment_id": "a3", "patient_phone_e164": "+5933", **slot}, None
+    )
+    other = am.handler(
+        {
+            "action": "create",
+            "appointment_id": "a4",
+            "patient_phone_e164": "+5934",
+            "start_iso": "2030-01-10T10:00:00",  # 15:00Z: libre en hora local
+            "end_iso": "2030-01-10T11:00:00",
+        },
+        None,
+    )
+
+    assert bulk["results"][1]["error"].startswith("invalid")
+    assert single == {"ok": False, "conflict": True}
+    assert other["ok"]
+    assert created == ["a1", "a4"]
+    assert invoked[0]["appointments"][0]["appt_time_iso"] == "2030-01-10T20:00:00Z"
+    assert invoked[1]["appt_time_iso"] == "2030-01-10T15:00:00Z"
@@ -0,0 +1,88 @@
+import pytest
+
+from app.tools import appointments_repo as repo_mod
+from app.tools.appointments_repo import (
+    P_REMINDER,
+    Appointment,
+    AppointmentsRepo,
+    ConditionFailed,
+    appt_key,
+    projection,
+    update_expression,
+)
+
+
+def test_projection_and_update_expression_escape_reserved_words():
+    assert projection(P_REMINDER) == ("pk, confirmed_at, #status", {"#status": "status"})
+
+    expr, names, values = update_expression(
+        {"status": "confirmed", "confirmed_at": "t"}, remove=("ttl",)
+    )
+    assert expr == "SET #status=:status, confirmed_at=:confirmed_at REMOVE #ttl"
+    assert names == {"#status": "status", "#ttl": "ttl"}
+    assert values == {":status": "confirmed", ":confirmed_at": "t"}
+
+
+def test_get_reads_only_projected_fields_into_slots_record(fake_table):
+    table = fake_table(
+        [{**appt_key("a1"), "status": "scheduled", "payload": "x" * 1000, "confirmed_at": "t"}]
+    )
+    repo = AppointmentsRepo(table, "t")
+
+    appt = repo.get("a1")
+
+    assert isinstance(appt, Appointment) and not hasattr(appt, "__dict__")
+    assert (appt.appointment_id, appt.status, appt.confirmed) == ("a1", "scheduled", True)
+    assert appt.patient_phone_e164 is None
+    assert repo.get("nope") is None
+    assert appt.to_item() == {**appt_key("a1"), "status": "scheduled", "confirmed_at": "t"}
+
+
+def test_conditional_update_and_capacity_hook(fake_table):
+    table = fake_table([appt_key("a1")])
+    repo = AppointmentsRepo(table, "t")
+    seen = []
+    hook = lambda op, consumed: seen.append((op, consumed["CapacityUnits"]))  # noqa: E731
+
+    repo_mod.add_capacity_hook(hook)
+    try:
+        repo.get("a1")
+        with pytest.raises(ConditionFailed):
+            repo.update("zz", set_={"status": "x"}, condition="attribute_exists(pk)")
+    finally:
+        repo_mod.remove_capacity_hook(hook)
+
+    assert seen == [("GetItem", 0.5)]
+    assert table.calls[-1][1]["ReturnConsumedCapacity"] == "TOTAL"
+    repo.get("a1")
+    assert "ReturnConsumedCapacity" not in table.calls[-1][1]
+
+
+def test_cancel_marks_status_and_drops_the_row_from_gsi1(fake_table):
+    table = fake_table([{**appt_key("a1"), "gsi1pk": "PATIENT#+5939", "gsi1sk": "t"}])
+    repo = AppointmentsRepo(table, "t")
+
+    repo.cancel("a1", set_={"gcal_etag": "e2"})
+
+    call = table.calls[-1][1]
+    assert call["UpdateExpression"] == (
+        "SET #status=:status, gcal_etag=:gcal_etag REMOVE gsi1pk, gsi1sk"
+    )
+    assert call["ExpressionAttributeValues"] == {":status": "cancelled", ":gcal_etag": "e2"}
+    assert table.items[("APPT#a1", "APPT#a1")] == {
+        **appt_key("a1"),
+        "status": "cancelled",
+        "gcal_etag": "e2",
+    }
+    with pytest.raises(ConditionFailed):
+        repo.cancel("zz")
+
+
+def test_put_many_keeps_the_last_item_of_a_repeated_key(fake_table):
+    table = fake_table()
+    repo = AppointmentsRepo(table, "t")
+
+    repo.put_many([{**appt_key("a1"), "n": 1}, {**appt_key("a2")}, {**appt_key("a1"), "n": 2}])
+
+    assert table.items[("APPT#a1", "APPT#a1")]["n"] == 2
+    assert ("APPT#a2", "APPT#a2") in table.items
@@ -0,0 +1,40 @@
+from app.tools import aws_clients
+
+
+def test_lazy_proxy_builds_on_first_use():
+    built = []
+
+    class Client:
+        def ping(self):
+            return "pong"
+
+    proxy = aws_clients.LazyProxy(lambda: built.append(1) or Client())
+    assert built == []
+    assert proxy.ping() == "pong"
+    assert proxy.ping() == "pong"
+    assert built == [1]
+
+
+def test_lazy_proxy_allows_attribute_override(monkeypatch):
+    proxy = aws_clients.LazyProxy(lambda: None)
+    proxy.query = lambda **k: {"Items": []}
+    assert proxy.query() == {"Items": []}
+
+
+def test_clients_are_cached_per_service(monkeypatch):
+    created = []
+
+    class Session:
+        def client(self, service, config=None):
+            created.append(service)
+            return object()
+
+    aws_clients.reset()
+    monkeypatch.setattr(aws_clients, "_session", Session())
+    try:
+        a = aws_clients.client("scheduler")
+        assert aws_clients.client("scheduler") is a
+        aws_clients.client("sqs")
+        assert created == ["scheduler", "sqs"]
+    finally:
+        aws_clients.reset()
@@ -0,0 +1,123 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("DDB_TABLE", "dummy")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "app"))
+
+from app.runtime import calendar_sync as cs  # noqa: E402
+
+
+def _ev(eid, appt_id, start, etag="e1", status="confirmed"):
+    ev = {"id": eid, "etag": etag, "status": status, "start": {"dateTime": start}}
+    if appt_id:
+        ev["extendedProperties"] = {"private": {"appointment_id": appt_id}}
+    return ev
+
+
+def _row(appt_id, iso):
+    return {
+        "pk": f"APPT#{appt_id}",
+        "sk": f"APPT#{appt_id}",
+        "appt_time_iso": iso,
+        "patient_phone_e164": "+5939",
+        "r1_schedule_name": f"pt-dev-{appt_id}-r1",
+    }
+
+
+@pytest.fixture
+def env(monkeypatch, fake_calendar, fake_table, fake_scheduler):
+    cal = fake_calendar(
+        [
+            _ev("g1", "a1", "2030-01-10T10:00:00-05:00"),
+            _ev("g2", "a2", "2030-01-11T10:00:00-05:00"),
+            _ev("g3", None, "2030-01-12T10:00:00-05:00"),  # evento personal
+        ]
+    )
+    table = fake_table([_row("a1", "2030-01-10T15:00:00Z"), _row("a2", "2030-01-11T15:00:00Z")])
+    sched = fake_scheduler(["pt-dev-a1-r1", "pt-dev-a2-r1"], group="pt-dev-reminders")
+    invoked = []
+
+    class Lambda:
+        def invoke(self, **kw):
+            invoked.append(kw)
+
+    monkeypatch.setattr(cs.gcal, "_svc", lambda: cal)
+    monkeypatch.setattr(cs, "TABLE", table)
+    monkeypatch.setattr(cs, "REPO", cs.AppointmentsRepo(table, "dummy"))
+    monkeypatch.setattr(cs, "lambda_client", Lambda())
+    monkeypatch.setattr(cs, "scheduler", sched)
+    return cal, table, invoked, sched.deleted
+
+
+def test_full_then_incremental_sync_only_touches_changed_events(env):
+    cal, table, invoked, deleted = env
+
+    res = cs.handler({}, None)  # primera corrida: sincronización completa
+    assert res["unchanged"] == 2 and res["ignored"] == 1 and res["pages"] == 2
+    assert invoked == [] and deleted == []
+    assert table.items[("SYNC#gcal", f"CAL#{cs.gcal.CALENDAR_ID}")]["sync_token"] == "tok0"
+
+    res = cs.handler({}, None)  # sin cambios: una página vacía
+    assert res == {"ok": True, "pages": 1}
+    assert cal.list_calls[-1]["syncToken"] == "tok0"
+
+    cal.change(_ev("g1", "a1", "2030-01-10T12:00:00-05:00", etag="e2"))
+    cal.change(_ev("g2", "a2", "2030-01-11T10:00:00-05:00", etag="e2", status="cancelled"))
+    res = cs.handler({}, None)
+
+    assert res["rescheduled"] == 1 and res["cancelled"] == 1
+    assert table.items[("APPT#a1", "APPT#a1")]["appt_time_iso"] == "2030-01-10T17:00:00Z"
+    assert table.items[("APPT#a2", "APPT#a2")]["status"] == "cancelled"
+    assert len(invoked) == 1 and deleted == ["pt-dev-a2-r1"]
+
+
+def test_expired_token_falls_back_to_full_sync(env):
+    cal, table, invoked, _ = env
+    table.put_item({"pk": "SYNC#gcal", "sk": f"CAL#{cs.gcal.CALENDAR_ID}", "sync_token": "old"})
+
+    res = cs.handler({}, None)
+
+    assert res["full_resync"] == 1
+    assert [c["syncToken"] for c in cal.list_calls] == ["old", None, None]
+    assert table.items[("SYNC#gcal", f"CAL#{cs.gcal.CALENDAR_ID}")]["sync_token"] == "tok0"
+
+
+def test_event_without_row_is_retried_after_the_token_advances(env):
+    cal, table, invoked, _ = env
+    cs.handler({}, None)
+
+    # el evento llega antes que la fila APPT# (carrera con appointments_manager)
+    cal.change(_ev("g4", "a4", "2030-01-12T11:00:00-05:00", etag="e2"))
+    res = cs.handler({}, None)
+    state = table.items[("SYNC#gcal", f"CAL#{cs.gcal.CALENDAR_ID}")]
+    assert res["missing"] == 1 and state["sync_token"] == "tok1" and "pending" in state
+
+    table.put_item(_row("a4", "2030-01-12T15:00:00Z"))
+    res = cs.handler({}, None)
+
+    assert res["rescheduled"] == 1
+    assert table.items[("APPT#a4", "APPT#a4")]["appt_time_iso"] == "2030-01-12T16:00:00Z"
+    assert len(invoked) == 1
+    assert "pending" not in table.items[("SYNC#gcal", f"CAL#{cs.gcal.CALENDAR_ID}")]
+
+    # pasado MISSING_RETRY_S se descarta
+    pending = [{"event": _ev("g5", "a5", "2030-01-12T11:00:00-05:00"), "first_seen": 0}]
+    assert cs.sync("tok2", pending, now=cs.MISSING_RETRY_S)[2] == []
+
+
+def test_naive_event_time_compares_in_clinic_zone(env, monkeypatch):
+    cal, table, invoked, _ = env
+    monkeypatch.setattr(cs.gcal, "TZ", "America/Guayaquil")
+    cs.handler({}, None)
+
+    cal.change(_ev("g1", "a1", "2030-01-10T10:00:00", etag="e2"))
+    res = cs.handler({}, None)
+
+    assert res["unchanged"] == 1 and invoked == []
+    assert table.items[("APPT#a1", "APPT#a1")]["appt_time_iso"] == "2030-01-10T15:00:00Z"
@@ -0,0 +1,75 @@
+import importlib.util
+import os
+
+import pytest
+
+from app.agents import catalog_index
+
+YAML = """
+servicios:
+  - nombre: Rehabilitación postparto
+    duracion: 50 minutos
+    descripcion: Fortalecimiento de suelo pélvico y corrección de diástasis.
+  - nombre: Tratamiento de incontinencia urinaria
+    duracion: 50 minutos
+    descripcion: Biofeedback, ejercicios hipopresivos y reeducación vesical.
+  - nombre: Dolor pélvico crónico
+    duracion: 50 minutos
+    descripcion: Terapia manual, educación y ejercicios personalizados.
+contacto:
+  direccion: Ambato, Ecuador
+  whatsapp: "+593"
+  horario: "Lun-Vie"
+"""
+
+
+def _index():
+    return catalog_index.CatalogIndex(catalog_index._parse_yaml(YAML), "v1")
+
+
+def test_search_is_accent_insensitive_and_ranked():
+    idx = _index()
+    assert idx.search("tengo INCONTINENCIA") == [1]
+    assert idx.search("diastasis post parto")[0] == 0
+    # "pelvico" aparece en dos servicios; el del nombre puntúa más
+    assert idx.search("dolor pelvico")[0] == 2
+
+
+def test_answer_uses_prerendered_lines_and_fallback():
+    idx = _index()
+    out = idx.answer("biofeedback")
+    assert out.startswith("Servicios recomendados:\n- Tratamiento de incontinencia urinaria")
+    assert out.endswith("Horario: Lun-Vie")
+    assert idx.answer("xyz") is idx.fallback
+
+
+def test_get_index_reloads_only_when_file_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_index, "RECHECK_S", 0)
+    path = tmp_path / "svc.yml"
+    path.write_text(YAML, encoding="utf-8")
+    catalog_index.clear_cache()
+
+    first = catalog_index.get_index(path)
+    assert catalog_index.get_index(path) is first
+
+    path.write_text(YAML.replace("Ambato", "Quito"), encoding="utf-8")
+    os.utime(path, ns=(1, 1))
+    second = catalog_index.get_index(path)
+    assert second is not first
+    assert "Quito" in second.footer
+
+
+def test_relative_locations_resolve_inside_the_package_and_missing_default_fails(
+    tmp_path, monkeypatch
+):
+    default = catalog_index.resolve_location("content/pelvis/service.yml")
+    assert default == str(catalog_index.APP_ROOT / "content" / "pelvis" / "service.yml")
+    monkeypatch.chdir(tmp_path)  # el cwd no importa
+    assert catalog_index.get_index("content/pelvis/service.yml").services
+
+    monkeypatch.setenv("PT_CONTENT_PATH", "content/missing.yml")
+    spec = importlib.util.spec_from_file_location(
+        "app.agents._catalog_probe", catalog_index.__file__
+    )
+    with pytest.raises(FileNotFoundError, match="missing.yml"):
+        spec.loader.exec_module(importlib.util.module_from_spec(spec))
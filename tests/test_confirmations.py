@@ -0,0 +1,126 @@
+import threading
+
+from app.tools.appointments_repo import AppointmentsRepo, appt_key
+from app.tools.confirmations import ConfirmationEngine
+
+NOW = "2030-01-09T12:00:00Z"
+
+
+def _row(appt_id, iso, status="scheduled"):
+    return {
+        **appt_key(appt_id),
+        "gsi1pk": "PATIENT#+5939",
+        "gsi1sk": iso,
+        "appt_time_iso": iso,
+        "status": status,
+        "r2_schedule_name": f"pt-dev-{appt_id}-r2",
+        "esc_schedule_name": f"pt-dev-{appt_id}-esc",
+    }
+
+
+def _table(fake_table):
+    # la demora ensancha la ventana entre consulta y update
+    return fake_table([_row("a1", "2030-01-10T15:00:00Z")], query_delay=0.002)
+
+
+def test_concurrent_confirmations_have_a_single_winner(fake_table):
+    table = _table(fake_table)
+    deleted, outcomes = [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(20)
+
+    def delete(names):
+        with lock:
+            deleted.extend(names)
+        return {"deleted": len(names), "missing": 0, "errors": {}}
+
+    def worker():
+        # un motor por hilo: contenedores distintos, sin caché compartida
+        engine = ConfirmationEngine(AppointmentsRepo(table, "t"), delete)
+        barrier.wait()
+        outcome, appt = engine.confirm("+5939", NOW)
+        with lock:
+            outcomes.append((outcome, appt.appointment_id))
+
+    threads = [threading.Thread(target=worker) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(o for o, _ in outcomes).count("confirmed") == 1
+    assert {o for o, _ in outcomes} <= {"confirmed", "already_confirmed"}
+    assert sorted(deleted) == ["pt-dev-a1-esc", "pt-dev-a1-r2"]
+    assert table.items[("APPT#a1", "APPT#a1")]["status"] == "confirmed"
+
+
+def test_repeated_confirmation_is_served_from_cache(fake_table):
+    table = _table(fake_table)
+    clock = [1_894_000_000.0]  # antes de la cita
+    engine = ConfirmationEngine(
+        AppointmentsRepo(table, "t"), lambda names: {}, cache_ttl=60, clock=lambda: clock[0]
+    )
+
+    assert engine.confirm("+5939", NOW)[0] == "confirmed"
+    assert engine.confirm("+5939", NOW)[0] == "cached"
+    assert table.count("Query") == 1
+
+    clock[0] += 61
+    assert engine.confirm("+5939", NOW)[0] == "already_confirmed"
+    assert table.count("Query") == 2
+    assert engine.confirm("+5940", NOW) == ("not_found", None)
+
+
+def test_cached_confirmation_is_dropped_after_a_reschedule(fake_table):
+    table = _table(fake_table)
+    deleted = []
+    engine = ConfirmationEngine(
+        AppointmentsRepo(table, "t"),
+        lambda names: deleted.extend(names) or {},
+        clock=lambda: 1_894_000_000.0,
+    )
+    assert engine.confirm("+5939", NOW)[0] == "confirmed"
+    assert engine.confirm("+5939", NOW)[0] == "cached"
+    assert table.count("GetItem") == 1
+
+    # otra Lambda (calendar_sync) la movió de hora: hay que volver a confirmar
+    row = table.items[("APPT#a1", "APPT#a1")]
+    row.pop("confirmed_at")
+    row.update(appt_time_iso="2030-01-10T17:00:00Z", gsi1sk="2030-01-10T17:00:00Z")
+
+    outcome, appt = engine.confirm("+5939", NOW)
+
+    assert outcome == "confirmed" and appt.appt_time_iso == "2030-01-10T17:00:00Z"
+    assert row["confirmed_at"] == NOW and deleted.count("pt-dev-a1-r2") == 2
+
+
+def test_cancelled_rows_are_skipped_and_never_confirmed(fake_table):
+    # filas canceladas que siguen en gsi1 (anteriores al índice disperso)
+    rows = [_row(f"c{i}", f"2030-01-10T0{i}:00:00Z", "cancelled") for i in range(7)]
+    table = fake_table([*rows, _row("a2", "2030-01-12T15:00:00Z")])
+    engine = ConfirmationEngine(AppointmentsRepo(table, "t"), lambda names: {})
+
+    outcome, appt = engine.confirm("+5939", NOW)
+
+    assert outcome == "confirmed" and appt.appointment_id == "a2"
+    assert table.count("Query") == 2  # la primera página eran todas canceladas
+    assert all(table.items[(r["pk"], r["sk"])]["status"] == "cancelled" for r in rows)
+
+
+def test_cancel_between_query_and_update_is_not_confirmed(fake_table):
+    table = _table(fake_table)
+    deleted = []
+    repo = AppointmentsRepo(table, "t")
+    engine = ConfirmationEngine(repo, lambda names: deleted.extend(names) or {})
+    query = table.query
+
+    def cancel_after_query(**kwargs):
+        resp = query(**kwargs)
+        table.items[("APPT#a1", "APPT#a1")]["status"] = "cancelled"
+        return resp
+
+    table.query = cancel_after_query
+
+    assert engine.confirm("+5939", NOW) == ("not_found", None)
+    row = table.items[("APPT#a1", "APPT#a1")]
+    assert row["status"] == "cancelled" and "confirmed_at" not in row and deleted == []
@@ -0,0 +1,55 @@
+from botocore.exceptions import ClientError
+
+from app.tools import dedup
+
+
+class Clock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_lru_ttl_expires_and_evicts():
+    clock = Clock()
+    lru = dedup.LruTtl(maxsize=2, ttl=10, clock=clock)
+    lru.add("a")
+    lru.add("b")
+    assert "a" in lru
+    lru.add("c")  # desaloja "b" (menos reciente)
+    assert "b" not in lru
+    clock.t = 11
+    assert "a" not in lru
+
+
+def test_claim_uses_local_then_remote_tier(fake_table):
+    table = fake_table()
+    d1 = dedup.MessageDeduper(table)
+    assert d1.claim("m1") is True
+    assert d1.claim("m1") is False
+    assert "ttl" in table.items[("INBOUND#m1", "INBOUND")]
+
+    # Otro contenedor (LRU frío) ve el duplicado vía DynamoDB
+    d2 = dedup.MessageDeduper(table)
+    assert d2.claim("m1") is False
+    assert d1.stats()["local_hits"] == 1
+    assert d2.stats()["remote_hits"] == 1
+    assert d2.claim("m1") is False
+    assert d2.stats()["local_hits"] == 1
+
+
+def test_release_allows_retry_and_errors_fail_open(fake_table):
+    table = fake_table()
+    d = dedup.MessageDeduper(table)
+    d.claim("m1")
+    d.release("m1")
+    assert d.claim("m1") is True
+
+    class Broken:
+        def put_item(self, **kwargs):
+            raise ClientError({"Error": {"Code": "Throttled", "Message": "x"}}, "PutItem")
+
+    d = dedup.MessageDeduper(Broken())
+    assert d.claim("m2") is True
+    assert d.stats()["remote_errors"] == 1
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+from app.agents import fast_path, response_cache, router
+
+CATALOG = Path(__file__).resolve().parents[1] / "app" / "content" / "pelvis" / "service.yml"
+
+
+def test_frequent_intents_answered_from_catalog():
+    fp = fast_path.FastPath(CATALOG)
+    assert "Lun-Vie 09:00-18:00" in fp.answer("¿A qué hora atienden?")
+    assert "Ambato, Ecuador" in fp.answer("DONDE ESTAN UBICADOS")
+    assert "Rehabilitación postparto" in fp.answer("qué servicios tienen?")
+    assert fp.answer("hola").startswith("¡Hola! Soy el asistente de Pelvis Therapy")
+
+
+def test_combined_intents_and_greeting_dropped():
+    fp = fast_path.FastPath(CATALOG)
+    out = fp.answer("hola, cual es el horario y la direccion?")
+    assert "horario de atención" in out and "Estamos en" in out
+    assert "Soy el asistente" not in out
+
+
+def test_long_or_unknown_questions_fall_through():
+    fp = fast_path.FastPath(CATALOG)
+    assert fp.answer("¿el tratamiento de incontinencia duele?") is None
+    assert (
+        fp.answer("hola, a qué hora atienden los sábados y cuánto cuesta la evaluación inicial")
+        is None
+    )
+    assert fp.stats() == {"total": 2, "fast": 0, "llm": 2, "fast_ratio": 0.0}
+
+
+def test_router_uses_llm_only_when_no_rule_fires(monkeypatch):
+    monkeypatch.setattr(router, "FAST_PATH", fast_path.FastPath(CATALOG))
+    monkeypatch.setattr(router, "RESPONSE_CACHE", response_cache.build_cache("lru", CATALOG))
+    llm_calls = []
+
+    class FakeAgent:
+        def __call__(self, text):
+            llm_calls.append(text)
+            return type("R", (), {"message": " respuesta LLM "})()
+
+    from app.agents import info_agent
+
+    monkeypatch.setattr(info_agent, "get_info_agent", lambda location: FakeAgent())
+    assert "Ambato" in router.handle_message("dirección?")
+    assert router.handle_message("¿qué es la diástasis?") == "respuesta LLM"
+    assert llm_calls == ["¿qué es la diástasis?"]
+    assert router.FAST_PATH.stats()["fast_ratio"] == 0.5
+
+    # la misma pregunta, redactada distinto, sale de la caché
+    assert router.handle_message("Que es la diastasis") == "respuesta LLM"
+    assert len(llm_calls) == 1
+    assert router.RESPONSE_CACHE.stats()["lru_hits"] == 1
+
+
+def test_router_answers_from_the_tenants_catalog(tmp_path, monkeypatch):
+    other = tmp_path / "service.yml"
+    other.write_text(
+        CATALOG.read_text(encoding="utf-8")
+        .replace("Pelvis Therapy", "Clínica Norte")
+        .replace("Ambato, Ecuador", "Quito, Ecuador"),
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(router, "_TENANT_PATHS", {})
+
+    assert "Quito" in router.handle_message("dirección?", other)
+    assert "Clínica Norte" in router.handle_message("hola", str(other))
+    assert "Ambato" in router.handle_message("dirección?")
+    fast_path_other, cache_other = router._paths(other)
+    assert fast_path_other is not router.FAST_PATH and cache_other is not router.RESPONSE_CACHE
+    assert fast_path_other.stats()["fast"] == 2
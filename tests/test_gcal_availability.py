@@ -0,0 +1,115 @@
+import datetime as dt
+
+from app.tools import gcal_client
+from app.tools.gcal_availability import Availability, BusyIndex, to_epoch
+
+NOW = to_epoch("2030-01-01T08:00:00Z")
+
+
+def _h(hour, minute=0):
+    return f"2030-01-01T{hour:02d}:{minute:02d}:00Z"
+
+
+class Fetch:
+    def __init__(self, busy):
+        self.busy = busy
+        self.calls = []
+
+    def __call__(self, time_min, time_max):
+        self.calls.append((time_min, time_max))
+        return list(self.busy)
+
+
+def test_busy_index_merges_and_checks_overlap():
+    idx = BusyIndex([(10, 20), (15, 30), (40, 50), (30, 35)])
+    assert (idx.starts, idx.ends) == ([10, 40], [35, 50])
+    assert idx.overlaps(34, 36) and not idx.overlaps(35, 40) and not idx.overlaps(0, 10)
+
+    idx.add(36, 40)
+    assert (idx.starts, idx.ends) == ([10, 36], [35, 50])
+    assert list(idx.gaps(0, 60)) == [(0, 10), (35, 36), (50, 60)]
+
+
+def test_availability_caches_until_ttl_or_invalidation():
+    clock = [NOW]
+    fetch = Fetch([(_h(9), _h(10))])
+    av = Availability(fetch, window_days=7, ttl=60, clock=lambda: clock[0])
+
+    assert not av.is_free(_h(9, 30), _h(10, 30))
+    assert av.is_free(_h(10), _h(11))
+    assert len(fetch.calls) == 1
+
+    av.note_busy(_h(11), _h(12))  # creado por nosotros: sin recarga
+    assert not av.is_free(_h(11, 30), _h(12))
+    assert len(fetch.calls) == 1
+
+    av.invalidate()
+    assert av.is_free(_h(11, 30), _h(12))  # recargado: el fake no tiene el evento
+    assert len(fetch.calls) == 2
+
+    clock[0] += 61
+    av.is_free(_h(13), _h(14))
+    assert len(fetch.calls) == 3
+
+    # fuera de la ventana: consulta directa, sin tocar el índice
+    av.is_free("2030-03-01T09:00:00Z", "2030-03-01T10:00:00Z")
+    assert fetch.calls[-1] == ("2030-03-01T09:00:00Z", "2030-03-01T10:00:00Z")
+
+
+def test_find_free_slots_aligned_to_step():
+    fetch = Fetch([(_h(9), _h(10)), (_h(10, 30), _h(12))])
+    av = Availability(fetch, window_days=7, ttl=60, clock=lambda: NOW)
+
+    slots = av.find_free_slots(
+        dt.timedelta(minutes=60), (_h(8), _h(14)), step=dt.timedelta(minutes=30)
+    )
+    assert slots == [(_h(8), _h(9)), (_h(12), _h(13)), (_h(12, 30), _h(13, 30)), (_h(13), _h(14))]
+    assert av.find_free_slots(dt.timedelta(minutes=30), (_h(8), _h(14)), limit=1) == [
+        (_h(8), _h(8, 30))
+    ]
+
+
+def test_live_check_sees_events_the_cached_index_misses(monkeypatch):
+    clock = [NOW]
+    fetch = Fetch([])
+    av = Availability(fetch, window_days=7, ttl=600, clock=lambda: clock[0])
+    monkeypatch.setattr(gcal_client, "AVAILABILITY", av)
+    assert gcal_client.is_free(_h(14), _h(15))
+
+    # agendado a mano en Calendar después de cargar el índice
+    monkeypatch.setattr(gcal_client, "_freebusy", lambda a, b: [(_h(14, 30), _h(15, 30))])
+
+    assert gcal_client.is_free(_h(14), _h(15))  # índice cacheado: desactualizado
+    assert not gcal_client.is_free(_h(14), _h(15), live=True)
+    assert gcal_client.is_free(_h(15, 30), _h(16), live=True)
+
+
+def test_gcal_client_create_marks_busy(monkeypatch):
+    clock = [NOW]
+    fetch = Fetch([])
+    av = Availability(fetch, window_days=7, ttl=600, clock=lambda: clock[0])
+    monkeypatch.setattr(gcal_client, "AVAILABILITY", av)
+    monkeypatch.setattr(gcal_client, "TZ", "America/Guayaquil")
+
+    class Events:
+        def insert(self, **kw):
+            return self
+
+        def delete(self, **kw):
+            return self
+
+        def execute(self):
+            return {"id": "ev1"}
+
+    class Svc:
+        def events(self):
+            return Events()
+
+    monkeypatch.setattr(gcal_client, "_svc", lambda: Svc())
+
+    assert gcal_client.is_free(_h(14), _h(15))
+    gcal_client.create_event("s", "2030-01-01T09:00:00", "2030-01-01T10:00:00", "d")
+    assert not gcal_client.is_free(_h(14), _h(15))  # 09:00 -05:00 = 14:00Z
+    gcal_client.delete_event("ev1")
+    assert gcal_client.is_free(_h(14), _h(15))
+    assert len(fetch.calls) == 2
@@ -0,0 +1,71 @@
+import pytest
+
+from app.tools import gcal_client
+
+
+@pytest.fixture
+def calendar(monkeypatch, fake_calendar):
+    """`calendar(etags)`: Calendar en memoria con esos eventos y la caché de ETags vacía."""
+
+    def setup(etags):
+        cal = fake_calendar([{"id": eid, "etag": etag} for eid, etag in etags.items()])
+        monkeypatch.setattr(gcal_client, "_svc", lambda: cal)
+        monkeypatch.setattr(gcal_client, "_etags", type(gcal_client._etags)())
+        return cal
+
+    return setup
+
+
+def test_update_event_patches_only_fields_with_if_match(calendar):
+    cal = calendar({"ev1": "v1"})
+
+    gcal_client.update_event("ev1", description="nota")  # ETag desconocido: sin If-Match
+    gcal_client.update_event("ev1", description="otra")
+    assert cal.patches == [("ev1", {"description": "nota"}), ("ev1", {"description": "otra"})]
+    assert [h.get("If-Match") for _, h in cal.requests] == [None, "v1+"]
+
+    cal.store["ev1"]["etag"] = "cambiado-a-mano"
+    try:
+        gcal_client.update_event("ev1", description="x")
+        raise AssertionError("debió lanzar EventChanged")
+    except gcal_client.EventChanged as e:
+        assert e.event_id == "ev1"
+    assert "ev1" not in gcal_client._etags
+
+
+def test_update_many_batches_and_reports_per_item(calendar):
+    cal = calendar({f"ev{i}": "v1" for i in range(60)})
+    gcal_client._remember_etag("ev3", "viejo")  # provoca 412
+
+    res = gcal_client.update_many([(f"ev{i}", {"description": str(i)}) for i in range(60)])
+
+    assert cal.batches == [50, 10]
+    assert [r["ok"] for r in res].count(False) == 1
+    assert res[3] == {"id": "ev3", "ok": False, "status": 412, "error": "event_changed"}
+    assert gcal_client._etags["ev0"] == "v1+"
+
+
+def test_create_many_and_delete_many_report_per_item(calendar, monkeypatch):
+    cal = calendar({})
+    monkeypatch.setattr(gcal_client, "TZ", "America/Guayaquil")
+    events = [
+        {
+            "summary": "falla" if i == 1 else f"cita {i}",
+            "start_iso": "2030-01-10T09:00:00",
+            "end_iso": "2030-01-10T10:00:00",
+            "description": "",
+            "appointment_id": f"a{i}",
+        }
+        for i in range(3)
+    ]
+
+    res = gcal_client.create_many(events)
+
+    assert cal.batches == [3]
+    assert [r["ok"] for r in res] == [True, False, True]
+    assert res[1]["status"] == 403
+    assert gcal_client._etags[res[0]["id"]] == "v1"
+
+    deleted = gcal_client.delete_many([res[0]["id"], res[0]["id"]])  # el 2.º ya no existe
+    assert [r["ok"] for r in deleted] == [True, True]
+    assert res[0]["id"] not in gcal_client._etags
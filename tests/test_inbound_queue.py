@@ -0,0 +1,34 @@
+import json
+
+from app.tools import inbound_queue
+
+
+def test_local_queue_in_memory_fifo():
+    q = inbound_queue.LocalQueue()
+    q.send_batch([{"n": i} for i in range(3)])
+    ev = q.receive(max_messages=2)
+    assert [json.loads(r["body"])["n"] for r in ev["Records"]] == [0, 1]
+    assert len(q) == 1
+
+
+def test_local_queue_file_backed(tmp_path):
+    path = tmp_path / "inbound.jsonl"
+    inbound_queue.LocalQueue(str(path)).send_batch([{"n": 1}, {"n": 2}])
+    consumer = inbound_queue.LocalQueue(str(path))
+    assert len(consumer) == 2
+    ev = consumer.receive()
+    assert [json.loads(r["body"])["n"] for r in ev["Records"]] == [1, 2]
+    assert len(consumer) == 0
+
+
+def test_sqs_queue_chunks_batches():
+    calls = []
+
+    class Client:
+        def send_message_batch(self, QueueUrl, Entries):
+            calls.append(len(Entries))
+            return {"Successful": Entries}
+
+    q = inbound_queue.SqsQueue("url", client=Client())
+    assert q.send_batch([{"n": i} for i in range(23)]) == 23
+    assert calls == [10, 10, 3]
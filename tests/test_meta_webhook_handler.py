@@ -2,6 +2,7 @@ import os
 import sys
 from pathlib import Path
 
+import pytest
 from botocore.exceptions import ClientError
 
 # Ensure environment variable needed by module is set before import
@@ -51,8 +52,8 @@ def test_mark_confirmed_update_failure(monkeypatch, caplog):
 
     deleted = []
 
-    def fake_delete_schedule(Name):
-        deleted.append(Name)
+    def fake_delete_schedule(Name, GroupName):
+        deleted.append((Name, GroupName))
 
     monkeypatch.setattr(mwh.TABLE, "query", fake_query)
     monkeypatch.setattr(mwh.TABLE, "update_item", fake_update_item)
@@ -62,6 +63,157 @@ def test_mark_confirmed_update_failure(monkeypatch, caplog):
         ok, appt = mwh._mark_confirmed_and_cancel("+5939")
 
     assert ok is True
-    assert appt["pk"] == "PK"
-    assert set(deleted) == {"R2", "ESC"}
+    assert appt.appointment_id == "PK"
+    assert set(deleted) == {("R2", "pt-dev-reminders"), ("ESC", "pt-dev-reminders")}
     assert "Boom" in caplog.text
+
+
+def test_handler_sends_payload_replies_in_one_batch(monkeypatch):
+    batches = []
+
+    def fake_send_many(payloads):
+        batches.append(payloads)
+        return [{"ok": True} for _ in payloads]
+
+    monkeypatch.setattr(mwh, "send_many", fake_send_many)
+    event = {
+        "requestContext": {"http": {"method": "POST"}},
+        "body": (
+            '{"entry": [{"changes": [{"value": {"messages": ['
+            '{"type": "text", "from": "5931", "text": {"body": "hola"}},'
+            '{"type": "text", "from": "5932", "text": {"body": "buenas"}}'
+            "]}}]}]}"
+        ),
+    }
+
+    assert mwh.handler(event, None)["statusCode"] == 200
+    assert len(batches) == 1
+    assert [p["to"] for p in batches[0] if p["type"] == "text"] == ["5931", "5932"]
+    assert sum(p["type"] == "template" for p in batches[0]) == 2
+
+
+def test_async_mode_enqueues_then_consumer_processes(monkeypatch):
+    from app.tools.dedup import MessageDeduper
+    from app.tools.inbound_queue import LocalQueue
+
+    queue = LocalQueue()
+    sent = []
+    monkeypatch.setattr(mwh, "DEDUP", MessageDeduper())
+    monkeypatch.setattr(mwh, "WEBHOOK_MODE", "async")
+    monkeypatch.setattr(mwh, "get_queue", lambda: queue)
+    monkeypatch.setattr(mwh, "send_many", lambda p: sent.extend(p) or [{"ok": True}] * len(p))
+    event = {
+        "requestContext": {"http": {"method": "POST"}},
+        "body": (
+            '{"entry": [{"changes": [{"value": {"metadata": {"phone_number_id": "PN"},'
+            '"messages": [{"id": "w1", "type": "text", "from": "5931", "text": {"body": "hola"}},'
+            '{"id": "w2", "type": "image", "from": "5932"}]}}]}]}'
+        ),
+    }
+
+    assert mwh.handler(event, None)["statusCode"] == 200
+    assert len(queue) == 1
+    assert sent == []
+
+    batch = queue.receive()
+    batch["Records"].append({"messageId": "bad", "body": "{not json"})
+    resp = mwh.consumer_handler(batch, None)
+
+    assert resp == {"batchItemFailures": [{"itemIdentifier": "bad"}]}
+    assert [p["to"] for p in sent if p["type"] == "text"] == ["5931"]
+
+
+def test_async_statuses_are_ingested_in_one_batch(monkeypatch):
+    from app.tools.dedup import MessageDeduper
+    from app.tools.delivery_status import DeliveryTracker, MemoryDeliveryStore
+    from app.tools.inbound_queue import LocalQueue
+
+    queue, store = LocalQueue(), MemoryDeliveryStore()
+    tracker = DeliveryTracker(store)
+    tracker.record_sent([("a1", "2030-01-10T15:00:00Z", "second", "wamid.R2")])
+    monkeypatch.setattr(mwh, "DEDUP", MessageDeduper())
+    monkeypatch.setattr(mwh, "DELIVERY", tracker)
+    monkeypatch.setattr(mwh, "WEBHOOK_MODE", "async")
+    monkeypatch.setattr(mwh, "get_queue", lambda: queue)
+    for status in ("sent", "delivered", "read"):
+        body = (
+            '{"entry": [{"changes": [{"value": {"statuses": '
+            f'[{{"id": "wamid.R2", "status": "{status}", "timestamp": "1760000000"}}]'
+            "}}]}]}"
+        )
+        event = {"requestContext": {"http": {"method": "POST"}}, "body": body}
+        assert mwh.handler(event, None)["statusCode"] == 200
+
+    writes = store.writes
+    assert mwh.consumer_handler(queue.receive(), None) == {"batchItemFailures": []}
+
+    assert store.writes == writes + 1  # tres estados, un BatchWriteItem
+    assert tracker.states([("a1", "2030-01-10T15:00:00Z", "second")]) == {
+        ("a1", "2030-01-10T15:00:00Z", "second"): "read"
+    }
+
+
+def test_retried_payload_is_processed_once(monkeypatch):
+    from app.tools.dedup import MessageDeduper
+
+    batches = []
+    monkeypatch.setattr(mwh, "DEDUP", MessageDeduper())
+    monkeypatch.setattr(mwh, "send_many", lambda p: batches.append(p) or [{"ok": True}] * len(p))
+    event = {
+        "requestContext": {"http": {"method": "POST"}},
+        "body": (
+            '{"entry": [{"changes": [{"value": {"messages": ['
+            '{"id": "wamid.X", "type": "text", "from": "5931", "text": {"body": "hola"}}'
+            "]}}]}]}"
+        ),
+    }
+
+    mwh.handler(event, None)
+    mwh.handler(event, None)
+
+    assert len(batches) == 1
+    assert mwh.DEDUP.stats()["local_hits"] == 1
+
+
+def test_sync_failure_releases_the_claim_for_metas_retry(monkeypatch):
+    from app.tools.dedup import MessageDeduper
+
+    batches = []
+    monkeypatch.setattr(mwh, "DEDUP", MessageDeduper())
+    monkeypatch.setattr(mwh, "send_many", lambda p: batches.append(p) or [{"ok": True}] * len(p))
+    event = {
+        "requestContext": {"http": {"method": "POST"}},
+        "body": (
+            '{"entry": [{"changes": [{"value": {"messages": ['
+            '{"id": "wamid.Y", "type": "text", "from": "5931", "text": {"body": "hola"}}'
+            "]}}]}]}"
+        ),
+    }
+    collect = mwh._collect
+
+    def boom(pending, msg):
+        raise RuntimeError("router down")
+
+    monkeypatch.setattr(mwh, "_collect", boom)
+    with pytest.raises(RuntimeError):
+        mwh.handler(event, None)
+
+    monkeypatch.setattr(mwh, "_collect", collect)
+    mwh.handler(event, None)
+
+    assert len(batches) == 1
+
+
+def test_confirmation_shows_local_time_and_other_text_goes_to_router(monkeypatch):
+    from app.tools.appointments_repo import Appointment
+    from app.tools.webhook_payload import InboundMessage
+
+    appt = Appointment("a1", appt_time_iso="2030-01-10T15:00:00Z")
+    monkeypatch.setattr(mwh, "_mark_confirmed_and_cancel", lambda phone: (True, appt))
+
+    out, notices = mwh._process_message(InboundMessage("w1", "5931", "text", text="SI"))
+    assert out[0]["text"]["body"] == "¡Gracias! Tu cita del 10/01/2030 10:00 quedó confirmada."
+    assert len(notices) == 2
+
+    out, _ = mwh._process_message(InboundMessage("w2", "5931", "text", text="¿precio?"))
+    assert out[0]["text"]["body"].endswith(": ¿precio?")
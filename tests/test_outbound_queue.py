@@ -0,0 +1,91 @@
+import json
+
+from app.tools.outbound_queue import MemoryDeadLetters, OutboundQueue, TokenBucket, is_retryable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, s):
+        self.now += s
+
+
+def test_token_bucket_allows_burst_then_paces_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, burst=5, clock=clock, sleep=clock.sleep)
+
+    waits = [bucket.acquire() for _ in range(25)]
+
+    assert waits[:5] == [0.0] * 5
+    assert clock.now == 2.0  # 20 mensajes extra a 10/s
+    assert all(abs(w - 0.1) < 1e-9 for w in waits[5:])
+
+
+def test_retryable_results():
+    meta_throttle = json.dumps({"error": {"code": 130429, "message": "Rate limit hit"}})
+    assert is_retryable({"ok": False, "status": 429})
+    assert is_retryable({"ok": False, "status": 503})
+    assert is_retryable({"ok": False, "error": "refused", "connect_error": True})
+    # la petición pudo haberse escrito: reenviarla duplicaría el mensaje
+    assert not is_retryable({"ok": False, "error": "timed out"})
+    assert is_retryable({"ok": False, "status": 400, "error": meta_throttle})
+    assert not is_retryable({"ok": False, "status": 400, "error": '{"error": {"code": 100}}'})
+    assert not is_retryable({"ok": True})
+
+
+def test_send_retries_throttling_and_dead_letters_permanent_failures():
+    responses = {
+        "a": [{"ok": False, "status": 429}, {"ok": False, "status": 500}, {"ok": True}],
+        "b": [{"ok": False, "status": 400, "error": '{"error": {"code": 131026}}'}],
+        "c": [{"ok": False, "status": 429}] * 3,
+    }
+    calls = []
+
+    def post(payload):
+        calls.append(payload["to"])
+        return responses[payload["to"]].pop(0)
+
+    dlq = MemoryDeadLetters()
+    q = OutboundQueue(post, dlq, rate=1000, burst=10, attempts=3, sleep=lambda s: None)
+
+    results = q.send_many([{"to": "a"}, {"to": "b"}, {"to": "c"}], "PN1")
+
+    assert results[0] == {"ok": True}
+    assert results[1]["dead_lettered"] and results[1]["attempts"] == 1
+    assert results[2]["dead_lettered"] and results[2]["attempts"] == 3
+    assert sorted(calls) == ["a", "a", "a", "b", "c", "c", "c"]
+    assert [(d["payload"]["to"], d["phone_number_id"]) for d in dlq.items] in (
+        [("b", "PN1"), ("c", "PN1")],
+        [("c", "PN1"), ("b", "PN1")],
+    )
+    assert q.counters == {"sent": 1, "retries": 4, "throttled": 4, "dead_lettered": 2}
+
+
+def test_retries_stop_at_the_time_budget():
+    clock = FakeClock()
+    calls = []
+
+    def post(payload):
+        calls.append(clock.now)
+        clock.now += 1.5
+        return {"ok": False, "status": 503}
+
+    q = OutboundQueue(
+        post,
+        rate=1000,
+        burst=10,
+        attempts=10,
+        retry_max_s=0.5,
+        retry_budget_s=4,
+        sleep=clock.sleep,
+        clock=clock,
+    )
+
+    res = q.send({"to": "a"}, "PN1")
+
+    assert res["dead_lettered"] and res["attempts"] == len(calls) == 3
+    assert clock.now <= 4 + 1.5
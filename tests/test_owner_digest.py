@@ -0,0 +1,97 @@
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault("DDB_TABLE", "dummy")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "app"))
+
+from app.runtime import meta_webhook_handler as mwh  # noqa: E402
+from app.tools.owner_digest import (  # noqa: E402
+    MemoryDigestBuffer,
+    OwnerNotifier,
+    digest_payload,
+    owner_notice,
+)
+
+NOW = 1_900_000_000.0
+
+
+def _estado(payload):
+    return payload["template"]["components"][0]["parameters"][2]["text"]
+
+
+def _notifier(sent, ok=True):
+    clock = [NOW]
+
+    def send(payloads):
+        sent.append(payloads)
+        return [{"ok": ok} for _ in payloads]
+
+    buf = MemoryDigestBuffer()
+    return OwnerNotifier(buf, send=send, mode="digest", clock=lambda: clock[0]), buf, clock
+
+
+def test_escalations_go_out_now_and_the_rest_in_one_digest():
+    sent = []
+    notifier, buf, clock = _notifier(sent)
+
+    notifier.notify([owner_notice("inbound", "+5931", "N/A", "mensaje entrante: hola")])
+    notifier.notify(
+        [
+            owner_notice("escalation", "+5932", "2030-01-10T15:00:00Z", "Paciente no confirmó"),
+            owner_notice("created", "+5933", "2030-01-11T10:00:00", "Agendado (eventId=ev1)"),
+        ]
+    )
+    assert len(sent) == 1 and _estado(sent[0][0]) == "Paciente no confirmó"
+    assert notifier.counters == {"immediate": 1, "buffered": 2, "fallback": 0}
+
+    clock[0] += 900
+    res = notifier.flush()
+
+    assert res["coalesced"] == 2 and res["digests"] == 1
+    assert len(sent) == 2 and len(sent[1]) == 1
+    estado = _estado(sent[1][0])
+    assert estado.startswith("1 mensajes, 1 agendadas | +5931: mensaje entrante: hola")
+    assert buf.items == []
+    assert buf.stats == {"immediate": 1, "coalesced": 2, "digests": 1}
+    assert notifier.flush() == {"ok": True, "coalesced": 0, "digests": 0}
+
+
+def test_failed_digest_keeps_notices_for_next_window():
+    sent = []
+    notifier, buf, clock = _notifier(sent, ok=False)
+    notifier.notify([owner_notice("inbound", f"+59{i}", "N/A", "hola") for i in range(3)])
+
+    res = notifier.flush()
+
+    assert res == {"ok": False, "coalesced": 0, "digests": 0, "pending": 3}
+    assert len(buf.items) == 3
+
+
+def test_digest_text_is_capped():
+    notices = [owner_notice("inbound", f"+5939{i:04d}", "N/A", "x" * 60) for i in range(100)]
+    estado = _estado(digest_payload(notices))
+    assert len(estado) <= 900 and estado.endswith(")") and "\n" not in estado
+
+
+def test_webhook_buffers_owner_notices_in_digest_mode(monkeypatch):
+    batches = []
+    buf = MemoryDigestBuffer()
+    monkeypatch.setattr(mwh, "OWNER", OwnerNotifier(buf, mode="digest"))
+    monkeypatch.setattr(mwh, "send_many", lambda p: batches.append(p) or [{"ok": True}] * len(p))
+    event = {
+        "requestContext": {"http": {"method": "POST"}},
+        "body": (
+            '{"entry": [{"changes": [{"value": {"messages": ['
+            '{"type": "text", "from": "5931", "text": {"body": "hola"}}'
+            "]}}]}]}"
+        ),
+    }
+
+    mwh.handler(event, None)
+
+    assert [p["type"] for p in batches[0]] == ["text"]
+    assert [i["kind"] for i in buf.items] == ["inbound"]
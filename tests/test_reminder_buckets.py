@@ -0,0 +1,130 @@
+import datetime as dt
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault("DDB_TABLE", "dummy")
+os.environ.setdefault("SCHEDULER_ROLE_ARN", "arn:role")
+os.environ.setdefault("REMINDER_DISPATCHER_ARN", "arn:dispatcher")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "app"))
+
+from app.runtime import reminder_scheduler as rs  # noqa: E402
+from app.tools.reminder_buckets import (  # noqa: E402
+    MemoryBucketStore,
+    ReminderSweeper,
+    reminder_item,
+)
+
+T0 = dt.datetime(2030, 1, 1, 8, 0, tzinfo=dt.timezone.utc)
+
+
+class Clock:
+    def __init__(self):
+        self.now = T0
+
+    def __call__(self):
+        return self.now
+
+
+def _store(*due_minutes):
+    store = MemoryBucketStore()
+    store.put_reminders(
+        [
+            reminder_item(f"a{i}", "first", T0 + dt.timedelta(minutes=m, seconds=30), {"id": i})
+            for i, m in enumerate(due_minutes)
+        ]
+    )
+    return store
+
+
+def test_sweeper_dispatches_only_complete_minutes():
+    clock, store, sent = Clock(), _store(0, 2), []
+    sweeper = ReminderSweeper(store, lambda ps: [sent.append(p["id"]) or {} for p in ps], clock)
+
+    sweeper.sweep()  # 08:00 → barre 07:59
+    clock.now = T0 + dt.timedelta(minutes=1)
+    sweeper.sweep()  # barre 08:00
+    assert sent == [0]
+
+    clock.now = T0 + dt.timedelta(minutes=10)
+    sweeper.sweep()  # se pone al día desde la marca de agua
+    assert sent == [0, 1]
+    assert store.pending() == []
+
+
+def test_failed_reminders_move_to_next_bucket():
+    clock, store = Clock(), _store(0, 0)
+    calls = []
+
+    def dispatch(payloads):
+        calls.append([p["id"] for p in payloads])
+        return [{"error": "boom"} if p["id"] == 1 and len(calls) == 1 else {} for p in payloads]
+
+    sweeper = ReminderSweeper(store, dispatch, clock)
+    store.set_watermark("203001010759")
+    clock.now = T0 + dt.timedelta(minutes=1)
+    stats = sweeper.sweep()
+    assert stats["failed"] == 1 and len(store.pending()) == 1
+
+    clock.now = T0 + dt.timedelta(minutes=2)
+    sweeper.sweep()
+    assert calls == [[0, 1], [1]]
+    assert store.pending() == []
+
+
+def test_crash_before_watermark_redelivers():
+    clock, store, sent = Clock(), _store(0), []
+
+    class Crash(Exception):
+        pass
+
+    def crash_once(item, now_iso, _state={"n": 0}):
+        _state["n"] += 1
+        if _state["n"] == 1:
+            raise Crash()
+        MemoryBucketStore.mark_sent(store, item, now_iso)
+
+    store.mark_sent = crash_once
+    store.set_watermark("203001010759")
+    sweeper = ReminderSweeper(store, lambda ps: [sent.append(p["id"]) or {} for p in ps], clock)
+
+    clock.now = T0 + dt.timedelta(minutes=1)
+    try:
+        sweeper.sweep()
+    except Crash:
+        pass
+    assert store.get_watermark() == "203001010759"
+
+    clock.now = T0 + dt.timedelta(minutes=2)
+    sweeper.sweep()
+    assert sent == [0, 0]  # al menos una vez: duplicado, nunca perdido
+    assert store.pending() == []
+
+
+def test_scheduler_sweeper_engine_writes_buckets(monkeypatch, fake_table):
+    store = MemoryBucketStore()
+    table = fake_table()
+    monkeypatch.setattr(rs, "REMINDER_ENGINE", "sweeper")
+    monkeypatch.setattr(rs, "BUCKET_STORE", store)
+    monkeypatch.setattr(rs, "REPO", rs.AppointmentsRepo(table, "dummy"))
+    monkeypatch.setattr(rs, "FAST_MODE", False)
+
+    rs.handler(
+        {
+            "appointment_id": "a1",
+            "patient_phone_e164": "+5939",
+            "appt_time_iso": "2030-01-10T15:00:00Z",
+        },
+        None,
+    )
+
+    buckets = sorted(i["gsi2pk"] for i in store.pending())
+    assert buckets == [
+        "REMBUCKET#203001091500",
+        "REMBUCKET#203001091900",
+        "REMBUCKET#203001092000",
+    ]
+    assert "REMOVE r1_schedule_name" in table.calls[0][1]["UpdateExpression"]
@@ -0,0 +1,159 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault("DDB_TABLE", "dummy")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "app"))
+
+from app.runtime import reminder_dispatcher as rd  # noqa: E402
+from app.tools.delivery_status import DeliveryTracker, MemoryDeliveryStore  # noqa: E402
+from app.tools.webhook_payload import StatusUpdate  # noqa: E402
+
+
+class FakeDDB:
+    """batch_get_item con un primer intento que deja claves sin procesar."""
+
+    def __init__(self, rows, unprocessed_first=0):
+        self.rows = rows
+        self.unprocessed_first = unprocessed_first
+        self.calls = []
+
+    def batch_get_item(self, RequestItems):
+        ((table, req),) = RequestItems.items()
+        keys = req["Keys"]
+        self.calls.append(len(keys))
+        held, keys = keys[: self.unprocessed_first], keys[self.unprocessed_first :]
+        self.unprocessed_first = 0
+        resp = {"Responses": {table: [self.rows[k["pk"]] for k in keys if k["pk"] in self.rows]}}
+        if held:
+            resp["UnprocessedKeys"] = {table: {**req, "Keys": held}}
+        return resp
+
+
+def _ev(appt_id, action, phone="+5939"):
+    return {
+        "appointment_id": appt_id,
+        "patient_phone_e164": phone,
+        "patient_name": "Ana",
+        "appt_time_iso": "2030-01-10T15:00:00Z",
+        "action": action,
+    }
+
+
+def _setup(monkeypatch, rows, fail_to=(), unprocessed_first=0):
+    ddb = FakeDDB(
+        {f"APPT#{a}": {"pk": f"APPT#{a}", **extra} for a, extra in rows.items()},
+        unprocessed_first,
+    )
+    sent = []
+
+    def fake_send_many(payloads, on_result=None):
+        start = len(sent)
+        sent.extend(payloads)
+        results = [
+            {"ok": p["to"] not in fail_to, "error": "x", "resp": {"messages": [{"id": f"w{n}"}]}}
+            for n, p in enumerate(payloads, start)
+        ]
+        for i, res in enumerate(results):
+            on_result(i, res)
+        return results
+
+    monkeypatch.setattr(rd, "REPO", rd.AppointmentsRepo(None, "dummy", ddb, retry_base_s=0))
+    monkeypatch.setattr(rd, "DELIVERY", DeliveryTracker(MemoryDeliveryStore()))
+    monkeypatch.setattr(rd, "send_many", fake_send_many)
+    return ddb, sent
+
+
+def test_dispatch_batch_rules_and_partial_failures(monkeypatch):
+    ddb, sent = _setup(
+        monkeypatch,
+        {"a1": {}, "a2": {"confirmed_at": "2030-01-09"}, "a3": {}},
+        fail_to={"5930"},
+        unprocessed_first=1,
+    )
+    res = rd.dispatch_batch(
+        [
+            _ev("a1", "first"),
+            _ev("a2", "second"),
+            _ev("a3", "escalation"),
+            _ev("a1", "first"),  # repetido en el lote
+            _ev("zz", "first"),
+            _ev("a3", "second", phone="+5930"),
+            {"appointment_id": "bad"},
+        ]
+    )
+
+    assert ddb.calls == [4, 1]  # un BatchGetItem + reintento de UnprocessedKeys
+    assert [r.get("sent") or r.get("skipped") for r in res[:5]] == [
+        "r1",
+        "already_confirmed",
+        "owner_alert",
+        "duplicate_in_batch",
+        "not_found",
+    ]
+    assert res[5]["error"] and res[6]["error"] == "invalid_event"
+    assert len(sent) == 3
+
+
+def test_batch_handler_reports_sqs_item_failures(monkeypatch):
+    _setup(monkeypatch, {"a1": {}, "a2": {}}, fail_to={"5930"})
+    event = {
+        "Records": [
+            {"messageId": "m1", "body": json.dumps(_ev("a1", "first"))},
+            {"messageId": "m2", "body": json.dumps(_ev("a2", "first", phone="+5930"))},
+            {"messageId": "m3", "body": "{not json"},
+        ]
+    }
+    res = rd.handler(event, None)
+
+    assert res["sent"] == 1
+    assert sorted(f["itemIdentifier"] for f in res["batchItemFailures"]) == ["m2", "m3"]
+
+
+def test_delivery_state_skips_resends_retries_failures_and_flags_escalation(monkeypatch):
+    _setup(monkeypatch, {"a1": {}, "a2": {}})
+
+    rd.dispatch_batch([_ev("a1", "first"), _ev("a2", "second")])  # w0, w1
+    counts = rd.DELIVERY.ingest(
+        [
+            StatusUpdate("w0", "delivered", timestamp="1760000000"),
+            StatusUpdate("w0", "delivered", timestamp="1760000000"),
+            StatusUpdate("w1", "failed", errors=({"code": 131026, "title": "Undeliverable"},)),
+            StatusUpdate("wamid.other", "read"),
+        ]
+    )
+    assert counts == {"received": 4, "written": 2, "unmapped": 1}
+
+    res = rd.dispatch_batch([_ev("a1", "first"), _ev("a2", "second"), _ev("a2", "escalation")])
+    assert res[0]["skipped"] == "already_delivered"
+    assert (res[1]["sent"], res[1]["retry"]) == ("r2", True)
+    assert (res[2]["sent"], res[2]["r2"]) == ("owner_alert", "failed")
+
+    # el R2 reenviado (w2) fue aceptado: el "failed" de w1 ya no es el estado vigente
+    assert rd.DELIVERY.states([("a2", "2030-01-10T15:00:00Z", "second")]) == {
+        ("a2", "2030-01-10T15:00:00Z", "second"): "sent"
+    }
+    assert rd.dispatch_batch([_ev("a2", "escalation")])[0]["r2"] == "sent"
+
+    # reprogramada: otra hora, recordatorios desde cero
+    moved = {**_ev("a1", "first"), "appt_time_iso": "2030-01-11T15:00:00Z"}
+    assert rd.dispatch_batch([moved])[0]["sent"] == "r1"
+
+
+def test_rule_channel_decides_the_recipient(monkeypatch):
+    _, sent = _setup(monkeypatch, {"a1": {}})
+    owner = rd.owner_template_payload(paciente="+5939", fecha_hora="t", estado="x")["to"]
+
+    rd.dispatch_batch(
+        [
+            {**_ev("a1", "first"), "channel": "owner"},
+            _ev("a1", "escalation"),  # sin "channel": el de la acción (propietaria)
+            {**_ev("a1", "second"), "channel": "patient"},
+        ]
+    )
+
+    assert [p["to"] for p in sent] == [owner, owner, "5939"]
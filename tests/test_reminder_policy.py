@@ -0,0 +1,58 @@
+import datetime as dt
+import json
+
+from app.tools.reminder_policy import ReminderRule, agent_policy, default_policy, upsert_all
+
+NOW = dt.datetime(2025, 1, 10, 12, 0, tzinfo=dt.timezone.utc)
+APPT = {
+    "appointment_id": "A1",
+    "appt_time_iso": "2025-01-15T15:00:00Z",
+    "patient_phone_e164": "+593999",
+    "patient_name": "Ana",
+}
+TARGET = {"Arn": "arn:dispatcher", "RoleArn": "arn:role"}
+
+
+def test_default_policy_plans_all_fires_with_conditions():
+    fires = default_policy("dev").plan(APPT, now=NOW)
+
+    assert [(f.schedule_name, f.when.isoformat()) for f in fires] == [
+        ("pt-dev-A1-r1", "2025-01-14T15:00:00+00:00"),
+        ("pt-dev-A1-r2", "2025-01-14T19:00:00+00:00"),
+        ("pt-dev-A1-esc", "2025-01-14T20:00:00+00:00"),
+    ]
+    assert fires[0].payload == {**APPT, "action": "first", "template": "patient_reminder"}
+    assert fires[1].payload["condition"] == "unconfirmed"
+    assert fires[2].payload["action"] == "escalation" and "template" not in fires[2].payload
+
+    fast = default_policy("dev").plan(APPT, now=NOW, fast=True)
+    assert [int((f.when - NOW).total_seconds() // 60) for f in fast] == [1, 5, 9]
+
+
+def test_upsert_all_creates_then_updates_and_extra_rule_adds_one_call(fake_scheduler):
+    client = fake_scheduler()
+    policy = agent_policy()
+
+    assert upsert_all(client, policy.plan(APPT, NOW), TARGET, clock=lambda: NOW, group="g") == {}
+    assert sorted(client.calls) == [("create", "A1-24h"), ("create", "A1-4h")]
+    sched = client.schedules["A1-24h"]
+    assert sched["ScheduleExpression"] == "at(2025-01-14T15:00:00)"
+    assert sched["GroupName"] == "g"
+    assert json.loads(sched["Target"]["Input"])["action"] == "first"
+
+    policy.rules += (ReminderRule("1h", "second", -dt.timedelta(hours=1)),)
+    client.calls.clear()
+    upsert_all(client, policy.plan(APPT, NOW), TARGET, clock=lambda: NOW)
+    creates = [name for op, name in client.calls if op == "create"]
+    assert sorted(creates) == ["A1-1h", "A1-24h", "A1-4h"]
+    assert len([c for c in client.calls if c[0] == "update"]) == 2
+
+
+def test_past_fire_time_is_moved_to_the_near_future(fake_scheduler):
+    client = fake_scheduler()
+    late = NOW + dt.timedelta(days=5)  # después de la hora del R1
+
+    upsert_all(client, agent_policy().plan(APPT, NOW)[:1], TARGET, clock=lambda: late)
+
+    expr = client.schedules["A1-24h"]["ScheduleExpression"]
+    assert expr == "at(2025-01-15T12:01:00)"
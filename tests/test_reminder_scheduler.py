@@ -0,0 +1,89 @@
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault("DDB_TABLE", "dummy")
+os.environ.setdefault("SCHEDULER_ROLE_ARN", "arn:role")
+os.environ.setdefault("REMINDER_DISPATCHER_ARN", "arn:dispatcher")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "app"))
+
+from app.runtime import reminder_scheduler as rs  # noqa: E402
+
+
+def _appt(appt_id, iso="2030-01-10T15:00:00Z"):
+    return {
+        "appointment_id": appt_id,
+        "patient_phone_e164": "+5939",
+        "patient_name": "Ana",
+        "appt_time_iso": iso,
+    }
+
+
+def test_handler_upserts_three_schedules(monkeypatch, fake_scheduler, fake_table):
+    sched, table = fake_scheduler(), fake_table()
+    monkeypatch.setattr(rs, "scheduler", sched)
+    monkeypatch.setattr(rs, "REPO", rs.AppointmentsRepo(table, "dummy"))
+    monkeypatch.setattr(rs, "FAST_MODE", False)
+
+    res = rs.handler(_appt("a1"), None)
+
+    assert res["r1"] == "2030-01-09T15:00:00Z"
+    assert set(sched.schedules) == {"pt-dev-a1-r1", "pt-dev-a1-r2", "pt-dev-a1-esc"}
+    assert table.calls[0][1]["ExpressionAttributeValues"][":gsi1pk"] == "PATIENT#+5939"
+
+    rs.handler(_appt("a1"), None)  # segunda vez: conflicto → update
+    assert sum(1 for op, _ in sched.calls if op == "update") == 3
+
+
+def test_batch_handler_reports_per_appointment(monkeypatch, fake_scheduler, fake_table):
+    sched, table = fake_scheduler(fail_names={"pt-dev-bad-r2"}), fake_table()
+    monkeypatch.setattr(rs, "batch_scheduler", sched)
+    monkeypatch.setattr(rs, "REPO", rs.AppointmentsRepo(table, "dummy"))
+    monkeypatch.setattr(rs, "FAST_MODE", False)
+
+    # fila previa (reprogramación): lo que el lote no escribe se conserva
+    table.put_item({"pk": "APPT#a1", "sk": "APPT#a1", "gcal_etag": "e1"})
+    event = {
+        "appointments": [
+            {**_appt("a1"), "event_id": "evt1"},
+            _appt("bad"),
+            _appt("x", iso="not-a-date"),
+            _appt("a2"),
+        ]
+    }
+    res = rs.handler(event, None)
+
+    assert [r["ok"] for r in res["results"]] == [True, False, False, True]
+    assert [r["appointment_id"] for r in res["results"]] == ["a1", "bad", "x", "a2"]
+    assert res["scheduled"] == 2 and res["failed"] == 2
+    assert set(table.items) == {("APPT#a1", "APPT#a1"), ("APPT#a2", "APPT#a2")}
+    assert table.items[("APPT#a1", "APPT#a1")]["event_id"] == "evt1"
+    assert table.items[("APPT#a1", "APPT#a1")]["gcal_etag"] == "e1"
+    assert table.items[("APPT#a2", "APPT#a2")]["status"] == "scheduled"
+    assert len([n for n in sched.schedules if n.startswith("pt-dev-a")]) == 6
+
+
+def test_batch_handler_marks_plans_failed_when_buckets_cannot_be_written(
+    monkeypatch, fake_table
+):
+    class Store:
+        def put_reminders(self, items):
+            raise rs.bex.ClientError(
+                {"Error": {"Code": "ProvisionedThroughputExceededException"}}, "BatchWriteItem"
+            )
+
+    table = fake_table()
+    monkeypatch.setattr(rs, "REMINDER_ENGINE", "sweeper")
+    monkeypatch.setattr(rs, "BUCKET_STORE", Store())
+    monkeypatch.setattr(rs, "REPO", rs.AppointmentsRepo(table, "dummy"))
+    monkeypatch.setattr(rs, "FAST_MODE", False)
+
+    res = rs.handler({"appointments": [_appt("a1"), _appt("x", iso="not-a-date")]}, None)
+
+    assert [r["ok"] for r in res["results"]] == [False, False]
+    assert "ProvisionedThroughputExceeded" in res["results"][0]["error"]
+    assert table.items == {}  # sin recordatorios no se marca la cita como programada
@@ -0,0 +1,78 @@
+import os
+from pathlib import Path
+
+from app.agents import response_cache
+
+YAML = "servicios: []\ncontacto: {direccion: Ambato, whatsapp: '+593', horario: Lun}\n"
+
+
+def _catalog(tmp_path) -> Path:
+    path = tmp_path / "svc.yml"
+    path.write_text(YAML, encoding="utf-8")
+    return path
+
+
+def test_cache_key_is_semantic():
+    assert response_cache.cache_key("¿Dónde están UBICADOS?") == response_cache.cache_key(
+        "ubicados donde estan"
+    )
+    assert response_cache.cache_key("hola") == ""
+
+
+def test_cache_key_keeps_interrogatives_and_negations():
+    pairs = [
+        ("¿Dónde es la evaluación?", "¿Cuándo es la evaluación?"),
+        ("¿Atienden sábados?", "¿No atienden sábados?"),
+        ("¿Cómo es la sesión?", "¿Cuál es la sesión?"),
+        ("¿Quién atiende?", "¿Atienden?"),
+    ]
+    for a, b in pairs:
+        assert response_cache.cache_key(a) != response_cache.cache_key(b), (a, b)
+
+
+def test_tiers_backfill_and_metrics(tmp_path, fake_table):
+    path = _catalog(tmp_path)
+    table = fake_table()
+    warm = response_cache.ResponseCache(
+        [response_cache.LruBackend(), response_cache.DynamoBackend(table)], path
+    )
+    assert warm.get("¿qué es la diástasis?") is None
+    warm.put("¿qué es la diástasis?", "Separación de los rectos abdominales.")
+
+    # contenedor frío: acierta en DynamoDB y rellena su LRU
+    cold_lru = response_cache.LruBackend()
+    cold = response_cache.ResponseCache([cold_lru, response_cache.DynamoBackend(table)], path)
+    assert cold.get("que es la diastasis") == "Separación de los rectos abdominales."
+    assert cold.get("diastasis es que?") == "Separación de los rectos abdominales."
+    assert cold.stats()["dynamodb_hits"] == 1
+    assert cold.stats()["lru_hits"] == 1
+    assert cold.stats()["hit_rate"] == 1.0
+
+
+def test_catalog_change_invalidates(tmp_path, monkeypatch):
+    from app.agents import catalog_index
+
+    monkeypatch.setattr(catalog_index, "RECHECK_S", 0)
+    path = _catalog(tmp_path)
+    cache = response_cache.ResponseCache([response_cache.LruBackend()], path)
+    cache.put("horario sabados", "No atendemos sábados.")
+    assert cache.get("horario sabados") == "No atendemos sábados."
+
+    path.write_text(YAML.replace("Lun", "Lun-Sab"), encoding="utf-8")
+    os.utime(path, ns=(1, 1))
+    assert cache.get("horario sabados") is None
+
+
+def test_tenants_sharing_a_backend_do_not_share_answers(tmp_path, fake_table):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    paths = [_catalog(tmp_path / "a"), _catalog(tmp_path / "b")]
+    for path in paths:  # misma versión (mtime y tamaño) en ambos catálogos
+        os.utime(path, ns=(1, 1))
+    table = fake_table()
+    a, b = (response_cache.ResponseCache([response_cache.DynamoBackend(table)], p) for p in paths)
+
+    a.put("¿qué es la diástasis?", "respuesta de A")
+
+    assert b.get("¿qué es la diástasis?") is None
+    assert a.get("que es la diastasis") == "respuesta de A"
@@ -0,0 +1,53 @@
+import datetime as dt
+
+from app.tools.appointments_repo import Appointment
+from app.tools.reminder_policy import default_policy
+from app.tools.schedule_lifecycle import ScheduleGC, delete_schedules
+
+NOW = dt.datetime(2025, 1, 10, 12, 0, tzinfo=dt.timezone.utc)
+POLICY = default_policy("dev")
+
+
+class FakeRepo:
+    def __init__(self, appts):
+        self.appts = {a.appointment_id: a for a in appts}
+        self.calls = []
+
+    def batch_get(self, appt_ids, fields):
+        ids = set(appt_ids)
+        self.calls.append(ids)
+        return {i: self.appts[i] for i in ids if i in self.appts}, set()
+
+
+def test_delete_schedules_counts_missing_as_not_an_error(fake_scheduler):
+    client = fake_scheduler(POLICY.schedule_names("A1"), group="pt-dev-reminders")
+
+    res = delete_schedules(
+        client, POLICY.schedule_names("A1") + ["pt-dev-A9-r1"], "pt-dev-reminders"
+    )
+
+    assert res == {"deleted": 3, "missing": 1, "errors": {}}
+    assert sorted(client.deleted) == ["pt-dev-A1-esc", "pt-dev-A1-r1", "pt-dev-A1-r2"]
+
+
+def test_gc_deletes_orphaned_cancelled_and_past_appointments_page_by_page(fake_scheduler):
+    ids = ["A1", "A2", "A3", "A4"]
+    names = [n for i in ids for n in POLICY.schedule_names(i)] + ["pt-prod-A5-r1", "other"]
+    client = fake_scheduler(names, group="pt-dev-reminders")
+    repo = FakeRepo(
+        [
+            Appointment("A1", appt_time_iso="2025-01-15T15:00:00Z", status="scheduled"),
+            Appointment("A2", appt_time_iso="2025-01-15T15:00:00Z", status="cancelled"),
+            Appointment("A3", appt_time_iso="2025-01-09T15:00:00Z", status="scheduled"),
+            # A4 ya no existe
+        ]
+    )
+
+    res = ScheduleGC(client, repo, POLICY, "pt-dev-reminders", page_size=5, clock=lambda: NOW).run()
+
+    assert res["scanned"] == 12 and res["pages"] == 3
+    assert res["orphaned"] == res["deleted"] == 9
+    assert not any(n.startswith("pt-dev-A1-") for n in client.deleted)
+    assert "pt-prod-A5-r1" not in client.deleted and "other" not in client.deleted
+    assert len(repo.calls) == 3  # una lectura por página
+    assert POLICY.appointment_id_of("pt-dev-appt-7-esc") == "appt-7"
@@ -3,18 +3,43 @@ from types import SimpleNamespace
 from app.tools import scheduler_tool
 
 
-def test_schedule_reminders(monkeypatch):
-    calls = []
-
-    class Client:
-        def create_schedule(self, **kwargs):
-            calls.append(kwargs)
-            return {"Name": kwargs["Name"]}
-
-    monkeypatch.setattr(
-        scheduler_tool, "boto3", SimpleNamespace(client=lambda name: Client())
-    )
-    scheduler_tool.schedule_reminders("ev1", "2024-01-02T10:00:00")
-    assert len(calls) == 2
-    names = {c["Name"] for c in calls}
-    assert "ev1-24h" in names and "ev1-4h" in names
+def _setup(monkeypatch, fake_table, fake_scheduler):
+    table, client = fake_table(), fake_scheduler()
+    monkeypatch.setattr(scheduler_tool, "boto3", SimpleNamespace(client=lambda name: client))
+    monkeypatch.setattr(scheduler_tool, "REPO", scheduler_tool.AppointmentsRepo(table, "dummy"))
+    monkeypatch.setattr(scheduler_tool.gcal, "TZ", "America/Guayaquil")
+    return table, client
+
+
+def test_schedule_reminders(monkeypatch, fake_table, fake_scheduler):
+    table, client = _setup(monkeypatch, fake_table, fake_scheduler)
+
+    res = scheduler_tool.schedule_reminders("ev1", "2030-01-02T10:00:00", "+593", "Ana")
+
+    assert set(client.schedules) == {"ev1-24h", "ev1-4h"}
+    # hora naive = hora de la clínica (UTC-5)
+    assert res["ev1-24h"]["at"] == "2030-01-01T15:00:00Z"
+    row = table.items[("APPT#ev1", "APPT#ev1")]
+    assert row["appt_time_iso"] == row["gsi1sk"] == "2030-01-02T15:00:00Z"
+    assert (row["status"], row["gsi1pk"], row["event_id"]) == ("scheduled", "PATIENT#+593", "ev1")
+
+
+def test_reschedule_keeps_the_patient_and_cancel_marks_the_row(
+    monkeypatch, fake_table, fake_scheduler
+):
+    table, client = _setup(monkeypatch, fake_table, fake_scheduler)
+    scheduler_tool.schedule_reminders("ev1", "2030-01-02T10:00:00", "+593", "Ana")
+    table.items[("APPT#ev1", "APPT#ev1")]["confirmed_at"] = "2030-01-01T00:00:00Z"
+
+    scheduler_tool.schedule_reminders("ev1", "2030-01-03T10:00:00")  # actualizar_cita
+
+    payload = client.schedules["ev1-4h"]["Target"]["Input"]
+    assert '"patient_phone_e164": "+593"' in payload and '"patient_name": "Ana"' in payload
+    row = table.items[("APPT#ev1", "APPT#ev1")]
+    assert row["appt_time_iso"] == "2030-01-03T15:00:00Z" and "confirmed_at" not in row
+
+    scheduler_tool.cancel_reminders("ev1")
+
+    assert client.schedules == {}
+    row = table.items[("APPT#ev1", "APPT#ev1")]
+    assert row["status"] == "cancelled" and "gsi1pk" not in row
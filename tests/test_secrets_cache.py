@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from app.tools import secrets_cache
+from app.tools.secrets_cache import SecretsCache
+
+
+class Fetch:
+    def __init__(self, fail_first=0, code="ThrottlingException", delay=0.0):
+        self.calls = []
+        self.fail_first = fail_first
+        self.code = code
+        self.delay = delay
+        self.version = 1
+        self._lock = threading.Lock()
+
+    def __call__(self, name):
+        with self._lock:
+            self.calls.append(name)
+            n = len(self.calls)
+        time.sleep(self.delay)
+        if n <= self.fail_first:
+            raise ClientError({"Error": {"Code": self.code, "Message": "x"}}, "GetSecretValue")
+        return json.dumps({"name": name, "v": self.version})
+
+
+def test_ttl_refresh_ahead_in_background():
+    clock = [0.0]
+    fetch = Fetch()
+    cache = SecretsCache(fetch, ttl=100, refresh_ahead=20, clock=lambda: clock[0])
+
+    assert cache.get("a") == {"name": "a", "v": 1}
+    clock[0] = 50
+    cache.get("a")
+    assert fetch.calls == ["a"]
+
+    fetch.version = 2
+    clock[0] = 85  # dentro de la ventana de refresco: devuelve el valor viejo y refresca
+    assert cache.get("a")["v"] == 1
+    for _ in range(100):
+        if cache.counters["refreshes"]:
+            break
+        time.sleep(0.01)
+    assert cache.get("a")["v"] == 2
+    assert len(fetch.calls) == 2
+
+
+def test_retries_with_backoff_and_serves_stale_on_error(monkeypatch):
+    clock = [0.0]
+    fetch = Fetch(fail_first=2)
+    cache = SecretsCache(
+        fetch, ttl=10, refresh_ahead=0, attempts=3, clock=lambda: clock[0], sleep=lambda s: None
+    )
+
+    assert cache.get("a")["v"] == 1
+    assert len(fetch.calls) == 3
+
+    fetch.fail_first, fetch.code = 99, "AccessDeniedException"  # no reintentable
+    clock[0] = 11
+    assert cache.get("a")["v"] == 1
+    assert len(fetch.calls) == 4
+    assert cache.counters["stale"] == 1
+
+
+def test_prefetch_is_concurrent_and_shared_with_get():
+    fetch = Fetch(delay=0.1)
+    cache = SecretsCache(fetch)
+
+    t0 = time.perf_counter()
+    cache.prefetch(["a", "b", "c"])
+    assert cache.get("b")["name"] == "b"  # espera al prefetch en curso, sin repetir
+    cache.prefetch(["a", "b", "c"], wait=True)
+    assert time.perf_counter() - t0 < 0.25
+    assert sorted(fetch.calls) == ["a", "b", "c"]
+
+
+def test_local_stand_in(monkeypatch, tmp_path):
+    path = tmp_path / "secrets.json"
+    path.write_text(json.dumps({"pelvis/gcal/sa": {"type": "service_account"}}))
+    monkeypatch.setattr(secrets_cache, "LOCAL_FILE", str(path))
+    monkeypatch.setenv("SECRET_JSON_PELVIS_WA_META_OWNER", '{"access_token": "t"}')
+
+    cache = SecretsCache()
+    assert cache.get("pelvis/gcal/sa") == {"type": "service_account"}
+    assert cache.get("pelvis/wa/meta-owner") == {"access_token": "t"}
@@ -1,26 +1,123 @@
-from app.tools import state_store
+from botocore.exceptions import ClientError
 
+from app.tools import conversation_state, state_store
+from app.tools.conversation_state import ConversationState
 
-def test_state_store_crud(monkeypatch):
-    class Table:
-        def __init__(self):
-            self.items = {}
 
-        def put_item(self, Item):
-            self.items[Item["id"]] = Item
+class Table:
+    def __init__(self):
+        self.items = {}
+        self.updates = 0
+
+    def put_item(self, Item):
+        self.items[Item["id"]] = Item
+
+    def get_item(self, Key, **kwargs):
+        item = self.items.get(Key["id"])
+        return {"Item": dict(item)} if item else {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames, **kwargs):
+        self.updates += 1
+        values = kwargs["ExpressionAttributeValues"]
+        item = self.items.get(Key["id"])
+        version = (item or {}).get("version")
+        cond = kwargs.get("ConditionExpression", "")
+        if (cond.startswith("attribute_not_exists") and version is not None) or (
+            cond.startswith("#v =") and version != values[":expected"]
+        ):
+            raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem")
+        item = self.items.setdefault(Key["id"], {"id": Key["id"]})
+        for ph, attr in ExpressionAttributeNames.items():
+            if ph.startswith("#f"):
+                item[attr] = values[":" + ph[1:]]
+            elif ph.startswith("#r"):
+                item.pop(attr, None)
+        item["version"] = (version or 0) + 1
+        return {"Attributes": dict(item)}
 
-        def get_item(self, Key):
-            return {"Item": self.items.get(Key["id"])}
+    def delete_item(self, Key):
+        self.items.pop(Key["id"], None)
 
-        def delete_item(self, Key):
-            self.items.pop(Key["id"], None)
 
+def test_state_store_crud(monkeypatch):
     tbl = Table()
     monkeypatch.setattr(state_store, "_table", lambda: tbl)
 
+    # fuera de un handler @flush_after las herramientas escriben de inmediato
     state_store.save_state("1", {"foo": "bar"})
     assert tbl.items["1"]["foo"] == "bar"
     item = state_store.get_state("1")
     assert item == {"id": "1", "foo": "bar"}
     state_store.delete_state("1")
     assert "1" not in tbl.items
+
+
+def test_state_tools_defer_writes_inside_flush_after(monkeypatch):
+    tbl = Table()
+    monkeypatch.setattr(state_store, "_table", lambda: tbl)
+
+    @conversation_state.flush_after
+    def handler(event, context):
+        state_store.save_state("1", {"foo": "bar"})
+        state_store.save_state("1", {"baz": 1})
+        return tbl.updates
+
+    assert handler({}, None) == 0
+    assert tbl.updates == 1 and tbl.items["1"]["baz"] == 1
+    assert not conversation_state.in_flush_scope()
+
+
+def test_partial_updates_coalesce_into_one_write_per_invocation(monkeypatch):
+    tbl = Table()
+    tbl.items["ev1"] = {"id": "ev1", "paciente": "Ana", "inicio": "a", "version": 1}
+    state = ConversationState(lambda: tbl)
+
+    @conversation_state.flush_after
+    def handler(event, context):
+        state.update("ev1", {"inicio": "b", "fin": "c"})
+        state.update("ev1", {"fin": "d"})
+        return state.get("ev1")
+
+    seen = handler({}, None)
+
+    assert seen == {"id": "ev1", "paciente": "Ana", "inicio": "b", "fin": "d"}
+    assert tbl.updates == 1
+    assert tbl.items["ev1"] == {
+        "id": "ev1",
+        "paciente": "Ana",
+        "inicio": "b",
+        "fin": "d",
+        "version": 2,
+    }
+    assert state.counters["coalesced"] == 1
+
+
+def test_version_conflict_rereads_and_keeps_both_writers_fields():
+    tbl = Table()
+    tbl.items["ev1"] = {"id": "ev1", "inicio": "a", "version": 1}
+    state = ConversationState(lambda: tbl)
+    assert state.get("ev1")["inicio"] == "a"
+
+    # otro contenedor escribe entre nuestra lectura y el flush
+    tbl.items["ev1"] = {"id": "ev1", "inicio": "a", "telefono": "+593", "version": 2}
+    state.update("ev1", {"inicio": "b"})
+    state.flush()
+
+    assert tbl.items["ev1"] == {"id": "ev1", "inicio": "b", "telefono": "+593", "version": 3}
+    assert state.counters["conflicts"] == 1
+    assert state.get("ev1") == {"id": "ev1", "inicio": "b", "telefono": "+593"}
+
+
+def test_update_after_delete_replaces_the_record():
+    tbl = Table()
+    tbl.items["ev1"] = {"id": "ev1", "paciente": "Ana", "inicio": "a", "version": 4}
+    state = ConversationState(lambda: tbl)
+
+    state.delete("ev1")
+    state.update("ev1", {"inicio": "b"})
+    assert state.get("ev1") == {"id": "ev1", "inicio": "b"}
+    state.flush()
+
+    assert tbl.items["ev1"] == {"id": "ev1", "inicio": "b", "version": 1}
+    state._cache.clear()
+    assert state.get("ev1") == {"id": "ev1", "inicio": "b"}
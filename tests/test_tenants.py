@@ -0,0 +1,127 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("DDB_TABLE", "dummy")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "app"))
+
+from app.runtime import meta_webhook_handler as mwh  # noqa: E402
+from app.tools.tenants import Tenant, TenantContext, TenantRegistry  # noqa: E402
+
+DEFAULT = Tenant(
+    "default",
+    phone_number_id="PN0",
+    name="Pelvis Therapy",
+    wa_secret_name="pelvis/wa/meta-owner",
+    owner_wa_e164="+593000",
+    owner_template="owner_alert",
+    lang_code="es_EC",
+    calendar_id="cal0",
+)
+CONFIG = {
+    "tenants": [
+        {
+            "tenant_id": "norte",
+            "phone_number_id": "PN1",
+            "name": "Clínica Norte",
+            "wa_secret_name": "norte/wa",
+            "owner_wa_e164": "+593111",
+            "calendar_id": "cal-norte",
+        }
+    ]
+}
+
+
+def test_registry_resolves_by_phone_number_id_with_env_defaults():
+    reg = TenantRegistry.from_config(CONFIG, DEFAULT)
+
+    norte = reg.get("PN1")
+    assert norte.name == "Clínica Norte" and norte.calendar_id == "cal-norte"
+    assert norte.owner_template == "owner_alert" and norte.lang_code == "es_EC"
+    assert reg.get("PN0") is DEFAULT
+    assert reg.get("PN-unknown") is DEFAULT
+    assert reg.get(tenant_id="norte") is norte
+    assert len(reg) == 2
+
+
+def test_context_builds_outbound_lazily_with_the_tenant_secret(monkeypatch):
+    from app.tools import whatsapp_owner
+
+    posted = []
+    monkeypatch.setattr(
+        whatsapp_owner, "_post_messages", lambda p, secret: posted.append(secret) or {"ok": True}
+    )
+    ctx = TenantContext(TenantRegistry.from_config(CONFIG, DEFAULT).get("PN1"))
+    assert ctx._outbound is None
+
+    assert ctx.send_many([whatsapp_owner.text_payload("+5939", "hola")]) == [{"ok": True}]
+    assert posted == ["norte/wa"]
+    assert ctx.outbound is ctx.outbound
+    assert ctx.owner_payload("p", "f", "e")["to"] == "593111"
+
+
+def test_webhook_replies_and_notifies_per_tenant(monkeypatch):
+    from app.tools.dedup import MessageDeduper
+
+    tenants = mwh.tenants
+    tenants.set_registry(TenantRegistry.from_config(CONFIG, DEFAULT))
+    default_sent, norte_posted = [], []
+    monkeypatch.setattr(mwh, "DEDUP", MessageDeduper())
+    monkeypatch.setattr(
+        mwh, "send_many", lambda p: default_sent.extend(p) or [{"ok": True}] * len(p)
+    )
+    monkeypatch.setattr(
+        tenants.whatsapp_owner,
+        "_post_messages",
+        lambda p, secret: norte_posted.append((secret, p)) or {"ok": True},
+    )
+
+    def change(pnid, mid):
+        return (
+            f'{{"value": {{"metadata": {{"phone_number_id": "{pnid}"}}, "messages": ['
+            f'{{"id": "{mid}", "type": "text", "from": "5931", "text": {{"body": "hola"}}}}]}}}}'
+        )
+
+    body = f'{{"entry": [{{"changes": [{change("PN0", "m1")}, {change("PN1", "m2")}]}}]}}'
+    try:
+        mwh.handler({"requestContext": {"http": {"method": "POST"}}, "body": body}, None)
+        assert tenants.context("PN1") is tenants.context("PN1")
+    finally:
+        tenants.set_registry(None)
+
+    assert len(default_sent) == 2  # respuesta + aviso con la propietaria del entorno
+    assert "Pelvis Therapy" in next(p for p in default_sent if p["type"] == "text")["text"]["body"]
+    assert {s for s, _ in norte_posted} == {"norte/wa"}
+    assert {p["to"] for _, p in norte_posted} == {"593111", "5931"}
+    reply = next(p for _, p in norte_posted if p["type"] == "text")
+    assert "Clínica Norte" in reply["text"]["body"]
+
+
+def test_non_default_tenants_cannot_book_or_confirm(monkeypatch):
+    from app.runtime import appointments_manager as am
+    from app.tools.webhook_payload import InboundMessage
+
+    reg = TenantRegistry.from_config(CONFIG, DEFAULT)
+    mwh.tenants.set_registry(reg)
+    am.tenants.set_registry(reg)
+    monkeypatch.setattr(
+        mwh, "_mark_confirmed_and_cancel", lambda phone: pytest.fail("queried shared rows")
+    )
+    try:
+        res = am.handler({"action": "create", "tenant_id": "norte", "appointment_id": "a1"}, None)
+        out, notices = mwh._process_message(
+            InboundMessage("w1", "5931", "text", text="si"), mwh.tenants.context("PN1")
+        )
+    finally:
+        mwh.tenants.set_registry(None)
+        am.tenants.set_registry(None)
+
+    assert res == {"ok": False, "error": "tenant_not_supported"}
+    assert "No encontré una cita pendiente" in out[0]["text"]["body"]
+    assert len(notices) == 1
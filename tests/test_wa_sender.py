@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+
+from app.tools import wa_sender
+
+
+class FakeResponse:
+    def __init__(self, status=200, body=b"{}", will_close=False):
+        self.status = status
+        self._body = body
+        self.will_close = will_close
+
+    def read(self):
+        return self._body
+
+
+class FakeConn:
+    def __init__(self, fail_first=False, read_error=None):
+        self.requests = 0
+        self.closed = False
+        self.fail_first = fail_first
+        self.read_error = read_error
+
+    def request(self, method, path, body=None, headers=None):
+        self.requests += 1
+        if self.fail_first and self.requests == 1:
+            raise ConnectionResetError("stale")
+
+    def getresponse(self):
+        if self.read_error:
+            raise self.read_error
+        return FakeResponse()
+
+    def close(self):
+        self.closed = True
+
+
+def test_pool_reuses_connections():
+    created = []
+
+    def factory():
+        created.append(FakeConn())
+        return created[-1]
+
+    pool = wa_sender.ConnectionPool("example.com", size=2, factory=factory)
+    for _ in range(3):
+        assert pool.request("POST", "/x", b"{}", {}) == (200, b"{}")
+    assert len(created) == 1
+    assert created[0].requests == 3
+
+
+def test_pool_retries_stale_reused_connection():
+    stale = FakeConn(fail_first=True)
+    fresh = FakeConn()
+    conns = iter([fresh])
+    pool = wa_sender.ConnectionPool("example.com", factory=lambda: next(conns))
+    pool._release(stale)
+
+    assert pool.request("POST", "/x", b"{}", {})[0] == 200
+    assert stale.closed
+    assert fresh.requests == 1
+
+
+def test_pool_never_resends_after_the_request_was_written():
+    reused = FakeConn(read_error=TimeoutError("timed out"))
+    created = []
+    pool = wa_sender.ConnectionPool("example.com", factory=lambda: created.append(1))
+    pool._release(reused)
+
+    with pytest.raises(TimeoutError):
+        pool.request("POST", "/x", b"{}", {})
+    assert reused.requests == 1 and reused.closed
+    assert created == []
+
+
+def test_pool_reports_connect_failures_before_writing():
+    class Refused(FakeConn):
+        sock = None
+
+        def connect(self):
+            raise ConnectionRefusedError("refused")
+
+    conn = Refused()
+    pool = wa_sender.ConnectionPool("example.com", factory=lambda: conn)
+
+    with pytest.raises(wa_sender.ConnectError):
+        pool.request("POST", "/x", b"{}", {})
+    assert conn.closed and conn.requests == 0
+
+
+def test_send_many_preserves_order_per_recipient():
+    sent = []
+    lock = threading.Lock()
+
+    def post(payload):
+        time.sleep(0.01 if payload["to"] == "a" else 0)
+        with lock:
+            sent.append((payload["to"], payload["n"]))
+        return {"ok": True, "n": payload["n"]}
+
+    payloads = [{"to": to, "n": i} for i, to in enumerate(["a", "b", "a", "c", "a", "b"])]
+    results = wa_sender.send_many(payloads, post)
+
+    assert [r["n"] for r in results] == list(range(6))
+    assert [n for to, n in sent if to == "a"] == [0, 2, 4]
+    assert [n for to, n in sent if to == "b"] == [1, 5]
+
+
+def test_send_many_isolates_failures():
+    def post(payload):
+        if payload["to"] == "bad":
+            raise OSError("down")
+        return {"ok": True}
+
+    seen = {}
+    results = wa_sender.send_many(
+        [{"to": "bad"}, {"to": "good"}], post, on_result=lambda i, res: seen.update({i: res})
+    )
+    assert results[0]["ok"] is False
+    assert results[1] == {"ok": True}
+    assert seen == dict(enumerate(results))
@@ -0,0 +1,88 @@
+import base64
+import logging
+
+import pytest
+
+from app.tools import webhook_payload as wp
+
+BODY = (
+    b'{"entry": [{"changes": [{"value": {"metadata": {"phone_number_id": "PN"},'
+    b'"statuses": [{"id": "wamid.S", "status": "delivered", "recipient_id": "5931"}],'
+    b'"messages": [{"id": "wamid.M", "type": "text", "from": "5931", "timestamp": "1",'
+    b'"text": {"body": "s\xc3\xad"}}, {"id": "wamid.I", "type": "image", "from": "5932"}]}}]}]}'
+)
+
+
+def test_parse_base64_body_and_yield_typed_records():
+    event = {"body": base64.b64encode(BODY).decode(), "isBase64Encoded": True}
+
+    events = list(wp.iter_events(wp.parse(wp.raw_body(event))))
+
+    assert [type(e).__name__ for e in events] == [
+        "StatusUpdate",
+        "InboundMessage",
+        "InboundMessage",
+    ]
+    st, msg, img = events
+    assert (st.id, st.status, st.phone_number_id) == ("wamid.S", "delivered", "PN")
+    assert (msg.sender, msg.text, msg.phone_number_id) == ("5931", "sí", "PN")
+    assert msg.to_record() == {
+        "id": "wamid.M",
+        "from": "5931",
+        "type": "text",
+        "timestamp": "1",
+        "text": {"body": "sí"},
+        "phone_number_id": "PN",
+    }
+    assert img.text == "" and "text" not in img.to_record()
+    assert wp.status_summary([st, st]) == "delivered=2"
+
+
+@pytest.mark.parametrize("raw", [b"{not json", b"[1, 2]"])
+def test_parse_rejects_non_objects(raw):
+    with pytest.raises(wp.PayloadError):
+        wp.parse(raw)
+
+
+def test_log_raw_slices_bytes_without_reencoding(caplog):
+    log = logging.getLogger("test_webhook_payload")
+    with caplog.at_level(logging.INFO, logger="test_webhook_payload"):
+        wp.log_raw(log, "payload", BODY, limit=12)
+        wp.log_event(log, "event", {"a": "x" * 100}, limit=8)
+
+    assert caplog.messages == [
+        f'payload ({len(BODY)} bytes): {{"entry": [{{',
+        'event (108 bytes): {"a":"xx',
+    ]
+
+
+def test_falls_back_to_stdlib_json_without_orjson(monkeypatch, caplog):
+    monkeypatch.setattr(wp, "orjson", None)
+    assert wp.parse(BODY)["entry"]
+    with pytest.raises(wp.PayloadError):
+        wp.parse(b"{not json")
+
+    log = logging.getLogger("test_webhook_payload")
+    with caplog.at_level(logging.INFO, logger="test_webhook_payload"):
+        wp.log_event(log, "event", {"a": "x" * 100}, limit=8)
+    assert caplog.messages == ['event (108 bytes): {"a":"xx']
+
+
+def test_to_record_keeps_only_needed_fields():
+    msg = {
+        "id": "wamid.1",
+        "from": "5939",
+        "type": "text",
+        "timestamp": "1700000000",
+        "text": {"body": "hola"},
+        "context": {"big": "x" * 100},
+    }
+    rec = wp.InboundMessage.from_record(msg, {"phone_number_id": "PN"}).to_record()
+    assert rec == {
+        "id": "wamid.1",
+        "from": "5939",
+        "type": "text",
+        "timestamp": "1700000000",
+        "text": {"body": "hola"},
+        "phone_number_id": "PN",
+    }